@@ -144,7 +144,9 @@ AEON_QUESTIONS = [
     }
 ]
 
-# Улучшенная система хранения сессий
+# Улучшенная система хранения сессий. Базы у этого варианта нет, сессии живут
+# только в памяти процесса: вытесненную сессию не восстановить, поэтому кэш с
+# вытеснением (app.session_cache в backend-hr) здесь не используется
 sessions: Dict[str, SessionState] = {}
 
 SESSION_TTL = timedelta(hours=1)
@@ -0,0 +1,177 @@
+"""normalized session answers and questions
+
+Revision ID: 5b7e1f4c9d2a
+Revises: 2ac68360ab73
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+# revision identifiers, used by Alembic.
+revision = '5b7e1f4c9d2a'
+down_revision = '2ac68360ab73'
+branch_labels = None
+depends_on = None
+
+LEGACY_COLUMNS = ('answers', 'aeon_answers', 'asked_questions', 'question_order')
+BACKFILL_BATCH = 500
+
+
+def _decode(value, default):
+    """Старые колонки хранили json.dumps(...) внутри JSON — декодируем до объекта"""
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return default
+    return default if value is None else value
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+
+    if 'session_answers' not in tables:
+        op.create_table(
+            'session_answers',
+            sa.Column('session_token', sa.String(), sa.ForeignKey('sessions.token', ondelete='CASCADE'), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('question_id', sa.String(), nullable=False),
+            sa.Column('answer', sa.Text(), nullable=False),
+            sa.Column('extra', sa.JSON(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('session_token', 'position')
+        )
+    if 'session_questions' not in tables:
+        op.create_table(
+            'session_questions',
+            sa.Column('session_token', sa.String(), sa.ForeignKey('sessions.token', ondelete='CASCADE'), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('question_id', sa.String(), nullable=False),
+            sa.Column('asked_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('session_token', 'position')
+        )
+
+    # Переносим данные из JSON-колонок (если база создана до нормализации)
+    session_columns = {c['name'] for c in inspector.get_columns('sessions')}
+    if not set(LEGACY_COLUMNS) <= session_columns:
+        return
+
+    sessions = sa.table(
+        'sessions',
+        sa.column('token', sa.String()),
+        sa.column('answers', sa.Text()),
+        sa.column('question_order', sa.Text()),
+        sa.column('created_at', sa.DateTime()),
+        sa.column('last_activity', sa.DateTime()),
+    )
+    answers_table = sa.table(
+        'session_answers',
+        sa.column('session_token', sa.String()),
+        sa.column('position', sa.Integer()),
+        sa.column('question_id', sa.String()),
+        sa.column('answer', sa.Text()),
+        sa.column('extra', sa.JSON()),
+        sa.column('created_at', sa.DateTime()),
+    )
+    questions_table = sa.table(
+        'session_questions',
+        sa.column('session_token', sa.String()),
+        sa.column('position', sa.Integer()),
+        sa.column('question_id', sa.String()),
+        sa.column('asked_at', sa.DateTime()),
+    )
+
+    last_token = ''
+    while True:
+        batch = bind.execute(
+            sa.select(sessions)
+            .where(sessions.c.token > last_token)
+            .order_by(sessions.c.token)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not batch:
+            break
+
+        answer_rows, question_rows = [], []
+        for row in batch:
+            for position, answer in enumerate(_decode(row.answers, [])):
+                if not isinstance(answer, dict) or 'question_id' not in answer:
+                    continue
+                extra = {k: v for k, v in answer.items() if k not in ('question_id', 'answer')}
+                answer_rows.append({
+                    'session_token': row.token,
+                    'position': position,
+                    'question_id': str(answer['question_id']),
+                    'answer': str(answer.get('answer', '')),
+                    'extra': extra or None,
+                    'created_at': row.last_activity,
+                })
+            for position, question_id in enumerate(_decode(row.question_order, [])):
+                question_rows.append({
+                    'session_token': row.token,
+                    'position': position,
+                    'question_id': str(question_id),
+                    'asked_at': row.created_at,
+                })
+
+        if answer_rows:
+            op.bulk_insert(answers_table, answer_rows)
+        if question_rows:
+            op.bulk_insert(questions_table, question_rows)
+        last_token = batch[-1].token
+
+    # Старые JSON-колонки оставляем для отката; приложение их больше не пишет
+
+
+def downgrade():
+    bind = op.get_bind()
+    session_columns = {c['name'] for c in sa.inspect(bind).get_columns('sessions')}
+
+    if set(LEGACY_COLUMNS) <= session_columns:
+        # Собираем JSON обратно из строк, чтобы не потерять ответы, полученные после миграции
+        answers = bind.execute(sa.text(
+            "SELECT session_token, question_id, answer, extra FROM session_answers "
+            "ORDER BY session_token, position"
+        )).all()
+        questions = bind.execute(sa.text(
+            "SELECT session_token, question_id FROM session_questions "
+            "ORDER BY session_token, position"
+        )).all()
+
+        by_token = {}
+        for token, question_id, answer, extra in answers:
+            state = by_token.setdefault(token, {'answers': [], 'aeon_answers': {}, 'order': []})
+            raw = {'question_id': question_id, 'answer': answer}
+            raw.update(_decode(extra, {}) or {})
+            state['answers'].append(raw)
+            state['aeon_answers'][question_id] = answer
+        for token, question_id in questions:
+            state = by_token.setdefault(token, {'answers': [], 'aeon_answers': {}, 'order': []})
+            state['order'].append(question_id)
+
+        # Старый код писал json.dumps(...) в JSON-колонку — сохраняем тот же формат
+        def encode(value):
+            return json.dumps(json.dumps(value))
+
+        for token, state in by_token.items():
+            bind.execute(
+                sa.text(
+                    "UPDATE sessions SET answers = :answers, aeon_answers = :aeon_answers, "
+                    "asked_questions = :asked_questions, question_order = :question_order "
+                    "WHERE token = :token"
+                ),
+                {
+                    'token': token,
+                    'answers': encode(state['answers']),
+                    'aeon_answers': encode(state['aeon_answers']),
+                    'asked_questions': encode(state['order']),
+                    'question_order': encode(state['order']),
+                },
+            )
+
+    op.drop_table('session_questions')
+    op.drop_table('session_answers')
@@ -0,0 +1,47 @@
+"""session expiry indexes
+
+Revision ID: 8c3d2e6f1a47
+Revises: 5b7e1f4c9d2a
+Create Date: 2026-10-18 14:00:00.000000
+
+Индексы для очистки просроченных сессий и выборок по времени.
+(completed, last_activity) покрывает запрос purge-задачи
+(completed = false AND last_activity < cutoff) и выборки по completed.
+В PostgreSQL индексы строятся CONCURRENTLY, чтобы не блокировать запись
+в таблицу sessions на время построения.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8c3d2e6f1a47'
+down_revision = '5b7e1f4c9d2a'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_sessions_last_activity', ['last_activity']),
+    ('ix_sessions_created_at', ['created_at']),
+    ('ix_sessions_completed_last_activity', ['completed', 'last_activity']),
+)
+
+
+def _existing_indexes():
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('sessions')}
+
+
+def upgrade():
+    existing = _existing_indexes()
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            if name not in existing:
+                op.create_index(name, 'sessions', columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    existing = _existing_indexes()
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            if name in existing:
+                op.drop_index(name, table_name='sessions', postgresql_concurrently=True)
@@ -0,0 +1,26 @@
+"""session final score
+
+Revision ID: a7d3e9f1c245
+Revises: f2a9c4e6b107
+Create Date: 2026-10-22 10:00:00.000000
+
+Итоговый балл сессии на момент завершения: /result отдаёт его из узкой
+сводки, не загружая ответы. У завершённых ранее сессий — NULL: балл
+считается по ответам, как раньше.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9f1c245'
+down_revision = 'f2a9c4e6b107'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sessions', sa.Column('final_score', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sessions', 'final_score')
@@ -0,0 +1,25 @@
+"""session bank version
+
+Revision ID: a9c4e2d7b615
+Revises: f3a8d51c7e29
+Create Date: 2026-10-18 22:00:00.000000
+
+Версия банка вопросов, закреплённая за сессией (app.question_catalog).
+У существующих сессий — NULL: они отвечают на текущий банк по умолчанию.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2d7b615'
+down_revision = 'f3a8d51c7e29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('sessions', sa.Column('bank_version', sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sessions', 'bank_version')
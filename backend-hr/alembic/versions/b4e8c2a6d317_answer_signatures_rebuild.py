@@ -0,0 +1,35 @@
+"""answer signatures rebuild staging
+
+Revision ID: b4e8c2a6d317
+Revises: a7d3e9f1c245
+Create Date: 2026-10-23 10:00:00.000000
+
+Промежуточная таблица перестроения индекса похожих ответов
+(app.answer_similarity): сигнатуры копятся в ней и переносятся в
+answer_signatures одной транзакцией, поэтому прерванное перестроение не
+оставляет наполовину заполненную таблицу.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8c2a6d317'
+down_revision = 'a7d3e9f1c245'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'answer_signatures_rebuild',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_token', sa.String(), nullable=False),
+        sa.Column('question_id', sa.String(), nullable=False),
+        sa.Column('bank_version', sa.String(), nullable=True),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('answer_signatures_rebuild')
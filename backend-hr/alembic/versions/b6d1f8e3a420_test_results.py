@@ -0,0 +1,37 @@
+"""test results
+
+Revision ID: b6d1f8e3a420
+Revises: a9c4e2d7b615
+Create Date: 2026-10-19 10:00:00.000000
+
+Результаты тестов с вариантами ответов (app.graded_tests): /test/{id}/submit
+возвращает id строки, /result/{id} читает её по первичному ключу.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b6d1f8e3a420'
+down_revision = 'a9c4e2d7b615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'test_results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('test_version', sa.String(), nullable=False),
+        sa.Column('language', sa.String(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('answers', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('test_results')
@@ -0,0 +1,31 @@
+"""test drafts
+
+Revision ID: c3e7a1f9d284
+Revises: b6d1f8e3a420
+Create Date: 2026-10-19 12:00:00.000000
+
+Черновики ответов на тесты (автосохранение, app.answer_drafts).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3e7a1f9d284'
+down_revision = 'b6d1f8e3a420'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'test_drafts',
+        sa.Column('candidate', sa.String(), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('answers', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('candidate', 'test_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('test_drafts')
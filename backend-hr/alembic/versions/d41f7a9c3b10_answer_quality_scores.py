@@ -0,0 +1,28 @@
+"""answer quality scores
+
+Revision ID: d41f7a9c3b10
+Revises: 8c3d2e6f1a47
+Create Date: 2026-10-18 16:00:00.000000
+
+Оценка качества ответа (app.answer_quality) хранится рядом с ответом.
+Существующие строки остаются без оценки: их оценит приложение при
+первом обращении к сессии.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7a9c3b10'
+down_revision = '8c3d2e6f1a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('session_answers', sa.Column('quality', sa.JSON(), nullable=True))
+    op.add_column('session_answers', sa.Column('scorer_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('session_answers', 'scorer_version')
+    op.drop_column('session_answers', 'quality')
@@ -0,0 +1,33 @@
+"""task cache
+
+Revision ID: d8b2f6a4c913
+Revises: c3e7a1f9d284
+Create Date: 2026-10-19 15:00:00.000000
+
+Кэш сгенерированных ИИ заданий /aeon/task (app.task_cache).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd8b2f6a4c913'
+down_revision = 'c3e7a1f9d284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'task_cache',
+        sa.Column('key', sa.String(length=40), nullable=False),
+        sa.Column('task', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index('ix_task_cache_expires_at', 'task_cache', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_task_cache_expires_at', table_name='task_cache')
+    op.drop_table('task_cache')
@@ -0,0 +1,26 @@
+"""answer signature bank version
+
+Revision ID: e5c1a7d3b982
+Revises: d8b2f6a4c913
+Create Date: 2026-10-20 10:00:00.000000
+
+Версия банка сессии у сигнатуры ответа (app.answer_similarity): ответы на
+одинаковые id вопросов из банков разных языков индексируются раздельно.
+У существующих строк — NULL: банк берётся по сессии.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1a7d3b982'
+down_revision = 'd8b2f6a4c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('answer_signatures', sa.Column('bank_version', sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('answer_signatures', 'bank_version')
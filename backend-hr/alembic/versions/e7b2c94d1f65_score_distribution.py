@@ -0,0 +1,34 @@
+"""score distribution
+
+Revision ID: e7b2c94d1f65
+Revises: d41f7a9c3b10
+Create Date: 2026-10-18 18:00:00.000000
+
+Счётчики итоговых баллов завершённых сессий для перцентиля кандидата.
+Таблица создаётся пустой: приложение при старте построит распределение
+по завершённым сессиям (app.score_distribution).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c94d1f65'
+down_revision = 'd41f7a9c3b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'score_distributions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('scorer_version', sa.Integer(), nullable=False),
+        sa.Column('counts', sa.JSON(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('score_distributions')
@@ -0,0 +1,31 @@
+"""job leases
+
+Revision ID: f2a9c4e6b107
+Revises: e5c1a7d3b982
+Create Date: 2026-10-21 10:00:00.000000
+
+Аренда фоновых задач (app.job_lease): перестроение распределения баллов и
+индекса похожих ответов выполняет один процесс, остальные ждут результат.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9c4e6b107'
+down_revision = 'e5c1a7d3b982'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_leases',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('holder', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('job_leases')
@@ -0,0 +1,36 @@
+"""answer signatures
+
+Revision ID: f3a8d51c7e29
+Revises: e7b2c94d1f65
+Create Date: 2026-10-18 20:00:00.000000
+
+MinHash-сигнатуры ответов для поиска похожих ответов разных кандидатов.
+Таблица создаётся пустой: приложение при старте посчитает сигнатуры по
+session_answers (app.answer_similarity).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d51c7e29'
+down_revision = 'e7b2c94d1f65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'answer_signatures',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_token', sa.String(), nullable=False),
+        sa.Column('question_id', sa.String(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_answer_signatures_session_token', 'answer_signatures', ['session_token'])
+
+
+def downgrade():
+    op.drop_index('ix_answer_signatures_session_token', table_name='answer_signatures')
+    op.drop_table('answer_signatures')
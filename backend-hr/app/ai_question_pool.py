@@ -0,0 +1,263 @@
+"""Пул заранее сгенерированных ИИ вопросов интервью.
+
+Когда вопросы банка заканчиваются, /aeon/question/{token} выдаёт вопрос,
+сгенерированный OpenAI. Генерация занимает секунды, поэтому на пути
+запроса её нет: фоновая задача (AIQuestionProducer, запускается в
+app.main) держит по каждому типу вопроса (technical / soft) ограниченный
+буфер готовых вопросов, а запрос только забирает вопрос из буфера (pop).
+
+Буфер пополняется по водяным знакам: когда вопросов типа меньше
+AI_POOL_LOW, производитель догенерирует их до AI_POOL_HIGH (не больше
+AI_POOL_CONCURRENCY запросов к ИИ одновременно). Каждый ответ модели
+проверяется (validate_question): текст нужной длины, тип совпадает с
+запрошенным, ключевые слова — строки; повторы уже выданных и лежащих в
+буфере вопросов отбрасываются. Если буфер пуст, запрос не ждёт генерации
+(счётчик underflows).
+
+Пул процессный и на одном языке (языке банка по умолчанию): сессии на
+других языках вопросы ИИ не получают.
+"""
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+AI_POOL_TYPES = tuple(t for t in os.getenv("AI_POOL_TYPES", "technical,soft").split(",") if t)
+AI_POOL_LOW = int(os.getenv("AI_POOL_LOW", "3"))
+AI_POOL_HIGH = int(os.getenv("AI_POOL_HIGH", "10"))
+AI_POOL_CONCURRENCY = int(os.getenv("AI_POOL_CONCURRENCY", "2"))
+AI_POOL_REFILL_INTERVAL = float(os.getenv("AI_POOL_REFILL_INTERVAL", "30"))
+
+MIN_QUESTION_LENGTH = 20
+MAX_QUESTION_LENGTH = 400
+MAX_KEYWORDS = 10
+# Сколько последних выданных текстов помнить для отбраковки повторов
+RECENT_TEXTS = 500
+# Сколько последних задержек генерации держать для медианы
+LATENCY_WINDOW = 100
+
+AI_QUESTION_PREFIX = "ai_"
+
+
+def ai_question_type(question_id) -> Optional[str]:
+    """Тип вопроса ИИ по его id ("ai_<тип>_<hex>"); None — вопрос не из пула"""
+    if not isinstance(question_id, str) or not question_id.startswith(AI_QUESTION_PREFIX):
+        return None
+    question_type, _, rest = question_id[len(AI_QUESTION_PREFIX):].rpartition("_")
+    return question_type if question_type and rest else None
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def validate_question(data, question_type: str) -> Optional[Dict]:
+    """Вопрос из ответа модели в виде для выдачи или None, если ответ не годится"""
+    if not isinstance(data, dict):
+        return None
+    text = data.get("text")
+    if not isinstance(text, str):
+        return None
+    text = " ".join(text.split())
+    if not MIN_QUESTION_LENGTH <= len(text) <= MAX_QUESTION_LENGTH:
+        return None
+    if data.get("type", question_type) != question_type:
+        return None
+    keywords = data.get("keywords") or []
+    if not isinstance(keywords, list):
+        return None
+    keywords = list(dict.fromkeys(k.strip().lower() for k in keywords if isinstance(k, str) and k.strip()))
+    return {
+        "id": f"{AI_QUESTION_PREFIX}{question_type}_{uuid.uuid4().hex[:12]}",
+        "text": text,
+        "type": question_type,
+        "keywords": keywords[:MAX_KEYWORDS],
+        "ai_generated": True,
+    }
+
+
+class AIQuestionPool:
+    """Буферы готовых вопросов ИИ по типам"""
+
+    def __init__(self, generate: Callable[[str], Awaitable[Optional[Dict]]], types: Iterable[str] = AI_POOL_TYPES,
+                 low: int = AI_POOL_LOW, high: int = AI_POOL_HIGH, concurrency: int = AI_POOL_CONCURRENCY,
+                 language: Optional[str] = None):
+        if not 0 < low <= high:
+            raise ValueError(f"AI question pool watermarks must satisfy 0 < low <= high, got {low}, {high}")
+        self.generate = generate
+        self.types = tuple(types)
+        self.low = low
+        self.high = high
+        self.concurrency = concurrency
+        self.language = language
+        self._buffers: Dict[str, Deque[Dict]] = {t: deque(maxlen=high) for t in self.types}
+        self._recent: Deque[str] = deque(maxlen=RECENT_TEXTS)
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        # Вызывается, когда буфер типа опустился ниже low (будит производителя)
+        self.on_low: Optional[Callable[[], None]] = None
+        self.served = 0
+        self.underflows = 0
+        self.generated = 0
+        self.rejected = 0
+        self.failures = 0
+        self.last_refill: Optional[str] = None
+
+    def depth(self, question_type: str) -> int:
+        return len(self._buffers.get(question_type, ()))
+
+    def needs_refill(self) -> List[str]:
+        return [t for t in self.types if len(self._buffers[t]) < self.low]
+
+    def pop(self, question_type: str) -> Optional[Dict]:
+        """Готовый вопрос типа (без обращения к ИИ) или None, если буфер пуст"""
+        buffer = self._buffers.get(question_type)
+        question = buffer.popleft() if buffer else None
+        if question is None:
+            self.underflows += 1
+        else:
+            self.served += 1
+            self._recent.append(_normalize(question["text"]))
+        if buffer is not None and len(buffer) < self.low and self.on_low is not None:
+            self.on_low()
+        return question
+
+    def pop_any(self, preferred: Iterable[str]) -> Optional[Dict]:
+        """Вопрос первого типа из preferred, у которого буфер не пуст"""
+        for question_type in preferred:
+            if self._buffers.get(question_type):
+                return self.pop(question_type)
+        self.underflows += 1
+        if self.on_low is not None:
+            self.on_low()
+        return None
+
+    def add(self, question: Dict) -> bool:
+        """Кладёт проверенный вопрос в буфер; повтор или переполнение — False"""
+        buffer = self._buffers.get(question["type"])
+        if buffer is None or len(buffer) >= self.high:
+            return False
+        text = _normalize(question["text"])
+        if text in self._recent or any(_normalize(q["text"]) == text for b in self._buffers.values() for q in b):
+            self.rejected += 1
+            return False
+        buffer.append(question)
+        return True
+
+    async def _produce(self, question_type: str) -> bool:
+        started = time.perf_counter()
+        try:
+            data = await self.generate(question_type)
+        except Exception as e:
+            self.failures += 1
+            print(f"ERROR: AI question generation failed: {e}")
+            return False
+        if data is None:
+            self.failures += 1
+            return False
+        question = validate_question(data, question_type)
+        if question is None:
+            self.rejected += 1
+            return False
+        if not self.add(question):
+            return False
+        self._latencies.append(time.perf_counter() - started)
+        self.generated += 1
+        return True
+
+    async def refill(self) -> int:
+        """Догенерирует буферы ниже low до high; возвращает число добавленных вопросов"""
+        missing = [t for t in self.needs_refill() for _ in range(self.high - len(self._buffers[t]))]
+        if not missing:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def produce(question_type: str) -> bool:
+            async with semaphore:
+                return await self._produce(question_type)
+
+        added = sum(await asyncio.gather(*(produce(t) for t in missing)))
+        self.last_refill = datetime.now(timezone.utc).isoformat()
+        return added
+
+    def stats(self) -> Dict:
+        latencies = [x * 1000 for x in self._latencies]
+        return {
+            "language": self.language,
+            "depth": {t: len(b) for t, b in self._buffers.items()},
+            "low": self.low,
+            "high": self.high,
+            "served": self.served,
+            "underflows": self.underflows,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "refill_latency_ms": {
+                "last": round(latencies[-1], 1) if latencies else None,
+                "p50": round(statistics.median(latencies), 1) if latencies else None,
+                "max": round(max(latencies), 1) if latencies else None,
+            },
+            "last_refill": self.last_refill,
+        }
+
+
+class AIQuestionProducer:
+    """Фоновое пополнение пула (asyncio-задача из app.main): по сигналу пула и раз в interval"""
+
+    def __init__(self, pool: AIQuestionPool, interval: float = AI_POOL_REFILL_INTERVAL,
+                 should_run: Callable[[], bool] = lambda: True):
+        self.pool = pool
+        self.interval = interval
+        self.should_run = should_run
+        self._stopped: Optional[asyncio.Event] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def run_once(self) -> int:
+        if not self.should_run() or not self.pool.needs_refill():
+            return 0
+        return await self.pool.refill()
+
+    @staticmethod
+    async def _wait_for(task: Optional[asyncio.Future], *events: asyncio.Event, timeout: Optional[float] = None):
+        """Ждёт первого из: завершения task, одного из событий, таймаута"""
+        waiters = [asyncio.ensure_future(event.wait()) for event in events]
+        try:
+            await asyncio.wait(waiters + ([task] if task is not None else []), timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self.pool.on_low = self._wakeup.set
+        print(f"DEBUG: AI question producer started (low={self.pool.low}, high={self.pool.high})")
+        try:
+            while not self._stopped.is_set():
+                self._wakeup.clear()
+                failures = self.pool.failures
+                refill = asyncio.ensure_future(self.run_once())
+                # Остановка не ждёт запросов к ИИ, которые уже в пути
+                await self._wait_for(refill, self._stopped)
+                if not refill.done():
+                    refill.cancel()
+                    break
+                try:
+                    refill.result()
+                except Exception as e:
+                    print(f"ERROR: AI question pool refill failed: {e}")
+                if self.pool.failures > failures:
+                    # ИИ не отвечает: следующая попытка — через interval, сигналы пула не ускоряют
+                    await self._wait_for(None, self._stopped, timeout=self.interval)
+                else:
+                    await self._wait_for(None, self._stopped, self._wakeup, timeout=self.interval)
+        finally:
+            self.pool.on_low = None
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
@@ -0,0 +1,209 @@
+"""Черновики ответов на тесты: буфер автосохранения с отложенной записью.
+
+/test/{id}/autosave вызывается фронтендом часто, пока кандидат отвечает.
+Каждый вызов только сливает ответы в черновик кандидата в памяти
+процесса (DraftBuffer.put) — без обращения к базе. Черновик записывается
+в таблицу test_drafts, когда кандидат затих на DRAFT_DEBOUNCE секунд или
+черновик не записан дольше DRAFT_MAX_DELAY (DraftFlusher из app.main).
+При остановке процесса записываются все черновики.
+
+При отправке теста черновик забирается из буфера и из базы и
+сливается с отправленными ответами (отправленные важнее).
+
+Запись сливает ответы с уже сохранёнными (по вопросу — последний), так
+что автосохранения кандидата, попавшие в разные процессы, не теряются.
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+DRAFT_DEBOUNCE = float(os.getenv("DRAFT_DEBOUNCE", "2"))
+DRAFT_MAX_DELAY = float(os.getenv("DRAFT_MAX_DELAY", "30"))
+DRAFT_FLUSH_INTERVAL = float(os.getenv("DRAFT_FLUSH_INTERVAL", "1"))
+
+# (кандидат, id теста)
+DraftKey = Tuple[str, int]
+
+
+class _Draft:
+    __slots__ = ("answers", "first_ts", "last_ts", "saves")
+
+    def __init__(self, now: float):
+        self.answers: Dict[int, int] = {}
+        self.first_ts = now   # первое несохранённое изменение
+        self.last_ts = now    # последнее изменение
+        self.saves = 0
+
+
+class DraftBuffer:
+    """Несохранённые черновики ответов по (кандидат, тест)"""
+
+    def __init__(self, debounce: float = DRAFT_DEBOUNCE, max_delay: float = DRAFT_MAX_DELAY,
+                 clock: Callable[[], float] = time.monotonic):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._drafts: Dict[DraftKey, _Draft] = {}
+        self.saves = 0
+        self.flushed = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_flush: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._drafts)
+
+    def put(self, candidate: str, test_id: int, answers: Iterable) -> int:
+        """Сливает ответы (UserAnswer) в черновик; возвращает число ответов в нём"""
+        now = self._clock()
+        with self._lock:
+            draft = self._drafts.get((candidate, test_id))
+            if draft is None:
+                draft = self._drafts[(candidate, test_id)] = _Draft(now)
+            for answer in answers:
+                draft.answers[answer.question_id] = answer.answer_id
+            draft.last_ts = now
+            draft.saves += 1
+            self.saves += 1
+            return len(draft.answers)
+
+    def get(self, candidate: str, test_id: int) -> Dict[int, int]:
+        """Несохранённая часть черновика (копия)"""
+        with self._lock:
+            draft = self._drafts.get((candidate, test_id))
+            return dict(draft.answers) if draft is not None else {}
+
+    def pop(self, candidate: str, test_id: int) -> Dict[int, int]:
+        with self._lock:
+            draft = self._drafts.pop((candidate, test_id), None)
+            return draft.answers if draft is not None else {}
+
+    def _take_due(self, force: bool) -> Dict[DraftKey, _Draft]:
+        now = self._clock()
+        with self._lock:
+            due = {key: draft for key, draft in self._drafts.items()
+                   if force or now - draft.last_ts >= self.debounce or now - draft.first_ts >= self.max_delay}
+            for key in due:
+                del self._drafts[key]
+            return due
+
+    def _restore(self, drafts: Dict[DraftKey, _Draft]):
+        """Возвращает незаписанные черновики; изменения, пришедшие за время записи, новее"""
+        with self._lock:
+            for key, draft in drafts.items():
+                newer = self._drafts.get(key)
+                if newer is not None:
+                    draft.answers.update(newer.answers)
+                    draft.last_ts = newer.last_ts
+                    draft.saves += newer.saves
+                self._drafts[key] = draft
+
+    def flush(self, force: bool = False) -> int:
+        """Записывает черновики, которым пора (force — все); возвращает их число"""
+        due = self._take_due(force)
+        if not due:
+            return 0
+        try:
+            write_drafts({key: draft.answers for key, draft in due.items()})
+        except Exception:
+            self._restore(due)
+            raise
+        self.flushed += len(due)
+        self.writes += 1
+        self.last_flush = datetime.now(timezone.utc).isoformat()
+        return len(due)
+
+    def stats(self) -> Dict:
+        return {"pending": len(self._drafts), "saves": self.saves, "flushed": self.flushed,
+                "writes": self.writes, "failures": self.failures, "last_flush": self.last_flush}
+
+
+# ----- хранение в базе -----
+
+def write_drafts(drafts: Dict[DraftKey, Dict[int, int]]):
+    """Сливает черновики с сохранёнными одной транзакцией"""
+    from app.db_models import SessionLocal, TestDraft
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        for (candidate, test_id), answers in drafts.items():
+            row = db.get(TestDraft, (candidate, test_id))
+            if row is None:
+                row = TestDraft(candidate=candidate, test_id=test_id, answers={})
+                db.add(row)
+            # Ключи JSON — строки
+            row.answers = dict(row.answers or {}, **{str(q): a for q, a in answers.items()})
+            row.updated_at = now
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def read_draft(candidate: str, test_id: int) -> Dict[int, int]:
+    from app.db_models import SessionLocal, TestDraft
+
+    db = SessionLocal()
+    try:
+        row = db.get(TestDraft, (candidate, test_id))
+        return {int(q): a for q, a in (row.answers or {}).items()} if row is not None else {}
+    finally:
+        db.close()
+
+
+def delete_draft(candidate: str, test_id: int):
+    from app.db_models import SessionLocal, TestDraft
+
+    db = SessionLocal()
+    try:
+        db.query(TestDraft).filter(TestDraft.candidate == candidate, TestDraft.test_id == test_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+class DraftFlusher:
+    """Периодическая запись черновиков (asyncio-задача из app.main); при остановке — всех"""
+
+    def __init__(self, buffer: DraftBuffer, interval: float = DRAFT_FLUSH_INTERVAL,
+                 should_run: Callable[[], bool] = lambda: True):
+        self.buffer = buffer
+        self.interval = interval
+        self.should_run = should_run
+        self._stopped: Optional[asyncio.Event] = None
+
+    def run_once(self, force: bool = False) -> int:
+        if not len(self.buffer):
+            return 0
+        if not self.should_run():
+            if force:
+                print(f"WARNING: Database not available, {len(self.buffer)} test drafts not saved")
+            return 0
+        try:
+            return self.buffer.flush(force)
+        except Exception as e:
+            self.buffer.failures += 1
+            print(f"ERROR: Flushing test drafts failed: {e}")
+            return 0
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        print(f"DEBUG: Test draft flusher started (interval={self.interval}s)")
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            # При остановке — все черновики, не дожидаясь паузы
+            await asyncio.to_thread(self.run_once, self._stopped.is_set())
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
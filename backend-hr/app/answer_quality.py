@@ -0,0 +1,289 @@
+"""Оценка качества ответов кандидата.
+
+Ответ оценивается один раз — при сохранении (save_answer): разбор хранится
+рядом с ответом в SessionState и в session_answers (колонки quality и
+scorer_version), а суммы по сессии поддерживаются инкрементально. Глиф,
+сводка и итоговый балл читают готовые суммы (session_quality).
+
+При изменении правил оценки увеличьте SCORER_VERSION: ответы, оценённые
+прежней версией, переоцениваются при первом обращении к сессии.
+
+Если загружена модель эталонных ответов (app.relevance), к оценке
+добавляется близость ответа к эталонам (relevance); итоговый балл
+учитывает её в доле RELEVANCE_WEIGHT.
+
+Ключевые слова и маркеры структуры ответа зависят от банка вопросов
+сессии (его языка): одинаковые id вопросов в банках на разных языках
+оцениваются каждый по своему банку.
+"""
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from app.session_state import QualityTotals, SessionState
+
+SCORER_VERSION = 2
+
+# Доля близости к эталонным ответам (app.relevance) в среднем качестве итогового балла
+RELEVANCE_WEIGHT = float(os.getenv("RELEVANCE_WEIGHT", "0.3"))
+
+
+# Слова-маркеры структуры ответа (примеры, конкретика) по языкам банка вопросов;
+# для языка без маркеров бонусы за примеры и конкретику не начисляются
+STRUCTURE_MARKERS = {
+    "ru": (('например', 'пример', 'случай', 'ситуация'), ('конкретно', 'именно', 'определенно')),
+    "en": (('for example', 'for instance', 'example', 'case', 'situation'),
+           ('specifically', 'in particular', 'exactly', 'precisely')),
+}
+EXAMPLE_MARKERS, SPECIFIC_MARKERS = STRUCTURE_MARKERS["ru"]
+
+
+def _minimal_needles(words) -> Tuple[str, ...]:
+    """Убирает слова, содержащие другое слово группы: «например» находится по «пример»"""
+    words = tuple(dict.fromkeys(w.lower() for w in words))
+    return tuple(w for w in words if not any(other != w and other in w for other in words))
+
+
+_NEEDLES = {language: (_minimal_needles(examples), _minimal_needles(specifics))
+            for language, (examples, specifics) in STRUCTURE_MARKERS.items()}
+
+
+class AnswerAnalyzer:
+    """Анализатор ответов на один вопрос: ключевые слова подготовлены заранее.
+
+    Для русского языка результат совпадает с прежней реализацией
+    analyze_answer_quality (_analyze_answer_quality_reference). Ключевые
+    слова приведены к нижнему регистру один раз, а каждое различное
+    ключевое слово и маркер ищется в тексте один раз. Маркеры структуры
+    берутся по языку банка (STRUCTURE_MARKERS).
+    """
+
+    __slots__ = ("keywords", "language", "_unique_keywords", "_example_needles", "_specific_needles")
+
+    def __init__(self, question_keywords: Iterable[str] = (), language: str = "ru"):
+        self.keywords = tuple(keyword.lower() for keyword in question_keywords or ())
+        self.language = language
+        unique = tuple(dict.fromkeys(self.keywords))
+        # Без повторов — ищем прямо по keywords; с повторами — каждое слово один раз
+        self._unique_keywords = self.keywords if len(unique) == len(self.keywords) else unique
+        self._example_needles, self._specific_needles = _NEEDLES.get(language, ((), ()))
+
+    def analyze(self, answer: str) -> Dict[str, Any]:
+        if not answer or not isinstance(answer, str):
+            return {"score": 0, "details": "Пустой ответ"}
+
+        answer_lower = answer.lower()
+        contains = answer_lower.__contains__
+
+        # Базовые метрики
+        word_count = len(answer.split())
+        sentence_count = sum(map(bool, map(str.strip, answer.split('.'))))
+
+        # Анализ содержания (если есть ключевые слова)
+        keyword_matches = 0
+        keyword_ratio = 0
+        if self.keywords:
+            if self._unique_keywords is self.keywords:
+                keyword_matches = sum(map(contains, self.keywords))
+            else:
+                found = dict(zip(self._unique_keywords, map(contains, self._unique_keywords)))
+                keyword_matches = sum(map(found.__getitem__, self.keywords))
+            keyword_ratio = keyword_matches / len(self.keywords)
+
+        # Анализ структуры
+        has_examples = any(map(contains, self._example_needles))
+        has_specifics = any(map(contains, self._specific_needles))
+
+        # Оценка качества (0-100)
+        score = 0
+
+        # Базовая оценка по длине
+        if word_count >= 50:
+            score += 30
+        elif word_count >= 20:
+            score += 20
+        elif word_count >= 10:
+            score += 10
+
+        # Бонус за релевантность (если есть ключевые слова)
+        if self.keywords:
+            score += min(30, keyword_ratio * 100)
+        else:
+            # Если нет ключевых слов, оцениваем по общему качеству
+            score += min(30, (word_count / 100) * 100)
+
+        # Бонус за примеры и конкретику
+        if has_examples:
+            score += 15
+        if has_specifics:
+            score += 10
+
+        # Бонус за структурированность
+        if sentence_count >= 3:
+            score += 10
+        elif sentence_count >= 2:
+            score += 5
+
+        # Штраф за слишком краткие ответы
+        if word_count < 5:
+            score = min(score, 10)
+
+        return {
+            "score": min(100, max(0, score)),
+            "word_count": word_count,
+            "sentence_count": sentence_count,
+            "keyword_matches": keyword_matches,
+            "keyword_ratio": keyword_ratio,
+            "has_examples": has_examples,
+            "has_specifics": has_specifics
+        }
+
+
+@lru_cache(maxsize=1024)
+def compile_analyzer(question_keywords: Tuple[str, ...] = (), language: str = "ru") -> AnswerAnalyzer:
+    """Анализатор для набора ключевых слов (кэшируется: у вопроса набор постоянный)"""
+    return AnswerAnalyzer(question_keywords, language)
+
+
+def analyze_answer_quality(answer: str, question_keywords: List[str] = None, language: str = "ru") -> Dict[str, Any]:
+    """Анализ качества ответа на основе содержания и ключевых слов"""
+    return compile_analyzer(tuple(question_keywords or ()), language).analyze(answer)
+
+
+def _analyze_answer_quality_reference(answer: str, question_keywords: List[str] = None) -> Dict[str, Any]:
+    """Прежняя реализация analyze_answer_quality — эталон для тестов и бенчмарка"""
+    if not answer or not isinstance(answer, str):
+        return {"score": 0, "details": "Пустой ответ"}
+
+    answer_lower = answer.lower()
+
+    # Базовые метрики
+    word_count = len(answer.split())
+    sentence_count = len([s for s in answer.split('.') if s.strip()])
+
+    # Анализ содержания (если есть ключевые слова)
+    keyword_matches = 0
+    keyword_ratio = 0
+    if question_keywords:
+        keyword_matches = sum(1 for keyword in question_keywords if keyword.lower() in answer_lower)
+        keyword_ratio = keyword_matches / len(question_keywords) if question_keywords else 0
+
+    # Анализ структуры
+    has_examples = any(word in answer_lower for word in ['например', 'пример', 'случай', 'ситуация'])
+    has_specifics = any(word in answer_lower for word in ['конкретно', 'именно', 'определенно'])
+
+    # Оценка качества (0-100)
+    score = 0
+
+    # Базовая оценка по длине
+    if word_count >= 50:
+        score += 30
+    elif word_count >= 20:
+        score += 20
+    elif word_count >= 10:
+        score += 10
+
+    # Бонус за релевантность (если есть ключевые слова)
+    if question_keywords:
+        score += min(30, keyword_ratio * 100)
+    else:
+        # Если нет ключевых слов, оцениваем по общему качеству
+        score += min(30, (word_count / 100) * 100)
+
+    # Бонус за примеры и конкретику
+    if has_examples:
+        score += 15
+    if has_specifics:
+        score += 10
+
+    # Бонус за структурированность
+    if sentence_count >= 3:
+        score += 10
+    elif sentence_count >= 2:
+        score += 5
+
+    # Штраф за слишком краткие ответы
+    if word_count < 5:
+        score = min(score, 10)
+
+    return {
+        "score": min(100, max(0, score)),
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "keyword_matches": keyword_matches,
+        "keyword_ratio": keyword_ratio,
+        "has_examples": has_examples,
+        "has_specifics": has_specifics
+    }
+
+
+def score_answer(session_state: SessionState, question_id: str, bank, relevance=None) -> Dict[str, Any]:
+    """Оценивает ответ из aeon_answers и сохраняет оценку в сессии.
+
+    bank — банк вопросов сессии (app.question_bank.QuestionBank): ответ
+    разбирает заранее подготовленный анализатор вопроса (bank.analyzer).
+    relevance — модель app.relevance этого банка (если построена): добавляет
+    в оценку близость ответа к эталонным ответам на этот вопрос.
+    """
+    answer = session_state.aeon_answers[question_id]
+    quality = dict(bank.analyzer(question_id).analyze(answer), version=SCORER_VERSION)
+    if relevance is not None:
+        quality["relevance"] = relevance.score(question_id, answer)
+    session_state.set_quality(question_id, quality)
+    return quality
+
+
+def quality_totals(qualities: Iterable[Mapping[str, Any]]) -> QualityTotals:
+    """Суммы по списку оценок (когда инкрементальных сумм нет)"""
+    qualities = list(qualities)
+    relevances = [q["relevance"] for q in qualities if q.get("relevance") is not None]
+    return QualityTotals(
+        scored=len(qualities),
+        score_sum=sum(q["score"] for q in qualities),
+        keyword_matches=sum(q["keyword_matches"] for q in qualities),
+        with_examples=sum(1 for q in qualities if q["has_examples"]),
+        relevance_sum=sum(relevances),
+        with_relevance=len(relevances),
+    )
+
+
+def performance_score(totals: QualityTotals, question_count: int,
+                      relevance_weight: Optional[float] = None) -> int:
+    """Итоговый балл 0-100: среднее качество ответов плюс бонус за полноту.
+
+    Если у ответов есть близость к эталонным (relevance, 0..1), среднее
+    качество смешивается с ней в доле RELEVANCE_WEIGHT.
+    """
+    if totals.scored == 0:
+        return 0
+    avg_quality = totals.score_sum / totals.scored
+    weight = RELEVANCE_WEIGHT if relevance_weight is None else relevance_weight
+    if totals.with_relevance and weight:
+        avg_relevance = totals.relevance_sum / totals.with_relevance * 100
+        avg_quality = (1 - weight) * avg_quality + weight * avg_relevance
+    completion_bonus = (totals.scored / question_count) * 20
+    return int(min(100, max(0, avg_quality + completion_bonus)))
+
+
+def session_quality(session_state: SessionState, bank, relevance=None) -> QualityTotals:
+    """Суммы оценок по ответам на вопросы банка сессии.
+
+    Обычно это чтение готовых сумм. Проход по ответам нужен, только если
+    у каких-то из них нет оценки текущей версии (сессия до введения оценок,
+    смена SCORER_VERSION); анализируются лишь такие ответы.
+    """
+    totals = session_state.quality_totals(SCORER_VERSION)
+    if totals is not None:
+        return totals
+    for question_id in list(session_state.aeon_answers):
+        if question_id not in bank:
+            continue
+        quality = session_state.quality(question_id)
+        if quality is None or quality["version"] != SCORER_VERSION:
+            score_answer(session_state, question_id, bank, relevance)
+    session_state.reset_quality_totals(SCORER_VERSION)
+    totals = session_state.quality_totals(SCORER_VERSION)
+    if totals is not None:
+        return totals
+    # В реестре есть вопросы не из банка сессии — считаем напрямую
+    return quality_totals(session_state.quality(q) for q in session_state.aeon_answers if q in bank)
@@ -0,0 +1,516 @@
+"""Поиск почти одинаковых ответов разных кандидатов (MinHash + LSH).
+
+Ответ разбивается на шинглы — тройки подряд идущих слов в нижнем регистре.
+MinHash-сигнатура из MINHASH_PERMUTATIONS чисел оценивает долю общих
+шинглов двух ответов (сходство Жаккара) по доле совпавших позиций.
+Сигнатура делится на LSH_BANDS полос; ответы с совпавшей хотя бы одной
+полосой — кандидаты, для них сходство оценивается по всей сигнатуре.
+Так ответ сравнивается не со всеми сохранёнными, а только с теми, что
+попали в общие корзины.
+
+Индекс свой для каждого вопроса банка, а банки разных позиций и языков
+(QuestionBank.cohort) не смешиваются: id вопросов в них совпадают, поэтому
+ответ попадает в группу "<когорта>/<id вопроса>" по банку своей сессии
+(bank_version, QuestionCatalog.pinned). Ключи полос хранятся в
+отсортированных массивах (bisect), поэтому и на сотнях тысяч ответов
+индекс компактен, а поиск занимает микросекунды.
+
+Сигнатура считается в save_answer и добавляется в индекс процесса;
+MinHashIndexSaver (app.main) периодически дописывает новые сигнатуры в
+таблицу answer_signatures и подгружает записанные другими процессами.
+Если таблица пуста, а ответы в базе есть, индекс строится заново по
+session_answers (rebuild) — через промежуточную таблицу, которая
+подменяет содержимое answer_signatures одной транзакцией. Перестраивает
+один процесс (аренда app.job_lease), в фоне после старта; остальные
+подгружают записанные им сигнатуры.
+
+Запуск вручную (из каталога backend-hr):
+  python -m app.answer_similarity --rebuild
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+from array import array
+from datetime import datetime
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.job_lease import JobLease
+
+ANSWER_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_SIMILARITY_THRESHOLD", "0.8"))
+ANSWER_SIMILARITY_SAVE_INTERVAL = float(os.getenv("ANSWER_SIMILARITY_SAVE_INTERVAL", "30"))
+ANSWER_SIMILARITY_CHUNK_SIZE = int(os.getenv("ANSWER_SIMILARITY_CHUNK_SIZE", "2000"))
+
+# Аренда перестроения по базе (app.job_lease)
+REBUILD_LEASE = "answer_index_rebuild"
+
+MINHASH_PERMUTATIONS = 64
+# 16 полос по 4 значения: ответ со сходством 0.8 попадает в кандидаты
+# с вероятностью 0.9998, со сходством 0.3 — около 0.12
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+# Перестановки — XOR с фиксированными масками поверх 64-битного хэша шингла.
+# Маски постоянны: сигнатуры хранятся в базе и сравниваются между процессами
+_MASKS = tuple(random.Random(20240611).getrandbits(64) for _ in range(MINHASH_PERMUTATIONS))
+_WORD = re.compile(r"\w+")
+
+# (session_token, question_id)
+AnswerKey = Tuple[str, str]
+
+
+def shingles(text: str) -> List[int]:
+    """64-битные хэши различных шинглов ответа"""
+    words = _WORD.findall(text.lower()) if text else []
+    if not words:
+        return []
+    if len(words) < SHINGLE_SIZE:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return [int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little") for gram in grams]
+
+
+def minhash(text: str) -> Optional[array]:
+    """MinHash-сигнатура ответа (старшие 32 бита минимумов); None для пустого ответа"""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    return array("I", [min([h ^ mask for h in hashes]) >> 32 for mask in _MASKS])
+
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """Оценка сходства Жаккара по двум сигнатурам"""
+    return sum(map(int.__eq__, first, second)) / MINHASH_PERMUTATIONS
+
+
+def _band_keys(signature: Sequence[int]) -> List[int]:
+    # hash() кортежа целых не зависит от PYTHONHASHSEED
+    return [hash(tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])) & 0xFFFFFFFFFFFFFFFF
+            for band in range(LSH_BANDS)]
+
+
+class _QuestionIndex:
+    """Полосы LSH для одного вопроса: по паре отсортированных массивов на полосу"""
+
+    __slots__ = ("keys", "refs")
+
+    def __init__(self):
+        self.keys = [array("Q") for _ in range(LSH_BANDS)]
+        self.refs = [array("L") for _ in range(LSH_BANDS)]
+
+    def add(self, band_keys: List[int], ref: int):
+        for band, key in enumerate(band_keys):
+            keys = self.keys[band]
+            position = bisect_right(keys, key)
+            keys.insert(position, key)
+            self.refs[band].insert(position, ref)
+
+    def add_many(self, entries: List[Tuple[List[int], int]]):
+        """Массовая загрузка: вставка по одному стоила бы O(n) на каждый ответ"""
+        if len(entries) < 64:
+            for band_keys, ref in entries:
+                self.add(band_keys, ref)
+            return
+        for band in range(LSH_BANDS):
+            pairs = list(zip(self.keys[band], self.refs[band]))
+            pairs.extend((band_keys[band], ref) for band_keys, ref in entries)
+            pairs.sort()
+            self.keys[band] = array("Q", [key for key, _ in pairs])
+            self.refs[band] = array("L", [ref for _, ref in pairs])
+
+    def candidates(self, band_keys: List[int]) -> set:
+        found = set()
+        for band, key in enumerate(band_keys):
+            keys = self.keys[band]
+            position = bisect_left(keys, key)
+            end = bisect_right(keys, key, position)
+            if end > position:
+                found.update(self.refs[band][position:end])
+        return found
+
+
+class MinHashIndex:
+    """Сигнатуры сохранённых ответов и LSH-индексы по вопросам банков"""
+
+    def __init__(self, catalog=None, threshold: float = ANSWER_SIMILARITY_THRESHOLD):
+        # app.question_catalog.QuestionCatalog: банк сессии по bank_version;
+        # None — индексировать ответы на любые вопросы, группа — id вопроса
+        self.catalog = catalog
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._answers: List[AnswerKey] = []
+        # Группа (индекс вопроса) каждого ответа, по номеру в _answers
+        self._groups: List[str] = []
+        self._by_answer: Dict[AnswerKey, int] = {}
+        self._signatures = array("I")
+        self._questions: Dict[str, _QuestionIndex] = {}
+        # Ещё не записанные в answer_signatures: (ключ ответа, версия банка сессии)
+        self._pending: List[Tuple[AnswerKey, Optional[str]]] = []
+        # id последней строки answer_signatures, прочитанной из базы
+        self._last_id = 0
+        self.ready = False
+        self.saves = 0
+        self.failures = 0
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def answers(self) -> List[AnswerKey]:
+        with self._lock:
+            return list(self._answers)
+
+    def group(self, question_id: str, bank_version: Optional[str] = None) -> Optional[str]:
+        """Индекс, в который попадает ответ сессии с этим банком; None — вопрос не из банка"""
+        if self.catalog is None:
+            return question_id
+        bank = self.catalog.pinned(bank_version)
+        return f"{bank.cohort}/{question_id}" if question_id in bank else None
+
+    def signature(self, token: str, question_id: str) -> Optional[array]:
+        ref = self._by_answer.get((token, question_id))
+        if ref is None:
+            return None
+        return self._signatures[ref * MINHASH_PERMUTATIONS:(ref + 1) * MINHASH_PERMUTATIONS]
+
+    def _register(self, token: str, question_id: str, signature: Sequence[int],
+                  group: Optional[str] = None) -> Optional[int]:
+        key = (token, question_id)
+        if key in self._by_answer:
+            return None
+        ref = len(self._answers)
+        self._answers.append(key)
+        self._groups.append(group or question_id)
+        self._by_answer[key] = ref
+        self._signatures.extend(signature)
+        return ref
+
+    def _question_index(self, group: str) -> _QuestionIndex:
+        index = self._questions.get(group)
+        if index is None:
+            index = self._questions[group] = _QuestionIndex()
+        return index
+
+    def _insert(self, token: str, question_id: str, group: str, signature: Sequence[int]) -> bool:
+        ref = self._register(token, question_id, signature, group)
+        if ref is None:
+            return False
+        self._question_index(group).add(_band_keys(signature), ref)
+        return True
+
+    def add(self, token: str, question_id: str, answer: str, bank_version: Optional[str] = None) -> Optional[array]:
+        """Считает сигнатуру ответа и добавляет её в индекс; None, если вопрос не из банка сессии"""
+        group = self.group(question_id, bank_version)
+        if group is None:
+            return None
+        signature = minhash(answer)
+        if signature is None:
+            return None
+        with self._lock:
+            if self._insert(token, question_id, group, signature):
+                self._pending.append(((token, question_id), bank_version))
+        return signature
+
+    def similar(self, token: str, question_id: str, signature: Optional[Sequence[int]] = None,
+                threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Ответы других сессий на тот же вопрос того же банка со сходством не ниже порога: [(token, сходство)]"""
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            ref = self._by_answer.get((token, question_id))
+            if signature is None:
+                signature = self.signature(token, question_id)
+            group = self._groups[ref] if ref is not None else (question_id if self.catalog is None else None)
+            index = self._questions.get(group) if group is not None else None
+            if signature is None or index is None:
+                return []
+            found = []
+            for ref in index.candidates(_band_keys(signature)):
+                other_token = self._answers[ref][0]
+                if other_token == token:
+                    continue
+                other = self._signatures[ref * MINHASH_PERMUTATIONS:(ref + 1) * MINHASH_PERMUTATIONS]
+                score = similarity(signature, other)
+                if score >= threshold:
+                    found.append((other_token, score))
+        found.sort(key=lambda item: -item[1])
+        return found
+
+    def flags(self, token: str, question_ids: Iterable[str]) -> Dict[str, List[Tuple[str, float]]]:
+        """Ответы сессии, похожие на ответы других кандидатов: {question_id: [(token, сходство)]}"""
+        flagged = {}
+        for question_id in question_ids:
+            matches = self.similar(token, question_id)
+            if matches:
+                flagged[question_id] = matches
+        return flagged
+
+    # ----- хранение в базе -----
+
+    def save(self):
+        """Дописывает новые сигнатуры в answer_signatures и подгружает чужие"""
+        from app.db_models import SessionLocal, AnswerSignature
+        from sqlalchemy import insert
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+            rows = [{"session_token": token, "question_id": question_id, "bank_version": bank_version,
+                     "signature": self.signature(token, question_id).tobytes()}
+                    for (token, question_id), bank_version in pending]
+        if rows:
+            db = SessionLocal()
+            try:
+                db.execute(insert(AnswerSignature), rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._pending = pending + self._pending
+                raise
+            finally:
+                db.close()
+        self.refresh()
+        self.saves += 1
+
+    def refresh(self, chunk_size: int = ANSWER_SIMILARITY_CHUNK_SIZE) -> int:
+        """Загружает строки answer_signatures после последней прочитанной.
+
+        Строка другого процесса, получившая меньший id, но закоммиченная
+        позже, будет пропущена до перезапуска — для пометки похожих ответов
+        это допустимо.
+        """
+        from app.db_models import SessionLocal, Session, AnswerSignature
+        from sqlalchemy import select, func
+
+        loaded = 0
+        db = SessionLocal()
+        try:
+            while True:
+                # Строки до появления колонки bank_version — банк берётся по сессии
+                rows = db.execute(
+                    select(AnswerSignature.id, AnswerSignature.session_token,
+                           AnswerSignature.question_id, AnswerSignature.signature,
+                           func.coalesce(AnswerSignature.bank_version, Session.bank_version))
+                    .outerjoin(Session, Session.token == AnswerSignature.session_token)
+                    .where(AnswerSignature.id > self._last_id)
+                    .order_by(AnswerSignature.id)
+                    .limit(chunk_size)
+                ).all()
+                with self._lock:
+                    entries: Dict[str, list] = {}
+                    for row_id, token, question_id, blob, bank_version in rows:
+                        self._last_id = row_id
+                        group = self.group(question_id, bank_version)
+                        if group is None:
+                            continue
+                        signature = array("I", blob)
+                        ref = self._register(token, question_id, signature, group)
+                        if ref is not None:
+                            entries.setdefault(group, []).append((_band_keys(signature), ref))
+                    for group, new in entries.items():
+                        self._question_index(group).add_many(new)
+                        loaded += len(new)
+                if len(rows) < chunk_size:
+                    break
+        finally:
+            db.close()
+        return loaded
+
+    def rebuild(self, chunk_size: int = ANSWER_SIMILARITY_CHUNK_SIZE) -> int:
+        """Пересчитывает сигнатуры всех ответов из session_answers и заменяет ими таблицу.
+
+        Сигнатуры копятся в answer_signatures_rebuild и переносятся в
+        answer_signatures одной транзакцией в конце: прерванное перестроение
+        оставляет таблицу прежней, а не заполненной наполовину. Строки,
+        дописанные другими процессами за время просмотра, сохраняются.
+        """
+        from app.db_models import SessionLocal, Session, SessionAnswer, AnswerSignature, AnswerSignatureStaging
+        from sqlalchemy import DateTime, select, delete, insert, and_, or_, func, literal
+
+        db = SessionLocal()
+        try:
+            # Остатки прерванного перестроения
+            db.execute(delete(AnswerSignatureStaging))
+            db.commit()
+            cutoff = db.execute(select(func.max(AnswerSignature.id))).scalar() or 0
+            after, total, carry = None, 0, {}
+            while True:
+                query = (select(SessionAnswer.session_token, SessionAnswer.position,
+                                SessionAnswer.question_id, SessionAnswer.answer, Session.bank_version)
+                         .outerjoin(Session, Session.token == SessionAnswer.session_token)
+                         .order_by(SessionAnswer.session_token, SessionAnswer.position)
+                         .limit(chunk_size))
+                if self.catalog is not None:
+                    query = query.where(SessionAnswer.question_id.in_(sorted(self.catalog.question_ids())))
+                if after is not None:
+                    query = query.where(or_(SessionAnswer.session_token > after[0],
+                                            and_(SessionAnswer.session_token == after[0],
+                                                 SessionAnswer.position > after[1])))
+                rows = db.execute(query).all()
+                # Как в aeon_answers: действует последний ответ на вопрос
+                latest, carry = carry, {}
+                for token, position, question_id, answer, bank_version in rows:
+                    if self.group(question_id, bank_version) is not None:
+                        latest[(token, question_id)] = (answer, bank_version)
+                if len(rows) == chunk_size:
+                    # Ответы последней сессии пачки могут продолжиться в следующей
+                    last_token = rows[-1][0]
+                    carry = {key: value for key, value in latest.items() if key[0] == last_token}
+                    latest = {key: value for key, value in latest.items() if key[0] != last_token}
+                signatures = []
+                for (token, question_id), (answer, bank_version) in latest.items():
+                    signature = minhash(answer)
+                    if signature is not None:
+                        signatures.append({"session_token": token, "question_id": question_id,
+                                           "bank_version": bank_version, "signature": signature.tobytes()})
+                if signatures:
+                    db.execute(insert(AnswerSignatureStaging), signatures)
+                    db.commit()
+                    total += len(signatures)
+                if len(rows) < chunk_size:
+                    break
+                after = rows[-1][:2]
+            columns = ("session_token", "question_id", "bank_version", "signature")
+            db.execute(delete(AnswerSignature).where(AnswerSignature.id <= cutoff))
+            db.execute(insert(AnswerSignature).from_select(
+                columns + ("created_at",),
+                select(*(getattr(AnswerSignatureStaging, column) for column in columns),
+                       literal(datetime.utcnow(), DateTime)).order_by(AnswerSignatureStaging.id)))
+            db.execute(delete(AnswerSignatureStaging))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        with self._lock:
+            self._answers, self._groups, self._by_answer, self._signatures = [], [], {}, array("I")
+            self._questions, self._pending, self._last_id = {}, [], 0
+        self.refresh()
+        self.ready = True
+        print(f"DEBUG: Answer similarity index rebuilt from {total} answers")
+        return total
+
+    def _load(self) -> bool:
+        """Подгружает сигнатуры; True — индекс готов (таблица не пуста или ответов в базе нет)"""
+        from app.db_models import SessionLocal, SessionAnswer
+        from sqlalchemy import select
+
+        if not (self.refresh() or self._last_id):
+            db = SessionLocal()
+            try:
+                if db.execute(select(SessionAnswer.session_token).limit(1)).first() is not None:
+                    return False
+            finally:
+                db.close()
+        self.ready = True
+        return True
+
+    def load_or_rebuild(self, lease: Optional[JobLease] = None) -> bool:
+        """Загружает сигнатуры из базы; пустую таблицу при непустых ответах — перестраивает.
+
+        С lease перестраивает, только если аренда досталась этому процессу;
+        False — перестраивает другой процесс, сигнатуры подгрузятся позже.
+        """
+        if self._load():
+            return True
+        if lease is None:
+            self.rebuild()
+            return True
+        if not lease.acquire():
+            return False
+        try:
+            # Пока аренду держал другой процесс, он мог успеть заполнить таблицу
+            if not self._load():
+                self.rebuild()
+        finally:
+            lease.release()
+        return True
+
+    def stats(self) -> Dict:
+        return {"answers": len(self._answers), "questions": len(self._questions), "ready": self.ready,
+                "pending": len(self._pending), "saves": self.saves, "failures": self.failures,
+                "threshold": self.threshold}
+
+
+class MinHashIndexSaver:
+    """Периодическая запись и подгрузка сигнатур (asyncio-задача из app.main).
+
+    Первая загрузка — сразу при запуске задачи, старт приложения её не
+    ждёт; перестраивает процесс, получивший аренду REBUILD_LEASE.
+    """
+
+    def __init__(self, index: MinHashIndex, interval: float = ANSWER_SIMILARITY_SAVE_INTERVAL,
+                 should_run: Callable[[], bool] = lambda: True, lease: Optional[JobLease] = None):
+        self.index = index
+        self.interval = interval
+        self.should_run = should_run
+        self.lease = lease or JobLease(REBUILD_LEASE)
+        self._stopped: Optional[asyncio.Event] = None
+
+    def run_once(self) -> bool:
+        if not self.should_run():
+            return False
+        try:
+            if self.index.ready:
+                self.index.save()
+            elif not self.index.load_or_rebuild(self.lease):
+                print("DEBUG: Answer similarity index is being rebuilt by another process")
+                return False
+        except Exception as e:
+            self.index.failures += 1
+            print(f"ERROR: Saving answer signatures failed: {e}")
+            return False
+        return True
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        print(f"DEBUG: Answer signature saver started (interval={self.interval}s)")
+        # Загрузка или перестроение — сразу, в фоне
+        await asyncio.to_thread(self.run_once)
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.to_thread(self.run_once)
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Индекс похожих ответов (MinHash-LSH)")
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать сигнатуры по session_answers")
+    parser.add_argument("--chunk-size", type=int, default=ANSWER_SIMILARITY_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.question_catalog import QuestionCatalog
+    index = MinHashIndex(QuestionCatalog().load())
+    lease = JobLease(REBUILD_LEASE)
+    if args.rebuild:
+        if not lease.acquire():
+            print("Answer similarity index is being rebuilt by another process")
+            return 1
+        try:
+            index.rebuild(args.chunk_size)
+        finally:
+            lease.release()
+    elif not index.load_or_rebuild(lease):
+        print("Answer similarity index is being rebuilt by another process; try again later")
+        return 1
+    flagged = 0
+    for token, question_id in index.answers():
+        flagged += bool(index.similar(token, question_id))
+    print(f"{len(index)} answers indexed, {flagged} similar to another candidate's answer "
+          f"(threshold {index.threshold})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
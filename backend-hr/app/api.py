@@ -1,17 +1,34 @@
 from fastapi import APIRouter, HTTPException, status, Body, Request
-from app.models import Test, Question, Answer  # Pydantic models
-from app.db_models import Session as DBSession, User, get_db, create_tables  # SQLAlchemy models
+from app.models import Test, UserAnswer  # Pydantic models
+from app.db_models import Session as DBSession, User, get_db, create_tables, AsyncSessionLocal  # SQLAlchemy models
+from sqlalchemy import select, func
 from app.schemas import SubmitAnswersRequest, SubmitAnswersResponse, GetResultResponse
 from typing import Optional, Dict, List, Any, Union
 import uuid
 import os
+import threading
+from collections import OrderedDict
 from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
 from datetime import datetime, timedelta, timezone
 from fastapi.templating import Jinja2Templates
-from dataclasses import dataclass, field
 import json
 from sqlalchemy.orm import Session as SQLAlchemySession
 from starlette.middleware.cors import CORSMiddleware
+from app.session_state import SessionState, SessionSummary
+from app.answer_quality import performance_score, score_answer, session_quality
+from app.question_bank import QuestionBank
+from app.question_catalog import QuestionCatalog
+from app.graded_tests import load_result, save_result
+from app.answer_drafts import DraftBuffer, delete_draft, read_draft
+from app.question_selector import QuestionSelector
+from app.score_distribution import ScoreDistributions
+from app.answer_similarity import MinHashIndex
+from app.relevance import load_relevance_models
+from app.llm_client import LLMClient
+from app.llm_limiter import BACKGROUND, INTERACTIVE, LLMLimiter
+from app.ai_question_pool import AIQuestionPool, ai_question_type
+from app.task_cache import TASK_CACHE_PERSIST, TaskCache, task_cache_key
+from app.session_store import create_session_store, db_breaker, database_stats
 
 router = APIRouter()
 admin_router = APIRouter(prefix="/admin")
@@ -67,41 +84,42 @@ async def get_current_user(request: Request):
             language_code = user_info.get("language_code")
             is_premium = user_info.get("is_premium", False)
             
-            # Проверяем, есть ли уже пользователи в системе
-            db = next(get_db())
-            existing_users = db.query(User).count()
-            
-            # Если это первый пользователь, делаем его админом
-            is_admin = existing_users == 0
-            
-            # Создаем или обновляем пользователя в базе данных
-            user = db.query(User).filter(User.telegram_id == user_id).first()
-            
-            if user:
-                # Обновляем существующего пользователя
-                user.username = username
-                user.first_name = first_name
-                user.last_name = last_name
-                user.language_code = language_code
-                user.is_premium = is_premium
+            async with AsyncSessionLocal() as db:
+                # Проверяем, есть ли уже пользователи в системе
+                existing_users = (await db.execute(select(func.count(User.id)))).scalar_one()
+                
                 # Если это первый пользователь, делаем его админом
-                if existing_users == 0:
-                    user.is_admin = True
-            else:
-                # Создаем нового пользователя
-                user = User(
-                    telegram_id=user_id,
-                    username=username,
-                    first_name=first_name,
-                    last_name=last_name,
-                    language_code=language_code,
-                    is_premium=is_premium,
-                    is_admin=is_admin
-                )
-                db.add(user)
+                is_admin = existing_users == 0
+                
+                # Создаем или обновляем пользователя в базе данных
+                user = (await db.execute(
+                    select(User).where(User.telegram_id == user_id)
+                )).scalar_one_or_none()
+                
+                if user:
+                    # Обновляем существующего пользователя
+                    user.username = username
+                    user.first_name = first_name
+                    user.last_name = last_name
+                    user.language_code = language_code
+                    user.is_premium = is_premium
+                    # Если это первый пользователь, делаем его админом
+                    if existing_users == 0:
+                        user.is_admin = True
+                else:
+                    # Создаем нового пользователя
+                    user = User(
+                        telegram_id=user_id,
+                        username=username,
+                        first_name=first_name,
+                        last_name=last_name,
+                        language_code=language_code,
+                        is_premium=is_premium,
+                        is_admin=is_admin
+                    )
+                    db.add(user)
             
-            db.commit()
-            db.close()
+                await db.commit()
             
             return {
                 "id": user_id,
@@ -177,160 +195,67 @@ async def check_invitations(request: Request):
     
     raise HTTPException(status_code=400, detail="Invalid Telegram data")
 
-# Моковые данные теста на двух языках
-mock_test_ru = Test(
-    id=1,
-    title="Тест по программированию",
-    questions=[
-        Question(
-            id=1,
-            text="Какой язык программирования используется для FastAPI?",
-            answers=[
-                Answer(id=1, text="Python"),
-                Answer(id=2, text="JavaScript"),
-                Answer(id=3, text="C++")
-            ]
-        ),
-        Question(
-            id=2,
-            text="Что такое Pydantic?",
-            answers=[
-                Answer(id=1, text="Библиотека для валидации данных"),
-                Answer(id=2, text="IDE"),
-                Answer(id=3, text="ОС")
-            ]
-        )
-    ]
-)
-
-mock_test_en = Test(
-    id=1,
-    title="Programming Test",
-    questions=[
-        Question(
-            id=1,
-            text="Which programming language is used for FastAPI?",
-            answers=[
-                Answer(id=1, text="Python"),
-                Answer(id=2, text="JavaScript"),
-                Answer(id=3, text="C++")
-            ]
-        ),
-        Question(
-            id=2,
-            text="What is Pydantic?",
-            answers=[
-                Answer(id=1, text="A data validation library"),
-                Answer(id=2, text="IDE"),
-                Answer(id=3, text="OS")
-            ]
-        )
-    ]
-)
-
-# Улучшенная структура для отслеживания сессий
-@dataclass
-class SessionState:
-    answers: List[Dict] = field(default_factory=list)
-    aeon_answers: Dict[str, str] = field(default_factory=dict)
-    asked_questions: set = field(default_factory=set)
-    current_question_index: int = 0
-    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
-    completed: bool = False
-    question_order: List[str] = field(default_factory=list)  # Порядок заданных вопросов
-    last_activity: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
-
-# AEON Questions Pool - 10 профессиональных вопросов
-AEON_QUESTIONS = [
-    {
-        "id": "q_1",
-        "text": "Расскажите о себе и своем профессиональном опыте. Какие навыки и достижения вы считаете наиболее важными?",
-        "type": "technical",
-        "keywords": ["навыки", "опыт", "достижения", "профессионал"]
-    },
-    {
-        "id": "q_2", 
-        "text": "Опишите свой идеальный рабочий день. Что бы вы делали и как бы себя чувствовали?",
-        "type": "soft",
-        "keywords": ["мотивация", "идеал", "комфорт", "рабочий день"]
-    },
-    {
-        "id": "q_3",
-        "text": "Расскажите о ситуации, когда вам пришлось решать сложную проблему. Как вы подошли к решению?",
-        "type": "technical",
-        "keywords": ["проблема", "решение", "анализ", "подход"]
-    },
-    {
-        "id": "q_4",
-        "text": "Как вы справляетесь со стрессом и давлением на работе? Приведите конкретный пример.",
-        "type": "soft",
-        "keywords": ["стресс", "давление", "пример", "справляться"]
-    },
-    {
-        "id": "q_5",
-        "text": "Расскажите о своем опыте работы в команде. Какую роль вы обычно играете в коллективе?",
-        "type": "soft",
-        "keywords": ["команда", "роль", "коллектив", "сотрудничество"]
-    },
-    {
-        "id": "q_6",
-        "text": "Какие технологии, методы или навыки вы изучили за последний год? Что планируете изучить?",
-        "type": "technical",
-        "keywords": ["технологии", "обучение", "планы", "развитие"]
-    },
-    {
-        "id": "q_7",
-        "text": "Опишите ситуацию, когда вам пришлось адаптироваться к серьезным изменениям. Как вы это делали?",
-        "type": "soft",
-        "keywords": ["адаптация", "изменения", "гибкость", "приспособление"]
-    },
-    {
-        "id": "q_8",
-        "text": "Расскажите о своих карьерных целях. Где вы видите себя через 2-3 года?",
-        "type": "soft",
-        "keywords": ["карьера", "цели", "планы", "будущее"]
-    },
-    {
-        "id": "q_9",
-        "text": "Что мотивирует вас в работе больше всего? Что дает вам энергию для профессионального роста?",
-        "type": "soft",
-        "keywords": ["мотивация", "энергия", "рост", "драйв"]
-    },
-    {
-        "id": "q_10",
-        "text": "Почему вы заинтересованы в работе в нашей компании? Какой вклад вы хотите внести?",
-        "type": "soft",
-        "keywords": ["интерес", "компания", "вклад", "ценность"]
-    }
-]
-
-# Улучшенная система хранения сессий
-sessions: Dict[str, SessionState] = {}
+# Банки вопросов AEON и тесты — из файлов data/questions (app.question_catalog),
+# перечитываются при изменении файлов (QuestionCatalogReloader из app.main)
+question_catalog = QuestionCatalog().load()
+
+# Банк по умолчанию на момент старта (бенчмарки); эндпоинты и фоновые задачи
+# берут банк сессии: session_bank() / question_catalog.pinned()
+AEON_BANK = question_catalog.bank()
+
+# Таблицы выбора следующего вопроса по версии банка (строятся при первом обращении).
+# Как версии банков в каталоге — LRU: сверх текущих банков не больше cached_versions
+_question_selectors: "OrderedDict[str, QuestionSelector]" = OrderedDict()
+_question_selectors_lock = threading.Lock()
+
+
+def session_bank(session_state) -> QuestionBank:
+    """Банк вопросов, закреплённый за сессией при создании"""
+    return question_catalog.pinned(session_state.bank_version)
+
+
+def bank_selector(bank: QuestionBank) -> QuestionSelector:
+    with _question_selectors_lock:
+        selector = _question_selectors.get(bank.version)
+        if selector is not None:
+            _question_selectors.move_to_end(bank.version)
+            return selector
+    selector = QuestionSelector(bank)
+    with _question_selectors_lock:
+        _question_selectors[bank.version] = selector
+        limit = question_catalog.cached_versions + len(question_catalog.versions())
+        while len(_question_selectors) > limit:
+            _question_selectors.popitem(last=False)
+    return selector
+
+# Хранилище сессий (SESSION_STORE=memory|sql|redis, см. app.session_store)
+session_store = create_session_store()
+# Кэш сессий этого процесса (есть только у SESSION_STORE=memory)
+sessions = getattr(session_store, "cache", None)
+# Итоговые баллы завершённых сессий для перцентиля (загружается и сохраняется из app.main)
+# — своё распределение у каждого банка (позиция и язык)
+score_distribution = ScoreDistributions()
+# Сигнатуры ответов на вопросы банка для поиска списанных ответов (то же)
+answer_index = MinHashIndex(question_catalog)
+# Черновики ответов на тесты до записи в базу (DraftFlusher из app.main)
+draft_buffer = DraftBuffer()
+# Близость ответов к эталонным (None, если модель не построена: python -m app.relevance build)
+# — модель у каждого банка, для которого построена
+relevance_models = load_relevance_models()
+
+
+def bank_relevance(bank: QuestionBank):
+    """Модель эталонных ответов банка сессии или None"""
+    return relevance_models.get(bank.cohort)
 
 SESSION_TTL = timedelta(hours=1)
 
 # ===== Helper: save to in-memory dict =====
 
 def _save_session_in_memory(token: str, session_state: SessionState):
-    """Сохраняем/обновляем сессию в словаре sessions как fallback"""
-    sessions[token] = session_state
-    print(f"DEBUG: Saved session {token} to memory")
-
-# Функция для проверки подключения к БД
-def check_database_connection():
-    """Проверяет подключение к базе данных"""
-    try:
-        from app.db_models import SessionLocal
-        from sqlalchemy import text
-        db = SessionLocal()
-        result = db.execute(text("SELECT 1"))
-        print(f"DEBUG: Database connection test result: {result.fetchone()}")
-        db.close()
-        print("DEBUG: Database connection successful")
-        return True
-    except Exception as e:
-        print(f"ERROR: Database connection failed: {e}")
-        return False
+    """Обновляем горячую копию сессии в хранилище (память процесса или Redis)"""
+    session_store.put(token, session_state)
+    print(f"DEBUG: Saved session {token} to {session_store.name} store")
 
 # Инициализируем базу данных при запуске
 def init_database():
@@ -349,120 +274,38 @@ def init_database():
     except Exception as e:
         print(f"ERROR: Failed to initialize database: {e}")
         print("WARNING: Using in-memory storage only")
+        # Не ждём N ошибок на запросах: база недоступна уже сейчас
+        db_breaker.trip(e)
         return False
 
 # Функция для сохранения сессии в PostgreSQL
-def save_session_to_db(token: str, session_state: SessionState):
-    """Сохраняет сессию в PostgreSQL базу данных"""
-    # Всегда сначала сохраняем в память как fallback
-    _save_session_in_memory(token, session_state)
-    
-    try:
-        from app.db_models import SessionLocal, Session
-        import json
-        
-        print(f"DEBUG: Attempting to save session {token} to PostgreSQL...")
-        
-        if not check_database_connection():
-            print(f"WARNING: Database not available, session {token} saved only to memory")
-            return
-        
-        db = SessionLocal()
-        
-        try:
-            # Проверяем, существует ли сессия
-            db_session = db.query(Session).filter(Session.token == token).first()
-            
-            if db_session:
-                print(f"DEBUG: Updating existing session {token} in database")
-                # Обновляем существующую сессию
-                db_session.answers = json.dumps(session_state.answers)
-                db_session.aeon_answers = json.dumps(session_state.aeon_answers)
-                db_session.asked_questions = json.dumps(list(session_state.asked_questions))
-                db_session.current_question_index = session_state.current_question_index
-                db_session.completed = session_state.completed
-                db_session.question_order = json.dumps(session_state.question_order)
-                db_session.last_activity = session_state.last_activity
-            else:
-                print(f"DEBUG: Creating new session {token} in database")
-                # Создаем новую сессию
-                db_session = Session(
-                    token=token,
-                    answers=json.dumps(session_state.answers),
-                    aeon_answers=json.dumps(session_state.aeon_answers),
-                    asked_questions=json.dumps(list(session_state.asked_questions)),
-                    current_question_index=session_state.current_question_index,
-                    created_at=session_state.created_at,
-                    completed=session_state.completed,
-                    question_order=json.dumps(session_state.question_order),
-                    last_activity=session_state.last_activity
-                )
-                db.add(db_session)
-            
-            db.commit()
-            print(f"DEBUG: Successfully saved session {token} to PostgreSQL")
-        except Exception as e:
-            print(f"ERROR: Failed to save session to PostgreSQL: {e}")
-            db.rollback()
-        finally:
-            db.close()
-    except Exception as e:
-        print(f"ERROR: Database error while saving session: {e}")
+def save_session_to_db(token: str, session_state: SessionState, flush: bool = False):
+    """Сохраняет сессию через хранилище; в PostgreSQL — синхронно или через write-behind.
+
+    flush=True записывает сессию синхронно (используется при завершении теста).
+    """
+    session_store.save(token, session_state, flush=flush)
 
 # Функция для загрузки сессии из PostgreSQL
 def load_session_from_db(token: str) -> SessionState:
-    """Загружает сессию из PostgreSQL базы данных"""
-    # Сначала пробуем загрузить из памяти
-    session_state = sessions.get(token)
-    if session_state:
-        print(f"DEBUG: Loaded session {token} from memory")
-        return session_state
-        
-    try:
-        from app.db_models import SessionLocal, Session
-        import json
-        
-        print(f"DEBUG: Attempting to load session {token} from PostgreSQL...")
-        
-        if not check_database_connection():
-            print(f"WARNING: Database not available, session {token} not found")
-            return None
-            
-        db = SessionLocal()
-        try:
-            db_session = db.query(Session).filter(Session.token == token).first()
-            
-            if not db_session:
-                print(f"DEBUG: Session {token} not found in database")
-                return None
-            
-            print(f"DEBUG: Found session {token} in database, loading...")
-            
-            session_state = SessionState()
-            session_state.answers = json.loads(db_session.answers)
-            session_state.aeon_answers = json.loads(db_session.aeon_answers)
-            session_state.asked_questions = set(json.loads(db_session.asked_questions))
-            session_state.current_question_index = db_session.current_question_index
-            session_state.created_at = db_session.created_at
-            session_state.completed = db_session.completed
-            session_state.question_order = json.loads(db_session.question_order)
-            session_state.last_activity = db_session.last_activity
-            
-            # Сохраняем в память для быстрого доступа
-            _save_session_in_memory(token, session_state)
-            
-            print(f"DEBUG: Successfully loaded session {token} from PostgreSQL")
-            return session_state
-        finally:
-            db.close()
-    except Exception as e:
-        print(f"ERROR: Database error while loading session: {e}")
-        return None
+    """Загружает сессию из хранилища (с подгрузкой из PostgreSQL при промахе)"""
+    return session_store.load(token)
+
+# Асинхронные варианты для async-эндпоинтов: запросы к БД не блокируют event loop
+async def save_session_to_db_async(token: str, session_state: SessionState, flush: bool = False):
+    await session_store.asave(token, session_state, flush=flush)
+
+async def load_session_from_db_async(token: str) -> SessionState:
+    return await session_store.aload(token)
+
+# Для эндпоинтов только на чтение: даты, completed и счётчики одним узким запросом
+def load_session_summary(token: str) -> Optional[SessionSummary]:
+    return session_store.load_summary(token)
 
 # Инициализируем базу данных при запуске
 db_initialized = init_database()
 
-def is_token_expired(session_state: SessionState) -> bool:
+def is_token_expired(session_state: Union[SessionState, SessionSummary]) -> bool:
     """Проверка истечения срока действия токена"""
     return datetime.now(timezone.utc) > session_state.created_at + SESSION_TTL
 
@@ -470,144 +313,28 @@ def update_session_activity(session_state: SessionState):
     """Обновление времени последней активности"""
     session_state.last_activity = datetime.now(timezone.utc)
 
-def analyze_answer_quality(answer: str, question_keywords: List[str] = None) -> Dict[str, Any]:
-    """Анализ качества ответа на основе содержания и ключевых слов"""
-    if not answer or not isinstance(answer, str):
-        return {"score": 0, "details": "Пустой ответ"}
-    
-    answer_lower = answer.lower()
-    
-    # Базовые метрики
-    word_count = len(answer.split())
-    sentence_count = len([s for s in answer.split('.') if s.strip()])
-    
-    # Анализ содержания (если есть ключевые слова)
-    keyword_matches = 0
-    keyword_ratio = 0
-    if question_keywords:
-        keyword_matches = sum(1 for keyword in question_keywords if keyword.lower() in answer_lower)
-        keyword_ratio = keyword_matches / len(question_keywords) if question_keywords else 0
-    
-    # Анализ структуры
-    has_examples = any(word in answer_lower for word in ['например', 'пример', 'случай', 'ситуация'])
-    has_specifics = any(word in answer_lower for word in ['конкретно', 'именно', 'определенно'])
-    
-    # Оценка качества (0-100)
-    score = 0
-    
-    # Базовая оценка по длине
-    if word_count >= 50:
-        score += 30
-    elif word_count >= 20:
-        score += 20
-    elif word_count >= 10:
-        score += 10
-    
-    # Бонус за релевантность (если есть ключевые слова)
-    if question_keywords:
-        score += min(30, keyword_ratio * 100)
-    else:
-        # Если нет ключевых слов, оцениваем по общему качеству
-        score += min(30, (word_count / 100) * 100)
-    
-    # Бонус за примеры и конкретику
-    if has_examples:
-        score += 15
-    if has_specifics:
-        score += 10
-    
-    # Бонус за структурированность
-    if sentence_count >= 3:
-        score += 10
-    elif sentence_count >= 2:
-        score += 5
-    
-    # Штраф за слишком краткие ответы
-    if word_count < 5:
-        score = min(score, 10)
-    
-    return {
-        "score": min(100, max(0, score)),
-        "word_count": word_count,
-        "sentence_count": sentence_count,
-        "keyword_matches": keyword_matches,
-        "keyword_ratio": keyword_ratio,
-        "has_examples": has_examples,
-        "has_specifics": has_specifics
-    }
-
 def calculate_performance_score(session_state: SessionState) -> int:
     """Расчет итогового балла на основе качества ответов"""
     if not session_state.aeon_answers:
         return 0
     
-    total_score = 0
-    answered_questions = 0
-    
-    for question_id, answer in session_state.aeon_answers.items():
-        # Найти вопрос для получения ключевых слов
-        question_data = next((q for q in AEON_QUESTIONS if q["id"] == question_id), None)
-        if question_data:
-            keywords = question_data.get("keywords", [])
-            quality = analyze_answer_quality(answer, keywords)
-            total_score += quality["score"]
-            answered_questions += 1
-    
-    if answered_questions == 0:
-        return 0
-    
-    # Средний балл за качество ответов
-    avg_quality = total_score / answered_questions
-    
-    # Бонус за полноту (процент отвеченных вопросов)
-    completion_bonus = (answered_questions / len(AEON_QUESTIONS)) * 20
-    
-    # Итоговый балл
-    final_score = min(100, max(0, avg_quality + completion_bonus))
-    
-    return int(final_score)
-
-AEON_CONTEXT = '''
-Как ChatGPT должен обращаться к вам?
-Сименс
-Кем вы работаете?
-Предприниматель, Учредитель и Архитектор Quantum Insight Platform
-Какими характеристиками должен обладать ChatGPT?
-1. Аналитический ум 
-2. Стратегическое мышление 
-3. Решительность 
-4. Самостоятельность 
-5. Целеустремленность 
-6. Уникальность
-7. Визионер
-Болтливый
-Остроумный
-Откровенный
-Ободряющий
-Поколение Z
-Скептический
-Традиционный
-Обладающий дальновидным мышлением
-Поэтический
-Что-нибудь еще, что ChatGPT должен знать о вас?
-Профиль:
-1. Воспринимает сложные системы гибридно: сначала анализирует части, затем собирает целостную картину
-2. Адаптируется к изменениям сбалансированно: анализирует тренды, но меняется только тогда, когда это необходимо
-3. Предпочитает гибридный подход к работе: работает самостоятельно, но при необходимости эффективно взаимодействует с командой
-4. Гибко адаптируется в управлении ресурсами: не придерживается жёстких рамок, регулирует ресурсы по ситуации
-5. Использует гибкое целеполагание: двигается в нужном направлении, корректируя цели по мере движения
-6. Предпочитает детальный анализ при решении сложных задач, фокусируется на фактах и деталях
-7. Принимает решения, опираясь на рациональность, логику анализ и данные, но также быстро и интуитивно, адаптируясь по мере развития событий
-8. Стремится к непрерывному обучению и поиску новых знаний
-9. Ценит эффективность и результат в жизни и работе
-10. Предпочитает гибкое и эмпатичное взаимодействие: подстраивается под собеседника, учитывая контекст и эмоции
-11. Использует гибридный подход к обработке информации: может углубляться в детали, но часто применяет фильтрацию и обобщение
-12. Принимает долгосрочные решения, опираясь на данные, анализ трендов, статистику и факторы влияния
-13. Управляет рисками: оценивает их, но допускает в разумных пределах ради выгоды
-14. Считает креативность ключевым фактором успешных решений
-'''
+    # Средний балл за качество ответов плюс бонус за полноту
+    bank = session_bank(session_state)
+    return performance_score(session_quality(session_state, bank, bank_relevance(bank)), len(bank))
+
+def record_completion(session_state: SessionState):
+    """Фиксирует итоговый балл завершённой сессии и добавляет его в распределение для перцентиля"""
+    session_state.final_score = calculate_performance_score(session_state)
+    score_distribution.add(session_bank(session_state).cohort, session_state.final_score)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# Один пул соединений к OpenAI на процесс (start/aclose — в app.main); все запросы —
+# через общий ограничитель параллельности и частоты (app.llm_limiter)
+llm_client = LLMClient(OPENAI_API_KEY, limiter=LLMLimiter())
+# Вопрос для пула генерируется в фоне, но один запрос не должен занимать слот дольше этого
+AI_QUESTION_TIMEOUT = float(os.getenv("AI_QUESTION_TIMEOUT", "10"))
+# Задание ждёт кандидат: не успеваем за столько секунд — запасное задание
+AI_TASK_BUDGET = float(os.getenv("AI_TASK_BUDGET", "15"))
 
 log = []
 
@@ -621,45 +348,83 @@ def log_event(action, details=None):
 
 @router.get("/test/{test_id}", response_model=Test)
 def get_test(test_id: int, lang: Optional[str] = "ru"):
-    if test_id == 1:
-        if lang == "en":
-            return mock_test_en
-        return mock_test_ru
-    raise HTTPException(status_code=404, detail="Тест не найден")
+    test = question_catalog.test(test_id, lang)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+    return test
+
+def _draft_answers(candidate: str, test_id: int, pop: bool = False) -> Dict[int, int]:
+    """Черновик кандидата: сохранённый в базе плюс несохранённый из буфера процесса"""
+    buffered = draft_buffer.pop(candidate, test_id) if pop else draft_buffer.get(candidate, test_id)
+    try:
+        stored = read_draft(candidate, test_id) if db_breaker.closed else {}
+    except Exception as e:
+        print(f"ERROR: Failed to read test draft: {e}")
+        stored = {}
+    return {**stored, **buffered}
 
 @router.post("/test/{test_id}/submit", response_model=SubmitAnswersResponse)
-def submit_answers(test_id: int, request: SubmitAnswersRequest):
-    if test_id != mock_test_ru.id:
+def submit_answers(test_id: int, request: SubmitAnswersRequest, lang: Optional[str] = None,
+                   candidate: Optional[str] = None):
+    test = question_catalog.compiled_test(test_id, lang)
+    if test is None:
         raise HTTPException(status_code=404, detail="Тест не найден")
-    correct = 0
-    for user_answer in request.answers:
-        for q in mock_test_ru.questions:
-            if q.id == user_answer.question_id and user_answer.answer_id == q.answers[0].id:
-                correct += 1
-    score = int(100 * correct / len(mock_test_ru.questions))
-    result_id = 1  # Моковый id результата
+    if not db_breaker.closed:
+        raise HTTPException(status_code=503, detail="База данных недоступна, попробуйте позже")
+    answers = request.answers
+    if candidate:
+        # Автосохранённые ответы засчитываются, отправленные — важнее
+        draft = _draft_answers(candidate, test_id, pop=True)
+        answers = [UserAnswer(question_id=q, answer_id=a) for q, a in draft.items()] + list(answers)
+    # Проверка по ключу ответов теста — O(число ответов)
+    result = test.grade(answers)
+    try:
+        result_id = save_result(test, result)
+    except Exception as e:
+        print(f"ERROR: Failed to save test result: {e}")
+        if candidate:
+            draft_buffer.put(candidate, test_id, answers)
+        raise HTTPException(status_code=503, detail="Не удалось сохранить результат, попробуйте позже")
+    if candidate:
+        try:
+            delete_draft(candidate, test_id)
+        except Exception as e:
+            print(f"WARNING: Failed to delete test draft: {e}")
+    log_event("test_submit", {"test_id": test_id, "result_id": result_id, "score": result.score})
     return SubmitAnswersResponse(result_id=result_id)
 
-@router.get("/result/{result_id}", response_model=GetResultResponse)
+# Только числовые id: иначе маршрут перехватывает /result/{token}
+@router.get("/result/{result_id:int}", response_model=GetResultResponse)
 def get_result(result_id: int):
-    # Моковые данные результата
-    if result_id == 1:
-        return GetResultResponse(score=50, details="1 из 2 правильных ответов")
-    raise HTTPException(status_code=404, detail="Результат не найден")
+    row = load_result(result_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Результат не найден")
+    return GetResultResponse(score=row.score, details=f"{row.correct} из {row.total} правильных ответов")
 
 @router.post("/test/{test_id}/autosave", status_code=status.HTTP_204_NO_CONTENT)
-def autosave_answers(test_id: int, request: SubmitAnswersRequest):
-    if test_id != mock_test_ru.id:
+def autosave_answers(test_id: int, request: SubmitAnswersRequest, candidate: Optional[str] = None):
+    if question_catalog.compiled_test(test_id) is None:
         raise HTTPException(status_code=404, detail="Тест не найден")
-    # Здесь можно сохранять ответы пользователя (например, в БД)
-    # Сейчас просто заглушка
+    # Только в буфер процесса: в базу черновик пишет DraftFlusher после паузы (app.answer_drafts).
+    # Без candidate сохранять не под чем
+    if candidate:
+        draft_buffer.put(candidate, test_id, request.answers)
     return
 
+@router.get("/test/{test_id}/draft")
+def get_test_draft(test_id: int, candidate: str):
+    """Черновик ответов для восстановления формы"""
+    if question_catalog.compiled_test(test_id) is None:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+    draft = _draft_answers(candidate, test_id)
+    return {"answers": [{"question_id": q, "answer_id": a} for q, a in sorted(draft.items())]}
+
 @router.post("/session")
-def create_session():
+def create_session(lang: Optional[str] = None):
     try:
         token = str(uuid.uuid4())
-        session_state = SessionState()
+        # Сессия до конца отвечает на текущую версию банка на своём языке
+        session_state = SessionState(bank_version=question_catalog.bank(lang).version)
         save_session_to_db(token, session_state)
         _save_session_in_memory(token, session_state)
         return {"token": token}
@@ -672,7 +437,7 @@ def create_session():
 @router.post("/session/{token}/answer")
 async def save_answer(token: str, answer: dict = Body(...)):
     try:
-        session_state = load_session_from_db(token)
+        session_state = await load_session_from_db_async(token)
         if not session_state:
             raise HTTPException(
                 status_code=404,
@@ -706,17 +471,23 @@ async def save_answer(token: str, answer: dict = Body(...)):
 
         session_state.aeon_answers[question_id] = answer_text
         session_state.answers.append(answer)
+        # Оцениваем один раз здесь; глиф и сводка читают готовые суммы
+        bank = session_bank(session_state)
+        if question_id in bank:
+            score_answer(session_state, question_id, bank, bank_relevance(bank))
+            answer_index.add(token, question_id, answer_text, session_state.bank_version)
 
         if len(session_state.aeon_answers) >= 10:
             session_state.completed = True
+            record_completion(session_state)
 
-        save_session_to_db(token, session_state)
+        await save_session_to_db_async(token, session_state, flush=session_state.completed)
 
         return {
             "status": "saved",
             "answers_saved": len(session_state.aeon_answers),
-            "total_questions": len(AEON_QUESTIONS),
-            "remaining_questions": len(AEON_QUESTIONS) - len(session_state.aeon_answers),
+            "total_questions": len(bank),
+            "remaining_questions": len(bank) - len(session_state.aeon_answers),
             "completed": session_state.completed
         }
     except Exception as e:
@@ -727,7 +498,7 @@ async def save_answer(token: str, answer: dict = Body(...)):
 
 @router.get("/session/{token}")
 def get_session(token: str):
-    session_state = load_session_from_db(token)
+    session_state = load_session_summary(token)
     if not session_state:
         raise HTTPException(
             status_code=404,
@@ -749,20 +520,31 @@ def complete_session(token: str):
         raise HTTPException(status_code=404, detail="Сессия не найдена")
     if is_token_expired(session_state):
         raise HTTPException(status_code=403, detail="Срок действия токена истёк")
-    session_state.completed = True
-    save_session_to_db(token, session_state)
+    if not session_state.completed:
+        session_state.completed = True
+        record_completion(session_state)
+    save_session_to_db(token, session_state, flush=True)
     log_event("complete_session", {"token": token})
     return {"status": "completed"}
 
 @router.get("/result/{token}")
 def get_result_by_token(token: str):
-    session_state = load_session_from_db(token)
+    session_state = load_session_summary(token)
     if not session_state:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
     
     total_time = (datetime.now(timezone.utc) - session_state.created_at).total_seconds()
-    questions_answered = len(session_state.aeon_answers)
-    completion_rate = (questions_answered / len(AEON_QUESTIONS)) * 100 if len(AEON_QUESTIONS) > 0 else 0
+    questions_answered = session_state.answered_count
+    bank = session_bank(session_state)
+    completion_rate = (questions_answered / len(bank)) * 100 if len(bank) > 0 else 0
+    # У завершённой сессии балл сохранён в строке sessions (читается той же сводкой);
+    # полная загрузка — только для незавершённой с ответами (и сессий до колонки final_score)
+    if session_state.final_score is not None:
+        score = session_state.final_score
+    elif questions_answered > 0:
+        score = calculate_performance_score(session_state.full())
+    else:
+        score = 0
     
     return {
         "session_id": token,
@@ -770,48 +552,49 @@ def get_result_by_token(token: str):
         "questions_answered": questions_answered,
         "completion_rate": completion_rate,
         "average_time_per_question": int(total_time / questions_answered) if questions_answered > 0 else 0,
-        "performance_score": min(85, max(40, 60 + (questions_answered * 3))),  # Простая формула
+        "performance_score": score,
+        # Место среди завершённых интервью; для незавершённого — None
+        "percentile": (score_distribution.percentile(session_bank(session_state).cohort, score)
+                       if session_state.completed else None),
         "created_at": session_state.created_at.isoformat(),
         "completed_at": datetime.now(timezone.utc).isoformat()
     }
 
 @router.get("/stats")
 def get_stats():
-    num_sessions = len(sessions)
-    num_answers = sum(len(s.aeon_answers) for s in sessions.values())
+    local_sessions = [s for _, s in session_store.local_sessions()]
+    num_sessions = len(local_sessions)
+    num_answers = sum(len(s.aeon_answers) for s in local_sessions)
     # Средний балл — если бы мы считали результаты (заглушка)
     avg_score = 50 if num_sessions > 0 else 0
     return {
         "sessions": num_sessions,
         "answers": num_answers,
-        "avg_score": avg_score
+        "avg_score": avg_score,
+        "session_store": session_store.stats(),
+        "score_distribution": score_distribution.stats(),
+        "answer_index": answer_index.stats(),
+        "test_drafts": draft_buffer.stats(),
+        "relevance_model": {cohort: model.stats() for cohort, model in relevance_models.items()} or None,
+        "llm_client": llm_client.stats(),
+        "ai_question_pool": ai_question_pool.stats(),
+        "task_cache": task_cache.stats(),
+        "database": database_stats()
     }
 
-# Добавляем функцию для генерации вопросов через OpenAI
-async def generate_question_with_openai(session_state: SessionState, question_type: str = None) -> dict:
-    """Генерирует новый вопрос через OpenAI API"""
-    if not OPENAI_API_KEY or OPENAI_API_KEY.startswith("sk-proj-X1"):
+# Генерация вопросов через OpenAI: только для пула (app.ai_question_pool), не на пути запроса
+async def generate_ai_question(question_type: str) -> Optional[dict]:
+    """Генерирует вопрос типа через OpenAI API; ответ модели проверяет пул"""
+    if not llm_client.enabled:
         return None
     
     try:
-        # Определяем тип вопроса на основе предыдущих ответов
-        if not question_type:
-            technical_count = sum(1 for q_id in session_state.asked_questions 
-                                if any(q["id"] == q_id and q["type"] == "technical" for q in AEON_QUESTIONS))
-            soft_count = len(session_state.asked_questions) - technical_count
-            
-            if technical_count < soft_count:
-                question_type = "technical"
-            else:
-                question_type = "soft"
-        
         # Создаем промпт для генерации вопроса
         context = f"""
         Ты - опытный HR-специалист, проводящий интервью. 
         Сгенерируй профессиональный вопрос для кандидата.
         
         Тип вопроса: {question_type}
-        Уже задано вопросов: {len(session_state.asked_questions)}
         
         Вопрос должен быть:
         - Профессиональным и релевантным
@@ -827,62 +610,50 @@ async def generate_question_with_openai(session_state: SessionState, question_ty
         }}
         """
         
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {"role": "system", "content": "Ты - опытный HR-специалист. Генерируй только валидный JSON."},
-                {"role": "user", "content": context}
-            ],
-            "max_tokens": 300,
-            "temperature": 0.7
-        }
+        content = await llm_client.chat([
+            {"role": "system", "content": "Ты - опытный HR-специалист. Генерируй только валидный JSON."},
+            {"role": "user", "content": context}
+        ], max_tokens=300, temperature=0.7, read_timeout=AI_QUESTION_TIMEOUT, priority=BACKGROUND)
         
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post("https://api.openai.com/v1/chat/completions", 
-                                       json=payload, headers=headers, timeout=10.0)
-            
-            if response.status_code == 200:
-                content = response.json()["choices"][0]["message"]["content"]
-                try:
-                    import json as pyjson
-                    result = pyjson.loads(content)
-                    
-                    # Генерируем уникальный ID для вопроса
-                    question_id = f"ai_q_{len(session_state.asked_questions) + 1}_{int(datetime.now().timestamp())}"
-                    
-                    return {
-                        "id": question_id,
-                        "text": result.get("text", "Расскажите о своем опыте работы в команде."),
-                        "type": result.get("type", "soft"),
-                        "keywords": result.get("keywords", ["опыт", "команда", "работа"]),
-                        "ai_generated": True
-                    }
-                except:
-                    pass
+        if content is not None:
+            return json.loads(content)
     except Exception as e:
         log_event("openai_error", {"error": str(e)})
     
     return None
 
+# Задания /aeon/task по (кандидат, позиция, контекст); таблица task_cache — пока база доступна
+task_cache = TaskCache(persistent=lambda: TASK_CACHE_PERSIST and db_breaker.closed)
+
+# Готовые вопросы ИИ на случай, когда вопросы банка закончились (пополняет app.main)
+ai_question_pool = AIQuestionPool(generate_ai_question, language=question_catalog.default_language)
+
+def ai_questions_available(bank: QuestionBank) -> bool:
+    return llm_client.enabled and bank.language == ai_question_pool.language
+
+def ai_question_types(session_state: SessionState, bank: QuestionBank) -> List[str]:
+    """Типы вопроса ИИ по возрастанию числа уже заданных вопросов этого типа"""
+    asked = list(session_state.asked_questions)
+    counts = {
+        question_type: bank.count_of_type(asked, question_type)
+        + sum(1 for question_id in asked if ai_question_type(question_id) == question_type)
+        for question_type in ai_question_pool.types
+    }
+    return sorted(ai_question_pool.types, key=counts.get)
+
 # Обновляем функцию получения следующего вопроса
 @router.post("/aeon/question/{token}")
 async def aeon_next_question_with_token(token: str, data: dict = Body(...)):
-    """Гарантированно выдает ровно 10 уникальных вопросов по порядку"""
+    """Выдает ровно 10 уникальных вопросов; следующий выбирается по качеству ответов (app.question_selector)"""
     print(f"DEBUG: Requesting question for token: {token}")
     print(f"DEBUG: Request data: {data}")
-    print(f"DEBUG: Available sessions in memory: {list(sessions.keys())}")
+    print(f"DEBUG: Session store: {session_store.name}")
     print(f"DEBUG: Database initialized: {db_initialized}")
     
     # Загружаем состояние сессии из PostgreSQL
-    session_state = load_session_from_db(token)
+    session_state = await load_session_from_db_async(token)
     if not session_state:
         print(f"ERROR: Session {token} not found in database!")
-        print(f"DEBUG: Available sessions in memory: {list(sessions.keys())}")
         raise HTTPException(status_code=404, detail="Сессия не найдена")
     
     print(f"DEBUG: Session {token} loaded successfully")
@@ -893,6 +664,7 @@ async def aeon_next_question_with_token(token: str, data: dict = Body(...)):
     
     # Обновляем активность
     update_session_activity(session_state)
+    bank = session_bank(session_state)
     
     # Проверяем, не превысили ли лимит в 10 вопросов
     if session_state.current_question_index >= 10:
@@ -913,31 +685,34 @@ async def aeon_next_question_with_token(token: str, data: dict = Body(...)):
     log_event("question_request", {
         "token": token,
         "asked_questions": list(session_state.asked_questions),
-        "question_order": session_state.question_order,
-        "total_aeon_questions": len(AEON_QUESTIONS),
+        "question_order": list(session_state.question_order),
+        "total_aeon_questions": len(bank),
         "current_question_index": session_state.current_question_index,
         "request_data": data
     })
     
-    # Проверяем, доступны ли все 10 вопросов
-    if len(AEON_QUESTIONS) < 10:
+    # Проверяем, доступны ли все 10 вопросов (недостающие может добавить ИИ)
+    if len(bank) < 10 and not ai_questions_available(bank):
         log_event("error_not_enough_questions", {
-            "available_questions": len(AEON_QUESTIONS),
+            "available_questions": len(bank),
             "required_questions": 10
         })
         return JSONResponse(content={"detail": "Недостаточно вопросов в базе"}, status_code=500)
 
-    # Защита от выхода за границы массива
-    if session_state.current_question_index >= len(AEON_QUESTIONS):
-        log_event("error_index_out_of_range", {
+    # Следующий вопрос: тип — по ответам кандидата, внутри типа — по порядку банка
+    question = bank_selector(bank).next_question(session_state)
+    if question is None and ai_questions_available(bank):
+        # Банк исчерпан: готовый вопрос ИИ из пула, генерации на пути запроса нет
+        question = ai_question_pool.pop_any(ai_question_types(session_state, bank))
+        if question is None:
+            log_event("ai_question_underflow", {"token": token, "pool": ai_question_pool.stats()["depth"]})
+            return JSONResponse(content={"detail": "Не удалось сгенерировать вопрос"}, status_code=503)
+    if question is None:
+        log_event("error_no_questions_left", {
             "current_index": session_state.current_question_index,
-            "total_questions": len(AEON_QUESTIONS)
+            "total_questions": len(bank)
         })
-        # Сброс индекса до последнего доступного вопроса
-        session_state.current_question_index = len(AEON_QUESTIONS) - 1
-
-    # Берем следующий вопрос по порядку из AEON_QUESTIONS
-    question = AEON_QUESTIONS[session_state.current_question_index]
+        return JSONResponse(content={"detail": "Все вопросы банка уже заданы"}, status_code=500)
     print(f"DEBUG: Using question {session_state.current_question_index}: {question['id']}")
 
     # Добавляем вопрос в список заданных и увеличиваем индекс
@@ -949,7 +724,7 @@ async def aeon_next_question_with_token(token: str, data: dict = Body(...)):
     print(f"DEBUG: Updated session state: asked_questions={list(session_state.asked_questions)}, current_index={session_state.current_question_index}")
     
     # Сохраняем сессию в PostgreSQL после получения вопроса
-    save_session_to_db(token, session_state)
+    await save_session_to_db_async(token, session_state)
     
     print(f"DEBUG: Returning question: {question['text']}")
     
@@ -967,7 +742,7 @@ async def aeon_next_question_with_token(token: str, data: dict = Body(...)):
 @router.post("/aeon/glyph/{token}")
 async def generate_glyph_with_token(token: str, data: dict = Body(...)):
     """УЛУЧШЕННАЯ генерация глифа с анализом качества ответов"""
-    session_state = sessions.get(token)
+    session_state = await load_session_from_db_async(token)
     if not session_state:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
     if is_token_expired(session_state):
@@ -982,24 +757,15 @@ async def generate_glyph_with_token(token: str, data: dict = Body(...)):
             "profile": "Кандидат только начинает интервью. Пока недостаточно данных для полного анализа."
         }
     
-    # Анализируем качество ответов
-    total_quality_score = 0
-    quality_details = []
-    
-    for question_id, answer in answers.items():
-        question_data = next((q for q in AEON_QUESTIONS if q["id"] == question_id), None)
-        if question_data:
-            keywords = question_data.get("keywords", [])
-            quality = analyze_answer_quality(answer, keywords)
-            total_quality_score += quality["score"]
-            quality_details.append(quality)
+    # Качество ответов: суммы оценок, посчитанных при сохранении
+    bank = session_bank(session_state)
+    total_quality_score = session_quality(session_state, bank, bank_relevance(bank)).score_sum
     
     avg_quality = total_quality_score / len(answers) if answers else 0
-    completion_rate = (len(answers) / len(AEON_QUESTIONS)) * 100
+    completion_rate = (len(answers) / len(bank)) * 100
     
     # Анализируем типы ответов
-    technical_count = sum(1 for q_id in answers.keys() 
-                         if any(q["id"] == q_id and q["type"] == "technical" for q in AEON_QUESTIONS))
+    technical_count = bank.count_of_type(answers.keys(), "technical")
     soft_count = len(answers) - technical_count
     
     # Определяем профиль на основе комплексного анализа
@@ -1018,7 +784,7 @@ async def generate_glyph_with_token(token: str, data: dict = Body(...)):
     
     # Добавляем детали анализа
     profile += f"\n\n📊 Детали анализа:\n"
-    profile += f"• Завершенность: {completion_rate:.1f}% ({len(answers)}/{len(AEON_QUESTIONS)})\n"
+    profile += f"• Завершенность: {completion_rate:.1f}% ({len(answers)}/{len(bank)})\n"
     profile += f"• Технические вопросы: {technical_count}, Soft skills: {soft_count}\n"
     profile += f"• Среднее качество ответов: {avg_quality:.1f}/100"
     
@@ -1027,7 +793,7 @@ async def generate_glyph_with_token(token: str, data: dict = Body(...)):
 @router.post("/aeon/summary/{token}")
 async def aeon_summary_with_token(token: str):
     """УЛУЧШЕННАЯ генерация сводки с детальным анализом"""
-    session_state = sessions.get(token)
+    session_state = await load_session_from_db_async(token)
     if not session_state:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
     if is_token_expired(session_state):
@@ -1041,24 +807,19 @@ async def aeon_summary_with_token(token: str):
             "summary": "📊 **Анализ интервью начат**\n\nИнтервью только началось. Пожалуйста, ответьте на вопросы для получения детального анализа."
         }
     
-    # Детальный анализ ответов
-    quality_scores = []
-    keyword_matches = []
-    has_examples_count = 0
-    
-    for question_id, answer in answers.items():
-        question_data = next((q for q in AEON_QUESTIONS if q["id"] == question_id), None)
-        if question_data:
-            keywords = question_data.get("keywords", [])
-            quality = analyze_answer_quality(answer, keywords)
-            quality_scores.append(quality["score"])
-            keyword_matches.append(quality["keyword_matches"])
-            if quality["has_examples"]:
-                has_examples_count += 1
+    # Детальный анализ ответов: суммы оценок, посчитанных при сохранении
+    bank = session_bank(session_state)
+    totals = session_quality(session_state, bank, bank_relevance(bank))
+    has_examples_count = totals.with_examples
     
     # Расчет метрик
-    avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
+    avg_quality = totals.score_sum / totals.scored if totals.scored else 0
     performance_score = calculate_performance_score(session_state)
+    percentile = score_distribution.percentile(bank.cohort, performance_score) if session_state.completed else None
+    # Средняя близость к эталонным ответам (если модель загружена)
+    relevance = totals.relevance_sum / totals.with_relevance * 100 if totals.with_relevance else None
+    # Ответы, почти совпадающие с ответами других кандидатов
+    similar_answers = answer_index.flags(token, answers.keys())
     total_time = (datetime.now(timezone.utc) - session_state.created_at).total_seconds() / 60
     
     # Определение уровня качества
@@ -1078,15 +839,17 @@ async def aeon_summary_with_token(token: str):
     summary = f"""📊 **Подробный анализ интервью**
 
 **Общая статистика:**
-• Отвечено на {total_answers} из {len(AEON_QUESTIONS)} вопросов ({(total_answers/len(AEON_QUESTIONS)*100):.1f}%)
+• Отвечено на {total_answers} из {len(bank)} вопросов ({(total_answers/len(bank)*100):.1f}%)
 • Общее время интервью: {int(total_time)} минут
-• Итоговый балл: {performance_score}/100
+• Итоговый балл: {performance_score}/100{f" (выше, чем у {percentile:.0f}% завершивших интервью)" if percentile is not None else ""}
 
 **Анализ качества ответов:**
 • Уровень качества: {quality_level}
 • Средний балл качества: {avg_quality:.1f}/100
 • Ответы с примерами: {has_examples_count}/{total_answers}
-• Релевантность содержания: {(sum(keyword_matches)/len(keyword_matches)/4*100):.1f}% (в среднем)
+• Ответы, совпадающие с ответами других кандидатов: {len(similar_answers)}/{total_answers}
+• Релевантность содержания: {(totals.keyword_matches/totals.scored/4*100):.1f}% (в среднем)
+{f"• Близость к эталонным ответам: {relevance:.1f}%" if relevance is not None else ""}
 
 **Профессиональная оценка:**
 {recommendation}
@@ -1103,12 +866,19 @@ async def aeon_summary_with_token(token: str):
 
     log_event("aeon_summary", {"token": token, "answers_count": total_answers, "performance_score": performance_score})
     
-    return {"summary": summary}
+    return {
+        "summary": summary,
+        "percentile": percentile,
+        "relevance": round(relevance, 1) if relevance is not None else None,
+        "similar_answers": {
+            question_id: round(matches[0][1], 2) for question_id, matches in similar_answers.items()
+        },
+    }
 
 @router.post("/aeon/task/{token}")
 async def aeon_task_with_token(token: str, data: dict = Body(...)):
     """Сгенерировать задание для конкретной сессии"""
-    session_state = sessions.get(token)
+    session_state = await load_session_from_db_async(token)
     if not session_state:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
     if is_token_expired(session_state):
@@ -1121,35 +891,28 @@ async def aeon_task_with_token(token: str, data: dict = Body(...)):
     task = f"Создайте план развития команды из 5 человек для {position}. Включите: 1) Анализ текущих навыков 2) Определение целей 3) План обучения 4) Метрики успеха 5) Временные рамки"
     example = "Пример: Анализ показал нехватку навыков в области проектного управления. Цель - повысить эффективность на 30%. План включает тренинги, менторство и практические проекты на 3 месяца."
     
-    # Попытаемся использовать OpenAI
-    try:
-        if OPENAI_API_KEY and not OPENAI_API_KEY.startswith("sk-proj-X1"):
-            prompt = f"Сгенерируй тестовое задание для кандидата {candidate} на позицию {position} и пример его выполнения. Ответ верни в формате JSON: {{\"task\": \"...\", \"example\": \"...\"}}"
-            payload = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": AEON_CONTEXT},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 500,
-                "temperature": 0.7
-            }
-            headers = {
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            async with httpx.AsyncClient() as client:
-                response = await client.post("https://api.openai.com/v1/chat/completions", json=payload, headers=headers)
-                if response.status_code == 200:
-                    content = response.json()["choices"][0]["message"]["content"]
-                    try:
-                        import json as pyjson
-                        result = pyjson.loads(content)
-                        return result
-                    except:
-                        pass
-    except:
-        pass
+    # Попытаемся использовать OpenAI: задание зависит только от кандидата, позиции и контекста
+    context = session_bank(session_state).context
+    
+    async def generate_task() -> Optional[dict]:
+        prompt = f"Сгенерируй тестовое задание для кандидата {candidate} на позицию {position} и пример его выполнения. Ответ верни в формате JSON: {{\"task\": \"...\", \"example\": \"...\"}}"
+        content = await llm_client.chat([
+            {"role": "system", "content": context},
+            {"role": "user", "content": prompt}
+        ], max_tokens=500, temperature=0.7, priority=INTERACTIVE, budget=AI_TASK_BUDGET)
+        if content is None:
+            return None
+        result = json.loads(content)
+        return result if isinstance(result, dict) and result.get("task") else None
+    
+    if llm_client.enabled:
+        try:
+            result = await task_cache.get_or_generate(
+                task_cache_key(candidate, position, context, llm_client.model), generate_task)
+            if result is not None:
+                return result
+        except Exception as e:
+            log_event("openai_error", {"error": str(e)})
     
     return {"task": task, "example": example}
 
@@ -1190,15 +953,16 @@ async def generate_glyph_legacy(data: dict):
 async def aeon_next_question_legacy(data: dict):
     """Старый эндпоинт для получения вопросов (без токена)"""
     history = data.get("history", [])
+    bank = question_catalog.bank(data.get("lang"))
     
-    if len(history) >= len(AEON_QUESTIONS):
+    if len(history) >= len(bank):
         return {"questions": []}
     
     # Возвращаем все оставшиеся вопросы
-    remaining_questions = AEON_QUESTIONS[len(history):]
+    remaining_questions = bank[len(history):]
     return {
         "questions": [{"text": q["text"], "type": q["type"]} for q in remaining_questions],
-        "total_questions": len(AEON_QUESTIONS),
+        "total_questions": len(bank),
         "remaining_questions": len(remaining_questions)
     }
 
@@ -1338,30 +1102,33 @@ def admin_sessions(request: Request):
             "answers": len(s.aeon_answers),
             "total_answers": len(s.answers)
         }
-        for token, s in sessions.items()
+        for token, s in session_store.local_sessions()
     ]
     return templates.TemplateResponse("admin_sessions.html", {"request": request, "sessions": session_list})
 
 @admin_router.get("/admin/session/{token}", response_class=HTMLResponse)
 def admin_session_detail(request: Request, token: str):
-    session_state = sessions.get(token)
+    session_state = load_session_from_db(token)
     if not session_state:
         return HTMLResponse("<h2>Сессия не найдена</h2>", status_code=404)
-    return templates.TemplateResponse("admin_session_detail.html", {"request": request, "token": token, "session": session_state})
+    # Похожие ответы других кандидатов: {question_id: [(token, сходство)]}
+    similar = answer_index.flags(token, session_state.aeon_answers.keys())
+    return templates.TemplateResponse("admin_session_detail.html", {"request": request, "token": token, "session": session_state, "similar": similar})
 
 @admin_router.post("/admin/session/{token}/delete")
 def admin_delete_session(request: Request, token: str):
-    sessions.pop(token, None)
+    session_store.delete(token)
     log_event("delete_session", {"token": token})
     from fastapi.responses import RedirectResponse
     return RedirectResponse(url="/admin", status_code=303)
 
 @admin_router.get("/admin/stats", response_class=HTMLResponse)
 def admin_stats(request: Request):
-    total = len(sessions)
-    completed = sum(1 for s in sessions.values() if s.completed)
+    local_sessions = [s for _, s in session_store.local_sessions()]
+    total = len(local_sessions)
+    completed = sum(1 for s in local_sessions if s.completed)
     active = total - completed
-    total_aeon_answers = sum(len(s.aeon_answers) for s in sessions.values())
+    total_aeon_answers = sum(len(s.aeon_answers) for s in local_sessions)
     return templates.TemplateResponse("admin_stats.html", {
         "request": request, 
         "total": total, 
@@ -1380,7 +1147,7 @@ def export_sessions():
         output = StringIO()
         writer = csv.writer(output)
         writer.writerow(["token", "created_at", "completed", "answers", "aeon_answers"])
-        for token, s in sessions.items():
+        for token, s in session_store.local_sessions():
             writer.writerow([token, s.created_at, s.completed, len(s.answers), len(s.aeon_answers)])
         yield output.getvalue()
     return StreamingResponse(generate(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=sessions.csv"})
@@ -0,0 +1,129 @@
+"""Circuit breaker для обращений к базе данных.
+
+Пока база отвечает, breaker «закрыт» и пропускает запросы. После
+failure_threshold ошибок подряд он «открывается»: запросы к БД не
+выполняются вовсе (сессии обслуживаются из памяти), а фоновый поток раз
+в reset_timeout секунд проверяет базу. Первая успешная проверка закрывает
+breaker. Так медленная или недоступная база не стоит запросу ожиданием
+соединения.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DB_BREAKER_FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURE_THRESHOLD", "5"))
+DB_BREAKER_RESET_TIMEOUT = float(os.getenv("DB_BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонён: breaker открыт, база считается недоступной"""
+
+
+class CircuitBreaker:
+    """Счётчик ошибок подряд с фоновой проверкой восстановления"""
+
+    def __init__(self, name: str, probe: Optional[Callable[[], Any]] = None,
+                 failure_threshold: int = DB_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = DB_BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.stats_counters = {
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0,
+            "probes": 0,
+        }
+
+    @property
+    def closed(self) -> bool:
+        return self.state == CLOSED
+
+    def allow(self) -> bool:
+        """True, если запрос к БД можно выполнять"""
+        if self.state == CLOSED:
+            return True
+        self.stats_counters["rejected"] += 1
+        return False
+
+    def guard(self):
+        """Как allow(), но бросает CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open: {self.last_error}")
+
+    def record_success(self):
+        if self.consecutive_failures:
+            with self._lock:
+                self.consecutive_failures = 0
+
+    def record_failure(self, error: BaseException):
+        if isinstance(error, CircuitOpenError):
+            return
+        with self._lock:
+            self.stats_counters["failures"] += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self, error: BaseException):
+        """Открывает breaker сразу (например, база недоступна при старте)"""
+        with self._lock:
+            self.last_error = str(error)
+            if self.state == CLOSED:
+                self._open()
+
+    def _open(self):
+        print(f"WARNING: {self.name} circuit opened after {self.consecutive_failures} failures: "
+              f"{self.last_error}")
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.stats_counters["opened"] += 1
+        if self.probe is not None and (self._prober is None or not self._prober.is_alive()):
+            self._prober = threading.Thread(target=self._probe_loop, name=f"{self.name}-breaker-probe",
+                                            daemon=True)
+            self._prober.start()
+
+    def _close(self):
+        with self._lock:
+            print(f"DEBUG: {self.name} circuit closed, database is available again")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def _probe_loop(self):
+        # Проверка идёт в отдельном потоке, а не на пути запроса
+        while self.state == OPEN and not self._stopped.wait(self.reset_timeout):
+            self.stats_counters["probes"] += 1
+            try:
+                self.probe()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"DEBUG: {self.name} probe failed: {e}")
+                continue
+            self._close()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "open_for_s": round(time.time() - self.opened_at, 1) if self.opened_at else 0.0,
+            "last_error": self.last_error,
+            **self.stats_counters,
+        }
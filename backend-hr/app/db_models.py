@@ -1,9 +1,25 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy import exc as sa_exc
 import os
+import threading
+import time
 from datetime import datetime
 
+# Настройки пула соединений (для PostgreSQL). На воркер gunicorn приходится до
+# DB_POOL_SIZE + DB_MAX_OVERFLOW соединений на каждый движок (sync и async).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Сколько ждать свободного соединения, прежде чем считать базу недоступной
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Пересоздавать соединения старше N секунд (обрывы со стороны прокси/PgBouncer)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Таймаут установки TCP-соединения с базой
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "3"))
+
 # Определяем URL базы данных
 def get_database_url():
     # Проверяем наличие DATABASE_URL (для Heroku)
@@ -17,17 +33,109 @@ def get_database_url():
     # Для локальной разработки используем SQLite
     return "sqlite:///./test.db"
 
+# URL для асинхронного движка: aiosqlite локально, asyncpg в проде
+def get_async_database_url(database_url: str = None):
+    database_url = database_url or get_database_url()
+    if database_url.startswith("sqlite:///"):
+        return database_url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if database_url.startswith("postgresql://"):
+        database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        # asyncpg не понимает libpq-параметр sslmode
+        return database_url.replace("sslmode=", "ssl=")
+    return database_url
+
+class PoolMetrics:
+    """Время ожидания соединения из пула (включая открытие нового)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.pool = None
+
+    def observe(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+            "status": self.pool.status() if self.pool is not None else None,
+        }
+
+
+class _TimedCheckout:
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics.pool = self
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            self.metrics.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics = PoolMetrics()
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def _engine_options(is_async: bool) -> dict:
+    if "sqlite" in get_database_url():
+        if is_async:
+            # SQLite допускает одного писателя, поэтому локально держим одно соединение:
+            # конкурирующие запросы ждут его асинхронно, а не падают с "database is locked"
+            return {"poolclass": TimedAsyncQueuePool, "pool_size": 1, "max_overflow": 0}
+        return {"poolclass": TimedQueuePool, "connect_args": {"check_same_thread": False}}
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        # asyncpg и psycopg2 называют таймаут подключения по-разному
+        "connect_args": {"timeout": DB_CONNECT_TIMEOUT} if is_async else {"connect_timeout": DB_CONNECT_TIMEOUT},
+    }
+
 # Создаем движок базы данных
-engine = create_engine(
-    get_database_url(),
-    connect_args={"check_same_thread": False} if "sqlite" in get_database_url() else {}
-)
+engine = create_engine(get_database_url(), **_engine_options(is_async=False))
+
+# Асинхронный движок для async-эндпоинтов: запросы к БД не блокируют event loop
+async_engine = create_async_engine(get_async_database_url(), **_engine_options(is_async=True))
+
+
+def pool_stats() -> dict:
+    """Метрики пулов соединений для /stats"""
+    return {
+        "sync": TimedQueuePool.metrics.stats(),
+        "async": TimedAsyncQueuePool.metrics.stats(),
+    }
 
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
 # Создаем класс сессии
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
@@ -60,14 +168,118 @@ class Session(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String, unique=True, index=True)
-    answers = Column(JSON, default=list)
-    aeon_answers = Column(JSON, default=dict)
-    asked_questions = Column(JSON, default=list)
     current_question_index = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     completed = Column(Boolean, default=False)
-    question_order = Column(JSON, default=list)
-    last_activity = Column(DateTime, default=datetime.utcnow)
+    last_activity = Column(DateTime, default=datetime.utcnow, index=True)
+    # Версия банка вопросов, закреплённая при создании сессии (app.question_catalog)
+    bank_version = Column(String, nullable=True)
+    # Итоговый балл на момент завершения: /result читает его узким SELECT без ответов
+    final_score = Column(Integer, nullable=True)
+    # Ответы и заданные вопросы хранятся построчно в session_answers / session_questions.
+    # Старые JSON-колонки (answers, aeon_answers, asked_questions, question_order)
+    # остаются в существующих базах после миграции, но больше не пишутся.
+
+    __table_args__ = (
+        # Для очистки просроченных сессий (app.session_expiry)
+        Index("ix_sessions_completed_last_activity", "completed", "last_activity"),
+    )
+
+# Ответ кандидата: одна строка на ответ, дописывается без перезаписи сессии
+class SessionAnswer(Base):
+    __tablename__ = "session_answers"
+
+    session_token = Column(String, ForeignKey("sessions.token", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)  # порядковый номер ответа в сессии
+    question_id = Column(String, nullable=False)
+    answer = Column(Text, nullable=False)
+    extra = Column(JSON, nullable=True)  # прочие поля исходного запроса, если были
+    quality = Column(JSON, nullable=True)  # разбор app.answer_quality, посчитанный при сохранении
+    scorer_version = Column(Integer, nullable=True)  # SCORER_VERSION, которой посчитан quality
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Заданный вопрос: порядок вопросов = порядок position
+class SessionQuestion(Base):
+    __tablename__ = "session_questions"
+
+    session_token = Column(String, ForeignKey("sessions.token", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    question_id = Column(String, nullable=False)
+    asked_at = Column(DateTime, default=datetime.utcnow)
+
+# MinHash-сигнатура ответа для поиска похожих ответов (app.answer_similarity)
+class AnswerSignature(Base):
+    __tablename__ = "answer_signatures"
+
+    id = Column(Integer, primary_key=True)  # порядок записи: процессы подгружают строки после последнего id
+    # Без внешнего ключа: сигнатура может быть записана раньше write-behind записи сессии
+    session_token = Column(String, nullable=False, index=True)
+    question_id = Column(String, nullable=False)
+    # Версия банка сессии (app.question_catalog): ответы разных банков индексируются раздельно
+    bank_version = Column(String, nullable=True)
+    signature = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Сигнатуры, посчитанные перестроением индекса (MinHashIndex.rebuild): в answer_signatures
+# переносятся одной транзакцией в конце, а недостроенные не видны другим процессам
+class AnswerSignatureStaging(Base):
+    __tablename__ = "answer_signatures_rebuild"
+
+    id = Column(Integer, primary_key=True)
+    session_token = Column(String, nullable=False)
+    question_id = Column(String, nullable=False)
+    bank_version = Column(String, nullable=True)
+    signature = Column(LargeBinary, nullable=False)
+
+# Распределение итоговых баллов завершённых сессий (app.score_distribution)
+class ScoreDistributionRow(Base):
+    __tablename__ = "score_distributions"
+
+    name = Column(String, primary_key=True)
+    scorer_version = Column(Integer, nullable=False)
+    counts = Column(JSON, nullable=False)  # 101 счётчик: баллы 0..100
+    total = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Результат теста с вариантами ответов (app.graded_tests); id возвращается кандидату
+class TestResult(Base):
+    __tablename__ = "test_results"
+
+    id = Column(Integer, primary_key=True)
+    test_id = Column(Integer, nullable=False)
+    test_version = Column(String, nullable=False)  # версия файла теста, по которому проверено
+    language = Column(String, nullable=False)
+    score = Column(Integer, nullable=False)  # 0-100
+    correct = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    answers = Column(JSON, nullable=False)  # {question_id: answer_id}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Черновик ответов кандидата на тест (автосохранение, app.answer_drafts)
+class TestDraft(Base):
+    __tablename__ = "test_drafts"
+
+    candidate = Column(String, primary_key=True)
+    test_id = Column(Integer, primary_key=True)
+    answers = Column(JSON, nullable=False)  # {question_id: answer_id}
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Сгенерированные ИИ задания по ключу входных данных (постоянный уровень app.task_cache)
+class TaskCacheEntry(Base):
+    __tablename__ = "task_cache"
+
+    key = Column(String(40), primary_key=True)  # sha1 нормализованных входных данных
+    task = Column(JSON, nullable=False)         # {"task": ..., "example": ...}
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Аренда фоновой задачи одним процессом (app.job_lease): перестроения по базе
+class JobLeaseRow(Base):
+    __tablename__ = "job_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)     # host:pid:случайный суффикс процесса-владельца
+    expires_at = Column(DateTime, nullable=False)
 
 def create_tables():
     Base.metadata.create_all(bind=engine) 
\ No newline at end of file
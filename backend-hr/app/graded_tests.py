@@ -0,0 +1,98 @@
+"""Тесты с вариантами ответов: ключ ответов, проверка и сохранённые результаты.
+
+Тест загружается из файла банка (app.question_catalog) и компилируется в
+CompiledTest: модель Test для выдачи кандидату (без правильных ответов) и
+ключ question_id -> correct_answer_id. Проверка — один проход по ответам
+кандидата с поиском в ключе, O(число ответов), без перебора вопросов.
+
+Результат проверки записывается в таблицу test_results; id строки
+возвращается кандидату, и /result/{id} читает результат по первичному
+ключу.
+"""
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, NamedTuple
+
+from app.models import Test, UserAnswer
+
+
+class GradeResult(NamedTuple):
+    correct: int
+    total: int
+    score: int          # 0-100
+    answers: Dict[int, int]  # question_id -> answer_id (последний ответ на вопрос)
+
+    @property
+    def details(self) -> str:
+        return f"{self.correct} из {self.total} правильных ответов"
+
+
+class CompiledTest:
+    """Тест на одном языке: модель для выдачи и ключ ответов"""
+
+    __slots__ = ("id", "language", "version", "test", "key")
+
+    def __init__(self, data: Mapping[str, Any], language: str, version: str):
+        key: Dict[int, int] = {}
+        for question in data["questions"]:
+            answer_ids = {answer["id"] for answer in question["answers"]}
+            correct = question.get("correct_answer_id")
+            if correct not in answer_ids:
+                raise ValueError(f"question {question['id']}: correct_answer_id {correct!r} is not among answers")
+            if question["id"] in key:
+                raise ValueError(f"duplicate question id {question['id']}")
+            key[question["id"]] = correct
+        self.id = int(data["id"])
+        self.language = language
+        self.version = version
+        # Test не содержит правильных ответов: лишние поля файла pydantic отбрасывает
+        self.test = Test(id=data["id"], title=data["title"], questions=data["questions"])
+        self.key: Mapping[int, int] = MappingProxyType(key)
+
+    def __len__(self) -> int:
+        return len(self.key)
+
+    def grade(self, answers: Iterable[UserAnswer]) -> GradeResult:
+        """Проверка ответов: на вопрос засчитывается последний ответ, чужие вопросы не считаются"""
+        given: Dict[int, int] = {}
+        for answer in answers:
+            if answer.question_id in self.key:
+                given[answer.question_id] = answer.answer_id
+        key = self.key
+        correct = sum(1 for question_id, answer_id in given.items() if key[question_id] == answer_id)
+        total = len(key)
+        score = int(100 * correct / total) if total else 0
+        return GradeResult(correct, total, score, given)
+
+    def __repr__(self) -> str:
+        return f"CompiledTest(id={self.id}, language={self.language!r}, questions={len(self)})"
+
+
+def save_result(test: CompiledTest, result: GradeResult) -> int:
+    """Записывает результат в test_results; возвращает его id"""
+    from app.db_models import SessionLocal, TestResult
+
+    db = SessionLocal()
+    try:
+        row = TestResult(test_id=test.id, test_version=test.version, language=test.language,
+                         score=result.score, correct=result.correct, total=result.total,
+                         # Ключи JSON — строки
+                         answers={str(question_id): answer_id for question_id, answer_id in result.answers.items()})
+        db.add(row)
+        db.commit()
+        return row.id
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def load_result(result_id: int):
+    """Строка test_results по первичному ключу или None"""
+    from app.db_models import SessionLocal, TestResult
+
+    db = SessionLocal()
+    try:
+        return db.get(TestResult, result_id)
+    finally:
+        db.close()
@@ -0,0 +1,78 @@
+"""Аренда фоновой задачи одним процессом из нескольких (воркеры gunicorn, CLI).
+
+Аренда — строка job_leases с именем задачи, владельцем и сроком. Процесс,
+который первым вставил строку или занял просроченную, выполняет задачу;
+остальные её пропускают и берут результат из базы, когда он появится.
+Если владелец упал, не освободив аренду, через JOB_LEASE_TTL задачу
+возьмёт другой процесс.
+
+Так перестроения по базе (app.score_distribution, app.answer_similarity)
+выполняет один процесс и в фоне, а не каждый воркер при старте.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+JOB_LEASE_TTL = float(os.getenv("JOB_LEASE_TTL", "3600"))
+
+
+def _holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobLease:
+    """Аренда задачи name: acquire() — True, если задачу выполняет этот процесс"""
+
+    def __init__(self, name: str, ttl: float = JOB_LEASE_TTL, holder: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or _holder_id()
+
+    def acquire(self) -> bool:
+        """Занимает свободную или просроченную аренду (своя — продлевается)"""
+        from app.db_models import SessionLocal, JobLeaseRow
+        from sqlalchemy import insert, or_, update
+        from sqlalchemy.exc import IntegrityError
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        db = SessionLocal()
+        try:
+            taken = db.execute(
+                update(JobLeaseRow)
+                .where(JobLeaseRow.name == self.name,
+                       or_(JobLeaseRow.holder == self.holder, JobLeaseRow.expires_at <= now))
+                .values(holder=self.holder, expires_at=expires_at)
+            ).rowcount == 1
+            if not taken:
+                try:
+                    db.execute(insert(JobLeaseRow).values(name=self.name, holder=self.holder,
+                                                          expires_at=expires_at))
+                    taken = True
+                except IntegrityError:
+                    # Аренду держит другой процесс
+                    db.rollback()
+            db.commit()
+            return taken
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def release(self):
+        from app.db_models import SessionLocal, JobLeaseRow
+        from sqlalchemy import delete
+
+        db = SessionLocal()
+        try:
+            db.execute(delete(JobLeaseRow).where(JobLeaseRow.name == self.name,
+                                                 JobLeaseRow.holder == self.holder))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,207 @@
+"""Общий HTTP-клиент для запросов к OpenAI.
+
+Один httpx.AsyncClient на процесс: создаётся при старте приложения
+(app.main, start) и закрывается при остановке (aclose). Соединения к API
+держатся в пуле (keep-alive), поэтому запрос к ИИ не платит за новое
+TCP+TLS-соединение; при установленном пакете h2 — HTTP/2, несколько
+запросов в одном соединении.
+
+У каждого запроса явные таймауты: на соединение (LLM_CONNECT_TIMEOUT) и
+на ожидание ответа (LLM_READ_TIMEOUT, для интерактивных путей задаётся
+меньше). Ошибки соединения, таймауты, 429 и 5xx повторяются до
+LLM_RETRIES раз с экспоненциальной задержкой и полным джиттером (случайная
+пауза от 0 до base * 2^попытка, не больше LLM_BACKOFF_MAX), чтобы
+повторы разных запросов не приходили в API одновременно; Retry-After
+ответа 429 учитывается. Остальные ответы (400, 401, ...) не повторяются.
+
+Каждая попытка проходит через app.llm_limiter.LLMLimiter (если задан):
+ограничение параллельности и частоты, приоритет запроса и его срок
+(budget). Не успевающий к сроку запрос сразу возвращает None — вызывающий
+отдаёт запасной ответ; 429 приостанавливает выдачу слотов всем запросам.
+"""
+import asyncio
+import contextlib
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.llm_limiter import INTERACTIVE, LLMLimiter, LLMOverloaded
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+# Ключ-заглушка из примеров конфигурации: с ним к API не обращаемся
+PLACEHOLDER_KEY_PREFIX = "sk-proj-X1"
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF, cap: float = LLM_BACKOFF_MAX) -> float:
+    """Пауза перед повтором номер attempt (с 0): полный джиттер"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class LLMClient:
+    """Пул соединений к OpenAI Chat Completions с таймаутами и повторами"""
+
+    def __init__(self, api_key: str, base_url: str = OPENAI_BASE_URL, model: str = OPENAI_MODEL,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_connections: int = LLM_MAX_CONNECTIONS, max_keepalive: int = LLM_MAX_KEEPALIVE,
+                 http2: bool = LLM_HTTP2, retries: int = LLM_RETRIES, backoff: float = LLM_BACKOFF,
+                 backoff_max: float = LLM_BACKOFF_MAX, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 limiter: Optional[LLMLimiter] = None):
+        self.api_key = api_key or ""
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.http2 = http2
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._transport = transport
+        self.limiter = limiter
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.overloaded = 0
+        self.clients_created = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key) and not self.api_key.startswith(PLACEHOLDER_KEY_PREFIX)
+
+    def timeout(self, read: Optional[float] = None) -> httpx.Timeout:
+        read = self.read_timeout if read is None else read
+        return httpx.Timeout(connect=self.connect_timeout, read=read, write=read, pool=self.connect_timeout)
+
+    async def start(self) -> httpx.AsyncClient:
+        """Создаёт клиент (при старте приложения; иначе — при первом запросе)"""
+        if self._client is None or self._client.is_closed:
+            http2 = self.http2
+            if http2 and not http2_available():
+                print("WARNING: Package h2 is not installed, LLM client uses HTTP/1.1")
+                http2 = False
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout(),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive,
+                                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+                http2=http2,
+                transport=self._transport,
+            )
+            self.clients_created += 1
+            print(f"DEBUG: LLM client started ({self.base_url}, http2={http2}, "
+                  f"max_connections={self.max_connections})")
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _send(self, payload: Dict, timeout: httpx.Timeout) -> httpx.Response:
+        client = await self.start()
+        return await client.post("/chat/completions", json=payload, timeout=timeout)
+
+    def _slot(self, priority: int, deadline: Optional[float]):
+        return self.limiter.slot(priority, deadline) if self.limiter is not None else contextlib.nullcontext()
+
+    async def post_chat(self, payload: Dict, read_timeout: Optional[float] = None, priority: int = INTERACTIVE,
+                        deadline: Optional[float] = None) -> Optional[httpx.Response]:
+        """POST /chat/completions с повторами; None — API недоступен или не успеть к deadline (time.monotonic())"""
+        read_timeout = self.read_timeout if read_timeout is None else read_timeout
+        for attempt in range(self.retries + 1):
+            timeout = self.timeout(read_timeout)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.failures += 1
+                    return None
+                timeout = self.timeout(min(read_timeout, remaining))
+            delay = None
+            try:
+                async with self._slot(priority, deadline):
+                    self.requests += 1
+                    response = await self._send(payload, timeout)
+                if response.status_code == 429:
+                    delay = _retry_after(response)
+                    if self.limiter is not None:
+                        self.limiter.on_rate_limited(delay)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    if response.status_code != 200:
+                        self.failures += 1
+                        print(f"ERROR: OpenAI responded {response.status_code}")
+                    return response
+                print(f"WARNING: OpenAI responded {response.status_code}, retrying")
+            except LLMOverloaded as e:
+                self.overloaded += 1
+                print(f"WARNING: OpenAI request not sent: {e}")
+                return None
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt == self.retries:
+                    self.failures += 1
+                    print(f"ERROR: OpenAI request failed: {e!r}")
+                    return None
+                print(f"WARNING: OpenAI request failed ({e!r}), retrying")
+            self.retried += 1
+            if delay is None:
+                delay = backoff_delay(attempt, self.backoff, self.backoff_max)
+            delay = min(delay, self.backoff_max)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                self.failures += 1
+                return None
+            await asyncio.sleep(delay)
+        return None
+
+    async def chat(self, messages: List[Dict], max_tokens: int, temperature: float = 0.7,
+                   read_timeout: Optional[float] = None, priority: int = INTERACTIVE,
+                   budget: Optional[float] = None) -> Optional[str]:
+        """Текст ответа модели или None (ключ не задан, ошибка API, не успеть за budget секунд)"""
+        if not self.enabled:
+            return None
+        deadline = time.monotonic() + budget if budget is not None else None
+        response = await self.post_chat({"model": self.model, "messages": messages,
+                                         "max_tokens": max_tokens, "temperature": temperature},
+                                        read_timeout, priority, deadline)
+        if response is None or response.status_code != 200:
+            return None
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "base_url": self.base_url, "started": self._client is not None,
+                "requests": self.requests, "retried": self.retried, "failures": self.failures,
+                "overloaded": self.overloaded, "clients_created": self.clients_created,
+                "limiter": self.limiter.stats() if self.limiter is not None else None}
@@ -0,0 +1,199 @@
+"""Ограничение исходящих запросов к ИИ: параллельность, частота, приоритеты.
+
+Все запросы app.llm_client.LLMClient (включая повторы) проходят через
+LLMLimiter.slot():
+
+  * одновременно в пути не больше LLM_CONCURRENCY запросов;
+  * частота — token bucket: LLM_RATE запросов в секунду, всплеск до
+    LLM_BURST;
+  * очередь с приоритетами: запросы, которых ждёт пользователь
+    (INTERACTIVE, например /aeon/task), пропускаются раньше фоновых
+    (BACKGROUND, пополнение пула вопросов app.ai_question_pool); внутри
+    приоритета — по порядку прихода;
+  * у запроса может быть срок (deadline, time.monotonic()). Если
+    ожидаемое ожидание в очереди (по числу запросов впереди, частоте и
+    средней длительности запроса) больше оставшегося времени, запрос
+    сразу получает LLMOverloaded и эндпоинт отдаёт запасной ответ, не
+    дожидаясь таймаута. Не дождавшийся очереди до срока — тоже.
+
+Ответ 429 от API (on_rate_limited) приостанавливает выдачу слотов на
+Retry-After (или LLM_RATE_LIMIT_PAUSE) секунд и обнуляет запас токенов.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_RATE = float(os.getenv("LLM_RATE", "5"))
+LLM_BURST = float(os.getenv("LLM_BURST", "10"))
+LLM_RATE_LIMIT_PAUSE = float(os.getenv("LLM_RATE_LIMIT_PAUSE", "1"))
+
+# Приоритеты: меньше — раньше
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Начальная оценка длительности запроса к ИИ (с), пока нет замеров
+INITIAL_LATENCY = 2.0
+LATENCY_SMOOTHING = 0.2
+
+
+class LLMOverloaded(Exception):
+    """Запрос не дождётся очереди к ИИ до своего срока"""
+
+
+class _Waiter:
+    __slots__ = ("priority", "future", "cancelled")
+
+    def __init__(self, priority: int, future: asyncio.Future):
+        self.priority = priority
+        self.future = future
+        self.cancelled = False
+
+
+class LLMLimiter:
+    """Допуск запросов к ИИ: семафор + token bucket + очередь с приоритетами"""
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, rate: float = LLM_RATE, burst: float = LLM_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        if concurrency < 1 or rate <= 0 or burst < 1:
+            raise ValueError("LLM limiter needs concurrency >= 1, rate > 0 and burst >= 1")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._refilled_at = clock()
+        self._paused_until = 0.0
+        self._queue: List = []          # heap (приоритет, номер, _Waiter)
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight = 0
+        self.latency = INITIAL_LATENCY  # сглаженная длительность запроса
+        self.admitted = 0
+        self.rejected = 0               # отказано сразу: ожидание больше срока
+        self.expired = 0                # срок истёк в очереди
+        self.rate_limited = 0
+        self.max_wait = 0.0
+
+    # ----- token bucket -----
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _token_delay(self, now: float) -> float:
+        """Через сколько секунд можно выдать следующий слот по частоте"""
+        delay = max(0.0, self._paused_until - now)
+        if self._tokens < 1:
+            delay = max(delay, (1 - self._tokens) / self.rate)
+        return delay
+
+    def expected_wait(self, priority: int) -> float:
+        """Оценка ожидания нового запроса с приоритетом priority"""
+        now = self._clock()
+        self._refill(now)
+        ahead = sum(1 for p, _, w in self._queue if p <= priority and not w.cancelled)
+        # Частота: впереди ahead запросов, у каждого — по токену
+        tokens_needed = ahead + 1 - self._tokens
+        by_rate = max(0.0, self._paused_until - now) + max(0.0, tokens_needed / self.rate)
+        # Параллельность: свободные слоты разбирают те, кто впереди, дальше — волнами по latency
+        waiting_for_slot = ahead + 1 - (self.concurrency - self.in_flight)
+        by_slots = math.ceil(waiting_for_slot / self.concurrency) * self.latency if waiting_for_slot > 0 else 0.0
+        return max(by_rate, by_slots)
+
+    # ----- очередь -----
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = self._clock()
+        self._refill(now)
+        while self._queue and self.in_flight < self.concurrency:
+            _, _, waiter = self._queue[0]
+            if waiter.cancelled or waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            delay = self._token_delay(now)
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self._tokens -= 1
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+    async def acquire(self, priority: int = INTERACTIVE, deadline: Optional[float] = None):
+        """Ждёт слот; LLMOverloaded — слот не достанется до deadline (time.monotonic())"""
+        started = self._clock()
+        if deadline is not None and self.expected_wait(priority) > deadline - started:
+            self.rejected += 1
+            raise LLMOverloaded(f"expected wait for LLM slot exceeds deadline ({deadline - started:.1f}s left)")
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._dispatch()
+        try:
+            if deadline is None:
+                await waiter.future
+            else:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max(0.0, deadline - self._clock()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            waiter.cancelled = True
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот выдан в тот же момент — возвращаем его
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.expired += 1
+                raise LLMOverloaded("deadline expired while waiting for LLM slot") from None
+            raise
+        self.admitted += 1
+        self.max_wait = max(self.max_wait, self._clock() - started)
+
+    def release(self, latency: Optional[float] = None):
+        self.in_flight -= 1
+        if latency is not None:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, deadline: Optional[float] = None):
+        await self.acquire(priority, deadline)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.release(self._clock() - started)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """API ответил 429: пауза в выдаче слотов"""
+        self.rate_limited += 1
+        now = self._clock()
+        self._paused_until = max(self._paused_until, now + (retry_after or LLM_RATE_LIMIT_PAUSE))
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+
+    def stats(self) -> Dict:
+        queued: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, waiter in self._queue:
+            if not waiter.cancelled and not waiter.future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued[name] = queued.get(name, 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "burst": self.burst,
+            "in_flight": self.in_flight,
+            "queued": queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "rate_limited": self.rate_limited,
+            "latency_ms": round(self.latency * 1000, 1),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
@@ -1,8 +1,18 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import router, admin_router, users_router
+from app.api import (
+    router, admin_router, users_router, session_store, db_breaker, score_distribution, answer_index,
+    question_catalog, draft_buffer, llm_client, ai_question_pool,
+)
 from app.db_models import create_tables, Base, engine
+from app.session_expiry import SessionPurgeJob, SESSION_PURGE_ENABLED
+from app.score_distribution import ScoreDistributionSaver
+from app.answer_similarity import MinHashIndexSaver
+from app.question_catalog import QuestionCatalogReloader
+from app.answer_drafts import DraftFlusher
+from app.ai_question_pool import AIQuestionProducer
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 
 # Настройка логирования
@@ -22,6 +32,59 @@ async def startup_event():
         logger.error(f"Error creating database tables: {e}")
         raise
 
+    # Запускаем фоновые задачи хранилища сессий (write-behind запись, очистка кэша)
+    app.state.session_store_task = asyncio.create_task(session_store.run())
+
+    # Периодическая очистка просроченных сессий; пока база недоступна — пропускаем
+    if SESSION_PURGE_ENABLED:
+        app.state.session_purge = SessionPurgeJob(should_run=lambda: db_breaker.closed)
+        app.state.session_purge_task = asyncio.create_task(app.state.session_purge.run())
+
+    # Распределение баллов для перцентиля: загрузка сохранённого в фоне (перестраивает по базе
+    # один процесс, получивший аренду), затем периодическое сохранение. Старт их не ждёт
+    app.state.score_saver = ScoreDistributionSaver(score_distribution, question_catalog,
+                                                   should_run=lambda: db_breaker.closed)
+    app.state.score_saver_task = asyncio.create_task(app.state.score_saver.run())
+
+    # Индекс похожих ответов: то же — загрузка или перестроение, затем запись новых сигнатур
+    app.state.answer_index_saver = MinHashIndexSaver(answer_index, should_run=lambda: db_breaker.closed)
+    app.state.answer_index_saver_task = asyncio.create_task(app.state.answer_index_saver.run())
+
+    # Банки вопросов: перечитываются при изменении файлов (в каждом процессе)
+    app.state.question_reloader = QuestionCatalogReloader(question_catalog)
+    app.state.question_reloader_task = asyncio.create_task(app.state.question_reloader.run())
+
+    # Черновики автосохранения тестов: запись после паузы, при остановке — всех
+    app.state.draft_flusher = DraftFlusher(draft_buffer, should_run=lambda: db_breaker.closed)
+    app.state.draft_flusher_task = asyncio.create_task(app.state.draft_flusher.run())
+
+    # Пул соединений к OpenAI на всё время работы процесса
+    await llm_client.start()
+
+    # Пул готовых вопросов ИИ: пополняется в фоне, пока задан ключ OpenAI
+    app.state.ai_question_producer = AIQuestionProducer(ai_question_pool, should_run=lambda: llm_client.enabled)
+    app.state.ai_question_producer_task = asyncio.create_task(app.state.ai_question_producer.run())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Flushing pending sessions to database...")
+    session_store.stop()
+    db_breaker.stop()
+    session_purge = getattr(app.state, "session_purge", None)
+    if session_purge:
+        session_purge.stop()
+        await app.state.session_purge_task
+    for name in ("score_saver", "answer_index_saver", "question_reloader", "draft_flusher",
+                 "ai_question_producer"):
+        saver = getattr(app.state, name, None)
+        if saver:
+            saver.stop()
+            await getattr(app.state, f"{name}_task")
+    store_task = getattr(app.state, "session_store_task", None)
+    if store_task:
+        await store_task
+    await llm_client.aclose()
+
 # Настройка CORS для разрешения запросов с фронтенда
 origins = [
     "https://aeon-messenger.vercel.app",
@@ -0,0 +1,138 @@
+"""Неизменяемый банк вопросов интервью с индексами.
+
+QuestionBank строится при загрузке файла банка (app.question_catalog) и даёт за O(1):
+вопрос по id, его порядковый номер, принадлежность типу (technical / soft)
+ключевые слова и готовый анализатор ответов (app.answer_quality.score_answer
+и session_quality оценивают через analyzer()). Вопрос ведёт себя как прежний
+dict (q["id"], q.get("keywords")), но изменить его нельзя.
+"""
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Mapping, Optional, Tuple
+
+from app.answer_quality import AnswerAnalyzer, compile_analyzer
+
+
+class BankQuestion:
+    """Вопрос банка: id, текст, тип, ключевые слова (в нижнем регистре) и анализатор ответов"""
+
+    __slots__ = ("id", "text", "type", "keywords", "ordinal", "analyzer")
+
+    def __init__(self, question: Mapping[str, Any], ordinal: int, language: str = "ru"):
+        keywords = tuple(keyword.lower() for keyword in question.get("keywords") or ())
+        for name, value in (
+            ("id", question["id"]),
+            ("text", question.get("text", "")),
+            ("type", question.get("type", "soft")),
+            ("keywords", keywords),
+            ("ordinal", ordinal),
+            ("analyzer", compile_analyzer(keywords, language)),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BankQuestion is immutable")
+
+    # Доступ как к dict вопроса из файла банка
+    def __getitem__(self, key: str):
+        if key not in ("id", "text", "type", "keywords"):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "text": self.text, "type": self.type, "keywords": list(self.keywords)}
+
+    def __repr__(self) -> str:
+        return f"BankQuestion(id={self.id!r}, type={self.type!r}, ordinal={self.ordinal})"
+
+
+class QuestionBank:
+    """Упорядоченный набор вопросов с индексами по id и по типу"""
+
+    __slots__ = ("_questions", "_by_id", "_by_type", "_keywords",
+                 "version", "position", "language", "title", "context")
+
+    def __init__(self, questions: Iterable[Mapping[str, Any]] = (), version: Optional[str] = None,
+                 position: str = "general", language: str = "ru", title: str = "", context: str = ""):
+        items = tuple(BankQuestion(q, ordinal, language) for ordinal, q in enumerate(questions))
+        by_id: Dict[str, BankQuestion] = {}
+        by_type: Dict[str, set] = {}
+        for question in items:
+            if question.id in by_id:
+                raise ValueError(f"Duplicate question id: {question.id!r}")
+            by_id[question.id] = question
+            by_type.setdefault(question.type, set()).add(question.id)
+        self._questions: Tuple[BankQuestion, ...] = items
+        self._by_id = MappingProxyType(by_id)
+        self._by_type: Mapping[str, FrozenSet[str]] = MappingProxyType(
+            {question_type: frozenset(ids) for question_type, ids in by_type.items()})
+        self._keywords = MappingProxyType({q.id: q.keywords for q in items})
+        # Версия файла, из которого построен банк (сессия закрепляет её при старте)
+        self.version = version
+        self.position = position
+        self.language = language
+        self.title = title
+        self.context = context
+
+    # ----- последовательность -----
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def __iter__(self) -> Iterator[BankQuestion]:
+        return iter(self._questions)
+
+    def __getitem__(self, index):
+        """По порядковому номеру (или срезу), как у прежнего списка"""
+        return self._questions[index]
+
+    def __contains__(self, question_id) -> bool:
+        return question_id in self._by_id
+
+    # ----- индексы -----
+
+    def get(self, question_id) -> Optional[BankQuestion]:
+        return self._by_id.get(question_id)
+
+    def ordinal(self, question_id) -> Optional[int]:
+        question = self._by_id.get(question_id)
+        return question.ordinal if question is not None else None
+
+    def ids(self) -> Tuple[str, ...]:
+        return tuple(q.id for q in self._questions)
+
+    def ids_of_type(self, question_type: str) -> FrozenSet[str]:
+        return self._by_type.get(question_type, frozenset())
+
+    def count_of_type(self, question_ids: Iterable[str], question_type: str) -> int:
+        """Сколько из question_ids — вопросы банка типа question_type"""
+        of_type = self.ids_of_type(question_type)
+        return sum(1 for question_id in question_ids if question_id in of_type)
+
+    @property
+    def keywords(self) -> Mapping[str, Tuple[str, ...]]:
+        """id -> ключевые слова"""
+        return self._keywords
+
+    def analyzer(self, question_id) -> Optional[AnswerAnalyzer]:
+        """Анализатор ответов на вопрос (строится один раз при загрузке банка)"""
+        question = self._by_id.get(question_id)
+        return question.analyzer if question is not None else None
+
+    def __reduce__(self):
+        # В процессы-воркеры (app.rescore) банк передаётся исходными вопросами и собирается заново
+        return (QuestionBank, ([q.as_dict() for q in self._questions], self.version,
+                               self.position, self.language, self.title, self.context))
+
+    @property
+    def cohort(self) -> str:
+        """Позиция и язык банка ("general.ru"): баллы, перцентили и похожие ответы — внутри когорты"""
+        return f"{self.position}.{self.language}"
+
+    def __repr__(self) -> str:
+        return f"QuestionBank({len(self)} questions, version={self.version!r})"
@@ -0,0 +1,343 @@
+"""Банки вопросов из файлов данных с атомарной перезагрузкой.
+
+Вопросы интервью AEON и тесты с вариантами ответов лежат в JSON-файлах
+каталога QUESTION_BANK_DIR (по умолчанию backend-hr/data/questions):
+
+  <position>.<language>.json  — банк интервью: {"kind": "interview", "version": 1,
+                                 "position", "language", "title", "context", "questions": [...]}
+  test-<id>.<language>.json   — тест: {"kind": "test", "version": 1, "id", "language", "title",
+                                 "questions": [{"id", "text", "answers": [...], "correct_answer_id"}]}
+
+При загрузке каждый банк компилируется в неизменяемый QuestionBank (с
+индексами и анализаторами ответов), тест — в CompiledTest (модель Test и
+ключ ответов, app.graded_tests). Все файлы каталога образуют снимок;
+перезагрузка (reload) строит новый снимок целиком и подменяет прежний
+одним присваиванием, поэтому запрос видит либо старые банки, либо новые.
+Если хоть один файл не разобрался, остаётся прежний снимок.
+
+Версия банка — "<position>.<language>@<version>+<хэш содержимого>".
+Сессия закрепляет версию при создании и до конца отвечает на вопросы
+того же банка (pinned), так что анализаторы ответов не меняются посреди
+интервью. Каждая загруженная версия публикуется в каталог
+QUESTION_BANK_VERSIONS_DIR файлом "<версия>.json" (с уже подставленным
+контекстом), общий для всех процессов: версию, которой нет в памяти
+(процесс её ещё не загружал, перезапустился или вытеснил), pinned читает
+оттуда. В памяти — не больше QUESTION_BANK_CACHED_VERSIONS давно не
+нужных версий (LRU) сверх текущих банков. Только версии, которой нет
+нигде, получают текущий банк той же позиции и языка.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple
+
+from app.models import Test
+from app.question_bank import QuestionBank
+from app.session_state import QuestionCodes, question_codes, register_bank_codes
+from app.graded_tests import CompiledTest
+
+QUESTION_BANK_DIR = os.getenv(
+    "QUESTION_BANK_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "questions"))
+QUESTION_BANK_RELOAD_INTERVAL = float(os.getenv("QUESTION_BANK_RELOAD_INTERVAL", "30"))
+QUESTION_BANK_VERSIONS_DIR = os.getenv("QUESTION_BANK_VERSIONS_DIR", "question-bank-versions")
+QUESTION_BANK_CACHED_VERSIONS = int(os.getenv("QUESTION_BANK_CACHED_VERSIONS", "64"))
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "ru")
+DEFAULT_POSITION = "general"
+
+
+class CatalogSnapshot(NamedTuple):
+    """Банки и тесты, построенные из одного состояния каталога"""
+    banks: Mapping[Tuple[str, str], QuestionBank]   # (position, language) -> банк
+    tests: Mapping[Tuple[int, str], CompiledTest]   # (id теста, language) -> тест
+    signature: Tuple                                # (имя, mtime_ns, размер) файлов
+
+
+def bank_version(position: str, language: str, version, content: bytes) -> str:
+    return f"{position}.{language}@{version}+{hashlib.sha1(content).hexdigest()[:8]}"
+
+
+def _key_of_version(version: str) -> Optional[Tuple[str, str]]:
+    position, _, language = version.partition("@")[0].rpartition(".")
+    return (position, language) if position and language else None
+
+
+class QuestionCatalog:
+    """Текущие банки вопросов и тесты из каталога файлов"""
+
+    def __init__(self, directory: str = QUESTION_BANK_DIR, default_language: str = DEFAULT_LANGUAGE,
+                 versions_dir: str = QUESTION_BANK_VERSIONS_DIR,
+                 cached_versions: int = QUESTION_BANK_CACHED_VERSIONS):
+        self.directory = directory
+        self.default_language = default_language
+        self.versions_dir = versions_dir
+        self.cached_versions = cached_versions
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # Недавно нужные версии банков (LRU); остальные читаются из versions_dir
+        self._versions: "OrderedDict[str, QuestionBank]" = OrderedDict()
+        # Таблицы кодов вопросов этих версий (app.session_state.bank_codes): каталог их держит
+        self._codes: Dict[str, QuestionCodes] = {}
+        self._versions_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload: Optional[str] = None
+
+    # ----- загрузка -----
+
+    def _signature(self) -> Tuple:
+        entries = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def _compile(self, signature: Tuple) -> CatalogSnapshot:
+        interviews: Dict[Tuple[str, str], Tuple[str, Dict, bytes]] = {}
+        tests: Dict[Tuple[int, str], CompiledTest] = {}
+        for name, _, _ in signature:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                content = f.read()
+            try:
+                data = json.loads(content)
+                language = data["language"]
+                if data.get("kind", "interview") == "test":
+                    version = bank_version(f"test-{data['id']}", language, data["version"], content)
+                    tests[(int(data["id"]), language)] = CompiledTest(data, language, version)
+                    continue
+                position = data.get("position", DEFAULT_POSITION)
+                if (position, language) in interviews:
+                    raise ValueError(f"second bank for {position}.{language}")
+                interviews[(position, language)] = (name, data, content)
+            except Exception as e:
+                raise ValueError(f"{name}: {e}") from e
+        if not any(language == self.default_language for _, language in interviews):
+            raise ValueError(f"no question bank for default language {self.default_language!r}")
+        banks: Dict[Tuple[str, str], QuestionBank] = {}
+        for (position, language), (name, data, content) in interviews.items():
+            # Контекст для ИИ один на позицию: у переводов без своего берётся из основного языка
+            context = data.get("context", "")
+            default = interviews.get((position, self.default_language))
+            if not context and default is not None:
+                context = default[1].get("context", "")
+            version = bank_version(position, language, data["version"], content)
+            cached = self._versions.get(version)
+            if cached is not None and cached.context == context:
+                banks[(position, language)] = cached
+                continue
+            data = dict(data, position=position, language=language, context=context)
+            try:
+                banks[(position, language)] = _compile_bank(version, data)
+            except Exception as e:
+                raise ValueError(f"{name}: {e}") from e
+            self._publish(version, data)
+        return CatalogSnapshot(banks, tests, signature)
+
+    def _version_path(self, version: str) -> Optional[str]:
+        # Версия приходит из строки сессии: только имя файла внутри versions_dir
+        if not version or version.startswith(".") or os.path.basename(version) != version:
+            return None
+        return os.path.join(self.versions_dir, f"{version}.json")
+
+    def _publish(self, version: str, data: Dict):
+        """Записывает версию банка в versions_dir (атомарно: временный файл и rename)"""
+        path = self._version_path(version)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.versions_dir, exist_ok=True)
+            content = json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    if f.read() == content:
+                        return
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(content)
+            os.replace(temporary, path)
+        except OSError as e:
+            # Версия остаётся доступной этому процессу; другим — после их собственной загрузки
+            print(f"WARNING: Could not publish question bank {version}: {e}")
+
+    def _load_version(self, version: str) -> Optional[QuestionBank]:
+        """Версия банка из versions_dir; None, если её там нет или файл не читается"""
+        path = self._version_path(version)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                bank = _compile_bank(version, json.loads(f.read()))
+        except Exception as e:
+            print(f"ERROR: Could not load question bank {version}: {e}")
+            return None
+        return self._remember(bank)
+
+    def _remember(self, bank: QuestionBank, keep=()) -> QuestionBank:
+        """Кладёт версию в LRU (с таблицей кодов) и вытесняет давно не нужные, кроме keep"""
+        codes = register_bank_codes(bank.version, bank.ids())
+        with self._versions_lock:
+            self._versions[bank.version] = bank
+            self._versions.move_to_end(bank.version)
+            self._codes[bank.version] = codes
+            self._evict(*keep)
+        return bank
+
+    def _evict(self, *keep: str):
+        """Вытесняет давно не нужные версии сверх cached_versions (под _versions_lock)"""
+        # Текущие банки держит снимок: в лимит считаются только прежние версии
+        keep = set(keep)
+        if self._snapshot is not None:
+            keep.update(bank.version for bank in self._snapshot.banks.values())
+        evictable = [version for version in self._versions if version not in keep]
+        for version in evictable[:max(0, len(evictable) - self.cached_versions)]:
+            del self._versions[version]
+            self._codes.pop(version, None)
+
+    def load(self) -> "QuestionCatalog":
+        """Первая загрузка; ошибка в файлах — исключение (без банков приложение не работает)"""
+        with self._reload_lock:
+            self._install(self._compile(self._signature()))
+        return self
+
+    def reload(self) -> bool:
+        """Перечитывает каталог, если файлы изменились; True — подставлен новый снимок"""
+        with self._reload_lock:
+            try:
+                signature = self._signature()
+                if self._snapshot is not None and signature == self._snapshot.signature:
+                    return False
+                snapshot = self._compile(signature)
+            except Exception as e:
+                self.failures += 1
+                print(f"ERROR: Question bank reload failed, keeping current banks: {e}")
+                return False
+            self._install(snapshot)
+            self.reloads += 1
+            print(f"DEBUG: Question banks reloaded: {', '.join(self.versions())}")
+            return True
+
+    def _install(self, snapshot: CatalogSnapshot):
+        incoming = [bank.version for bank in snapshot.banks.values()]
+        for bank in snapshot.banks.values():
+            # Коды до подмены снимка: сессии хранят вопросы по кодам таблицы своего банка,
+            # сессии без версии банка — по кодам общего реестра
+            question_codes.register(bank.ids())
+            # Та же версия с другим заимствованным контекстом заменяет прежнюю
+            self._remember(bank, keep=incoming)
+        with self._versions_lock:
+            self._snapshot = snapshot
+            self._evict()
+        self.last_reload = datetime.now(timezone.utc).isoformat()
+
+    # ----- доступ -----
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        if self._snapshot is None:
+            raise RuntimeError("QuestionCatalog is not loaded")
+        return self._snapshot
+
+    def bank(self, language: Optional[str] = None, position: str = DEFAULT_POSITION) -> QuestionBank:
+        """Текущий банк позиции на языке (нет такого языка — на языке по умолчанию)"""
+        banks = self.snapshot.banks
+        bank = banks.get((position, language or self.default_language))
+        if bank is None:
+            bank = banks.get((position, self.default_language)) or banks[(DEFAULT_POSITION, self.default_language)]
+        return bank
+
+    def pinned(self, version: Optional[str]) -> QuestionBank:
+        """Банк, закреплённый за сессией (из памяти или versions_dir);
+        версия, которой нет нигде, — текущий банк той же позиции и языка"""
+        if version is None:
+            return self.bank()
+        with self._versions_lock:
+            bank = self._versions.get(version)
+            if bank is not None:
+                self._versions.move_to_end(version)
+                return bank
+        bank = self._load_version(version)
+        if bank is not None:
+            return bank
+        key = _key_of_version(version)
+        bank = self.bank(key[1], key[0]) if key else self.bank()
+        print(f"WARNING: Question bank {version} is not published in {self.versions_dir}, using {bank.version}")
+        return bank
+
+    def compiled_test(self, test_id: int, language: Optional[str] = None) -> Optional[CompiledTest]:
+        """Тест с ключом ответов (нет такого языка — на языке по умолчанию)"""
+        tests = self.snapshot.tests
+        return tests.get((test_id, language or self.default_language)) or tests.get((test_id, self.default_language))
+
+    def test(self, test_id: int, language: Optional[str] = None) -> Optional[Test]:
+        """Тест для выдачи кандидату (без правильных ответов)"""
+        compiled = self.compiled_test(test_id, language)
+        return compiled.test if compiled is not None else None
+
+    def languages(self, position: str = DEFAULT_POSITION) -> List[str]:
+        return sorted(language for bank_position, language in self.snapshot.banks if bank_position == position)
+
+    def question_ids(self) -> FrozenSet[str]:
+        """id вопросов всех версий банков (в памяти и в versions_dir): отбор ответов в фоновых пересчётах"""
+        with self._versions_lock:
+            question_ids = {question_id for bank in self._versions.values() for question_id in bank.ids()}
+        try:
+            names = [name for name in os.listdir(self.versions_dir) if name.endswith(".json")]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            try:
+                with open(os.path.join(self.versions_dir, name), "rb") as f:
+                    question_ids.update(question["id"] for question in json.loads(f.read())["questions"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: Skipping question bank {name}: {e}")
+        return frozenset(question_ids)
+
+    def versions(self) -> List[str]:
+        return sorted(bank.version for bank in self.snapshot.banks.values())
+
+    def stats(self) -> Dict:
+        return {"directory": self.directory, "banks": self.versions(), "loaded_versions": len(self._versions),
+                "tests": len(self.snapshot.tests), "reloads": self.reloads, "failures": self.failures,
+                "last_reload": self.last_reload}
+
+
+def _compile_bank(version: str, data: Mapping) -> QuestionBank:
+    """Банк версии version из данных файла (контекст уже подставлен)"""
+    return QuestionBank(data["questions"], version=version, position=data["position"],
+                        language=data["language"], title=data.get("title", ""), context=data.get("context", ""))
+
+
+class QuestionCatalogReloader:
+    """Периодическая проверка файлов банков (asyncio-задача из app.main, в каждом процессе)"""
+
+    def __init__(self, catalog: QuestionCatalog, interval: float = QUESTION_BANK_RELOAD_INTERVAL,
+                 should_run: Callable[[], bool] = lambda: True):
+        self.catalog = catalog
+        self.interval = interval
+        self.should_run = should_run
+        self._stopped: Optional[asyncio.Event] = None
+
+    def run_once(self) -> bool:
+        if not self.should_run():
+            return False
+        return self.catalog.reload()
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        print(f"DEBUG: Question bank reloader started (interval={self.interval}s)")
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.to_thread(self.run_once)
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
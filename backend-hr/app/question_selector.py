@@ -0,0 +1,150 @@
+"""Выбор следующего вопроса интервью по качеству ответов кандидата.
+
+Следующий тип вопроса зависит от типа последнего заданного вопроса и
+уровня (low / mid / high) среднего балла ответов на вопросы этого типа:
+после сильных технических ответов — ещё технические, после слабых —
+soft, и т.д. (TRANSITIONS).
+
+Всё, что не зависит от сессии, считается один раз при создании
+QuestionSelector: для каждого типа — битовая маска его вопросов в битах
+банка (бит n — вопрос с порядковым номером n), для каждого состояния
+(тип, уровень) — кортеж масок в порядке предпочтения. На запрос заданные
+вопросы сессии (SessionState.asked_mask: биты таблицы кодов банка сессии
+или общего реестра question_codes) переводятся в биты банка — по одному
+шагу на заданный вопрос, — дальше несколько операций с масками и поиск
+младшего свободного бита: без перебора вопросов банка и сборки списков,
+сколько бы их ни было.
+Младший бит — первый в порядке банка, поэтому внутри типа вопросы
+выдаются в порядке файла банка, даже если после перезагрузки он не
+совпадает с порядком регистрации id в реестре.
+"""
+from typing import Dict, Optional, Tuple
+
+from app.question_bank import BankQuestion, QuestionBank
+from app.session_state import SessionState, bank_codes, question_codes, registry_bit, table_bit
+
+# Границы уровней по среднему баллу ответов (0-100) на вопросы одного типа
+LOW_QUALITY = 50
+HIGH_QUALITY = 75
+
+LEVELS = ("low", "mid", "high")
+
+# (тип последнего вопроса, уровень ответов этого типа) -> порядок типов для следующего вопроса.
+# Типы, которых нет в таблице, идут следом в порядке банка.
+TRANSITIONS: Dict[Tuple[str, str], Tuple[str, ...]] = {
+    ("technical", "high"): ("technical", "soft"),   # сильные технические ответы — углубляемся
+    ("technical", "mid"): ("soft", "technical"),    # чередуем
+    ("technical", "low"): ("soft", "technical"),    # слабые — даём передышку на soft
+    ("soft", "high"): ("technical", "soft"),        # уверенные soft-ответы — проверяем технику
+    ("soft", "mid"): ("technical", "soft"),
+    ("soft", "low"): ("soft", "technical"),         # раскрываем кандидата на soft-вопросах
+}
+
+
+def quality_level(score: Optional[float]) -> str:
+    """Уровень среднего балла; без ответов — mid"""
+    if score is None:
+        return "mid"
+    if score >= HIGH_QUALITY:
+        return "high"
+    if score < LOW_QUALITY:
+        return "low"
+    return "mid"
+
+
+class QuestionSelector:
+    """Таблицы выбора следующего вопроса для одного банка"""
+
+    __slots__ = ("bank", "_type_masks", "_all_mask", "_registry_mask", "_local_bits", "_codes", "_table_mask",
+                 "_tables", "_start", "_type_of")
+
+    def __init__(self, bank: QuestionBank, transitions: Dict[Tuple[str, str], Tuple[str, ...]] = TRANSITIONS):
+        self.bank = bank
+        type_masks: Dict[str, int] = {}
+        # Номер бита реестра -> бит банка
+        self._local_bits: Dict[int, int] = {}
+        self._registry_mask = 0
+        for question in bank:
+            bit = registry_bit(question.id)
+            if bit is None:
+                raise ValueError(f"Question {question.id!r} is not registered in question_codes")
+            self._registry_mask |= bit
+            self._local_bits[bit.bit_length() - 1] = 1 << question.ordinal
+            type_masks[question.type] = type_masks.get(question.type, 0) | (1 << question.ordinal)
+        bank_types = tuple(type_masks)
+        self._type_masks = type_masks
+        self._all_mask = (1 << len(bank)) - 1
+        # Таблица кодов банка (app.question_catalog): у сессий банка код вопроса — его порядковый номер
+        self._codes = bank_codes(bank.version)
+        self._table_mask = 0
+        for ordinal in range(len(bank)):
+            self._table_mask |= table_bit(ordinal)
+        self._type_of = {question.id: question.type for question in bank}
+
+        def masks_in_order(preferred: Tuple[str, ...]) -> Tuple[int, ...]:
+            order = [t for t in preferred if t in type_masks]
+            order += [t for t in bank_types if t not in order]
+            return tuple(type_masks[t] for t in order)
+
+        # Первый вопрос — того же типа, что первый вопрос банка
+        self._start = masks_in_order(bank_types)
+        self._tables: Dict[Tuple[str, str], Tuple[int, ...]] = {
+            (question_type, level): masks_in_order(transitions.get((question_type, level), (question_type,)))
+            for question_type in bank_types for level in LEVELS
+        }
+
+    def type_scores(self, session_state: SessionState) -> Dict[str, float]:
+        """Средний балл ответов по типам вопросов (только оценённые ответы на вопросы банка)"""
+        sums: Dict[str, list] = {}
+        for question_id, quality in session_state.qualities().items():
+            question_type = self._type_of.get(question_id)
+            if question_type is not None:
+                total = sums.setdefault(question_type, [0.0, 0])
+                total[0] += quality["score"]
+                total[1] += 1
+        return {question_type: total / count for question_type, (total, count) in sums.items()}
+
+    def _preferences(self, session_state: SessionState) -> Tuple[int, ...]:
+        order = session_state.question_order
+        last_type = self._type_of.get(order[-1]) if len(order) else None
+        if last_type is None:
+            return self._start
+        return self._tables[(last_type, quality_level(self.type_scores(session_state).get(last_type)))]
+
+    def asked_mask(self, session_state: SessionState) -> int:
+        """Заданные вопросы банка в битах банка"""
+        table = session_state.code_table
+        asked = 0
+        if table is self._codes:
+            bits = session_state.asked_mask & self._table_mask
+            while bits:
+                position = bits.bit_length() - 1
+                asked |= 1 << (position // 2)
+                bits ^= 1 << position
+        elif table is question_codes:
+            registry = session_state.asked_mask & self._registry_mask
+            while registry:
+                position = registry.bit_length() - 1
+                asked |= self._local_bits[position]
+                registry ^= 1 << position
+        else:
+            # Сессия другой версии банка: по id
+            for question_id in session_state.asked_questions:
+                ordinal = self.bank.ordinal(question_id)
+                if ordinal is not None:
+                    asked |= 1 << ordinal
+        return asked
+
+    def next_question(self, session_state: SessionState) -> Optional[BankQuestion]:
+        """Следующий незаданный вопрос банка или None, если заданы все"""
+        free = self._all_mask & ~self.asked_mask(session_state)
+        if not free:
+            return None
+        for mask in self._preferences(session_state):
+            available = mask & free
+            if available:
+                return self.bank[(available & -available).bit_length() - 1]
+        return None
+
+    def remaining(self, session_state: SessionState) -> int:
+        return bin(self._all_mask & ~self.asked_mask(session_state)).count("1")
@@ -0,0 +1,140 @@
+"""Минимальный синхронный клиент протокола Redis (RESP2).
+
+Поддерживает только команды, нужные хранилищу сессий, и работает с
+любым сервером, говорящим на RESP (Redis, KeyDB, Valkey, тестовая
+заглушка). Соединения переиспользуются через небольшой пул.
+"""
+import queue
+import socket
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+
+class RedisError(Exception):
+    """Ошибка, возвращённая сервером (-ERR ...) или нарушение протокола"""
+
+
+def _encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class _Connection:
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+    def execute(self, *args) -> Any:
+        self.sock.sendall(_encode_command(*args))
+        return self._read_reply()
+
+    def _read_line(self) -> bytes:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        return line[:-2]
+
+    def _read_reply(self) -> Any:
+        line = self._read_line()
+        kind, payload = line[:1], line[1:]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply type: {line!r}")
+
+
+class RedisClient:
+    """Клиент с пулом соединений, безопасный для вызова из нескольких потоков"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0",
+                 timeout: float = 2.0, pool_size: int = 10):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[_Connection]" = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self) -> _Connection:
+        conn = _Connection(self.host, self.port, self.timeout)
+        if self.password:
+            conn.execute("AUTH", self.password)
+        if self.db:
+            conn.execute("SELECT", self.db)
+        return conn
+
+    def execute(self, *args) -> Any:
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            reply = conn.execute(*args)
+        except (OSError, ConnectionError):
+            # Соединение из пула могло умереть — одна попытка с новым
+            conn.close()
+            conn = self._connect()
+            reply = conn.execute(*args)
+        except RedisError:
+            self._release(conn)
+            raise
+        self._release(conn)
+        return reply
+
+    def _release(self, conn: _Connection):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # ----- команды -----
+
+    def ping(self) -> bool:
+        return self.execute("PING") == "PONG"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def set(self, key: str, value, ex: Optional[int] = None) -> bool:
+        if ex:
+            return self.execute("SET", key, value, "EX", int(ex)) == "OK"
+        return self.execute("SET", key, value) == "OK"
+
+    def delete(self, key: str) -> int:
+        return self.execute("DEL", key)
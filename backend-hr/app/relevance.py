@@ -0,0 +1,381 @@
+"""Близость ответа к эталонным ответам на вопрос (TF-IDF, без обращения к LLM).
+
+Модель строится заранее (build) по эталонным ответам на вопросы банка:
+признаки ответа — униграммы и биграммы основ слов (первые
+RELEVANCE_STEM_LENGTH букв), хэшированные в RELEVANCE_DIMENSIONS корзин;
+вес признака — (1 + log tf) * idf, вектор нормирован. Для каждого вопроса
+хранится центроид его эталонных ответов (разреженная строка CSR) и
+масштаб — средняя косинусная близость эталона к центроиду остальных.
+
+Модель — каталог .npy-файлов, которые открываются через np.load(mmap_mode="r"):
+процессы gunicorn и воркеры app.rescore делят одни страницы файла, а
+загрузка не зависит от размера модели. Опубликованные файлы не
+перезаписываются — усечение файла под отображением роняет читающий процесс
+(SIGBUS): save пишет модель в новый каталог-версию рядом и атомарно
+переключает на него символическую ссылку.
+
+Модель строится для одного банка вопросов — когорты "<position>.<language>"
+(у банков на разных языках одинаковые id вопросов, но свои эталоны и
+словарь) и лежит в RELEVANCE_MODEL_DIR/<когорта>; ответ сессии оценивается
+моделью её банка (load_relevance_models).
+
+Оценка ответа — скалярное произведение разреженных векторов ответа и
+центроида его вопроса (score_batch считает сразу пачку ответов),
+делённое на масштаб вопроса и ограниченное сверху единицей: ответ,
+близкий к эталонам так же, как они друг к другу, получает 1.0.
+
+Запуск (из каталога backend-hr):
+  python -m app.relevance build --references data/reference_answers.json
+  python -m app.relevance build --references data/reference_answers.json --from-db --min-score 70
+  python -m app.relevance build --bank general.en --references reference_answers.en.json
+  python -m app.relevance score q_1 "Пять лет разрабатываю сервисы на Python..."
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.question_catalog import DEFAULT_LANGUAGE, DEFAULT_POSITION
+
+RELEVANCE_MODEL_DIR = os.getenv("RELEVANCE_MODEL_DIR", "relevance-model")
+RELEVANCE_DIMENSIONS = int(os.getenv("RELEVANCE_DIMENSIONS", str(2 ** 18)))
+RELEVANCE_STEM_LENGTH = 5
+RELEVANCE_CHUNK_SIZE = int(os.getenv("RELEVANCE_CHUNK_SIZE", "2000"))
+
+MODEL_VERSION = 2
+# Банк, для которого строится модель по умолчанию
+DEFAULT_COHORT = f"{DEFAULT_POSITION}.{DEFAULT_LANGUAGE}"
+
+_WORD = re.compile(r"\w+")
+
+
+def _stems(text: str) -> List[str]:
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    return [word[:RELEVANCE_STEM_LENGTH] for word in words if len(word) > 2 and not word.isdigit()]
+
+
+def feature_hashes(text: str, dimensions: int = RELEVANCE_DIMENSIONS) -> np.ndarray:
+    """Номера корзин униграмм и биграмм основ слов (с повторами)"""
+    stems = _stems(text)
+    grams = stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+    return np.fromiter((zlib.crc32(gram.encode()) % dimensions for gram in grams),
+                       dtype=np.int64, count=len(grams))
+
+
+def _term_counts(text: str, dimensions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Отсортированные номера признаков и их частоты в тексте"""
+    return np.unique(feature_hashes(text, dimensions), return_counts=True)
+
+
+def _normalized(indices: np.ndarray, counts: np.ndarray, idf) -> np.ndarray:
+    values = (1 + np.log(counts)) * idf[indices]
+    norm = np.sqrt(np.dot(values, values))
+    return values / norm if norm else values
+
+
+def _sparse_dot(indices: np.ndarray, values: np.ndarray,
+                row_indices: np.ndarray, row_data: np.ndarray) -> np.ndarray:
+    """Поэлементные произведения совпавших признаков (row_indices отсортированы)"""
+    if not len(row_indices) or not len(indices):
+        return np.zeros(len(indices), dtype=np.float64)
+    positions = np.searchsorted(row_indices, indices)
+    positions[positions == len(row_indices)] = 0
+    matched = row_indices[positions] == indices
+    return np.where(matched, values * row_data[positions], 0.0)
+
+
+def _leave_one_out(centroid: np.ndarray, indices: np.ndarray, values: np.ndarray) -> float:
+    """Близость эталона к центроиду остальных эталонов вопроса.
+
+    Собственный вклад исключается: иначе масштаб завышен и новые хорошие
+    ответы получали бы заметно меньше единицы.
+    """
+    others = centroid.copy()
+    others[indices] -= values
+    norm = np.sqrt(np.dot(others, others))
+    return float(np.dot(others[indices], values) / norm) if norm else 0.0
+
+
+class RelevanceModel:
+    """IDF признаков и центроиды эталонных ответов по вопросам одного банка"""
+
+    def __init__(self, question_ids: Sequence[str], idf: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray, data: np.ndarray, scale: np.ndarray,
+                 dimensions: int = RELEVANCE_DIMENSIONS, documents: int = 0, path: Optional[str] = None,
+                 cohort: str = DEFAULT_COHORT):
+        self.question_ids = list(question_ids)
+        self.cohort = cohort
+        self._rows = {question_id: n for n, question_id in enumerate(self.question_ids)}
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.scale = scale
+        self.dimensions = dimensions
+        self.documents = documents
+        self.path = path
+
+    def __contains__(self, question_id: str) -> bool:
+        return question_id in self._rows
+
+    # ----- построение -----
+
+    @classmethod
+    def build(cls, references: Mapping[str, Sequence[str]], documents: Iterable[str] = (),
+              dimensions: int = RELEVANCE_DIMENSIONS, cohort: str = DEFAULT_COHORT) -> "RelevanceModel":
+        """Строит модель по эталонным ответам; documents — дополнительные тексты только для IDF"""
+        question_ids = [question_id for question_id, texts in references.items() if texts]
+        counted = {question_id: [_term_counts(text, dimensions) for text in references[question_id]]
+                   for question_id in question_ids}
+
+        document_frequency = np.zeros(dimensions, dtype=np.int64)
+        total = 0
+        for per_question in counted.values():
+            for indices, _ in per_question:
+                document_frequency[indices] += 1
+                total += 1
+        for text in documents:
+            document_frequency[np.unique(feature_hashes(text, dimensions))] += 1
+            total += 1
+        idf = (np.log((1 + total) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        indptr, indices, data, scale = [0], [], [], []
+        for question_id in question_ids:
+            centroid = np.zeros(dimensions, dtype=np.float64)
+            vectors = []
+            for term_indices, counts in counted[question_id]:
+                values = _normalized(term_indices, counts, idf)
+                centroid[term_indices] += values
+                vectors.append((term_indices, values))
+            nonzero = np.flatnonzero(centroid)
+            values = centroid[nonzero] / np.sqrt(np.dot(centroid[nonzero], centroid[nonzero]))
+            similarities = [_leave_one_out(centroid, term_indices, term_values)
+                            for term_indices, term_values in vectors] if len(vectors) > 1 else [1.0]
+            indptr.append(indptr[-1] + len(nonzero))
+            indices.append(nonzero)
+            data.append(values)
+            scale.append(max(float(np.mean(similarities)), 1e-6))
+
+        return cls(question_ids, idf,
+                   np.asarray(indptr, dtype=np.int64),
+                   np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32),
+                   np.concatenate(data).astype(np.float32) if data else np.zeros(0, dtype=np.float32),
+                   np.asarray(scale, dtype=np.float32), dimensions, total, cohort=cohort)
+
+    # ----- хранение -----
+
+    def save(self, path: str = RELEVANCE_MODEL_DIR):
+        """Публикует модель по пути path — символической ссылке на новый каталог-версию.
+
+        Файлы прежней версии не трогаются: их держат в mmap работающие
+        процессы. Хранятся текущая и предыдущая версии.
+        """
+        parent, name = os.path.split(os.path.normpath(path))
+        parent = parent or "."
+        os.makedirs(parent, exist_ok=True)
+        version = f".{name}.{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        directory = os.path.join(parent, version)
+        os.makedirs(directory)
+        for array_name in ("idf", "indptr", "indices", "data", "scale"):
+            np.save(os.path.join(directory, f"{array_name}.npy"), np.asarray(getattr(self, array_name)))
+        meta = {"version": MODEL_VERSION, "bank": self.cohort, "question_ids": self.question_ids,
+                "dimensions": self.dimensions, "stem_length": RELEVANCE_STEM_LENGTH, "documents": self.documents}
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        previous = os.readlink(path) if os.path.islink(path) else None
+        if previous is None and os.path.isdir(path):
+            # Модель прежнего формата — каталог на месте ссылки: становится версией
+            previous = f".{name}.legacy-{uuid.uuid4().hex[:6]}"
+            os.rename(path, os.path.join(parent, previous))
+        link = os.path.join(parent, f".{name}.link-{uuid.uuid4().hex[:6]}")
+        os.symlink(version, link)
+        os.replace(link, path)
+        _prune_versions(parent, name, keep={version, previous})
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str = RELEVANCE_MODEL_DIR) -> "RelevanceModel":
+        # Все файлы — из одной версии, даже если ссылку переключат во время загрузки
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != MODEL_VERSION or meta.get("stem_length") != RELEVANCE_STEM_LENGTH:
+            raise ValueError(f"relevance model in {path} was built by another version; rebuild it")
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                  for name in ("idf", "indptr", "indices", "data", "scale")}
+        return cls(meta["question_ids"], dimensions=meta["dimensions"], documents=meta["documents"],
+                   path=path, cohort=meta["bank"], **arrays)
+
+    # ----- оценка -----
+
+    def vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Разреженный нормированный вектор ответа: (номера признаков, веса)"""
+        indices, counts = _term_counts(text, self.dimensions)
+        return indices, _normalized(indices, counts, self.idf)
+
+    def score_batch(self, question_ids: Sequence[str], texts: Sequence[str]) -> np.ndarray:
+        """Близость 0..1 для пачки ответов; NaN — вопроса нет в модели.
+
+        Признаки всех ответов на один вопрос склеиваются и сравниваются с
+        центроидом одним searchsorted; суммы по ответам — через bincount.
+        """
+        result = np.full(len(texts), np.nan, dtype=np.float64)
+        by_question: Dict[int, List[int]] = {}
+        for n, question_id in enumerate(question_ids):
+            row = self._rows.get(question_id)
+            if row is not None:
+                by_question.setdefault(row, []).append(n)
+
+        for row, positions in by_question.items():
+            vectors = [self.vectorize(texts[n]) for n in positions]
+            owners = np.repeat(np.arange(len(positions)), [len(indices) for indices, _ in vectors])
+            indices = np.concatenate([indices for indices, _ in vectors])
+            values = np.concatenate([values for _, values in vectors])
+            start, end = int(self.indptr[row]), int(self.indptr[row + 1])
+            products = _sparse_dot(indices, values, self.indices[start:end], self.data[start:end])
+            cosines = np.bincount(owners, weights=products, minlength=len(positions))
+            result[positions] = np.minimum(1.0, np.maximum(0.0, cosines / float(self.scale[row])))
+        return result
+
+    def score(self, question_id: str, text: str) -> Optional[float]:
+        """Близость ответа к эталонам вопроса (0..1); None — вопроса нет в модели"""
+        if question_id not in self._rows:
+            return None
+        return round(float(self.score_batch([question_id], [text])[0]), 3)
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "bank": self.cohort, "questions": len(self.question_ids),
+                "dimensions": self.dimensions,
+                "features": int(self.indptr[-1]), "documents": self.documents}
+
+
+def _prune_versions(parent: str, name: str, keep):
+    """Удаляет старые каталоги-версии модели name (отображённые в память файлы остаются доступны)"""
+    prefix = f".{name}."
+    for entry in os.listdir(parent):
+        if entry.startswith(prefix) and entry not in keep:
+            target = os.path.join(parent, entry)
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target, ignore_errors=True)
+
+
+def load_relevance_model(path: str = RELEVANCE_MODEL_DIR) -> Optional[RelevanceModel]:
+    """Модель из каталога или None, если она не построена (оценка тогда без relevance)"""
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        print(f"DEBUG: Relevance model not found in {path}; scoring without relevance")
+        return None
+    try:
+        model = RelevanceModel.load(path)
+    except Exception as e:
+        print(f"ERROR: Failed to load relevance model from {path}: {e}")
+        return None
+    print(f"DEBUG: Relevance model loaded from {path} ({model.cohort}, {len(model.question_ids)} questions)")
+    return model
+
+
+def load_relevance_models(path: str = RELEVANCE_MODEL_DIR) -> Dict[str, RelevanceModel]:
+    """Модели из подкаталогов path по банкам: {"general.ru": модель, ...}; пусто, если не построены"""
+    models: Dict[str, RelevanceModel] = {}
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.startswith("."):
+                continue  # каталоги-версии: модель доступна по ссылке <когорта>
+            directory = os.path.join(path, name)
+            if os.path.exists(os.path.join(directory, "meta.json")):
+                model = load_relevance_model(directory)
+                if model is not None:
+                    models[model.cohort] = model
+    if not models:
+        print(f"DEBUG: No relevance models in {path}; scoring without relevance")
+    return models
+
+
+def stored_answers(question_ids: Sequence[str], resolve_bank: Callable[[Optional[str]], Any],
+                   cohort: str = DEFAULT_COHORT,
+                   chunk_size: int = RELEVANCE_CHUNK_SIZE) -> Iterator[Tuple[str, str, Optional[dict]]]:
+    """(question_id, ответ, оценка) из session_answers сессий банка cohort пачками по ключу, как в app.rescore.
+
+    resolve_bank — банк сессии по её bank_version (QuestionCatalog.pinned).
+    """
+    from app.db_models import SessionLocal, Session, SessionAnswer
+    from sqlalchemy import select, and_, or_
+
+    after = None
+    while True:
+        db = SessionLocal()
+        try:
+            query = (select(SessionAnswer.session_token, SessionAnswer.position, SessionAnswer.question_id,
+                            SessionAnswer.answer, SessionAnswer.quality, Session.bank_version)
+                     .outerjoin(Session, Session.token == SessionAnswer.session_token)
+                     .where(SessionAnswer.question_id.in_(list(question_ids)))
+                     .order_by(SessionAnswer.session_token, SessionAnswer.position)
+                     .limit(chunk_size))
+            if after is not None:
+                query = query.where(or_(SessionAnswer.session_token > after[0],
+                                        and_(SessionAnswer.session_token == after[0],
+                                             SessionAnswer.position > after[1])))
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+        for _, _, question_id, answer, quality, bank_version in rows:
+            if resolve_bank(bank_version).cohort == cohort:
+                yield question_id, answer, quality
+        if len(rows) < chunk_size:
+            return
+        after = rows[-1][:2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Модель близости ответов к эталонным (TF-IDF)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="построить модель")
+    build.add_argument("--references", required=True, help="JSON: {question_id: [эталонные ответы]}")
+    build.add_argument("--bank", default=DEFAULT_COHORT, help="банк вопросов эталонов: <position>.<language>")
+    build.add_argument("--from-db", action="store_true",
+                       help="IDF по всем сохранённым ответам, хорошие ответы — в эталоны")
+    build.add_argument("--min-score", type=float, default=70, help="оценка сохранённого ответа для эталона")
+    build.add_argument("--output", default=RELEVANCE_MODEL_DIR, help="каталог моделей (модель — в <output>/<bank>)")
+    score = commands.add_parser("score", help="оценить ответ")
+    score.add_argument("question_id")
+    score.add_argument("text")
+    score.add_argument("--bank", default=DEFAULT_COHORT)
+    score.add_argument("--model", default=RELEVANCE_MODEL_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "score":
+        model = RelevanceModel.load(os.path.join(args.model, args.bank))
+        print(model.score(args.question_id, args.text))
+        return 0
+
+    with open(args.references, encoding="utf-8") as f:
+        references = {question_id: list(texts) for question_id, texts in json.load(f).items()}
+    documents = []
+    if args.from_db:
+        from app.question_catalog import QuestionCatalog
+
+        catalog = QuestionCatalog().load()
+        added = 0
+        for question_id, answer, quality in stored_answers(list(references), catalog.pinned, args.bank):
+            if quality and quality.get("score", 0) >= args.min_score:
+                references[question_id].append(answer)
+                added += 1
+            else:
+                documents.append(answer)
+        print(f"{len(documents) + added} stored answers read, {added} added as references")
+    model = RelevanceModel.build(references, documents, cohort=args.bank)
+    model.save(os.path.join(args.output, args.bank))
+    print(f"Relevance model for {len(model.question_ids)} questions of {args.bank} saved to {model.path} "
+          f"({model.stats()['features']} centroid features, {model.documents} documents)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,270 @@
+"""Переоценка сохранённых ответов после изменения правил оценки.
+
+Ответы из session_answers, оценённые не текущей SCORER_VERSION (или
+вовсе без оценки), читаются пачками по ключу (session_token, position):
+каждая пачка — отдельный короткий SELECT, долгих транзакций и блокировок
+нет. Каждый ответ оценивается по банку вопросов своей сессии
+(Session.bank_version, QuestionCatalog.pinned): ключевые слова и маркеры
+его языка. Пачки оцениваются в пуле процессов, результаты записываются
+массовым UPDATE по первичному ключу вместе с scorer_version. Если
+построены модели эталонных ответов (app.relevance), воркеры открывают их
+через mmap и добавляют к оценкам близость — моделью банка ответа, одним
+вызовом на банк в пачке.
+
+После каждой записанной пачки ключ последней строки сохраняется в файл
+контрольной точки: прерванный запуск продолжается с того же места.
+
+Запуск (из каталога backend-hr):
+  python -m app.rescore
+  python -m app.rescore --workers 8 --chunk-size 5000
+  python -m app.rescore --all --restart     # переоценить всё заново
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from app.answer_quality import SCORER_VERSION
+from app.question_bank import QuestionBank
+from app.relevance import RELEVANCE_MODEL_DIR, RelevanceModel, load_relevance_models
+
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "2000"))
+RESCORE_CHECKPOINT = os.getenv("RESCORE_CHECKPOINT", "rescore-checkpoint.json")
+
+# (session_token, position, question_id, answer, bank_version сессии)
+Row = Tuple[str, int, str, str, Optional[str]]
+
+# Модели эталонных ответов по банкам в процессе-воркере (задаются инициализатором пула)
+_relevance: Dict[str, RelevanceModel] = {}
+
+
+def _init_worker(relevance_dir: Optional[str] = None):
+    global _relevance
+    _relevance = load_relevance_models(relevance_dir) if relevance_dir else {}
+
+
+def score_rows(rows: List[Row], banks: Mapping[str, QuestionBank], version: int = SCORER_VERSION) -> List[Dict]:
+    """Оценивает пачку строк; возвращает параметры для UPDATE по первичному ключу.
+
+    banks — банки ответов пачки по версии; bank_version строки — версия из banks.
+    """
+    updates = []
+    relevances: Dict[int, float] = {}
+    by_bank: Dict[str, List[int]] = {}
+    for n, row in enumerate(rows):
+        by_bank.setdefault(row[4], []).append(n)
+    for bank_version, positions in by_bank.items():
+        model = _relevance.get(banks[bank_version].cohort)
+        if model is not None:
+            batch = model.score_batch([rows[n][2] for n in positions], [rows[n][3] for n in positions])
+            relevances.update((n, batch[i]) for i, n in enumerate(positions) if rows[n][2] in model)
+    for n, (token, position, question_id, answer, bank_version) in enumerate(rows):
+        quality = dict(banks[bank_version].analyzer(question_id).analyze(answer), version=version)
+        if n in relevances:
+            quality["relevance"] = round(float(relevances[n]), 3)
+        updates.append({"session_token": token, "position": position,
+                        "quality": quality, "scorer_version": version})
+    return updates
+
+
+def _read_chunk(after: Optional[Tuple[str, int]], question_ids: FrozenSet[str],
+                version: int, rescore_all: bool, limit: int) -> List[Row]:
+    from app.db_models import SessionLocal, Session, SessionAnswer
+    from sqlalchemy import select, and_, or_
+
+    query = (select(SessionAnswer.session_token, SessionAnswer.position,
+                    SessionAnswer.question_id, SessionAnswer.answer, Session.bank_version)
+             .outerjoin(Session, Session.token == SessionAnswer.session_token)
+             .where(SessionAnswer.question_id.in_(sorted(question_ids)))
+             .order_by(SessionAnswer.session_token, SessionAnswer.position)
+             .limit(limit))
+    if not rescore_all:
+        query = query.where(or_(SessionAnswer.scorer_version.is_(None),
+                                SessionAnswer.scorer_version != version))
+    if after is not None:
+        token, position = after
+        query = query.where(or_(SessionAnswer.session_token > token,
+                                and_(SessionAnswer.session_token == token, SessionAnswer.position > position)))
+    db = SessionLocal()
+    try:
+        return [tuple(row) for row in db.execute(query)]
+    finally:
+        db.close()
+
+
+def _write_scores(updates: List[Dict]):
+    from app.db_models import SessionLocal, SessionAnswer
+    from sqlalchemy import update
+
+    db = SessionLocal()
+    try:
+        db.execute(update(SessionAnswer), updates)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class Checkpoint:
+    """Ключ последней записанной строки и счётчики; хранится в JSON-файле"""
+
+    def __init__(self, path: Optional[str], version: int, rescore_all: bool):
+        self.path = path
+        self.state = {"version": version, "all": rescore_all, "after": None, "rows": 0, "done": False}
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            saved = json.load(f)
+        # Точка от другой версии оценщика или другого режима не подходит
+        if saved.get("version") != self.state["version"] or saved.get("all") != self.state["all"]:
+            return False
+        self.state.update(saved)
+        return True
+
+    @property
+    def after(self) -> Optional[Tuple[str, int]]:
+        return tuple(self.state["after"]) if self.state["after"] else None
+
+    def advance(self, last_row: Row, rows: int):
+        self.state["after"] = [last_row[0], last_row[1]]
+        self.state["rows"] += rows
+        self._save()
+
+    def finish(self):
+        self.state["done"] = True
+        self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+def _with_banks(rows: List[Row], catalog) -> Tuple[List[Row], Dict[str, QuestionBank]]:
+    """Строки с вопросами из банка своей сессии; bank_version заменён версией найденного банка"""
+    resolved, banks = [], {}
+    for token, position, question_id, answer, bank_version in rows:
+        bank = catalog.pinned(bank_version)
+        if question_id in bank:
+            banks[bank.version] = bank
+            resolved.append((token, position, question_id, answer, bank.version))
+    return resolved, banks
+
+
+def rescore_answers(catalog,
+                    workers: Optional[int] = None,
+                    chunk_size: int = RESCORE_CHUNK_SIZE,
+                    checkpoint: Optional[str] = RESCORE_CHECKPOINT,
+                    rescore_all: bool = False,
+                    restart: bool = False,
+                    max_rows: Optional[int] = None,
+                    version: int = SCORER_VERSION,
+                    report_every: float = 5.0,
+                    relevance_dir: Optional[str] = None) -> Dict:
+    """Переоценивает ответы на вопросы банков; возвращает итоговую статистику.
+
+    catalog — app.question_catalog.QuestionCatalog: банк сессии по её
+    bank_version (pinned) и id вопросов всех банков (question_ids).
+    workers=0 — оценка в текущем процессе (без пула). relevance_dir —
+    каталог моделей эталонных ответов (None — без близости к эталонам).
+    """
+    progress = Checkpoint(checkpoint, version, rescore_all)
+    if not restart and progress.load():
+        if progress.state["done"]:
+            print(f"Checkpoint {checkpoint} is complete ({progress.state['rows']} rows); use --restart to run again")
+            return dict(progress.state, rows_this_run=0, elapsed_s=0.0)
+        print(f"Resuming after {progress.after} ({progress.state['rows']} rows already rescored)")
+
+    question_ids = catalog.question_ids()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    started = last_report = time.monotonic()
+    done_this_run = 0
+    exhausted = False
+
+    def chunks():
+        nonlocal exhausted
+        # Следующая пачка читается от ключа последней прочитанной, а не записанной
+        after, remaining = progress.after, max_rows
+        while remaining is None or remaining > 0:
+            rows = _read_chunk(after, question_ids, version, rescore_all,
+                               chunk_size if remaining is None else min(chunk_size, remaining))
+            if not rows:
+                exhausted = True
+                return
+            after = rows[-1][:2]
+            if remaining is not None:
+                remaining -= len(rows)
+            yield rows
+
+    def record(rows: List[Row], updates: List[Dict]):
+        nonlocal done_this_run, last_report
+        if updates:
+            _write_scores(updates)
+        progress.advance(rows[-1], len(rows))
+        done_this_run += len(rows)
+        now = time.monotonic()
+        if now - last_report >= report_every:
+            last_report = now
+            print(f"Rescored {progress.state['rows']} answers "
+                  f"({done_this_run / (now - started):.0f} rows/s)")
+
+    if workers == 0:
+        _init_worker(relevance_dir)
+        for rows in chunks():
+            record(rows, score_rows(*_with_banks(rows, catalog), version))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(relevance_dir,)) as pool:
+            # Ограниченное окно: читаем вперёд не больше 2 пачек на воркер,
+            # записываем по порядку, чтобы контрольная точка только росла
+            pending = []
+            for rows in chunks():
+                pending.append((rows, pool.submit(score_rows, *_with_banks(rows, catalog), version)))
+                if len(pending) >= 2 * workers:
+                    rows_done, future = pending.pop(0)
+                    record(rows_done, future.result())
+            for rows_done, future in pending:
+                record(rows_done, future.result())
+
+    if exhausted:
+        progress.finish()
+    elapsed = time.monotonic() - started
+    rate = done_this_run / elapsed if elapsed > 0 else 0.0
+    print(f"Rescored {done_this_run} answers in {elapsed:.1f}s ({rate:.0f} rows/s) "
+          f"with scorer version {version}; total {progress.state['rows']}")
+    return dict(progress.state, rows_this_run=done_this_run, elapsed_s=round(elapsed, 3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Переоценка сохранённых ответов текущей версией оценщика")
+    parser.add_argument("--workers", type=int, default=None, help="процессов (по умолчанию — число CPU, 0 — без пула)")
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=RESCORE_CHECKPOINT, help="файл контрольной точки")
+    parser.add_argument("--all", action="store_true", help="переоценить и ответы с текущей версией")
+    parser.add_argument("--restart", action="store_true", help="не продолжать с контрольной точки")
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--relevance-model", default=RELEVANCE_MODEL_DIR,
+                        help="каталог моделей эталонных ответов (app.relevance)")
+    args = parser.parse_args(argv)
+
+    # Банки вопросов — из файлов приложения; ответ оценивается по банку своей сессии
+    from app.question_catalog import QuestionCatalog
+    rescore_answers(QuestionCatalog().load(), workers=args.workers, chunk_size=args.chunk_size,
+                    checkpoint=args.checkpoint, rescore_all=args.all, restart=args.restart,
+                    max_rows=args.max_rows,
+                    relevance_dir=args.relevance_model if os.path.isdir(args.relevance_model) else None)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
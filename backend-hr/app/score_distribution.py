@@ -0,0 +1,478 @@
+"""Распределение итоговых баллов завершённых интервью и перцентиль кандидата.
+
+Итоговый балл (calculate_performance_score) — целое от 0 до 100, поэтому
+распределение — это 101 счётчик. При завершении сессии балл добавляется
+в счётчик (add), перцентиль считается по счётчикам (percentile) — без
+сортировки и без запросов к базе, за фиксированное число операций.
+
+Распределение своё у каждой когорты — банка вопросов (позиция и язык,
+QuestionBank.cohort): у банков свои ключевые слова и маркеры, поэтому
+кандидат сравнивается только с прошедшими интервью по тому же банку
+(ScoreDistributions).
+
+Счётчики периодически сохраняются в таблицу score_distributions, строка
+"performance:<когорта>" (ScoreDistributionSaver из app.main). Каждый
+процесс сохраняет только свои новые баллы, прибавляя их к сохранённым, и
+забирает итог — так процессы видят завершения друг друга. Если строк нет
+или они посчитаны другой SCORER_VERSION, распределения строятся заново по
+завершённым сессиям в базе (rebuild), каждая сессия — по своему банку.
+Перестраивает один процесс (аренда app.job_lease), в фоне после старта;
+остальные загружают сохранённый им результат, а до этого перцентиль не
+отдают.
+
+Запуск вручную (из каталога backend-hr):
+  python -m app.score_distribution            # показать сохранённое распределение
+  python -m app.score_distribution --rebuild  # перестроить по базе
+"""
+import argparse
+import asyncio
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.answer_quality import SCORER_VERSION, performance_score, quality_totals
+from app.job_lease import JobLease
+from app.question_bank import QuestionBank
+
+SCORE_DISTRIBUTION_SAVE_INTERVAL = float(os.getenv("SCORE_DISTRIBUTION_SAVE_INTERVAL", "60"))
+SCORE_DISTRIBUTION_CHUNK_SIZE = int(os.getenv("SCORE_DISTRIBUTION_CHUNK_SIZE", "2000"))
+
+MAX_SCORE = 100
+DISTRIBUTION_NAME = "performance"
+# Аренда перестроения по базе (app.job_lease)
+REBUILD_LEASE = "score_distribution_rebuild"
+
+
+def _empty() -> List[int]:
+    return [0] * (MAX_SCORE + 1)
+
+
+def _bucket(score) -> int:
+    return min(MAX_SCORE, max(0, int(score)))
+
+
+class ScoreDistribution:
+    """Счётчики баллов 0..100 завершённых сессий"""
+
+    def __init__(self, name: str = "performance", version: int = SCORER_VERSION):
+        self.name = name
+        self.version = version
+        self._lock = threading.Lock()
+        self._counts = _empty()
+        self._total = 0
+        # Баллы, добавленные после последнего сохранения
+        self._pending = _empty()
+        self.saves = 0
+        self.failures = 0
+        self.last_save: Optional[str] = None
+        self.rebuilt = False
+        # Счётчики согласованы с базой (загружены или перестроены)
+        self.ready = False
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def counts(self) -> List[int]:
+        with self._lock:
+            return list(self._counts)
+
+    def add(self, score):
+        bucket = _bucket(score)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._pending[bucket] += 1
+            self._total += 1
+
+    def percentile(self, score) -> Optional[float]:
+        """Доля завершённых сессий с меньшим баллом (равные считаются за половину), %"""
+        bucket = _bucket(score)
+        with self._lock:
+            if not self._total:
+                return None
+            below = sum(self._counts[:bucket])
+            rank = below + self._counts[bucket] / 2
+            return round(rank / self._total * 100, 1)
+
+    def replace(self, counts: Sequence[int]):
+        """Заменяет счётчики (после загрузки или перестроения); несохранённые баллы сохраняются"""
+        with self._lock:
+            self._counts = [stored + pending for stored, pending in zip(counts, self._pending)]
+            self._total = sum(self._counts)
+
+    # ----- хранение в базе -----
+
+    def _select_row(self, db):
+        from app.db_models import ScoreDistributionRow
+        from sqlalchemy import select
+
+        query = select(ScoreDistributionRow).where(ScoreDistributionRow.name == self.name)
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update()
+        return db.execute(query).scalar_one_or_none()
+
+    def stored_counts(self) -> List[int]:
+        """Счётчики строки в базе сейчас; нули, если строки нет или она от другой версии оценщика"""
+        from app.db_models import SessionLocal
+
+        db = SessionLocal()
+        try:
+            row = self._select_row(db)
+            if row is None or row.scorer_version != self.version or not row.counts:
+                return _empty()
+            return list(row.counts)
+        finally:
+            db.close()
+
+    def load(self) -> bool:
+        """Читает сохранённые счётчики; False, если их нет или они от другой версии оценщика"""
+        from app.db_models import SessionLocal
+
+        db = SessionLocal()
+        try:
+            row = self._select_row(db)
+            if row is None or row.scorer_version != self.version:
+                return False
+            self.replace(row.counts)
+            self.ready = True
+            return True
+        finally:
+            db.close()
+
+    def save(self, rebuilt_from: Optional[Sequence[int]] = None):
+        """Прибавляет несохранённые баллы к строке в базе и забирает итог.
+
+        После перестроения rebuilt_from — счётчики строки до начала
+        просмотра базы (stored_counts): в строку пишутся текущие счётчики
+        (пересчитанные плюс баллы, пришедшие за время просмотра) и приросты
+        строки с тех пор — баллы, сохранённые за это время другими
+        процессами.
+        """
+        from app.db_models import SessionLocal, ScoreDistributionRow
+
+        with self._lock:
+            pending, self._pending = self._pending, _empty()
+            local = list(self._counts)
+        db = SessionLocal()
+        try:
+            row = self._select_row(db)
+            if row is None:
+                row = ScoreDistributionRow(name=self.name)
+                db.add(row)
+            if rebuilt_from is not None:
+                current = row.counts if row.scorer_version == self.version and row.counts else _empty()
+                stored = [counted + max(0, now - before)
+                          for counted, now, before in zip(local, current, rebuilt_from)]
+            elif row.scorer_version != self.version or not row.counts:
+                stored = local
+            else:
+                stored = [saved + new for saved, new in zip(row.counts, pending)]
+            row.counts = stored
+            row.total = sum(stored)
+            row.scorer_version = self.version
+            row.updated_at = datetime.utcnow()
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Не потерять баллы: попробуем записать их в следующий раз
+            with self._lock:
+                self._pending = [a + b for a, b in zip(self._pending, pending)]
+            raise
+        finally:
+            db.close()
+        self.replace(stored)
+        self.saves += 1
+        self.last_save = datetime.now(timezone.utc).isoformat()
+
+    def discard_pending(self):
+        """Забывает несохранённые баллы: перестроение по базе посчитает их само"""
+        with self._lock:
+            self._pending = _empty()
+
+    def stats(self) -> Dict:
+        return {"total": self._total, "scorer_version": self.version, "ready": self.ready, "saves": self.saves,
+                "failures": self.failures, "last_save": self.last_save, "rebuilt": self.rebuilt}
+
+
+class ScoreDistributions:
+    """Распределения баллов по когортам банков вопросов ("general.ru", "general.en", ...)"""
+
+    def __init__(self, name: str = DISTRIBUTION_NAME, version: int = SCORER_VERSION):
+        self.name = name
+        self.version = version
+        self._lock = threading.Lock()
+        self._cohorts: Dict[str, ScoreDistribution] = {}
+        self.failures = 0
+        self.rebuilt = False
+        # Счётчики согласованы с базой (загружены или перестроены)
+        self.ready = False
+
+    def get(self, cohort: str) -> ScoreDistribution:
+        with self._lock:
+            distribution = self._cohorts.get(cohort)
+            if distribution is None:
+                distribution = self._cohorts[cohort] = ScoreDistribution(f"{self.name}:{cohort}", self.version)
+                # Новой когорты в базе ещё нет: прибавлять есть к чему — к нулю
+                distribution.ready = self.ready
+            return distribution
+
+    def cohorts(self) -> List[str]:
+        with self._lock:
+            return sorted(self._cohorts)
+
+    def add(self, cohort: str, score):
+        self.get(cohort).add(score)
+
+    def percentile(self, cohort: str, score) -> Optional[float]:
+        """Перцентиль балла среди завершённых сессий той же когорты; None, пока счётчики не загружены"""
+        with self._lock:
+            distribution = self._cohorts.get(cohort) if self.ready else None
+        return distribution.percentile(score) if distribution is not None else None
+
+    @property
+    def total(self) -> int:
+        return sum(self.get(cohort).total for cohort in self.cohorts())
+
+    def _stored_cohorts(self) -> Dict[str, int]:
+        """Когорты строк score_distributions и версии оценщика, которой они посчитаны"""
+        from app.db_models import SessionLocal, ScoreDistributionRow
+        from sqlalchemy import select
+
+        prefix = f"{self.name}:"
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(ScoreDistributionRow.name, ScoreDistributionRow.scorer_version)
+                              .where(ScoreDistributionRow.name.startswith(prefix))).all()
+        finally:
+            db.close()
+        return {name[len(prefix):]: version for name, version in rows}
+
+    def load(self) -> bool:
+        """Читает сохранённые счётчики всех когорт; False, если их нет или они от другой версии оценщика"""
+        stored = self._stored_cohorts()
+        if not stored or any(version != self.version for version in stored.values()):
+            return False
+        for cohort in stored:
+            if not self.get(cohort).load():
+                return False
+        with self._lock:
+            self.ready = True
+            for distribution in self._cohorts.values():
+                distribution.ready = True
+        return True
+
+    def save(self):
+        for cohort in self.cohorts():
+            self.get(cohort).save()
+
+    def rebuild(self, catalog, chunk_size: int = SCORE_DISTRIBUTION_CHUNK_SIZE):
+        """Пересчитывает распределения по завершённым сессиям в базе и сохраняет их.
+
+        Баллы, добавленные до начала просмотра, в базе уже есть и
+        отбрасываются; пришедшие за время просмотра (его сессия могла
+        пройти их токены) остаются несохранёнными и прибавляются к
+        пересчитанным. Приросты строк от других процессов за это время
+        тоже не теряются (save(rebuilt_from=...)).
+        """
+        before = {cohort: self.get(cohort).stored_counts() for cohort in self._stored_cohorts()}
+        for cohort in self.cohorts():
+            self.get(cohort).discard_pending()
+        counts = scan_completed_scores(catalog, chunk_size, self.version)
+        for cohort in set(counts) | set(before) | set(self.cohorts()):
+            distribution = self.get(cohort)
+            distribution.replace(counts.get(cohort) or _empty())
+            distribution.save(rebuilt_from=before.get(cohort) or _empty())
+            distribution.rebuilt = distribution.ready = True
+        with self._lock:
+            self.rebuilt = self.ready = True
+        print(f"DEBUG: Score distributions rebuilt from {self.total} completed sessions "
+              f"({', '.join(self.cohorts()) or 'no banks'})")
+
+    def load_or_rebuild(self, catalog, lease: Optional[JobLease] = None) -> bool:
+        """Загружает сохранённые распределения, нет их — перестраивает.
+
+        С lease перестраивает, только если аренда досталась этому процессу;
+        False — перестраивает другой процесс, загрузить позже.
+        """
+        if self.load():
+            return True
+        if lease is None:
+            self.rebuild(catalog)
+            return True
+        if not lease.acquire():
+            return False
+        try:
+            # Пока аренду держал другой процесс, он мог успеть всё сохранить
+            if not self.load():
+                self.rebuild(catalog)
+        finally:
+            lease.release()
+        return True
+
+    def stats(self) -> Dict:
+        return {"total": self.total, "cohorts": {cohort: self.get(cohort).total for cohort in self.cohorts()},
+                "scorer_version": self.version, "ready": self.ready, "failures": self.failures,
+                "rebuilt": self.rebuilt}
+
+
+def _session_score(answers: Dict[str, tuple], bank: QuestionBank, version: int) -> int:
+    """Итоговый балл по последним ответам сессии на вопросы её банка"""
+    qualities = []
+    for question_id, (answer, quality, scorer_version) in answers.items():
+        if not quality or scorer_version != version:
+            quality = bank.analyzer(question_id).analyze(answer)
+        qualities.append(quality)
+    return performance_score(quality_totals(qualities), len(bank))
+
+
+def scan_completed_scores(catalog, chunk_size: int = SCORE_DISTRIBUTION_CHUNK_SIZE,
+                          version: int = SCORER_VERSION) -> Dict[str, List[int]]:
+    """Счётчики баллов завершённых сессий по когортам: {когорта банка: 101 счётчик}.
+
+    catalog — app.question_catalog.QuestionCatalog: банк сессии по её
+    bank_version (pinned). Ответы читаются пачками по ключу (session_token,
+    position), как в app.rescore; сохранённая оценка используется, если она
+    текущей версии.
+    """
+    from app.db_models import SessionLocal, Session, SessionAnswer
+    from sqlalchemy import select, and_, or_, func
+
+    counts: Dict[str, List[int]] = {}
+    seen: Dict[str, int] = {}
+
+    def count(bank: QuestionBank, answers: Dict[str, tuple]):
+        cohort_counts = counts.setdefault(bank.cohort, _empty())
+        cohort_counts[_bucket(_session_score(answers, bank, version))] += 1
+        seen[bank.cohort] = seen.get(bank.cohort, 0) + 1
+
+    current_token, current_bank, current = None, None, {}
+    after = None
+    db = SessionLocal()
+    try:
+        completed: Dict[str, int] = {}
+        for bank_version, sessions in db.execute(
+                select(Session.bank_version, func.count(Session.id))
+                .where(Session.completed.is_(True)).group_by(Session.bank_version)).all():
+            cohort = catalog.pinned(bank_version).cohort
+            completed[cohort] = completed.get(cohort, 0) + sessions
+        while True:
+            query = (select(SessionAnswer.session_token, SessionAnswer.position, SessionAnswer.question_id,
+                            SessionAnswer.answer, SessionAnswer.quality, SessionAnswer.scorer_version,
+                            Session.bank_version)
+                     .join(Session, Session.token == SessionAnswer.session_token)
+                     .where(Session.completed.is_(True))
+                     .order_by(SessionAnswer.session_token, SessionAnswer.position)
+                     .limit(chunk_size))
+            if after is not None:
+                query = query.where(or_(SessionAnswer.session_token > after[0],
+                                        and_(SessionAnswer.session_token == after[0],
+                                             SessionAnswer.position > after[1])))
+            rows = db.execute(query).all()
+            for token, position, question_id, answer, quality, scorer_version, bank_version in rows:
+                if token != current_token:
+                    if current_token is not None:
+                        count(current_bank, current)
+                    current_token, current_bank, current = token, catalog.pinned(bank_version), {}
+                if question_id in current_bank:
+                    # Как в aeon_answers: действует последний ответ на вопрос
+                    current[question_id] = (answer, quality, scorer_version)
+            if len(rows) < chunk_size:
+                break
+            after = rows[-1][:2]
+    finally:
+        db.close()
+    if current_token is not None:
+        count(current_bank, current)
+    # Завершённые сессии без единого ответа — балл 0
+    for cohort, sessions in completed.items():
+        counts.setdefault(cohort, _empty())[0] += max(0, sessions - seen.get(cohort, 0))
+    return counts
+
+
+class ScoreDistributionSaver:
+    """Периодическое сохранение распределений (asyncio-задача из app.main).
+
+    Пока счётчики не согласованы с базой (старт процесса, база была
+    недоступна), вместо сохранения они загружаются или перестраиваются —
+    иначе частичные счётчики процесса затёрли бы сохранённые. Первая
+    попытка — сразу при запуске задачи, но старт приложения её не ждёт.
+    Перестраивает процесс, получивший аренду REBUILD_LEASE, остальные
+    повторяют загрузку каждые interval секунд. catalog — банки вопросов
+    для перестроения (QuestionCatalog).
+    """
+
+    def __init__(self, distribution: ScoreDistributions, catalog,
+                 interval: float = SCORE_DISTRIBUTION_SAVE_INTERVAL,
+                 should_run: Callable[[], bool] = lambda: True, lease: Optional[JobLease] = None):
+        self.distribution = distribution
+        self.catalog = catalog
+        self.interval = interval
+        self.should_run = should_run
+        self.lease = lease or JobLease(REBUILD_LEASE)
+        self._stopped: Optional[asyncio.Event] = None
+
+    def run_once(self) -> bool:
+        if not self.should_run():
+            return False
+        try:
+            if self.distribution.ready:
+                self.distribution.save()
+            elif not self.distribution.load_or_rebuild(self.catalog, self.lease):
+                print("DEBUG: Score distributions are being rebuilt by another process")
+                return False
+        except Exception as e:
+            self.distribution.failures += 1
+            print(f"ERROR: Saving score distribution failed: {e}")
+            return False
+        return True
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        print(f"DEBUG: Score distribution saver started (interval={self.interval}s)")
+        # Загрузка или перестроение — сразу, в фоне
+        await asyncio.to_thread(self.run_once)
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            # Последнее сохранение — и при остановке
+            await asyncio.to_thread(self.run_once)
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Распределение итоговых баллов завершённых интервью")
+    parser.add_argument("--rebuild", action="store_true", help="перестроить по завершённым сессиям в базе")
+    parser.add_argument("--chunk-size", type=int, default=SCORE_DISTRIBUTION_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    distributions = ScoreDistributions()
+    if args.rebuild:
+        from app.question_catalog import QuestionCatalog
+        lease = JobLease(REBUILD_LEASE)
+        if not lease.acquire():
+            print("Score distributions are being rebuilt by another process")
+            return 1
+        try:
+            distributions.rebuild(QuestionCatalog().load(), args.chunk_size)
+        finally:
+            lease.release()
+    elif not distributions.load():
+        print("No saved distributions for the current scorer version; run with --rebuild")
+        return 1
+    for cohort in distributions.cohorts():
+        distribution = distributions.get(cohort)
+        counts = distribution.counts()
+        print(f"{cohort}: {distribution.total} completed sessions")
+        for low in range(0, MAX_SCORE + 1, 10):
+            print(f"  {low:>3}-{min(MAX_SCORE, low + 9):<3} {sum(counts[low:low + 10]):>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
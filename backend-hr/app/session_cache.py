@@ -0,0 +1,197 @@
+"""Ограниченный кэш сессий в памяти.
+
+Заменяет неограниченный словарь sessions: LRU-вытеснение по количеству
+записей и по бюджету памяти, TTL по last_activity и фоновый asyncio-
+чистильщик просроченных записей.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "3600"))
+SESSION_CACHE_SWEEP_INTERVAL = float(os.getenv("SESSION_CACHE_SWEEP_INTERVAL", "60"))
+
+
+def _to_epoch(value) -> float:
+    """datetime (в т.ч. naive из SQLite) или число -> unix time"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value or 0)
+
+
+def estimate_session_size(session_state) -> int:
+    """Приблизительный размер сессии в байтах (без обхода всего графа объектов)"""
+    # Компактный SessionState: объект со слотами, маска, array порядка, float-даты.
+    # Тексты ответов общие у aeon_answers и answers, считаем их один раз.
+    size = 200
+    for text in session_state.aeon_answers.values():
+        size += sys.getsizeof(text) + 16
+    size += 72 * len(session_state.answers)
+    size += 2 * len(session_state.question_order)
+    # Оценки ответов (app.answer_quality): кортеж из 9 полей на ответ
+    size += 152 * (len(getattr(session_state, "_scores", None) or ()) // 2)
+    return size
+
+
+def _last_activity_epoch(session_state) -> float:
+    epoch = getattr(session_state, "last_activity_ts", None)
+    return epoch if epoch is not None else _to_epoch(session_state.last_activity)
+
+
+class SessionCache:
+    """Словарь token -> SessionState с LRU/TTL-вытеснением"""
+
+    def __init__(self,
+                 max_entries: int = SESSION_CACHE_MAX_ENTRIES,
+                 max_bytes: int = SESSION_CACHE_MAX_BYTES,
+                 ttl: float = SESSION_CACHE_TTL,
+                 sizeof: Callable[[Any], int] = estimate_session_size,
+                 clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._clock = clock
+        # token -> (session_state, размер в байтах); порядок = порядок использования
+        self._data: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stopped: Optional[asyncio.Event] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ----- dict-подобный интерфейс -----
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, token) -> bool:
+        return token in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __getitem__(self, token: str):
+        session_state = self.get(token)
+        if session_state is None:
+            raise KeyError(token)
+        return session_state
+
+    def __setitem__(self, token: str, session_state):
+        size = self._sizeof(session_state)
+        with self._lock:
+            previous = self._data.pop(token, None)
+            if previous:
+                self._bytes -= previous[1]
+            self._data[token] = (session_state, size)
+            self._bytes += size
+            self._evict_overflow()
+
+    def __delitem__(self, token: str):
+        if self.pop(token, None) is None:
+            raise KeyError(token)
+
+    def get(self, token: str, default=None):
+        with self._lock:
+            entry = self._data.get(token)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._is_expired(entry[0]):
+                self._remove(token)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def pop(self, token: str, default=None):
+        with self._lock:
+            if token not in self._data:
+                return default
+            return self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def values(self) -> List[Any]:
+        with self._lock:
+            return [entry[0] for entry in self._data.values()]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return [(token, entry[0]) for token, entry in self._data.items()]
+
+    # ----- вытеснение -----
+
+    def _remove(self, token: str):
+        session_state, size = self._data.pop(token)
+        self._bytes -= size
+        return session_state
+
+    def _is_expired(self, session_state) -> bool:
+        return self._clock() - _last_activity_epoch(session_state) > self.ttl
+
+    def _evict_overflow(self):
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            token = next(iter(self._data))
+            self._remove(token)
+            self.evictions += 1
+            print(f"DEBUG: Evicted session {token} from memory cache (LRU)")
+
+    def sweep(self) -> int:
+        """Удаляет все сессии, неактивные дольше TTL; возвращает их число"""
+        with self._lock:
+            expired = [token for token, (state, _) in self._data.items() if self._is_expired(state)]
+            for token in expired:
+                self._remove(token)
+            self.expirations += len(expired)
+        if expired:
+            print(f"DEBUG: Swept {len(expired)} expired sessions from memory cache")
+        return len(expired)
+
+    async def run_sweeper(self, interval: float = SESSION_CACHE_SWEEP_INTERVAL):
+        """Фоновая задача: периодически вызывает sweep()"""
+        self._stopped = asyncio.Event()
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                self.sweep()
+
+    def stop_sweeper(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики для подбора размеров кэша"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
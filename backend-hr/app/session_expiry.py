@@ -0,0 +1,184 @@
+"""Очистка просроченных сессий из таблицы sessions.
+
+Незавершённая сессия, в которой не было активности дольше
+SESSION_PURGE_AFTER секунд, удаляется вместе со строками session_answers,
+session_questions и answer_signatures. Завершённые сессии не трогаются —
+это результаты.
+
+Удаление идёт пачками по SESSION_PURGE_BATCH_SIZE сессий, каждая пачка —
+отдельная короткая транзакция, между пачками — пауза. В PostgreSQL строки
+выбираются с FOR UPDATE SKIP LOCKED: сессии, которые сейчас пишутся, просто
+пропускаются, а не ждут друг друга.
+
+Запуск вручную (из каталога backend-hr):
+  python -m app.session_expiry --dry-run
+  python -m app.session_expiry --older-than 86400 --batch-size 1000
+В приложении задача запускается из app.main раз в SESSION_PURGE_INTERVAL.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+# Сессия старше TTL токена (1 час) уже не может продолжиться; берём запас
+SESSION_PURGE_AFTER = float(os.getenv("SESSION_PURGE_AFTER", str(2 * 3600)))
+SESSION_PURGE_BATCH_SIZE = int(os.getenv("SESSION_PURGE_BATCH_SIZE", "500"))
+SESSION_PURGE_PAUSE = float(os.getenv("SESSION_PURGE_PAUSE", "0.05"))
+SESSION_PURGE_INTERVAL = float(os.getenv("SESSION_PURGE_INTERVAL", "600"))
+SESSION_PURGE_ENABLED = os.getenv("SESSION_PURGE_ENABLED", "1") == "1"
+
+
+def purge_cutoff(older_than: float = SESSION_PURGE_AFTER, now: Optional[datetime] = None) -> datetime:
+    """Граница last_activity; naive UTC, как хранятся даты в колонках DateTime"""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    return now - timedelta(seconds=older_than)
+
+
+def _expired(cutoff: datetime):
+    from app.db_models import Session
+    from sqlalchemy import and_, or_
+    return and_(
+        or_(Session.completed.is_(False), Session.completed.is_(None)),
+        or_(Session.last_activity < cutoff,
+            and_(Session.last_activity.is_(None), Session.created_at < cutoff)),
+    )
+
+
+def count_expired_sessions(cutoff: datetime) -> int:
+    from app.db_models import SessionLocal, Session
+    from sqlalchemy import select, func
+
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.count(Session.id)).where(_expired(cutoff))).scalar_one()
+    finally:
+        db.close()
+
+
+def _purge_batch(cutoff: datetime, batch_size: int) -> int:
+    from app.db_models import SessionLocal, Session, SessionAnswer, SessionQuestion, AnswerSignature
+    from sqlalchemy import select, delete
+
+    db = SessionLocal()
+    try:
+        query = (select(Session.token)
+                 .where(_expired(cutoff))
+                 .order_by(Session.last_activity)
+                 .limit(batch_size))
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        tokens: List[str] = list(db.execute(query).scalars())
+        if not tokens:
+            db.rollback()
+            return 0
+        # Сначала родительские строки с повторной проверкой: сессия могла ожить между
+        # SELECT и DELETE (SQLite без SKIP LOCKED). Дочерние — только у реально удалённых
+        expired_sessions = delete(Session).where(Session.token.in_(tokens), _expired(cutoff))
+        if db.get_bind().dialect.delete_returning:
+            removed = list(db.execute(expired_sessions.returning(Session.token)).scalars())
+        else:
+            db.execute(expired_sessions)
+            alive = set(db.execute(select(Session.token).where(Session.token.in_(tokens))).scalars())
+            removed = [token for token in tokens if token not in alive]
+        if removed:
+            db.execute(delete(SessionAnswer).where(SessionAnswer.session_token.in_(removed)))
+            db.execute(delete(SessionQuestion).where(SessionQuestion.session_token.in_(removed)))
+            db.execute(delete(AnswerSignature).where(AnswerSignature.session_token.in_(removed)))
+        deleted = len(removed)
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def purge_expired_sessions(older_than: float = SESSION_PURGE_AFTER,
+                           batch_size: int = SESSION_PURGE_BATCH_SIZE,
+                           pause: float = SESSION_PURGE_PAUSE,
+                           max_batches: Optional[int] = None,
+                           now: Optional[datetime] = None) -> int:
+    """Удаляет просроченные незавершённые сессии пачками; возвращает их число"""
+    cutoff = purge_cutoff(older_than, now)
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        deleted = _purge_batch(cutoff, batch_size)
+        total += deleted
+        batches += 1
+        if deleted < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    if total:
+        print(f"DEBUG: Purged {total} expired sessions (last activity before {cutoff.isoformat()}) "
+              f"in {batches} batches")
+    return total
+
+
+class SessionPurgeJob:
+    """Периодическая очистка внутри приложения (asyncio-задача из app.main)"""
+
+    def __init__(self, interval: float = SESSION_PURGE_INTERVAL,
+                 should_run: Callable[[], bool] = lambda: True, **purge_options):
+        self.interval = interval
+        self.should_run = should_run
+        self.purge_options = purge_options
+        self._stopped: Optional[asyncio.Event] = None
+        self.stats = {"runs": 0, "purged": 0, "failures": 0, "last_run": None}
+
+    def run_once(self) -> int:
+        if not self.should_run():
+            return 0
+        try:
+            purged = purge_expired_sessions(**self.purge_options)
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"ERROR: Session purge failed: {e}")
+            return 0
+        self.stats["runs"] += 1
+        self.stats["purged"] += purged
+        self.stats["last_run"] = datetime.now(timezone.utc).isoformat()
+        return purged
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        print(f"DEBUG: Session purge job started (interval={self.interval}s)")
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                # Синхронный SQLAlchemy — в пуле потоков, чтобы не держать event loop
+                await asyncio.to_thread(self.run_once)
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Удаление просроченных незавершённых сессий")
+    parser.add_argument("--older-than", type=float, default=SESSION_PURGE_AFTER,
+                        help="секунд без активности (по умолчанию SESSION_PURGE_AFTER)")
+    parser.add_argument("--batch-size", type=int, default=SESSION_PURGE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=SESSION_PURGE_PAUSE,
+                        help="пауза между пачками, сек")
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать")
+    args = parser.parse_args(argv)
+
+    cutoff = purge_cutoff(args.older_than)
+    if args.dry_run:
+        print(f"{count_expired_sessions(cutoff)} expired sessions (last activity before {cutoff.isoformat()})")
+        return 0
+    purged = purge_expired_sessions(args.older_than, args.batch_size, args.pause, args.max_batches)
+    print(f"Purged {purged} expired sessions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
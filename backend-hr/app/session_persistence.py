@@ -0,0 +1,200 @@
+"""Write-behind сохранение сессий.
+
+Изменения сессий не пишутся в БД на каждом запросе: они попадают в
+очередь, где несколько обновлений одного токена сливаются в одно, а
+фоновый флашер записывает накопившиеся сессии пачками.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Максимальное время (сек), которое изменение может ждать записи в БД
+SESSION_WRITE_MAX_STALENESS = float(os.getenv("SESSION_WRITE_MAX_STALENESS", "5"))
+# Максимальное количество сессий в одной пачке записи
+SESSION_WRITE_BATCH_SIZE = int(os.getenv("SESSION_WRITE_BATCH_SIZE", "200"))
+
+# Функция записи пачки: получает список (token, row) и пишет их одной транзакцией
+BatchWriter = Callable[[List[Tuple[str, dict]]], None]
+AsyncBatchWriter = Callable[[List[Tuple[str, dict]]], Awaitable[None]]
+
+
+class WriteBehindQueue:
+    """Очередь «грязных» сессий с объединением обновлений по токену"""
+
+    def __init__(self, writer: BatchWriter,
+                 max_staleness: float = SESSION_WRITE_MAX_STALENESS,
+                 batch_size: int = SESSION_WRITE_BATCH_SIZE,
+                 async_writer: Optional[AsyncBatchWriter] = None,
+                 available: Optional[Callable[[], bool]] = None):
+        self._writer = writer
+        self._async_writer = async_writer
+        # Если available() ложно (например, открыт circuit breaker), запись
+        # откладывается: сессии остаются в очереди, а флашер не дёргает базу
+        self._available = available
+        self.max_staleness = max_staleness
+        self.batch_size = batch_size
+        # token -> (время первой пометки, последний снимок строки)
+        self._dirty: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped: Optional[asyncio.Event] = None
+        self.stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "failures": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._dirty)
+
+    def enqueue(self, token: str, row: dict):
+        """Помечает сессию грязной; повторные изменения заменяют снимок"""
+        with self._lock:
+            self.stats["enqueued"] += 1
+            existing = self._dirty.get(token)
+            if existing:
+                self.stats["coalesced"] += 1
+                self._dirty[token] = (existing[0], row)
+            else:
+                self._dirty[token] = (time.monotonic(), row)
+
+    def pending(self, token: str) -> Optional[dict]:
+        """Возвращает ещё не записанный снимок сессии, если он есть"""
+        entry = self._dirty.get(token)
+        return entry[1] if entry else None
+
+    def discard(self, token: str):
+        """Убирает сессию из очереди (например, при удалении)"""
+        with self._lock:
+            self._dirty.pop(token, None)
+
+    def is_overdue(self) -> bool:
+        """True, если самое старое изменение ждёт дольше max_staleness"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            oldest = next(iter(self._dirty.values()))[0]
+        return time.monotonic() - oldest >= self.max_staleness
+
+    def _take(self, tokens: Optional[Iterable[str]] = None) -> List[Tuple[str, float, dict]]:
+        with self._lock:
+            if tokens is None:
+                keys = list(self._dirty)[:self.batch_size]
+            else:
+                keys = [t for t in tokens if t in self._dirty]
+            return [(token, *self._dirty.pop(token)) for token in keys]
+
+    def _requeue(self, batch: List[Tuple[str, float, dict]]):
+        # Если за время записи пришло более свежее изменение, оставляем его
+        with self._lock:
+            for token, dirty_since, row in batch:
+                if token in self._dirty:
+                    newer = self._dirty[token][1]
+                    self._dirty[token] = (dirty_since, newer)
+                else:
+                    self._dirty[token] = (dirty_since, row)
+
+    def _write_failed(self, batch, error: Exception):
+        print(f"ERROR: Write-behind flush failed for {len(batch)} sessions: {error}")
+        self.stats["failures"] += 1
+        self._requeue(batch)
+
+    def _write_succeeded(self, batch):
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += len(batch)
+
+    def writable(self) -> bool:
+        return self._available is None or self._available()
+
+    def flush(self, tokens: Optional[Iterable[str]] = None) -> int:
+        """Синхронно записывает грязные сессии; возвращает число записанных строк"""
+        if not self.writable():
+            return 0
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take(tokens)
+                if not batch:
+                    break
+                try:
+                    self._writer([(token, row) for token, _, row in batch])
+                except Exception as e:
+                    self._write_failed(batch, e)
+                    break
+                self._write_succeeded(batch)
+                written += len(batch)
+                if tokens is not None:
+                    break
+        return written
+
+    async def aflush(self, tokens: Optional[Iterable[str]] = None) -> int:
+        """Как flush(), но через асинхронный writer — не блокирует event loop"""
+        if not self.writable():
+            return 0
+        if self._async_writer is None:
+            return await asyncio.to_thread(self.flush, tokens)
+        # Тот же замок, что и у синхронного flush: две записи одной сессии не пересекаются
+        if not self._flush_lock.acquire(blocking=False):
+            await asyncio.to_thread(self._flush_lock.acquire)
+        written = 0
+        try:
+            while True:
+                batch = self._take(tokens)
+                if not batch:
+                    break
+                try:
+                    await self._async_writer([(token, row) for token, _, row in batch])
+                except Exception as e:
+                    self._write_failed(batch, e)
+                    break
+                self._write_succeeded(batch)
+                written += len(batch)
+                if tokens is not None:
+                    break
+        finally:
+            self._flush_lock.release()
+        return written
+
+    def flush_token(self, token: str) -> bool:
+        """Немедленная запись одной сессии (для событий завершения)"""
+        if self.pending(token) is None:
+            return True
+        self.flush([token])
+        return self.pending(token) is None
+
+    async def aflush_token(self, token: str) -> bool:
+        if self.pending(token) is None:
+            return True
+        await self.aflush([token])
+        return self.pending(token) is None
+
+    async def run(self, interval: Optional[float] = None):
+        """Фоновый флашер: периодически сбрасывает очередь в БД"""
+        interval = interval or max(0.1, self.max_staleness / 2)
+        self._stopped = asyncio.Event()
+        print(f"DEBUG: Write-behind flusher started (interval={interval}s)")
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._dirty:
+                await self.aflush()
+        # Остаток — тем же путём: синхронный flush() в event loop заблокировал бы его
+        # на _flush_lock, пока идёт асинхронная запись
+        await self.aflush()
+
+    @property
+    def started(self) -> bool:
+        return self._stopped is not None
+
+    def stop(self):
+        """Останавливает фоновый флашер; оставшееся запишет run() перед выходом, без флашера — сразу"""
+        if self._stopped is not None:
+            self._stopped.set()
+        else:
+            self.flush()
@@ -0,0 +1,744 @@
+"""Состояние сессии интервью и его сериализация для хранилищ.
+
+SessionState хранится компактно, чтобы сотни тысяч простаивающих сессий
+в кэше не стоили по килобайту служебных объектов каждая:
+
+* id вопросов кодируются небольшими int по таблице кодов банка сессии
+  (bank_codes: код — порядковый номер вопроса в закреплённой версии банка,
+  таблицы регистрирует app.question_catalog). Сессии без зарегистрированной
+  таблицы (версия банка не указана или ещё не загружена) кодируют вопросы по
+  общему реестру question_codes. Заданные вопросы — битовая маска, порядок —
+  array('i'). Вопросы не из таблицы (например, сгенерированные OpenAI)
+  хранятся в самой сессии и получают отрицательные коды;
+* ответы — кортежи (код, текст[, прочие поля]) вместо словарей;
+* даты — unix time (float);
+* оценки качества ответов (app.answer_quality) — кортежи по коду вопроса,
+  а суммы по ним поддерживаются инкрементально (quality_totals).
+
+Снаружи answers / aeon_answers / asked_questions / question_order ведут
+себя как прежние list / dict / set / list (это представления поверх
+компактных полей), а created_at / last_activity — как aware datetime.
+"""
+from array import array
+from collections.abc import Mapping, MutableMapping, MutableSequence, MutableSet, Sequence
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+import json
+import time
+import weakref
+
+
+class QuestionCodes:
+    """Реестр id вопроса <-> код. Только дописывается, поэтому коды стабильны"""
+
+    __slots__ = ("_ids", "_codes", "__weakref__")
+
+    def __init__(self, question_ids: Iterable[str] = ()):
+        self._ids: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.register(question_ids)
+
+    def register(self, question_ids: Iterable[str]):
+        for question_id in question_ids:
+            if question_id not in self._codes:
+                self._codes[question_id] = len(self._ids)
+                self._ids.append(question_id)
+
+    def code(self, question_id) -> Optional[int]:
+        return self._codes.get(question_id)
+
+    def question_id(self, code: int) -> str:
+        return self._ids[code]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+question_codes = QuestionCodes()
+
+# Версия банка -> таблица кодов его вопросов (код — порядковый номер в банке).
+# Таблицу держат каталог и сессии банка; ненужная уходит вместе с ними
+_bank_codes: "weakref.WeakValueDictionary[str, QuestionCodes]" = weakref.WeakValueDictionary()
+
+
+def register_bank_codes(version: str, question_ids: Iterable[str]) -> QuestionCodes:
+    """Таблица кодов версии банка (question_ids — в порядке банка); уже известная версия — прежняя таблица"""
+    codes = _bank_codes.get(version)
+    if codes is None:
+        codes = _bank_codes[version] = QuestionCodes(question_ids)
+    return codes
+
+
+def bank_codes(version: Optional[str]) -> Optional[QuestionCodes]:
+    return _bank_codes.get(version) if version is not None else None
+
+
+# Порядок полей упакованной оценки ответа (см. app.answer_quality.analyze_answer_quality).
+# relevance — близость к эталонным ответам (app.relevance), None без модели
+QUALITY_FIELDS = ("version", "score", "word_count", "sentence_count", "keyword_matches",
+                  "keyword_ratio", "has_examples", "has_specifics", "relevance")
+_QUALITY_DEFAULTS = {"relevance": None}
+
+
+class QualityTotals(NamedTuple):
+    """Суммы по оценкам ответов на вопросы из таблицы кодов сессии"""
+    scored: int
+    score_sum: float
+    keyword_matches: int
+    with_examples: int
+    relevance_sum: float = 0.0
+    with_relevance: int = 0
+
+
+def _pack_quality(quality: Dict) -> tuple:
+    return tuple(quality.get(name, _QUALITY_DEFAULTS.get(name, 0)) for name in QUALITY_FIELDS)
+
+
+def _to_timestamp(value) -> float:
+    if isinstance(value, datetime):
+        # Колонки DateTime без timezone возвращают naive-время; в базу пишется UTC
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    # Точность datetime — микросекунды: так время переживает round-trip через datetime
+    return round(float(value), 6)
+
+
+def _bit(code: int) -> int:
+    # Чётные биты — коды таблицы, нечётные — вопросы, известные только сессии
+    return 1 << (2 * code if code >= 0 else -1 - 2 * code)
+
+
+def _code_of_bit(position: int) -> int:
+    return position // 2 if position % 2 == 0 else (-1 - position) // 2
+
+
+def registry_bit(question_id) -> Optional[int]:
+    """Бит вопроса реестра в SessionState.asked_mask сессий без таблицы банка (None — вопроса нет в реестре)"""
+    code = question_codes.code(question_id)
+    return None if code is None else _bit(code)
+
+
+def table_bit(ordinal: int) -> int:
+    """Бит вопроса с порядковым номером ordinal в asked_mask сессии с таблицей банка"""
+    return _bit(ordinal)
+
+
+class SessionState:
+    """Состояние одной сессии интервью"""
+
+    __slots__ = ("current_question_index", "completed", "created_ts", "last_activity_ts", "bank_version",
+                 "final_score", "_table", "_asked", "_order", "_extra", "_aeon", "_answers", "_scores", "_totals")
+
+    def __init__(self, answers: Optional[Iterable[Dict]] = None,
+                 aeon_answers: Optional[Mapping] = None,
+                 asked_questions: Optional[Iterable[str]] = None,
+                 current_question_index: int = 0,
+                 created_at=None,
+                 completed: bool = False,
+                 question_order: Optional[Iterable[str]] = None,
+                 last_activity=None,
+                 bank_version: Optional[str] = None,
+                 final_score: Optional[int] = None):
+        now = _to_timestamp(time.time())
+        self.current_question_index = current_question_index
+        self.completed = completed
+        # Версия банка вопросов, закреплённая при создании (app.question_catalog); None — текущий банк
+        self.bank_version = bank_version
+        # Таблица кодов вопросов: банка сессии, если он загружен, иначе общий реестр
+        self._table = bank_codes(bank_version) or question_codes
+        # Итоговый балл, зафиксированный при завершении (app.api.record_completion)
+        self.final_score = final_score
+        self.created_ts = now if created_at is None else _to_timestamp(created_at)
+        self.last_activity_ts = now if last_activity is None else _to_timestamp(last_activity)
+        self._asked = 0        # битовая маска заданных вопросов
+        self._order = None     # array('i') кодов в порядке выдачи
+        self._extra = None     # tuple id вопросов, которых нет в таблице
+        # Кортежи, а не списки: без запаса под append; при изменении пересобираются
+        self._aeon = None      # (код, текст, код, текст, ...)
+        self._answers = None   # ((код, текст[, прочие поля]) | исходный dict, ...)
+        self._scores = None    # (код, упакованная оценка, ...) для ответов из aeon_answers
+        # (версия оценщика, без оценки, с оценкой, сумма баллов, ключевые слова, с примерами)
+        # по ответам на вопросы таблицы; None — суммы надо пересчитать
+        self._totals = None
+        if asked_questions:
+            _AskedQuestions(self).update(asked_questions)
+        if question_order:
+            _QuestionOrder(self).extend(question_order)
+        if aeon_answers:
+            _AeonAnswers(self).update(aeon_answers)
+        if answers:
+            _Answers(self).extend(answers)
+
+    # ----- коды вопросов -----
+
+    def _lookup(self, question_id) -> Optional[int]:
+        if self._extra and question_id in self._extra:
+            return -1 - self._extra.index(question_id)
+        return self._table.code(question_id)
+
+    def _encode(self, question_id) -> int:
+        code = self._lookup(question_id)
+        if code is None:
+            self._extra = (self._extra or ()) + (question_id,)
+            code = -len(self._extra)
+        return code
+
+    def _decode(self, code: int):
+        return self._table.question_id(code) if code >= 0 else self._extra[-1 - code]
+
+    # ----- публичные атрибуты -----
+
+    @property
+    def code_table(self) -> QuestionCodes:
+        """Таблица, по которой закодированы вопросы сессии (bank_codes или question_codes)"""
+        return self._table
+
+    @property
+    def asked_mask(self) -> int:
+        """Битовая маска заданных вопросов: table_bit при таблице банка, иначе registry_bit"""
+        return self._asked
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_ts, timezone.utc)
+
+    @created_at.setter
+    def created_at(self, value):
+        self.created_ts = _to_timestamp(value)
+
+    @property
+    def last_activity(self) -> datetime:
+        return datetime.fromtimestamp(self.last_activity_ts, timezone.utc)
+
+    @last_activity.setter
+    def last_activity(self, value):
+        self.last_activity_ts = _to_timestamp(value)
+
+    @property
+    def asked_questions(self) -> "_AskedQuestions":
+        return _AskedQuestions(self)
+
+    @asked_questions.setter
+    def asked_questions(self, value):
+        # `state.asked_questions |= {...}` присваивает обратно то же представление
+        if isinstance(value, _AskedQuestions) and value._state is self:
+            return
+        value = list(value)
+        self._asked = 0
+        _AskedQuestions(self).update(value)
+
+    @property
+    def question_order(self) -> "_QuestionOrder":
+        return _QuestionOrder(self)
+
+    @question_order.setter
+    def question_order(self, value):
+        if isinstance(value, _QuestionOrder) and value._state is self:
+            return
+        value = list(value)
+        self._order = None
+        _QuestionOrder(self).extend(value)
+
+    @property
+    def aeon_answers(self) -> "_AeonAnswers":
+        return _AeonAnswers(self)
+
+    @aeon_answers.setter
+    def aeon_answers(self, value):
+        if isinstance(value, _AeonAnswers) and value._state is self:
+            return
+        value = dict(value)
+        self._aeon = None
+        self._scores = None
+        self._totals = None
+        _AeonAnswers(self).update(value)
+
+    @property
+    def answers(self) -> "_Answers":
+        return _Answers(self)
+
+    @answers.setter
+    def answers(self, value):
+        if isinstance(value, _Answers) and value._state is self:
+            return
+        value = list(value)
+        self._answers = None
+        _Answers(self).extend(value)
+
+    # ----- оценки качества ответов -----
+
+    def _pop_score(self, code: int) -> Optional[tuple]:
+        scores = self._scores
+        if scores:
+            for i in range(0, len(scores), 2):
+                if scores[i] == code:
+                    self._scores = scores[:i] + scores[i + 2:] or None
+                    return scores[i + 1]
+        return None
+
+    def _adjust_totals(self, removed: Optional[tuple] = None, added: Optional[tuple] = None,
+                       unscored: int = 0):
+        version, pending, scored, score_sum, keywords, examples, relevance, with_relevance = self._totals
+        for packed, sign in ((removed, -1), (added, 1)):
+            if packed is None:
+                continue
+            if packed[0] != version:
+                # Оценка другой версией: сумм для неё нет, пересчитаем целиком
+                self._totals = None
+                return
+            scored += sign
+            score_sum += sign * packed[1]
+            keywords += sign * packed[4]
+            examples += sign * bool(packed[6])
+            if packed[8] is not None:
+                relevance += sign * packed[8]
+                with_relevance += sign
+            pending -= sign
+        self._totals = (version, pending + unscored, scored, score_sum, keywords, examples,
+                        relevance, with_relevance)
+
+    def _answer_changed(self, code: int, is_new: bool):
+        """Текст ответа изменился: прежняя оценка больше не действительна"""
+        removed = self._pop_score(code)
+        if self._totals is not None and code >= 0:
+            self._adjust_totals(removed=removed, unscored=0 if removed is not None or not is_new else 1)
+
+    def _answer_deleted(self, code: int):
+        removed = self._pop_score(code)
+        if self._totals is not None and code >= 0:
+            self._adjust_totals(removed=removed, unscored=-1)
+
+    def set_quality(self, question_id, quality: Dict):
+        """Сохраняет оценку ответа на question_id (ответ уже в aeon_answers)"""
+        code = self._lookup(question_id)
+        if code is None or question_id not in self.aeon_answers:
+            raise KeyError(question_id)
+        packed = _pack_quality(quality)
+        removed = self._pop_score(code)
+        self._scores = (self._scores or ()) + (code, packed)
+        if self._totals is not None and code >= 0:
+            self._adjust_totals(removed=removed, added=packed)
+
+    def quality(self, question_id) -> Optional[Dict]:
+        """Сохранённая оценка ответа (с версией оценщика) или None"""
+        code = self._lookup(question_id)
+        scores = self._scores or ()
+        for i in range(0, len(scores), 2):
+            if scores[i] == code:
+                return dict(zip(QUALITY_FIELDS, scores[i + 1]))
+        return None
+
+    def qualities(self) -> Dict[str, Dict]:
+        scores = self._scores or ()
+        return {self._decode(scores[i]): dict(zip(QUALITY_FIELDS, scores[i + 1]))
+                for i in range(0, len(scores), 2)}
+
+    def quality_totals(self, version: int) -> Optional[QualityTotals]:
+        """Суммы по оценкам версии version, если оценены все ответы на вопросы таблицы"""
+        totals = self._totals
+        if totals is None or totals[0] != version or totals[1]:
+            return None
+        return QualityTotals(*totals[2:])
+
+    def reset_quality_totals(self, version: int):
+        """Пересчитывает суммы по сохранённым оценкам (без повторного анализа текстов)"""
+        scores = self._scores or ()
+        by_code = {scores[i]: scores[i + 1] for i in range(0, len(scores), 2)}
+        pairs = self._aeon or ()
+        pending = scored = keywords = examples = with_relevance = 0
+        score_sum = relevance = 0
+        for i in range(0, len(pairs), 2):
+            if pairs[i] < 0:
+                continue
+            packed = by_code.get(pairs[i])
+            if packed is None or packed[0] != version:
+                pending += 1
+                continue
+            scored += 1
+            score_sum += packed[1]
+            keywords += packed[4]
+            examples += bool(packed[6])
+            if packed[8] is not None:
+                relevance += packed[8]
+                with_relevance += 1
+        self._totals = (version, pending, scored, score_sum, keywords, examples, relevance, with_relevance)
+
+    def _fields(self):
+        return (list(self.answers), dict(self.aeon_answers), set(self.asked_questions),
+                self.current_question_index, self.created_ts, self.completed,
+                list(self.question_order), self.last_activity_ts, self.bank_version)
+
+    def __eq__(self, other):
+        if not isinstance(other, SessionState):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Через снимок, а не коды: таблицы кодов у каждого процесса свои
+        return session_from_row, (session_to_row(self),)
+
+    def __repr__(self) -> str:
+        return (f"SessionState(answers={list(self.answers)!r}, aeon_answers={dict(self.aeon_answers)!r}, "
+                f"asked_questions={set(self.asked_questions)!r}, "
+                f"current_question_index={self.current_question_index!r}, created_at={self.created_at!r}, "
+                f"completed={self.completed!r}, question_order={list(self.question_order)!r}, "
+                f"last_activity={self.last_activity!r})")
+
+
+# ===== Представления компактных полей =====
+
+class _AskedQuestions(MutableSet):
+    __slots__ = ("_state",)
+
+    def update(self, question_ids: Iterable[str]):
+        for question_id in question_ids:
+            self.add(question_id)
+
+    def __init__(self, state: SessionState):
+        self._state = state
+
+    def __contains__(self, question_id) -> bool:
+        code = self._state._lookup(question_id)
+        return code is not None and bool(self._state._asked & _bit(code))
+
+    def __iter__(self):
+        mask, position = self._state._asked, 0
+        while mask:
+            if mask & 1:
+                yield self._state._decode(_code_of_bit(position))
+            mask >>= 1
+            position += 1
+
+    def __len__(self) -> int:
+        return bin(self._state._asked).count("1")
+
+    def add(self, question_id):
+        self._state._asked |= _bit(self._state._encode(question_id))
+
+    def discard(self, question_id):
+        code = self._state._lookup(question_id)
+        if code is not None:
+            self._state._asked &= ~_bit(code)
+
+    def __repr__(self) -> str:
+        return repr(set(self))
+
+
+class _QuestionOrder(MutableSequence):
+    __slots__ = ("_state",)
+
+    def __init__(self, state: SessionState):
+        self._state = state
+
+    def _codes(self) -> array:
+        if self._state._order is None:
+            self._state._order = array("i")
+        return self._state._order
+
+    def __len__(self) -> int:
+        return len(self._state._order) if self._state._order is not None else 0
+
+    def __getitem__(self, index):
+        codes = self._state._order if self._state._order is not None else array("i")
+        if isinstance(index, slice):
+            return [self._state._decode(code) for code in codes[index]]
+        return self._state._decode(codes[index])
+
+    def __setitem__(self, index, question_id):
+        if isinstance(index, slice):
+            self._codes()[index] = array("i", [self._state._encode(q) for q in question_id])
+        else:
+            self._codes()[index] = self._state._encode(question_id)
+
+    def __delitem__(self, index):
+        del self._codes()[index]
+
+    def insert(self, index, question_id):
+        self._codes().insert(index, self._state._encode(question_id))
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class _AeonAnswers(MutableMapping):
+    __slots__ = ("_state",)
+
+    def __init__(self, state: SessionState):
+        self._state = state
+
+    def _position(self, question_id) -> int:
+        code = self._state._lookup(question_id)
+        pairs = self._state._aeon
+        if code is not None and pairs:
+            for i in range(0, len(pairs), 2):
+                if pairs[i] == code:
+                    return i
+        return -1
+
+    def __getitem__(self, question_id):
+        i = self._position(question_id)
+        if i < 0:
+            raise KeyError(question_id)
+        return self._state._aeon[i + 1]
+
+    def __setitem__(self, question_id, text):
+        pairs = self._state._aeon or ()
+        i = self._position(question_id)
+        if i >= 0:
+            if pairs[i + 1] == text:
+                return
+            self._state._aeon = pairs[:i + 1] + (text,) + pairs[i + 2:]
+            self._state._answer_changed(pairs[i], is_new=False)
+        else:
+            code = self._state._encode(question_id)
+            self._state._aeon = pairs + (code, text)
+            self._state._answer_changed(code, is_new=True)
+
+    def __delitem__(self, question_id):
+        i = self._position(question_id)
+        if i < 0:
+            raise KeyError(question_id)
+        pairs = self._state._aeon
+        self._state._aeon = pairs[:i] + pairs[i + 2:] or None
+        self._state._answer_deleted(pairs[i])
+
+    def __iter__(self):
+        pairs = self._state._aeon or ()
+        return (self._state._decode(pairs[i]) for i in range(0, len(pairs), 2))
+
+    def __len__(self) -> int:
+        return len(self._state._aeon) // 2 if self._state._aeon else 0
+
+    def items(self):
+        pairs = self._state._aeon or ()
+        return [(self._state._decode(pairs[i]), pairs[i + 1]) for i in range(0, len(pairs), 2)]
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class _Answers(MutableSequence):
+    """Исходные ответы; элементы собираются в dict при чтении (копии, не ссылки)"""
+
+    __slots__ = ("_state",)
+
+    def __init__(self, state: SessionState):
+        self._state = state
+
+    def _modify(self, change):
+        entries = list(self._state._answers or ())
+        change(entries)
+        self._state._answers = tuple(entries) or None
+
+    def _pack(self, answer):
+        if isinstance(answer, dict) and "question_id" in answer and "answer" in answer:
+            try:
+                code = self._state._encode(answer["question_id"])
+            except TypeError:
+                return dict(answer)
+            extra = {k: v for k, v in answer.items() if k not in ("question_id", "answer")}
+            return (code, answer["answer"], extra) if extra else (code, answer["answer"])
+        # Нестандартная запись хранится как есть
+        return dict(answer) if isinstance(answer, dict) else answer
+
+    def _unpack(self, entry):
+        if not isinstance(entry, tuple):
+            return dict(entry) if isinstance(entry, dict) else entry
+        answer = {"question_id": self._state._decode(entry[0]), "answer": entry[1]}
+        if len(entry) > 2:
+            answer.update(entry[2])
+        return answer
+
+    def __len__(self) -> int:
+        return len(self._state._answers) if self._state._answers else 0
+
+    def __getitem__(self, index):
+        entries = self._state._answers or ()
+        if isinstance(index, slice):
+            return [self._unpack(entry) for entry in entries[index]]
+        return self._unpack(entries[index])
+
+    def __setitem__(self, index, answer):
+        if isinstance(index, slice):
+            packed = [self._pack(a) for a in answer]
+        else:
+            packed = self._pack(answer)
+        self._modify(lambda entries: entries.__setitem__(index, packed))
+
+    def __delitem__(self, index):
+        self._modify(lambda entries: entries.__delitem__(index))
+
+    def insert(self, index, answer):
+        packed = self._pack(answer)
+        self._modify(lambda entries: entries.insert(index, packed))
+
+    def extend(self, answers):
+        packed = [self._pack(a) for a in answers]
+        if packed:
+            self._modify(lambda entries: entries.extend(packed))
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+# ===== Сводка сессии для эндпоинтов только на чтение =====
+
+class SessionSummary:
+    """Метаданные сессии без ответов: даты, флаг завершения и счётчики.
+
+    Читается из базы одним узким SELECT (см. session_store.read_session_summary).
+    Тяжёлые поля (answers, aeon_answers, asked_questions, question_order)
+    подгружаются полной загрузкой сессии при первом обращении. Сводка
+    только для чтения: изменять и сохранять нужно полноценный SessionState.
+    """
+
+    __slots__ = ("current_question_index", "completed", "created_ts", "last_activity_ts", "bank_version",
+                 "final_score", "answered_count", "asked_count", "_loader", "_state")
+
+    def __init__(self, created_at, last_activity, completed: bool = False,
+                 current_question_index: int = 0, answered_count: int = 0, asked_count: int = 0,
+                 loader: Optional[Callable[[], Optional[SessionState]]] = None,
+                 state: Optional[SessionState] = None, bank_version: Optional[str] = None,
+                 final_score: Optional[int] = None):
+        self.current_question_index = current_question_index or 0
+        self.bank_version = bank_version
+        self.final_score = final_score
+        self.completed = bool(completed)
+        self.created_ts = _to_timestamp(created_at)
+        self.last_activity_ts = _to_timestamp(last_activity if last_activity is not None else created_at)
+        self.answered_count = answered_count
+        self.asked_count = asked_count
+        self._loader = loader
+        self._state = state
+
+    created_at = SessionState.created_at
+    last_activity = SessionState.last_activity
+
+    def full(self) -> Optional[SessionState]:
+        """Полное состояние сессии (загружается один раз)"""
+        if self._state is None and self._loader is not None:
+            self._state = self._loader()
+            self._loader = None
+        return self._state
+
+    @property
+    def loaded(self) -> bool:
+        return self._state is not None
+
+    @property
+    def answers(self):
+        return self.full().answers
+
+    @property
+    def aeon_answers(self):
+        return self.full().aeon_answers
+
+    @property
+    def asked_questions(self):
+        return self.full().asked_questions
+
+    @property
+    def question_order(self):
+        return self.full().question_order
+
+    def __repr__(self) -> str:
+        return (f"SessionSummary(created_at={self.created_at!r}, completed={self.completed}, "
+                f"answered={self.answered_count}, asked={self.asked_count}, loaded={self.loaded})")
+
+
+def summary_from_state(session_state: SessionState) -> SessionSummary:
+    """Сводка по уже загруженной сессии (повторно в базу не ходит)"""
+    return SessionSummary(
+        created_at=session_state.created_ts,
+        last_activity=session_state.last_activity_ts,
+        completed=session_state.completed,
+        current_question_index=session_state.current_question_index,
+        answered_count=len(session_state.aeon_answers),
+        asked_count=len(session_state.question_order),
+        state=session_state,
+        bank_version=session_state.bank_version,
+        final_score=session_state.final_score,
+    )
+
+
+def summary_from_row(row: dict, loader=None) -> SessionSummary:
+    """Сводка по снимку; SessionState из него строится только по требованию"""
+    return SessionSummary(
+        created_at=row["created_at"],
+        last_activity=row["last_activity"],
+        completed=row["completed"],
+        current_question_index=row["current_question_index"],
+        answered_count=len(row["aeon_answers"]),
+        asked_count=len(row["question_order"]),
+        loader=loader if loader is not None else (lambda: session_from_row(row)),
+        bank_version=row.get("bank_version"),
+        final_score=row.get("final_score"),
+    )
+
+
+# ===== Снимки для хранилищ =====
+
+def session_to_row(session_state: SessionState) -> dict:
+    """Снимок состояния сессии для отложенной записи (без сериализации)"""
+    return {
+        "answers": list(session_state.answers),
+        "aeon_answers": dict(session_state.aeon_answers.items()),
+        "asked_questions": list(session_state.asked_questions),
+        "current_question_index": session_state.current_question_index,
+        "created_at": session_state.created_at,
+        "completed": session_state.completed,
+        "question_order": list(session_state.question_order),
+        "last_activity": session_state.last_activity,
+        "quality": session_state.qualities(),
+        "bank_version": session_state.bank_version,
+        "final_score": session_state.final_score,
+    }
+
+
+def session_from_row(row: dict) -> SessionState:
+    """Восстанавливает SessionState из снимка"""
+    session_state = SessionState(
+        answers=row["answers"],
+        aeon_answers=row["aeon_answers"],
+        asked_questions=row["asked_questions"],
+        current_question_index=row["current_question_index"],
+        created_at=row["created_at"],
+        completed=row["completed"],
+        question_order=row["question_order"],
+        last_activity=row["last_activity"],
+        bank_version=row.get("bank_version"),
+        final_score=row.get("final_score"),
+    )
+    for question_id, quality in (row.get("quality") or {}).items():
+        if quality and question_id in session_state.aeon_answers:
+            session_state.set_quality(question_id, quality)
+    return session_state
+
+
+def row_to_json(row: dict) -> str:
+    """Снимок -> JSON (даты в ISO 8601) для внешних хранилищ"""
+    return json.dumps(dict(
+        row,
+        created_at=row["created_at"].isoformat(),
+        last_activity=row["last_activity"].isoformat(),
+    ), ensure_ascii=False)
+
+
+def row_from_json(data) -> dict:
+    row = json.loads(data)
+    row["created_at"] = datetime.fromisoformat(row["created_at"])
+    row["last_activity"] = datetime.fromisoformat(row["last_activity"])
+    return row
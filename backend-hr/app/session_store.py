@@ -0,0 +1,847 @@
+"""Хранилища состояния сессий.
+
+SessionStore — интерфейс за load_session_from_db / save_session_to_db /
+_save_session_in_memory в app.api. Реализации:
+
+* InProcessSessionStore — LRU/TTL-кэш в памяти процесса + write-behind
+  запись в SQL. Быстрее всего, но работает только с одним воркером.
+* SqlSessionStore — общая SQL-база как единственный источник истины:
+  чтение при каждом обращении, запись сразу (write-through).
+* RedisSessionStore — горячее состояние в Redis-совместимом сервере с
+  TTL, долговременная копия пишется в SQL через write-behind очередь.
+
+Хранилище выбирается переменной окружения SESSION_STORE
+(memory | sql | redis). Для нескольких воркеров gunicorn нужен sql или redis.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.redis_client import RedisClient
+from app.session_cache import SessionCache
+from app.session_persistence import WriteBehindQueue
+from app.session_state import (
+    SessionState, SessionSummary, row_from_json, row_to_json, session_from_row, session_to_row,
+    summary_from_row, summary_from_state,
+)
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_SESSION_PREFIX = os.getenv("REDIS_SESSION_PREFIX", "hr:session:")
+REDIS_SESSION_TTL = int(os.getenv("REDIS_SESSION_TTL", "7200"))
+
+
+# ===== SQL helpers =====
+
+def ping_database():
+    """SELECT 1 мимо ORM — проверка восстановления для circuit breaker"""
+    from app.db_models import engine
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+
+# Вместо проверки соединения перед каждым запросом: ошибки самих запросов
+# открывают breaker, а восстановление проверяется в фоне
+db_breaker = CircuitBreaker("database", probe=ping_database)
+
+
+def _database_writable() -> bool:
+    return db_breaker.closed
+
+
+def database_stats() -> Dict[str, Any]:
+    from app.db_models import pool_stats
+    return {"breaker": db_breaker.stats(), "pools": pool_stats()}
+
+
+def _answer_to_db(token: str, position: int, answer: dict, quality: Optional[dict] = None) -> dict:
+    extra = {k: v for k, v in answer.items() if k not in ("question_id", "answer")}
+    return {
+        "session_token": token,
+        "position": position,
+        "question_id": answer.get("question_id"),
+        "answer": answer.get("answer"),
+        "extra": extra or None,
+        "quality": quality,
+        "scorer_version": quality["version"] if quality else None,
+    }
+
+
+def _answer_from_db(db_answer) -> dict:
+    answer = {"question_id": db_answer.question_id, "answer": db_answer.answer}
+    if db_answer.extra:
+        answer.update(db_answer.extra)
+    return answer
+
+
+def _session_select(token: str):
+    from app.db_models import Session
+    from sqlalchemy import select
+    return select(Session).where(Session.token == token)
+
+
+def _answers_select(token: str):
+    from app.db_models import SessionAnswer
+    from sqlalchemy import select
+    return (select(SessionAnswer)
+            .where(SessionAnswer.session_token == token)
+            .order_by(SessionAnswer.position))
+
+
+def _questions_select(token: str):
+    from app.db_models import SessionQuestion
+    from sqlalchemy import select
+    return (select(SessionQuestion.question_id)
+            .where(SessionQuestion.session_token == token)
+            .order_by(SessionQuestion.position))
+
+
+def _summary_select(token: str):
+    """Один узкий SELECT: скалярные колонки сессии и счётчики дочерних строк"""
+    from app.db_models import Session, SessionAnswer, SessionQuestion
+    from sqlalchemy import select, func, distinct
+    # aeon_answers — словарь по question_id, поэтому считаются различные вопросы
+    answered = (select(func.count(distinct(SessionAnswer.question_id)))
+                .where(SessionAnswer.session_token == Session.token)
+                .scalar_subquery())
+    asked = (select(func.count())
+             .where(SessionQuestion.session_token == Session.token)
+             .scalar_subquery())
+    return select(
+        Session.created_at, Session.last_activity, Session.completed,
+        Session.current_question_index, answered.label("answered_count"), asked.label("asked_count"),
+        Session.bank_version, Session.final_score,
+    ).where(Session.token == token)
+
+
+def _assemble_row(db_session, db_answers, question_order: List[str]) -> dict:
+    return {
+        "answers": [_answer_from_db(a) for a in db_answers],
+        "aeon_answers": {a.question_id: a.answer for a in db_answers},
+        "asked_questions": list(question_order),
+        "current_question_index": db_session.current_question_index,
+        "created_at": db_session.created_at,
+        "completed": db_session.completed,
+        "question_order": question_order,
+        "last_activity": db_session.last_activity,
+        "bank_version": db_session.bank_version,
+        "final_score": db_session.final_score,
+        # Как и aeon_answers: по последнему ответу на вопрос
+        "quality": {question_id: quality for question_id, quality in
+                    {a.question_id: a.quality for a in db_answers}.items() if quality},
+    }
+
+
+def _write_lookups(tokens: List[str]):
+    """Запросы, нужные для записи пачки: id сессий и последние position"""
+    from app.db_models import Session, SessionAnswer, SessionQuestion
+    from sqlalchemy import select, func
+    return (
+        select(Session.token, Session.id).where(Session.token.in_(tokens)),
+        select(SessionAnswer.session_token, func.max(SessionAnswer.position))
+        .where(SessionAnswer.session_token.in_(tokens))
+        .group_by(SessionAnswer.session_token),
+        select(SessionQuestion.session_token, func.max(SessionQuestion.position))
+        .where(SessionQuestion.session_token.in_(tokens))
+        .group_by(SessionQuestion.session_token),
+    )
+
+
+def _plan_writes(rows: List[Tuple[str, dict]], existing: dict,
+                 last_answer: dict, last_question: dict) -> list:
+    """Превращает снимки в список (statement, params) для executemany"""
+    from app.db_models import Session, SessionAnswer, SessionQuestion
+    from sqlalchemy import insert, update
+
+    updates, inserts, new_answers, new_questions = [], [], [], []
+    for token, row in rows:
+        values = {
+            "current_question_index": row["current_question_index"],
+            "completed": row["completed"],
+            "last_activity": row["last_activity"],
+            "bank_version": row.get("bank_version"),
+            "final_score": row.get("final_score"),
+        }
+        if token in existing:
+            updates.append({"id": existing[token], **values})
+        else:
+            inserts.append({"token": token, "created_at": row["created_at"], **values})
+
+        start = last_answer.get(token, -1) + 1
+        quality = row.get("quality") or {}
+        aeon_answers = row["aeon_answers"]
+        for position, answer in enumerate(row["answers"][start:], start):
+            question_id = answer.get("question_id")
+            # Оценка относится к тексту из aeon_answers — пишем её только к нему
+            scored = quality.get(question_id) if aeon_answers.get(question_id) == answer.get("answer") else None
+            new_answers.append(_answer_to_db(token, position, answer, scored))
+        start = last_question.get(token, -1) + 1
+        for position, question_id in enumerate(row["question_order"][start:], start):
+            new_questions.append({
+                "session_token": token,
+                "position": position,
+                "question_id": question_id,
+                "asked_at": row["last_activity"],
+            })
+
+    print(f"DEBUG: Flushing {len(updates)} updated and {len(inserts)} new sessions "
+          f"(+{len(new_answers)} answers, +{len(new_questions)} questions) to PostgreSQL")
+    return [(stmt, params) for stmt, params in (
+        (update(Session), updates),
+        (insert(Session), inserts),
+        (insert(SessionAnswer), new_answers),
+        (insert(SessionQuestion), new_questions),
+    ) if params]
+
+
+def _read_session_row(token: str) -> Optional[dict]:
+    from app.db_models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db_session = db.execute(_session_select(token)).scalar_one_or_none()
+        if not db_session:
+            return None
+        db_answers = db.execute(_answers_select(token)).scalars().all()
+        question_order = list(db.execute(_questions_select(token)).scalars())
+        return _assemble_row(db_session, db_answers, question_order)
+    finally:
+        db.close()
+
+
+async def _aread_session_row(token: str) -> Optional[dict]:
+    from app.db_models import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        db_session = (await db.execute(_session_select(token))).scalar_one_or_none()
+        if not db_session:
+            return None
+        db_answers = (await db.execute(_answers_select(token))).scalars().all()
+        question_order = list((await db.execute(_questions_select(token))).scalars())
+        return _assemble_row(db_session, db_answers, question_order)
+
+
+def _read_session_summary(token: str):
+    from app.db_models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return db.execute(_summary_select(token)).one_or_none()
+    finally:
+        db.close()
+
+
+async def _aread_session_summary(token: str):
+    from app.db_models import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(_summary_select(token))).one_or_none()
+
+
+def _write_session_rows(rows: List[Tuple[str, dict]]):
+    from app.db_models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        existing, last_answer, last_question = (
+            dict(db.execute(stmt).all()) for stmt in _write_lookups([t for t, _ in rows])
+        )
+        for stmt, params in _plan_writes(rows, existing, last_answer, last_question):
+            db.execute(stmt, params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def _awrite_session_rows(rows: List[Tuple[str, dict]]):
+    from app.db_models import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        try:
+            lookups = [dict((await db.execute(stmt)).all())
+                       for stmt in _write_lookups([t for t, _ in rows])]
+            for stmt, params in _plan_writes(rows, *lookups):
+                await db.execute(stmt, params)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+def is_connectivity_error(error: BaseException) -> bool:
+    """Ошибка связи с базой (открывает breaker), а не данных или запроса.
+
+    IntegrityError и прочие ошибки данных (например, гонка PK между
+    воркерами) означают, что база отвечает, — на breaker они не влияют.
+    """
+    from sqlalchemy import exc as sa_exc
+
+    if isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError,
+                              asyncio.TimeoutError, ConnectionError))
+
+
+def _guarded(fn, *args):
+    db_breaker.guard()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        if is_connectivity_error(e):
+            db_breaker.record_failure(e)
+        raise
+    db_breaker.record_success()
+    return result
+
+
+async def _aguarded(fn, *args):
+    db_breaker.guard()
+    try:
+        result = await fn(*args)
+    except Exception as e:
+        if is_connectivity_error(e):
+            db_breaker.record_failure(e)
+        raise
+    db_breaker.record_success()
+    return result
+
+
+def read_session_row(token: str) -> Optional[dict]:
+    """Собирает снимок сессии из строки sessions и дочерних строк; None, если её нет"""
+    return _guarded(_read_session_row, token)
+
+
+async def aread_session_row(token: str) -> Optional[dict]:
+    """Асинхронная версия read_session_row (SQLAlchemy asyncio)"""
+    return await _aguarded(_aread_session_row, token)
+
+
+def read_session_summary(token: str):
+    """Строка (created_at, last_activity, completed, current_question_index,
+    answered_count, asked_count, bank_version) без ответов; None, если сессии нет"""
+    return _guarded(_read_session_summary, token)
+
+
+async def aread_session_summary(token: str):
+    return await _aguarded(_aread_session_summary, token)
+
+
+def write_session_rows(rows: List[Tuple[str, dict]]):
+    """Записывает пачку сессий одной транзакцией.
+
+    Строка sessions обновляется только скалярными полями, а из ответов и
+    вопросов дописываются лишь те, что новее уже сохранённых (по position),
+    поэтому стоимость записи не растёт с количеством и длиной ответов.
+    При открытом breaker бросает CircuitOpenError, не обращаясь к базе.
+    """
+    _guarded(_write_session_rows, rows)
+
+
+async def awrite_session_rows(rows: List[Tuple[str, dict]]):
+    """Асинхронная версия write_session_rows"""
+    await _aguarded(_awrite_session_rows, rows)
+
+
+def _delete_session_row(token: str):
+    from app.db_models import SessionLocal, Session, SessionAnswer, SessionQuestion
+
+    db = SessionLocal()
+    try:
+        db.query(SessionAnswer).filter(SessionAnswer.session_token == token).delete()
+        db.query(SessionQuestion).filter(SessionQuestion.session_token == token).delete()
+        db.query(Session).filter(Session.token == token).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def delete_session_row(token: str):
+    _guarded(_delete_session_row, token)
+
+
+def _load_from_sql(token: str) -> Optional[dict]:
+    try:
+        print(f"DEBUG: Attempting to load session {token} from PostgreSQL...")
+        row = read_session_row(token)
+        if row is None:
+            print(f"DEBUG: Session {token} not found in database")
+        return row
+    except CircuitOpenError:
+        print(f"WARNING: Database not available, session {token} not found")
+        return None
+    except Exception as e:
+        print(f"ERROR: Database error while loading session: {e}")
+        return None
+
+
+async def _aload_from_sql(token: str) -> Optional[dict]:
+    try:
+        print(f"DEBUG: Attempting to load session {token} from PostgreSQL (async)...")
+        row = await aread_session_row(token)
+        if row is None:
+            print(f"DEBUG: Session {token} not found in database")
+        return row
+    except CircuitOpenError:
+        print(f"WARNING: Database not available, session {token} not found")
+        return None
+    except Exception as e:
+        print(f"ERROR: Database error while loading session: {e}")
+        return None
+
+
+def _summary(row, loader) -> SessionSummary:
+    return SessionSummary(
+        created_at=row.created_at,
+        last_activity=row.last_activity,
+        completed=row.completed,
+        current_question_index=row.current_question_index,
+        answered_count=row.answered_count,
+        asked_count=row.asked_count,
+        loader=loader,
+        bank_version=row.bank_version,
+        final_score=row.final_score,
+    )
+
+
+def _load_summary_from_sql(token: str, loader) -> Optional[SessionSummary]:
+    try:
+        row = read_session_summary(token)
+    except CircuitOpenError:
+        print(f"WARNING: Database not available, session {token} not found")
+        return None
+    except Exception as e:
+        print(f"ERROR: Database error while loading session summary: {e}")
+        return None
+    return _summary(row, loader) if row is not None else None
+
+
+async def _aload_summary_from_sql(token: str, loader) -> Optional[SessionSummary]:
+    try:
+        row = await aread_session_summary(token)
+    except CircuitOpenError:
+        print(f"WARNING: Database not available, session {token} not found")
+        return None
+    except Exception as e:
+        print(f"ERROR: Database error while loading session summary: {e}")
+        return None
+    return _summary(row, loader) if row is not None else None
+
+
+# ===== Stores =====
+
+class SessionStore:
+    """Интерфейс хранилища сессий"""
+
+    name = "base"
+
+    def load(self, token: str) -> Optional[SessionState]:
+        """Возвращает сессию или None"""
+        raise NotImplementedError
+
+    def put(self, token: str, session_state: SessionState):
+        """Обновляет горячую (быстро доступную) копию сессии"""
+        raise NotImplementedError
+
+    def save(self, token: str, session_state: SessionState, flush: bool = False):
+        """Сохраняет сессию; flush=True — гарантированно записать в SQL сейчас"""
+        raise NotImplementedError
+
+    def delete(self, token: str):
+        raise NotImplementedError
+
+    # Асинхронные варианты для async-эндпоинтов: не блокируют event loop
+    # на обращениях к БД. По умолчанию — синхронная версия в пуле потоков.
+
+    async def aload(self, token: str) -> Optional[SessionState]:
+        return await asyncio.to_thread(self.load, token)
+
+    async def asave(self, token: str, session_state: SessionState, flush: bool = False):
+        await asyncio.to_thread(self.save, token, session_state, flush)
+
+    async def adelete(self, token: str):
+        await asyncio.to_thread(self.delete, token)
+
+    # Сводка для эндпоинтов только на чтение: даты, completed и счётчики.
+    # Реализации берут её из памяти, если сессия там есть, иначе — одним
+    # узким SELECT; ответы подгружаются только при обращении к ним.
+
+    def load_summary(self, token: str) -> Optional[SessionSummary]:
+        session_state = self.load(token)
+        return summary_from_state(session_state) if session_state is not None else None
+
+    async def aload_summary(self, token: str) -> Optional[SessionSummary]:
+        return await asyncio.to_thread(self.load_summary, token)
+
+    def local_sessions(self) -> List[Tuple[str, SessionState]]:
+        """Сессии, которые лежат в памяти этого процесса (для админки)"""
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        return {"store": self.name}
+
+    async def run(self):
+        """Фоновые задачи хранилища (запускаются из app.main)"""
+
+    def stop(self):
+        """Останавливает фоновые задачи и дописывает данные"""
+
+
+class InProcessSessionStore(SessionStore):
+    """Кэш в памяти процесса + write-behind запись в SQL"""
+
+    name = "memory"
+
+    def __init__(self, cache: Optional[SessionCache] = None,
+                 writer: Optional[WriteBehindQueue] = None):
+        self.cache = cache if cache is not None else SessionCache()
+        self.writer = writer if writer is not None else WriteBehindQueue(
+            write_session_rows, async_writer=awrite_session_rows, available=_database_writable)
+
+    def _from_memory(self, token: str) -> Optional[SessionState]:
+        session_state = self.cache.get(token)
+        if session_state:
+            print(f"DEBUG: Loaded session {token} from memory")
+            return session_state
+
+        # Сессия могла быть вытеснена из кэша до того, как флашер записал её в БД
+        row = self.writer.pending(token)
+        if row is not None:
+            return self._remember(token, row, "write-behind queue")
+        return None
+
+    def _remember(self, token: str, row: dict, source: str) -> SessionState:
+        session_state = session_from_row(row)
+        # Сохраняем в память для быстрого доступа
+        self.put(token, session_state)
+        print(f"DEBUG: Successfully loaded session {token} from {source}")
+        return session_state
+
+    def load(self, token: str) -> Optional[SessionState]:
+        session_state = self._from_memory(token)
+        if session_state is not None:
+            return session_state
+        row = _load_from_sql(token)
+        return self._remember(token, row, "PostgreSQL") if row is not None else None
+
+    async def aload(self, token: str) -> Optional[SessionState]:
+        session_state = self._from_memory(token)
+        if session_state is not None:
+            return session_state
+        row = await _aload_from_sql(token)
+        return self._remember(token, row, "PostgreSQL") if row is not None else None
+
+    def load_summary(self, token: str) -> Optional[SessionSummary]:
+        session_state = self._from_memory(token)
+        if session_state is not None:
+            return summary_from_state(session_state)
+        # В кэш не кладём: сводка неполная, а полная сессия загрузится при обращении
+        return _load_summary_from_sql(token, lambda: self.load(token))
+
+    async def aload_summary(self, token: str) -> Optional[SessionSummary]:
+        session_state = self._from_memory(token)
+        if session_state is not None:
+            return summary_from_state(session_state)
+        return await _aload_summary_from_sql(token, lambda: self.load(token))
+
+    def put(self, token: str, session_state: SessionState):
+        self.cache[token] = session_state
+
+    def save(self, token: str, session_state: SessionState, flush: bool = False):
+        self.put(token, session_state)
+        self.writer.enqueue(token, session_to_row(session_state))
+
+        if flush:
+            if not self.writer.flush_token(token):
+                print(f"WARNING: Database not available, session {token} kept in write-behind queue")
+        elif self.writer.is_overdue():
+            # Флашер не успевает (или не запущен) — не даём данным устареть сильнее лимита
+            self.writer.flush()
+
+    async def asave(self, token: str, session_state: SessionState, flush: bool = False):
+        self.put(token, session_state)
+        self.writer.enqueue(token, session_to_row(session_state))
+
+        if flush:
+            if not await self.writer.aflush_token(token):
+                print(f"WARNING: Database not available, session {token} kept in write-behind queue")
+        elif self.writer.is_overdue():
+            await self.writer.aflush()
+
+    def delete(self, token: str):
+        self.cache.pop(token, None)
+        self.writer.discard(token)
+
+    async def adelete(self, token: str):
+        self.delete(token)
+
+    def local_sessions(self) -> List[Tuple[str, SessionState]]:
+        return self.cache.items()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": self.name,
+            "cache": self.cache.stats(),
+            "write_behind": dict(self.writer.stats, pending=len(self.writer)),
+        }
+
+    async def run(self):
+        await asyncio.gather(self.writer.run(), self.cache.run_sweeper())
+
+    def stop(self):
+        self.cache.stop_sweeper()
+        self.writer.stop()
+
+
+class SqlSessionStore(SessionStore):
+    """Общая SQL-база: каждый воркер читает и пишет напрямую.
+
+    Если база недоступна (ошибка записи или открытый breaker), сессия
+    остаётся в локальном fallback-кэше, обслуживается из него и дописывается
+    в базу в фоне, когда breaker закроется.
+    """
+
+    name = "sql"
+
+    def __init__(self, fallback: Optional[SessionCache] = None,
+                 resync_interval: float = 5.0):
+        self.fallback = fallback if fallback is not None else SessionCache()
+        self.resync_interval = resync_interval
+        self._stopped: Optional[asyncio.Event] = None
+
+    def load(self, token: str) -> Optional[SessionState]:
+        session_state = self.fallback.get(token)
+        if session_state is not None:
+            return session_state
+        row = _load_from_sql(token)
+        return session_from_row(row) if row is not None else None
+
+    async def aload(self, token: str) -> Optional[SessionState]:
+        session_state = self.fallback.get(token)
+        if session_state is not None:
+            return session_state
+        row = await _aload_from_sql(token)
+        return session_from_row(row) if row is not None else None
+
+    def load_summary(self, token: str) -> Optional[SessionSummary]:
+        session_state = self.fallback.get(token)
+        if session_state is not None:
+            return summary_from_state(session_state)
+        return _load_summary_from_sql(token, lambda: self.load(token))
+
+    async def aload_summary(self, token: str) -> Optional[SessionSummary]:
+        session_state = self.fallback.get(token)
+        if session_state is not None:
+            return summary_from_state(session_state)
+        return await _aload_summary_from_sql(token, lambda: self.load(token))
+
+    def put(self, token: str, session_state: SessionState):
+        # Горячей копии нет: источник истины — база
+        pass
+
+    def _keep_in_memory(self, token: str, session_state: SessionState, error: Exception):
+        if not isinstance(error, CircuitOpenError):
+            print(f"ERROR: Failed to save session to PostgreSQL: {error}")
+        self.fallback[token] = session_state
+
+    def save(self, token: str, session_state: SessionState, flush: bool = False):
+        try:
+            write_session_rows([(token, session_to_row(session_state))])
+        except Exception as e:
+            self._keep_in_memory(token, session_state, e)
+        else:
+            self.fallback.pop(token, None)
+
+    async def asave(self, token: str, session_state: SessionState, flush: bool = False):
+        try:
+            await awrite_session_rows([(token, session_to_row(session_state))])
+        except Exception as e:
+            self._keep_in_memory(token, session_state, e)
+        else:
+            self.fallback.pop(token, None)
+
+    def delete(self, token: str):
+        self.fallback.pop(token, None)
+        try:
+            delete_session_row(token)
+        except Exception as e:
+            print(f"ERROR: Failed to delete session from PostgreSQL: {e}")
+
+    def resync(self) -> int:
+        """Дописывает в базу сессии из fallback-кэша; возвращает их число"""
+        if not self.fallback or not db_breaker.closed:
+            return 0
+        pending = self.fallback.items()
+        try:
+            write_session_rows([(token, session_to_row(state)) for token, state in pending])
+        except Exception as e:
+            print(f"ERROR: Failed to resync {len(pending)} sessions to PostgreSQL: {e}")
+            return 0
+        for token, state in pending:
+            # Сессию могли обновить за время записи — тогда она остаётся в кэше
+            if self.fallback.get(token) is state:
+                self.fallback.pop(token, None)
+        print(f"DEBUG: Resynced {len(pending)} sessions from memory to PostgreSQL")
+        return len(pending)
+
+    def local_sessions(self) -> List[Tuple[str, SessionState]]:
+        return self.fallback.items()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"store": self.name, "fallback_sessions": len(self.fallback)}
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        sweeper = asyncio.create_task(self.fallback.run_sweeper())
+        while not self._stopped.is_set():
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.resync_interval)
+            except asyncio.TimeoutError:
+                pass
+            # Последняя дозапись — и после stop(), не в потоке цикла событий
+            if self.fallback:
+                await asyncio.to_thread(self.resync)
+        await sweeper
+
+    def stop(self):
+        """Останавливает фоновую задачу; оставшееся допишет run() перед выходом, без задачи — сразу"""
+        self.fallback.stop_sweeper()
+        if self._stopped is not None:
+            self._stopped.set()
+        else:
+            self.resync()
+
+
+class RedisSessionStore(SessionStore):
+    """Горячее состояние в Redis-совместимом сервере, копия в SQL через write-behind.
+
+    Write-behind очередь у каждого воркера своя, поэтому SQL-копия может
+    отставать от Redis на max_staleness; при чтении Redis приоритетнее.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: RedisClient, prefix: str = REDIS_SESSION_PREFIX,
+                 ttl: int = REDIS_SESSION_TTL, writer: Optional[WriteBehindQueue] = None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.writer = writer if writer is not None else WriteBehindQueue(
+            write_session_rows, async_writer=awrite_session_rows, available=_database_writable)
+        self.errors = 0
+
+    def _key(self, token: str) -> str:
+        return self.prefix + token
+
+    def _get_hot_row(self, token: str) -> Optional[dict]:
+        try:
+            data = self.client.get(self._key(token))
+            if data is not None:
+                return row_from_json(data)
+        except Exception as e:
+            self.errors += 1
+            print(f"ERROR: Redis error while loading session: {e}")
+        return None
+
+    def _get_hot(self, token: str) -> Optional[SessionState]:
+        row = self._get_hot_row(token)
+        return session_from_row(row) if row is not None else None
+
+    def load(self, token: str) -> Optional[SessionState]:
+        session_state = self._get_hot(token)
+        if session_state is not None:
+            return session_state
+        row = self.writer.pending(token) or _load_from_sql(token)
+        if row is None:
+            return None
+        session_state = session_from_row(row)
+        self.put(token, session_state)
+        return session_state
+
+    async def aload(self, token: str) -> Optional[SessionState]:
+        # Клиент Redis синхронный — его вызовы уходят в пул потоков
+        session_state = await asyncio.to_thread(self._get_hot, token)
+        if session_state is not None:
+            return session_state
+        row = self.writer.pending(token) or await _aload_from_sql(token)
+        if row is None:
+            return None
+        session_state = session_from_row(row)
+        await asyncio.to_thread(self.put, token, session_state)
+        return session_state
+
+    def load_summary(self, token: str) -> Optional[SessionSummary]:
+        row = self._get_hot_row(token) or self.writer.pending(token)
+        if row is not None:
+            return summary_from_row(row)
+        return _load_summary_from_sql(token, lambda: self.load(token))
+
+    async def aload_summary(self, token: str) -> Optional[SessionSummary]:
+        row = await asyncio.to_thread(self._get_hot_row, token) or self.writer.pending(token)
+        if row is not None:
+            return summary_from_row(row)
+        return await _aload_summary_from_sql(token, lambda: self.load(token))
+
+    def put(self, token: str, session_state: SessionState):
+        try:
+            self.client.set(self._key(token), row_to_json(session_to_row(session_state)), ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"ERROR: Redis error while saving session: {e}")
+
+    def save(self, token: str, session_state: SessionState, flush: bool = False):
+        self.put(token, session_state)
+        self.writer.enqueue(token, session_to_row(session_state))
+        if flush:
+            self.writer.flush_token(token)
+        elif self.writer.is_overdue():
+            self.writer.flush()
+
+    async def asave(self, token: str, session_state: SessionState, flush: bool = False):
+        await asyncio.to_thread(self.put, token, session_state)
+        self.writer.enqueue(token, session_to_row(session_state))
+        if flush:
+            await self.writer.aflush_token(token)
+        elif self.writer.is_overdue():
+            await self.writer.aflush()
+
+    def delete(self, token: str):
+        try:
+            self.client.delete(self._key(token))
+        except Exception as e:
+            self.errors += 1
+            print(f"ERROR: Redis error while deleting session: {e}")
+        self.writer.discard(token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": self.name,
+            "redis_errors": self.errors,
+            "write_behind": dict(self.writer.stats, pending=len(self.writer)),
+        }
+
+    async def run(self):
+        try:
+            await self.writer.run()
+        finally:
+            # Клиент нужен флашеру до последней записи
+            self.client.close()
+
+    def stop(self):
+        self.writer.stop()
+        if not self.writer.started:
+            self.client.close()
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """Создаёт хранилище по имени из SESSION_STORE"""
+    if kind == "sql":
+        return SqlSessionStore()
+    if kind == "redis":
+        return RedisSessionStore(RedisClient(REDIS_URL))
+    if kind != "memory":
+        print(f"WARNING: Unknown SESSION_STORE={kind!r}, using in-process store")
+    return InProcessSessionStore()
@@ -0,0 +1,181 @@
+"""Кэш заданий /aeon/task с объединением одновременных запросов.
+
+Задание, которое генерирует ИИ, зависит только от кандидата, позиции и
+системного промпта (контекста банка вопросов сессии), поэтому ответ
+модели кэшируется по ключу из нормализованных входных данных
+(task_cache_key): регистр и лишние пробелы не дают новых ключей.
+
+Уровни:
+  * память процесса — LRU на TASK_CACHE_MAX заданий, TTL TASK_CACHE_TTL;
+  * таблица task_cache (TASK_CACHE_PERSIST) — задания переживают
+    перезапуск и общие для всех процессов; пока база недоступна, этот
+    уровень пропускается.
+
+Single-flight: если задание по ключу уже генерируется, одновременные
+запросы с тем же ключом ждут этот же вызов, а не отправляют в ИИ свой.
+Неудачная генерация (None) не кэшируется — ждавшие получают None и
+запасное задание.
+
+Доля запросов без обращения к ИИ и сэкономленные вызовы — в stats()
+(/stats, "task_cache").
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", str(7 * 24 * 3600)))
+TASK_CACHE_MAX = int(os.getenv("TASK_CACHE_MAX", "1000"))
+TASK_CACHE_PERSIST = os.getenv("TASK_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+
+
+def _normalize(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def task_cache_key(candidate: str, position: str, context: str, model: str) -> str:
+    """Ключ кэша: sha1 нормализованных кандидата и позиции, контекста и модели"""
+    raw = "\x1f".join((_normalize(candidate), _normalize(position), context or "", model or ""))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# ----- постоянный уровень -----
+
+def read_cached_task(key: str) -> Optional[Dict]:
+    from app.db_models import SessionLocal, TaskCacheEntry
+
+    db = SessionLocal()
+    try:
+        row = db.get(TaskCacheEntry, key)
+        if row is None or row.expires_at <= datetime.utcnow():
+            return None
+        return row.task
+    finally:
+        db.close()
+
+
+def write_cached_task(key: str, task: Dict, ttl: float):
+    """Сохраняет задание и заодно удаляет просроченные"""
+    from app.db_models import SessionLocal, TaskCacheEntry
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.query(TaskCacheEntry).filter(TaskCacheEntry.expires_at <= now).delete()
+        db.merge(TaskCacheEntry(key=key, task=task, created_at=now, expires_at=now + timedelta(seconds=ttl)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class TaskCache:
+    """TTL-кэш заданий в памяти и в базе с single-flight генерацией"""
+
+    def __init__(self, ttl: float = TASK_CACHE_TTL, max_entries: int = TASK_CACHE_MAX,
+                 persistent: Callable[[], bool] = lambda: TASK_CACHE_PERSIST,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Использовать ли таблицу task_cache сейчас (выключено или база недоступна — нет)
+        self.persistent = persistent
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()  # key -> (истекает, задание)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+        self.hits = 0
+        self.db_hits = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_failures = 0
+        self.db_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, task: Dict):
+        self._entries[key] = (self._clock() + self.ttl, task)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: str, generate: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        if self.persistent():
+            try:
+                task = await asyncio.to_thread(read_cached_task, key)
+            except Exception as e:
+                self.db_errors += 1
+                print(f"WARNING: Task cache lookup failed: {e}")
+                task = None
+            if task is not None:
+                self.db_hits += 1
+                self.put(key, task)
+                return task
+        self.upstream_calls += 1
+        task = await generate()
+        if task is None:
+            self.upstream_failures += 1
+            return None
+        self.put(key, task)
+        if self.persistent():
+            try:
+                await asyncio.to_thread(write_cached_task, key, task, self.ttl)
+            except Exception as e:
+                self.db_errors += 1
+                print(f"WARNING: Task cache write failed: {e}")
+        return task
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Задание из кэша или из generate(); одновременные вызовы с одним ключом делят один generate()"""
+        self.requests += 1
+        if not self.enabled:
+            self.upstream_calls += 1
+            return await generate()
+        task = self.get(key)
+        if task is not None:
+            self.hits += 1
+            return task
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            # shield: отмена одного ждущего запроса не отменяет общий вызов
+            return await asyncio.shield(inflight)
+        future = asyncio.ensure_future(self._load(key, generate))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        saved = self.hits + self.db_hits + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "requests": self.requests,
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_failures": self.upstream_failures,
+            "db_errors": self.db_errors,
+            "saved_calls": saved,
+            "hit_ratio": round(saved / self.requests, 3) if self.requests else None,
+        }
@@ -0,0 +1,61 @@
+"""Скорость analyze_answer_quality: подготовленный анализатор против прежней реализации.
+
+Ответы разной длины собираются из типичных фраз кандидата; для каждого
+размера печатается лучшее время одного вызова (мкс) и проверяется, что
+результаты совпадают.
+
+Запуск (из каталога backend-hr):
+  python benchmarks/bench_answer_quality.py
+  python benchmarks/bench_answer_quality.py --sizes 200,5000,20000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.answer_quality import _analyze_answer_quality_reference, analyze_answer_quality  # noqa: E402
+
+# Ключевые слова q_1 из data/questions/general.ru.json (импорт app.api поднял бы всё приложение)
+KEYWORDS = ["навыки", "опыт", "достижения", "профессионал"]
+PHRASES = [
+    "Я работал в команде из пяти человек", "отвечал за планирование релизов",
+    "например, мы перевели сервис на FastAPI", "конкретно я занимался базой данных",
+    "Опыт руководства у меня небольшой", "в такой ситуации я бы начал с метрик",
+]
+
+
+def make_answer(size: int, rng: random.Random) -> str:
+    parts = []
+    while sum(len(p) + 2 for p in parts) < size:
+        parts.append(rng.choice(PHRASES))
+    return ". ".join(parts)[:size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="60,500,5000", help="длины ответов через запятую")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        answer = make_answer(size, rng)
+        assert analyze_answer_quality(answer, KEYWORDS) == _analyze_answer_quality_reference(answer, KEYWORDS)
+        number = max(100, 200000 // max(size, 1))
+        timings = {}
+        for name, fn in (("reference", _analyze_answer_quality_reference), ("compiled", analyze_answer_quality)):
+            best = min(timeit.repeat(lambda: fn(answer, KEYWORDS), number=number, repeat=args.repeat))
+            timings[name] = best / number * 1e6
+        results[size] = timings
+        print(f"{size:>6} chars: reference {timings['reference']:7.1f} us, compiled {timings['compiled']:7.1f} us "
+              f"({timings['reference'] / timings['compiled']:.2f}x)")
+    return results
+
+
+if __name__ == "__main__":
+    main()
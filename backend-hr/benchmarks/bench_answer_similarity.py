@@ -0,0 +1,129 @@
+"""Индекс похожих ответов (MinHash-LSH) на большом числе сохранённых ответов.
+
+Строит индекс из --answers синтетических ответов на 10 вопросов (слова
+из большого словаря с частотами по Ципфу, часть ответов — копии чужих с
+дописанной фразой из benchmarks/corpus.py) и печатает: время сигнатуры
+одного ответа, массовую загрузку, время поиска похожих (медиана и p99,
+мкс), память на ответ и полноту поиска по сравнению с полным перебором.
+
+Запуск (из каталога backend-hr):
+  python benchmarks/bench_answer_similarity.py --answers 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import EN_PHRASES, RU_PHRASES  # noqa: E402
+from app.answer_similarity import (  # noqa: E402
+    MINHASH_PERMUTATIONS, MinHashIndex, _band_keys, minhash, similarity,
+)
+
+QUESTIONS = [f"q_{n}" for n in range(1, 11)]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    letters = "абвгдеёжзийклмнопрстуфхцчшщыэюя"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(size)]
+
+
+def make_answers(count: int, copy_share: float, rng: random.Random):
+    phrases = RU_PHRASES + EN_PHRASES
+    vocabulary = make_vocabulary(20000, rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    answers, originals = [], []
+    for n in range(count):
+        question_id = QUESTIONS[n % len(QUESTIONS)]
+        if originals and rng.random() < copy_share:
+            source_question, source = rng.choice(originals)
+            # Копия чужого ответа с дописанной фразой
+            answers.append((f"s{n}", source_question, source + " " + rng.choice(phrases)))
+            continue
+        text = " ".join(rng.choices(vocabulary, weights, k=rng.choice((30, 60, 120))))
+        answers.append((f"s{n}", question_id, text))
+        if len(originals) < 500:
+            originals.append((question_id, text))
+    return answers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=100000)
+    parser.add_argument("--copy-share", type=float, default=0.05)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    answers = make_answers(args.answers, args.copy_share, rng)
+
+    started = time.perf_counter()
+    signatures = [minhash(text) for _, _, text in answers]
+    per_answer = (time.perf_counter() - started) / len(answers) * 1e6
+    print(f"minhash: {per_answer:.0f} us per answer")
+
+    def build():
+        index = MinHashIndex()
+        entries = {}
+        for (token, question_id, _), signature in zip(answers, signatures):
+            ref = index._register(token, question_id, signature)
+            entries.setdefault(question_id, []).append((_band_keys(signature), ref))
+        for question_id, new in entries.items():
+            index._question_index(question_id).add_many(new)
+        return index
+
+    started = time.perf_counter()
+    index = build()
+    load_time = time.perf_counter() - started
+    # Память — отдельной сборкой: tracemalloc сильно замедляет загрузку
+    del index
+    tracemalloc.start()
+    index = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"bulk load: {load_time:.2f}s for {len(index)} answers, "
+          f"{memory / len(index):.0f} bytes per answer")
+
+    started = time.perf_counter()
+    for token, question_id, text in answers[-200:]:
+        index._questions[question_id].add(_band_keys(minhash(text)), 0)
+    print(f"single insert (incl. minhash): {(time.perf_counter() - started) / 200 * 1e6:.0f} us")
+
+    probes = rng.sample(range(len(answers)), args.lookups)
+    times = []
+    for n in probes:
+        token, question_id, _ = answers[n]
+        started = time.perf_counter()
+        index.similar(token, question_id, signatures[n])
+        times.append((time.perf_counter() - started) * 1e6)
+    print(f"lookup: median {percentile(times, 50):.1f} us, p99 {percentile(times, 99):.1f} us")
+
+    # Полнота: сколько пар выше порога находит LSH по сравнению с полным перебором
+    found = expected = 0
+    for n in probes[:50]:
+        token, question_id, _ = answers[n]
+        exact = {answers[m][0] for m in range(len(answers))
+                 if answers[m][1] == question_id and m != n
+                 and similarity(signatures[n], signatures[m]) >= index.threshold}
+        expected += len(exact)
+        found += len(exact & {other for other, _ in index.similar(token, question_id, signatures[n])})
+    recall = found / expected if expected else 1.0
+    print(f"recall vs brute force on 50 probes: {recall:.3f} ({found}/{expected} pairs, "
+          f"{MINHASH_PERMUTATIONS} permutations)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""Бенчмарк путей к ИИ: клиент на каждый запрос против общего пула.
+
+Поднимает локальный фейковый OpenAI (ASGI-приложение под uvicorn в
+отдельном потоке, /v1/chat/completions отвечает через --latency-ms) и
+гоняет через ASGI-транспорт эндпоинт /aeon/task/{token} — он ходит в ИИ
+на каждый запрос. --concurrency запросов идут одновременно, всего
+--requests. Режимы:
+
+  --mode per-call  — как было раньше: новый httpx.AsyncClient на каждый запрос
+  --mode shared    — app.llm_client: один пул keep-alive соединений
+  --mode both      — оба режима подряд и сравнение p50/p99
+
+Кэш заданий (app.task_cache) по умолчанию выключен, иначе все запросы
+с одной позицией, кроме первого, в ИИ не идут. С --task-cache он включён
+(только память), а --positions задаёт число разных позиций в запросах:
+печатаются доля запросов без обращения к ИИ и сэкономленные вызовы.
+
+--reject-every N — фейковый OpenAI отвечает 429 (Retry-After) на каждый
+N-й запрос; --llm-concurrency / --llm-rate включают ограничитель
+app.llm_limiter: печатаются его счётчики (429, отказы по сроку).
+
+Фейковый сервер работает по HTTP, поэтому разница показывает только цену
+нового TCP-соединения и создания клиента; на настоящем API к ней
+добавляется TLS-рукопожатие (--base-url направляет запросы на другой
+совместимый сервер, например локальный https-прокси).
+
+Запуск (из каталога backend-hr):
+  python benchmarks/bench_llm_client.py --requests 500 --concurrency 20 --latency-ms 20
+  python benchmarks/bench_llm_client.py --mode shared --task-cache --positions 5
+  python benchmarks/bench_llm_client.py --mode shared --reject-every 10 --llm-concurrency 8 --llm-rate 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FAKE_TASK = {"task": "Спроектируйте сервис очередей", "example": "Пример: брокер, ретраи, идемпотентность"}
+
+
+def configure_environment():
+    # До импорта app: временная база и кэш сессий в памяти — замеряем только путь к ИИ
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_llm_client_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SESSION_STORE"] = "memory"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+
+def make_fake_openai(latency_ms: float, reject_every: int = 0):
+    """ASGI-приложение с /v1/chat/completions: ответ через latency_ms, каждый reject_every-й — 429"""
+    body = json.dumps({"choices": [{"message": {"content": json.dumps(FAKE_TASK, ensure_ascii=False)}}]}).encode()
+    calls = [0]
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        calls[0] += 1
+        await asyncio.sleep(latency_ms / 1000)
+        if reject_every and calls[0] % reject_every == 0:
+            await send({"type": "http.response.start", "status": 429, "headers": [(b"retry-after", b"0.05")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def fake_openai_server(latency_ms: float, reject_every: int = 0):
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(make_fake_openai(latency_ms, reject_every), host="127.0.0.1", port=port,
+                                           log_level="warning", lifespan="off", backlog=4096))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def per_call_client_class():
+    import httpx
+    from app.llm_client import LLMClient
+
+    class PerCallClient(LLMClient):
+        """Поведение до общего клиента: новое соединение на каждый запрос"""
+
+        async def _send(self, payload, timeout):
+            self.clients_created += 1
+            async with httpx.AsyncClient(base_url=self.base_url,
+                                         headers={"Authorization": f"Bearer {self.api_key}"}) as client:
+                return await client.post("/chat/completions", json=payload, timeout=timeout)
+
+    return PerCallClient
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(app, requests: int, concurrency: int, positions: int = 1):
+    import httpx
+
+    latencies, errors = [], []
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        token = (await client.post("/session")).json()["token"]
+        queue = iter(range(requests))
+
+        async def worker():
+            for i in queue:
+                started = time.perf_counter()
+                response = await client.post(f"/aeon/task/{token}", json={"position": f"Backend {i % positions}"})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200 or response.json() != FAKE_TASK:
+                    errors.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def report(mode: str, latencies, errors, elapsed, llm_client) -> dict:
+    ms = [x * 1000 for x in latencies]
+    result = {
+        "mode": mode,
+        "requests": len(ms),
+        "errors": len(errors),
+        "throughput_rps": round(len(ms) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(ms), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "clients_created": llm_client.clients_created,
+    }
+    print(f"{mode:>8}: {result['requests']} req, {result['errors']} errors, {result['throughput_rps']} req/s, "
+          f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms, clients created={result['clients_created']}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="задержка ответа фейкового OpenAI")
+    parser.add_argument("--mode", choices=("per-call", "shared", "both"), default="both")
+    parser.add_argument("--task-cache", action="store_true", help="не выключать кэш заданий (только память)")
+    parser.add_argument("--positions", type=int, default=1, help="число разных позиций в запросах")
+    parser.add_argument("--reject-every", type=int, default=0, help="каждый N-й ответ фейкового OpenAI — 429")
+    parser.add_argument("--llm-concurrency", type=int, help="включить ограничитель: не больше N запросов к ИИ")
+    parser.add_argument("--llm-rate", type=float, default=1000.0, help="частота ограничителя, запросов в секунду")
+    parser.add_argument("--base-url", help="внешний совместимый API вместо локального фейкового")
+    parser.add_argument("--verbose", action="store_true", help="не глушить DEBUG-вывод приложения")
+    args = parser.parse_args(argv)
+
+    configure_environment()
+
+    def quiet():
+        return contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    with quiet():
+        from app import api, db_models
+        from app.main import app
+        from app.llm_client import LLMClient
+        from app.task_cache import TaskCache
+        from app.llm_limiter import LLMLimiter
+        db_models.Base.metadata.create_all(bind=db_models.engine)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    server = contextlib.nullcontext(args.base_url) if args.base_url else fake_openai_server(args.latency_ms, args.reject_every)
+    modes = ("per-call", "shared") if args.mode == "both" else (args.mode,)
+    results = {}
+    with server as base_url:
+        print(f"{args.requests} requests to /aeon/task, concurrency={args.concurrency}, "
+              f"AI latency={args.latency_ms}ms, api={base_url}")
+        for mode in modes:
+            client_class = per_call_client_class() if mode == "per-call" else LLMClient
+            limiter = (LLMLimiter(concurrency=args.llm_concurrency, rate=args.llm_rate, burst=args.llm_concurrency)
+                       if args.llm_concurrency else None)
+            api.llm_client = client_class(os.environ["OPENAI_API_KEY"], base_url=base_url,
+                                          max_connections=args.concurrency, max_keepalive=args.concurrency,
+                                          limiter=limiter)
+            api.task_cache = TaskCache(ttl=3600 if args.task_cache else 0, persistent=lambda: False)
+
+            async def measure():
+                try:
+                    return await run_load(app, args.requests, args.concurrency, args.positions)
+                finally:
+                    await api.llm_client.aclose()
+
+            with quiet():
+                latencies, errors, elapsed = asyncio.run(measure())
+            results[mode] = report(mode, latencies, errors, elapsed, api.llm_client)
+            if limiter is not None:
+                stats = results[mode]["limiter"] = limiter.stats()
+                print(f"{'':>8}  limiter: admitted={stats['admitted']}, 429={stats['rate_limited']}, "
+                      f"rejected={stats['rejected']}, expired={stats['expired']}, max wait={stats['max_wait_ms']}ms")
+            if args.task_cache:
+                cache = results[mode]["task_cache"] = api.task_cache.stats()
+                print(f"{'':>8}  task cache: hit ratio={cache['hit_ratio']}, upstream calls={cache['upstream_calls']}, "
+                      f"saved={cache['saved_calls']} (hits={cache['hits']}, coalesced={cache['coalesced']})")
+
+    if len(results) == 2:
+        per_call, shared = results["per-call"], results["shared"]
+        print(f"p50: {per_call['p50_ms'] / shared['p50_ms']:.2f}x, p99: {per_call['p99_ms'] / shared['p99_ms']:.2f}x, "
+              f"throughput: {shared['throughput_rps'] / max(per_call['throughput_rps'], 0.1):.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
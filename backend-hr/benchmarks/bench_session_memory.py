@@ -0,0 +1,110 @@
+"""Память на одну простаивающую сессию: прежний dataclass против компактного SessionState.
+
+Каждый вариант строится в отдельном процессе: N сессий (по умолчанию 1M)
+с --asked заданными вопросами и --answered ответами держатся в списке, а
+прирост RSS делится на N. Тексты ответов по умолчанию общие для всех
+сессий, чтобы измерялись именно накладные расходы структуры; с --unique-text
+у каждой сессии свои строки (так выглядит реальный кэш).
+
+Запуск (из каталога backend-hr):
+  python benchmarks/bench_session_memory.py
+  python benchmarks/bench_session_memory.py --sessions 200000 --answered 10 --unique-text
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Те же id, что у банка AEON (импорт app.api поднял бы всё приложение)
+QUESTION_IDS = [f"q_{i}" for i in range(1, 11)]
+ANSWER_TEXT = "Я работал в команде из пяти человек и отвечал за планирование релизов."
+
+
+@dataclass
+class LegacySessionState:
+    """SessionState до перехода на компактное представление"""
+    answers: List[Dict] = field(default_factory=list)
+    aeon_answers: Dict[str, str] = field(default_factory=dict)
+    asked_questions: set = field(default_factory=set)
+    current_question_index: int = 0
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    completed: bool = False
+    question_order: List[str] = field(default_factory=list)
+    last_activity: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def build_session(factory, asked: int, answered: int, n: int, unique_text: bool):
+    state = factory()
+    for question_id in QUESTION_IDS[:asked]:
+        state.asked_questions.add(question_id)
+        state.question_order.append(question_id)
+        state.current_question_index += 1
+    for question_id in QUESTION_IDS[:answered]:
+        # Как в save_answer: текст из запроса попадает и в aeon_answers, и в answers
+        text = f"{ANSWER_TEXT} #{n}" if unique_text else ANSWER_TEXT
+        state.aeon_answers[question_id] = text
+        state.answers.append({"question_id": question_id, "answer": text})
+    state.last_activity = datetime.now(timezone.utc)
+    return state
+
+
+def measure(variant: str, sessions: int, asked: int, answered: int, unique_text: bool) -> dict:
+    if variant == "legacy":
+        factory = LegacySessionState
+    else:
+        from app.session_state import SessionState, question_codes
+        question_codes.register(QUESTION_IDS)
+        factory = SessionState
+
+    gc.collect()
+    before = rss_bytes()
+    held = [build_session(factory, asked, answered, n, unique_text) for n in range(sessions)]
+    gc.collect()
+    after = rss_bytes()
+    assert len(held) == sessions
+    return {"variant": variant, "sessions": sessions, "bytes_per_session": round((after - before) / sessions, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--asked", type=int, default=5, help="заданных вопросов на сессию (0..10)")
+    parser.add_argument("--answered", type=int, default=3, help="ответов на сессию (<= asked)")
+    parser.add_argument("--unique-text", action="store_true")
+    parser.add_argument("--variant", choices=("legacy", "compact"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.variant:
+        print(json.dumps(measure(args.variant, args.sessions, args.asked, args.answered, args.unique_text)))
+        return None
+
+    print(f"{args.sessions} idle sessions, {args.asked} asked / {args.answered} answered, "
+          f"{'unique' if args.unique_text else 'shared'} answer text")
+    results = {}
+    for variant in ("legacy", "compact"):
+        command = [sys.executable, os.path.abspath(__file__), "--variant", variant,
+                   "--sessions", str(args.sessions), "--asked", str(args.asked),
+                   "--answered", str(args.answered)] + (["--unique-text"] if args.unique_text else [])
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results[variant] = json.loads(output.strip().splitlines()[-1])
+        print(f"{variant:>8}: {results[variant]['bytes_per_session']} bytes/session")
+    ratio = results["legacy"]["bytes_per_session"] / max(results["compact"]["bytes_per_session"], 1)
+    print(f"compact is {ratio:.1f}x smaller")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""Набор бенчмарков горячих путей оценки и порог регрессий.
+
+Все замеры идут на детерминированном корпусе ответов (benchmarks/corpus.py,
+русские и английские, короткие / средние / длинные):
+
+  analyze/<вид>         analyze_answer_quality на ответах корпуса
+  score/cached          calculate_performance_score по готовым суммам
+  score/cold            сессия из снимка без оценок + calculate_performance_score
+  state/to_row ...      SessionState <-> row <-> JSON
+  store/write, store/read  запись и чтение сессии в SQL (временная SQLite)
+  endpoint/glyph, endpoint/summary  эндпоинты глифа и сводки для сессии из 10 ответов
+  flow/interview        всё интервью через ASGI: сессия, 10 вопросов и ответов,
+                        глиф, сводка, завершение
+
+Для каждого случая печатается медиана и p95 одного вызова (мкс) по раундам.
+--save пишет результаты в JSON; --compare сравнивает с сохранённым JSON и
+завершается с кодом 1, если медиана какого-либо случая выросла больше чем
+на --threshold (по умолчанию 25%) и повторные замеры (--retries) это
+подтвердили. Базовый файл имеет смысл только для той же машины: перед
+сравнением сохраните его на ней же, лучше с --processes 5 (медиана по
+нескольким процессам не зависит от одного удачного или неудачного запуска).
+
+Запуск (из каталога backend-hr):
+  python benchmarks/bench_suite.py --processes 5 --save benchmarks/baseline.json
+  python benchmarks/bench_suite.py --compare benchmarks/baseline.json
+  python benchmarks/bench_suite.py --quick --cases analyze,score
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import make_corpus  # noqa: E402
+
+RESULTS_FORMAT = 1
+DEFAULT_THRESHOLD = 0.25
+QUESTIONS_PER_INTERVIEW = 10
+
+
+def configure_environment():
+    # До импорта app: временная база и хранилище сессий в памяти процесса
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_suite_"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SESSION_STORE"] = "memory"
+    os.environ.setdefault("SESSION_PURGE_ENABLED", "0")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, number: int, rounds: int) -> dict:
+    """rounds раундов по number вызовов; время одного вызова в мкс"""
+    fn()  # прогрев
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number * 1e6)
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "p95_us": round(percentile(samples, 95), 3),
+        "min_us": round(min(samples), 3),
+        "number": number,
+        "rounds": rounds,
+    }
+
+
+def cycle(items):
+    """Функция без аргументов, по очереди возвращающая элементы items"""
+    state = {"i": -1}
+
+    def next_item():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return next_item
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Случаи, медиана которых выросла больше чем на threshold: [(имя, было, стало, отношение)]"""
+    regressions = []
+    for name, result in current.get("cases", {}).items():
+        before = baseline.get("cases", {}).get(name)
+        if not before or not before.get("median_us"):
+            continue
+        ratio = result["median_us"] / before["median_us"]
+        if ratio > 1 + threshold:
+            regressions.append((name, before["median_us"], result["median_us"], ratio))
+    return regressions
+
+
+# ===== Случаи =====
+
+def answer_cases(corpus):
+    from app.api import AEON_BANK
+    from app.answer_quality import analyze_answer_quality
+
+    cases = {}
+    for kind, answers in corpus.items():
+        pairs = [(answer, AEON_BANK[i % len(AEON_BANK)].keywords) for i, answer in enumerate(answers)]
+        next_pair = cycle(pairs)
+
+        def run(next_pair=next_pair):
+            answer, keywords = next_pair()
+            analyze_answer_quality(answer, keywords)
+        cases[f"analyze/{kind}"] = (run, 2000 if kind.endswith("long") else 10000)
+    return cases
+
+
+def interview_answers(corpus, offset: int = 0):
+    """10 ответов вперемешку по языкам и длинам"""
+    kinds = sorted(corpus)
+    return [corpus[kinds[(offset + i) % len(kinds)]][(offset + i) % len(corpus[kinds[0]])]
+            for i in range(QUESTIONS_PER_INTERVIEW)]
+
+
+def answered_state(corpus, offset: int = 0):
+    from app.api import AEON_BANK
+    from app.answer_quality import score_answer
+    from app.session_state import SessionState
+
+    state = SessionState()
+    for question, text in zip(AEON_BANK, interview_answers(corpus, offset)):
+        state.asked_questions.add(question.id)
+        state.question_order.append(question.id)
+        state.aeon_answers[question.id] = text
+        state.answers.append({"question_id": question.id, "answer": text})
+        score_answer(state, question.id, AEON_BANK)
+    return state
+
+
+def state_cases(corpus):
+    from app.api import calculate_performance_score
+    from app.session_state import row_from_json, row_to_json, session_from_row, session_to_row
+
+    state = answered_state(corpus)
+    row = session_to_row(state)
+    payload = row_to_json(row)
+    unscored = dict(row)
+    unscored.pop("quality", None)
+
+    return {
+        "score/cached": (lambda: calculate_performance_score(state), 20000),
+        "score/cold": (lambda: calculate_performance_score(session_from_row(unscored)), 500),
+        "state/to_row": (lambda: session_to_row(state), 5000),
+        "state/from_row": (lambda: session_from_row(row), 5000),
+        "state/to_json": (lambda: row_to_json(row), 5000),
+        "state/from_json": (lambda: row_from_json(payload), 5000),
+    }
+
+
+def store_cases(corpus):
+    from app.session_state import session_to_row
+    from app.session_store import read_session_row, write_session_rows
+
+    row = session_to_row(answered_state(corpus, offset=1))
+    write_session_rows([("bench-store", row)])
+    return {
+        "store/write": (lambda: write_session_rows([("bench-store", row)]), 20),
+        "store/read": (lambda: read_session_row("bench-store"), 100),
+    }
+
+
+def endpoint_cases(corpus):
+    from app.api import generate_glyph_with_token, aeon_summary_with_token, session_store
+
+    token = "bench-endpoints"
+    session_store.put(token, answered_state(corpus, offset=2))
+    loop = asyncio.new_event_loop()
+    return {
+        "endpoint/glyph": (lambda: loop.run_until_complete(generate_glyph_with_token(token, {})), 2000),
+        "endpoint/summary": (lambda: loop.run_until_complete(aeon_summary_with_token(token)), 2000),
+    }
+
+
+def flow_cases(corpus):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    offsets = cycle(list(range(len(corpus["ru-short"]))))
+
+    def interview():
+        answers = iter(interview_answers(corpus, offsets()))
+        token = client.post("/session").json()["token"]
+        for _ in range(QUESTIONS_PER_INTERVIEW):
+            question = client.post(f"/aeon/question/{token}", json={}).json()["questions"][0]
+            response = client.post(f"/session/{token}/answer",
+                                   json={"question_id": question["id"], "answer": next(answers)})
+            assert response.status_code == 200, response.text
+        client.post(f"/aeon/glyph/{token}", json={})
+        client.post(f"/aeon/summary/{token}")
+        client.post(f"/session/{token}/complete")
+    return {"flow/interview": (interview, 3)}
+
+
+CASE_GROUPS = [answer_cases, state_cases, store_cases, endpoint_cases, flow_cases]
+
+
+def run_suite(selected=None, quick: bool = False, seed: int = 42, log=print) -> dict:
+    corpus = make_corpus(seed)
+    rounds = 5 if quick else 15
+    results = {}
+    for group in CASE_GROUPS:
+        # Приложение печатает DEBUG на каждый запрос: в замер это не попадает
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            cases = group(corpus)
+        for name, (fn, number) in cases.items():
+            if selected and not any(name.startswith(prefix) for prefix in selected):
+                continue
+            if quick:
+                number = max(1, number // 5)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results[name] = measure(fn, number, rounds)
+            log(f"{name:<22} median {results[name]['median_us']:>12.1f} us   "
+                f"p95 {results[name]['p95_us']:>12.1f} us")
+    return {
+        "format": RESULTS_FORMAT,
+        "seed": seed,
+        "quick": quick,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPU)",
+        "cases": results,
+    }
+
+
+def merge_runs(runs: list) -> dict:
+    """Результаты нескольких процессов: по каждому случаю медиана медиан"""
+    merged = dict(runs[0], cases={}, processes=len(runs))
+    for name in runs[0]["cases"]:
+        results = [run["cases"][name] for run in runs if name in run["cases"]]
+        merged["cases"][name] = dict(
+            results[0],
+            median_us=round(statistics.median(r["median_us"] for r in results), 3),
+            p95_us=round(statistics.median(r["p95_us"] for r in results), 3),
+            min_us=min(r["min_us"] for r in results),
+        )
+    return merged
+
+
+def measure_in_subprocess(names, quick: bool = False, seed: int = 42) -> dict:
+    """Замер случаев names в отдельном процессе этого же скрипта"""
+    with tempfile.TemporaryDirectory(prefix="bench_suite_") as tmp:
+        output = os.path.join(tmp, "retry.json")
+        command = [sys.executable, os.path.abspath(__file__), "--cases", ",".join(names),
+                   "--seed", str(seed), "--save", output]
+        if quick:
+            command.append("--quick")
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(output) as f:
+            return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="записать результаты в JSON")
+    parser.add_argument("--compare", help="сравнить с результатами из JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимый рост медианы (0.25 = +25%%)")
+    parser.add_argument("--cases", default="", help="префиксы случаев через запятую (analyze,score,...)")
+    parser.add_argument("--quick", action="store_true", help="меньше раундов и вызовов")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="прогнать набор в N процессах и взять медиану (для базового файла)")
+    parser.add_argument("--retries", type=int, default=3, help="сколько раз перемерять случаи с регрессией")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    configure_environment()
+    logging.disable(logging.INFO)
+    selected = [prefix for prefix in args.cases.split(",") if prefix]
+    if args.processes > 1:
+        runs = []
+        for number in range(args.processes):
+            print(f"Process {number + 1}/{args.processes}")
+            runs.append(measure_in_subprocess(selected, quick=args.quick, seed=args.seed))
+        results = merge_runs(runs)
+        for name, result in results["cases"].items():
+            print(f"{name:<22} median {result['median_us']:>12.1f} us   p95 {result['p95_us']:>12.1f} us")
+    else:
+        results = run_suite(selected, quick=args.quick, seed=args.seed)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved {len(results['cases'])} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != results["machine"] or baseline.get("python") != results["python"]:
+            print(f"WARNING: baseline from {baseline.get('machine')}, Python {baseline.get('python')}")
+        regressions = compare(baseline, results, args.threshold)
+        # Время одного и того же кода заметно различается между процессами
+        # (раскладка памяти, соседи по машине): при регрессии набор
+        # перемеряется в новом процессе, в зачёт идёт лучшая медиана. Набор
+        # прогоняется тот же, а не только подозрительные случаи: в одиночку
+        # случай измеряется в других условиях, чем в базовом файле
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            print(f"Re-measuring ({', '.join(name for name, *_ in regressions)})")
+            retry = measure_in_subprocess(selected, quick=args.quick, seed=args.seed)
+            for name, result in retry["cases"].items():
+                if name in results["cases"] and result["median_us"] < results["cases"][name]["median_us"]:
+                    results["cases"][name] = result
+            regressions = compare(baseline, results, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.1f} -> {after:.1f} us (x{ratio:.2f})")
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,51 @@
+"""Детерминированный синтетический корпус ответов кандидатов для бенчмарков.
+
+Ответы на русском и английском разной длины собираются из фраз по
+фиксированному seed: один и тот же seed всегда даёт тот же корпус, поэтому
+результаты разных запусков сравнимы.
+"""
+import random
+from typing import Dict, List
+
+RU_PHRASES = [
+    "Я работал в команде из пяти человек и отвечал за планирование релизов",
+    "например, мы перевели сервис на FastAPI и сократили время ответа вдвое",
+    "конкретно я занимался схемой базы данных и миграциями",
+    "опыт руководства у меня небольшой, но навыки наставничества есть",
+    "в такой ситуации я бы начал с анализа метрик и разговора с командой",
+    "мотивация для меня — видеть, как продукт помогает людям",
+    "стресс помогает справляться планирование и честная коммуникация",
+    "за последний год я изучил Kubernetes и основы машинного обучения",
+    "именно поэтому я хочу развиваться в сторону архитектуры",
+    "был случай, когда релиз пришлось откатить за десять минут до демо",
+]
+EN_PHRASES = [
+    "I worked in a team of five engineers and owned the release planning",
+    "for example, we moved the service to FastAPI and halved the latency",
+    "specifically I was responsible for the database schema and migrations",
+    "my management experience is limited but I mentor junior developers",
+    "in that situation I would start by looking at the metrics",
+    "what motivates me is seeing the product actually help people",
+    "over the last year I learned Kubernetes and some machine learning",
+    "there was a case when we had to roll back ten minutes before a demo",
+]
+# Примерная длина ответа в символах
+LENGTHS = {"short": 60, "medium": 400, "long": 3000}
+
+
+def make_answer(rng: random.Random, phrases: List[str], size: int) -> str:
+    sentences = []
+    while sum(len(s) + 2 for s in sentences) < size:
+        sentence = rng.choice(phrases)
+        sentences.append(sentence[0].upper() + sentence[1:])
+    return ". ".join(sentences) + "."
+
+
+def make_corpus(seed: int = 42, per_kind: int = 20) -> Dict[str, List[str]]:
+    """{"ru-short": [...], "en-long": [...], ...} — per_kind ответов каждого вида"""
+    rng = random.Random(seed)
+    corpus = {}
+    for lang, phrases in (("ru", RU_PHRASES), ("en", EN_PHRASES)):
+        for kind, size in LENGTHS.items():
+            corpus[f"{lang}-{kind}"] = [make_answer(rng, phrases, size) for _ in range(per_kind)]
+    return corpus
@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import db_models
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    db_models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(db_models, "SessionLocal", factory)
+    monkeypatch.setattr(db_models, "engine", engine)
+    # Ошибки других тестов (старая схема test.db) не должны открыть breaker здесь
+    from app import session_store
+    from app.circuit_breaker import CircuitBreaker
+    monkeypatch.setattr(session_store, "db_breaker", CircuitBreaker("test", probe=session_store.ping_database))
+    return factory
+
+
+@pytest.fixture
+def async_sqlite_db(tmp_path, monkeypatch, sqlite_db):
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import NullPool
+    from app import db_models
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}", poolclass=NullPool)
+    factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(db_models, "AsyncSessionLocal", factory)
+    return factory
+
+
+# Банки на двух языках с одинаковыми id вопросов
+BANK_KEYWORDS = {
+    "ru": {"q_1": ["опыт", "команда"], "q_2": ["python"], "q_3": []},
+    "en": {"q_1": ["experience", "team"], "q_2": ["python"], "q_3": []},
+}
+
+
+@pytest.fixture
+def bank_catalog(tmp_path):
+    import json
+    from app.question_catalog import QuestionCatalog
+
+    directory = tmp_path / "banks"
+    directory.mkdir()
+    for language, keywords in BANK_KEYWORDS.items():
+        questions = [{"id": question_id, "text": question_id, "type": "soft", "keywords": words}
+                     for question_id, words in keywords.items()]
+        (directory / f"general.{language}.json").write_text(json.dumps(
+            {"kind": "interview", "version": 1, "position": "general", "language": language,
+             "questions": questions}, ensure_ascii=False), encoding="utf-8")
+    return QuestionCatalog(str(directory), default_language="ru", versions_dir=str(tmp_path / "versions")).load()
@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import json
+import os
+
+from app.ai_question_pool import AIQuestionPool, AIQuestionProducer, ai_question_type, validate_question
+
+
+def fake_generator(calls):
+    counter = itertools.count()
+
+    async def generate(question_type):
+        calls.append(question_type)
+        await asyncio.sleep(0)
+        return {"text": f"Расскажите о случае номер {next(counter)} из вашей практики", "type": question_type,
+                "keywords": ["Опыт", "опыт", " команда ", 3]}
+    return generate
+
+
+def test_validate_question():
+    question = validate_question({"text": "  Как вы   разбираете сложный инцидент? ", "keywords": ["Логи", 1]},
+                                 "technical")
+    assert question["text"] == "Как вы разбираете сложный инцидент?"
+    assert question["keywords"] == ["логи"] and question["ai_generated"]
+    assert ai_question_type(question["id"]) == "technical"
+    assert ai_question_type("q1") is None
+    assert validate_question({"text": "Коротко?"}, "soft") is None
+    assert validate_question({"text": "Как вы разбираете сложный инцидент?", "type": "soft"}, "technical") is None
+    assert validate_question({"text": "Как вы разбираете сложный инцидент?", "keywords": "логи"}, "soft") is None
+    assert validate_question("не JSON-объект", "soft") is None
+
+
+def test_refill_by_watermarks_and_local_pop():
+    calls = []
+    pool = AIQuestionPool(fake_generator(calls), types=("technical", "soft"), low=2, high=4)
+    assert asyncio.run(pool.refill()) == 8
+    assert pool.depth("technical") == pool.depth("soft") == 4
+    assert pool.needs_refill() == [] and asyncio.run(pool.refill()) == 0
+
+    wakeups = []
+    pool.on_low = lambda: wakeups.append(True)
+    served = [pool.pop("technical") for _ in range(3)]
+    assert len(calls) == 8 and all(q["type"] == "technical" for q in served)
+    assert pool.needs_refill() == ["technical"] and wakeups == [True]
+    assert pool.served == 3 and pool.stats()["depth"] == {"technical": 1, "soft": 4}
+
+    # Повтор выданного вопроса не попадает обратно в буфер
+    assert not pool.add(dict(served[0], id="ai_technical_dup"))
+    assert asyncio.run(pool.refill()) == 3 and pool.depth("technical") == 4
+
+    for _ in range(4):
+        pool.pop("technical")
+    assert pool.pop("technical") is None and pool.underflows == 1
+    assert pool.pop_any(["technical", "soft"])["type"] == "soft"
+
+
+def test_producer_refills_in_background_and_survives_failures():
+    calls = []
+    generate = fake_generator(calls)
+    failing = {"on": True}
+
+    async def flaky(question_type):
+        if failing["on"]:
+            raise RuntimeError("OpenAI down")
+        return await generate(question_type)
+
+    pool = AIQuestionPool(flaky, types=("soft",), low=1, high=3)
+    producer = AIQuestionProducer(pool, interval=0.01)
+
+    async def scenario():
+        task = asyncio.create_task(producer.run())
+        while pool.failures < 3:
+            await asyncio.sleep(0.001)
+        failing["on"] = False
+        while pool.depth("soft") < 3:
+            await asyncio.sleep(0.001)
+        for _ in range(3):
+            pool.pop("soft")
+        while pool.depth("soft") < 3:
+            await asyncio.sleep(0.001)
+        producer.stop()
+        await task
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert pool.generated == 6 and pool.on_low is None
+    assert pool.stats()["refill_latency_ms"]["p50"] is not None
+
+
+def test_exhausted_bank_is_served_from_pool(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import api
+    from app.llm_client import LLMClient
+    from app.main import app
+    from app.question_bank import QuestionBank
+    from app.question_catalog import QUESTION_BANK_DIR
+
+    with open(os.path.join(QUESTION_BANK_DIR, "general.ru.json"), encoding="utf-8") as f:
+        small = QuestionBank(json.load(f)["questions"][:1], version="general.ru@small", language="ru")
+    calls = []
+    pool = AIQuestionPool(fake_generator(calls), types=("technical", "soft"), low=1, high=2, language="ru")
+    asyncio.run(pool.refill())
+    calls.clear()
+    monkeypatch.setattr(api, "llm_client", LLMClient("sk-test"))
+    monkeypatch.setattr(api, "ai_question_pool", pool)
+    monkeypatch.setattr(api, "session_bank", lambda session_state: small)
+
+    client = TestClient(app)
+    token = client.post("/session").json()["token"]
+    ask = lambda: client.post(f"/aeon/question/{token}", json={})
+    assert ask().json()["questions"][0]["id"] == small[0].id
+    served = [ask().json()["questions"][0] for _ in range(4)]
+    assert all(ai_question_type(q["id"]) == q["type"] for q in served)
+    assert {q["type"] for q in served} == {"technical", "soft"}
+    assert calls == []                       # на пути запроса ИИ не вызывается
+
+    response = ask()
+    assert response.status_code == 503 and response.json()["detail"] == "Не удалось сгенерировать вопрос"
+    assert pool.underflows == 1
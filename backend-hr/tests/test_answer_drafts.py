@@ -0,0 +1,74 @@
+from app.answer_drafts import DraftBuffer, DraftFlusher, read_draft
+from app.models import UserAnswer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def answers(*pairs):
+    return [UserAnswer(question_id=q, answer_id=a) for q, a in pairs]
+
+
+def test_rapid_saves_are_coalesced_and_debounced(sqlite_db):
+    clock = Clock()
+    buffer = DraftBuffer(debounce=2, max_delay=10, clock=clock)
+    for step in range(5):
+        clock.now = step * 0.5
+        buffer.put("alice", 1, answers((1, step), (2, 1)))
+    assert len(buffer) == 1 and buffer.get("alice", 1) == {1: 4, 2: 1}
+    assert buffer.flush() == 0            # кандидат ещё печатает
+    clock.now = 4.1
+    assert buffer.flush() == 1 and buffer.writes == 1
+    assert read_draft("alice", 1) == {1: 4, 2: 1} and len(buffer) == 0
+
+    # Непрерывные сохранения записываются не реже max_delay
+    for step in range(30):
+        clock.now = 10 + step * 0.5
+        buffer.put("alice", 1, answers((3, step)))
+        buffer.flush()
+    assert buffer.writes == 2 and read_draft("alice", 1)[3] == 20
+
+
+def test_failed_flush_keeps_drafts(monkeypatch):
+    from app import answer_drafts
+
+    buffer = DraftBuffer(debounce=0)
+    buffer.put("bob", 1, answers((1, 1)))
+
+    def broken(drafts):
+        buffer.put("bob", 1, answers((2, 2)))  # пришло во время записи
+        raise RuntimeError("db down")
+    monkeypatch.setattr(answer_drafts, "write_drafts", broken)
+    flusher = DraftFlusher(buffer)
+    assert flusher.run_once() == 0 and buffer.failures == 1
+    assert buffer.get("bob", 1) == {1: 1, 2: 2}
+
+
+def test_autosave_is_buffered_until_flush_and_merged_on_submit(sqlite_db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import api
+    from app.main import app
+
+    client = TestClient(app)
+    buffer = DraftBuffer(debounce=0)
+    monkeypatch.setattr(api, "draft_buffer", buffer)
+    for answer_id in (3, 2, 1):
+        assert client.post("/test/1/autosave?candidate=carol",
+                           json={"answers": [{"question_id": 1, "answer_id": answer_id}]}).status_code == 204
+    assert buffer.saves == 3 and read_draft("carol", 1) == {}
+    assert DraftFlusher(buffer).run_once(force=True) == 1
+    assert read_draft("carol", 1) == {1: 1}
+    client.post("/test/1/autosave?candidate=carol", json={"answers": [{"question_id": 2, "answer_id": 2}]})
+    assert client.get("/test/1/draft?candidate=carol").json()["answers"] == [
+        {"question_id": 1, "answer_id": 1}, {"question_id": 2, "answer_id": 2}]
+
+    # В отправке только второй вопрос, правильный — первый берётся из черновика
+    result_id = client.post("/test/1/submit?candidate=carol",
+                            json={"answers": [{"question_id": 2, "answer_id": 1}]}).json()["result_id"]
+    assert client.get(f"/result/{result_id}").json()["score"] == 100
+    assert read_draft("carol", 1) == {} and len(buffer) == 0
@@ -0,0 +1,144 @@
+import random
+
+import pytest
+
+from app import answer_quality
+from app.answer_quality import (
+    SCORER_VERSION, _analyze_answer_quality_reference, analyze_answer_quality, score_answer, session_quality,
+)
+from app.question_bank import QuestionBank
+from app.session_state import (
+    SessionState, question_codes, row_from_json, row_to_json, session_from_row, session_to_row,
+)
+
+question_codes.register(["q_1", "q_2", "q_3"])
+
+KEYWORDS = {"q_1": ["опыт", "команда"], "q_2": ["python"], "q_3": []}
+BANK = QuestionBank([{"id": question_id, "keywords": keywords} for question_id, keywords in KEYWORDS.items()])
+TEXTS = {
+    "q_1": "У меня большой опыт. Например, команда из пяти человек. Конкретно отвечал за релизы.",
+    "q_2": "Пишу на Python каждый день, в основном сервисы на FastAPI и немного аналитики.",
+    "q_3": "Коротко о себе",
+}
+
+
+def test_analyzer_matches_reference_implementation():
+    rng = random.Random(11)
+    pieces = ["опыт", "Опыт", "НАВЫКИ", "например", "Пример", "случай", "именно", "определенно",
+              "слово", " ", "  ", ".", ". .", "\n", "\t", "\r\n", "\xa0", "\u200b", "İ", "Σ", "x"]
+    keyword_sets = [None, [], ["навыки", "опыт"], ["опыт", "ОПЫТ", "опыт"], [""], ["i̇"]]
+    for _ in range(3000):
+        # Короткие и длинные ответы
+        text = "".join(rng.choice(pieces) for _ in range(rng.choice((rng.randint(0, 20), rng.randint(80, 200)))))
+        keywords = rng.choice(keyword_sets)
+        assert analyze_answer_quality(text, keywords) == _analyze_answer_quality_reference(text, keywords)
+    assert analyze_answer_quality(None) == _analyze_answer_quality_reference(None)
+    # Длинные серии пробелов и прочие пробельные символы Unicode
+    for text in ("слово" + " " * 100_000 + "опыт", "a\u2003b\u3000c\x1cd " * 100):
+        assert analyze_answer_quality(text) == _analyze_answer_quality_reference(text)
+
+
+def test_markers_follow_bank_language():
+    text = "Five years in a team. For example, I ran the releases; specifically the billing API."
+    english = analyze_answer_quality(text, ["team"], language="en")
+    assert english["keyword_matches"] == 1 and english["has_examples"] and english["has_specifics"]
+    russian = analyze_answer_quality(text, ["team"])
+    assert not russian["has_examples"] and not russian["has_specifics"]
+    assert english["score"] > russian["score"]
+    unknown = analyze_answer_quality(text, ["team"], language="de")
+    assert not unknown["has_examples"] and unknown["keyword_matches"] == 1
+
+
+@pytest.fixture
+def analyzer_calls(monkeypatch):
+    calls = []
+    analyze = answer_quality.AnswerAnalyzer.analyze
+
+    def counting(self, answer):
+        calls.append(answer)
+        return analyze(self, answer)
+
+    monkeypatch.setattr(answer_quality.AnswerAnalyzer, "analyze", counting)
+    return calls
+
+
+def answered_state():
+    state = SessionState()
+    for question_id in ("q_1", "ai_q_4_1700000000", "q_2"):
+        state.aeon_answers[question_id] = TEXTS.get(question_id, "Ответ на вопрос ИИ")
+        if question_id in KEYWORDS:
+            score_answer(state, question_id, BANK)
+    return state
+
+
+def expected_totals(state):
+    scored = [_analyze_answer_quality_reference(text, KEYWORDS[q]) for q, text in state.aeon_answers.items() if q in KEYWORDS]
+    return (len(scored), sum(q["score"] for q in scored),
+            sum(q["keyword_matches"] for q in scored), sum(1 for q in scored if q["has_examples"]), 0.0, 0)
+
+
+def test_totals_are_read_without_reanalyzing(analyzer_calls):
+    state = answered_state()
+    session_quality(state, BANK)
+    analyzer_calls.clear()
+
+    state.aeon_answers["q_3"] = TEXTS["q_3"]
+    score_answer(state, "q_3", BANK)
+    assert len(analyzer_calls) == 1
+    assert tuple(session_quality(state, BANK)) == expected_totals(state)
+    assert len(analyzer_calls) == 1
+
+
+def test_changed_or_deleted_answer_updates_totals(analyzer_calls):
+    state = answered_state()
+    session_quality(state, BANK)
+    analyzer_calls.clear()
+
+    state.aeon_answers["q_1"] = "Другой ответ без примеров и без ключевых слов вовсе"
+    assert state.quality("q_1") is None
+    assert tuple(session_quality(state, BANK)) == expected_totals(state)
+    assert analyzer_calls == [state.aeon_answers["q_1"]]
+
+    del state.aeon_answers["q_2"]
+    assert tuple(session_quality(state, BANK)) == expected_totals(state)
+    assert len(analyzer_calls) == 1
+
+
+def test_answers_scored_by_older_version_are_rescored_lazily(analyzer_calls, monkeypatch):
+    state = answered_state()
+    analyzer_calls.clear()
+    monkeypatch.setattr(answer_quality, "SCORER_VERSION", SCORER_VERSION + 1)
+
+    assert tuple(session_quality(state, BANK)) == expected_totals(state)
+    assert sorted(analyzer_calls) == sorted([TEXTS["q_1"], TEXTS["q_2"]])
+    assert state.quality("q_1")["version"] == SCORER_VERSION + 1
+
+
+def test_scores_survive_snapshot_roundtrip(analyzer_calls):
+    state = answered_state()
+    analyzer_calls.clear()
+
+    restored = session_from_row(row_from_json(row_to_json(session_to_row(state))))
+    assert restored.qualities() == state.qualities()
+    assert tuple(session_quality(restored, BANK)) == expected_totals(state)
+    assert analyzer_calls == []
+
+
+def test_scores_are_stored_with_answer_rows(sqlite_db, analyzer_calls):
+    from app.db_models import SessionAnswer
+    from app.session_store import read_session_row, write_session_rows
+
+    state = answered_state()
+    for question_id, text in state.aeon_answers.items():
+        state.answers.append({"question_id": question_id, "answer": text})
+    write_session_rows([("tok", session_to_row(state))])
+
+    db = sqlite_db()
+    versions = {a.question_id: a.scorer_version for a in db.query(SessionAnswer)}
+    db.close()
+    assert versions == {"q_1": SCORER_VERSION, "ai_q_4_1700000000": None, "q_2": SCORER_VERSION}
+
+    analyzer_calls.clear()
+    loaded = session_from_row(read_session_row("tok"))
+    assert tuple(session_quality(loaded, BANK)) == expected_totals(state)
+    assert analyzer_calls == []
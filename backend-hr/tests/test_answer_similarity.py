@@ -0,0 +1,164 @@
+import random
+
+from app.answer_similarity import REBUILD_LEASE, MinHashIndex, MinHashIndexSaver, minhash, similarity
+from app.job_lease import JobLease
+from app.session_state import SessionState, question_codes, session_to_row
+
+question_codes.register(["q_1", "q_2"])
+
+MODEL_ANSWER = ("В прошлой команде я отвечал за релизы и миграции базы данных. Например, мы перевели "
+                "сервис на FastAPI и сократили время ответа вдвое, конкретно я писал схему и тесты.")
+
+
+def original_answer(rng):
+    words = ["проект", "команда", "релиз", "клиент", "метрика", "сервис", "задача", "срок", "план",
+             "ошибка", "данные", "отчёт", "встреча", "код", "ревью", "нагрузка", "бюджет", "риск"]
+    return " ".join(rng.choice(words) + str(rng.randint(0, 99)) for _ in range(40))
+
+
+def test_signature_estimates_overlap():
+    copy = minhash(MODEL_ANSWER + " Спасибо!")
+    assert similarity(minhash(MODEL_ANSWER), minhash(MODEL_ANSWER.upper())) == 1.0
+    assert similarity(minhash(MODEL_ANSWER), copy) >= 0.8
+    assert similarity(minhash(MODEL_ANSWER), minhash(original_answer(random.Random(1)))) < 0.2
+    assert minhash("") is None and minhash("...") is None
+
+
+def test_index_flags_copies_of_other_candidates_only(bank_catalog):
+    rng = random.Random(5)
+    index = MinHashIndex(bank_catalog)
+    for n in range(300):
+        index.add(f"orig-{n}", "q_1", original_answer(rng))
+    index.add("author", "q_1", MODEL_ANSWER)
+    index.add("copier", "q_1", MODEL_ANSWER + " Спасибо за вопрос.")
+    index.add("copier", "q_2", MODEL_ANSWER)  # другой вопрос — другой индекс
+    assert index.add("copier", "q_ai_1", MODEL_ANSWER) is None
+
+    flags = index.flags("copier", ["q_1", "q_2"])
+    assert list(flags) == ["q_1"]
+    assert [token for token, _ in flags["q_1"]] == ["author"]
+    assert index.flags("orig-3", ["q_1"]) == {}
+
+    # Тот же id вопроса в банке другого языка — отдельный индекс
+    index.add("english", "q_1", MODEL_ANSWER, bank_catalog.bank("en").version)
+    assert index.flags("english", ["q_1"]) == {}
+    assert [token for token, _ in index.flags("author", ["q_1"])["q_1"]] == ["copier"]
+
+
+def test_signatures_are_saved_loaded_and_rebuilt(sqlite_db):
+    from app.db_models import AnswerSignature
+    from app.session_store import write_session_rows
+
+    first, second = MinHashIndex(), MinHashIndex()
+    first.add("a", "q_1", MODEL_ANSWER)
+    first.ready = second.ready = True
+    first.save()
+    second.add("b", "q_1", MODEL_ANSWER)
+    second.save()
+    # Каждый процесс видит сигнатуры другого после сохранения
+    assert [token for token, _ in second.similar("b", "q_1")] == ["a"]
+    first.save()
+    assert [token for token, _ in first.similar("a", "q_1")] == ["b"]
+
+    # Перестроение — по ответам в session_answers (здесь их два, на разных сессиях)
+    rows = []
+    for token, text in (("x", MODEL_ANSWER), ("y", MODEL_ANSWER + " Вот так.")):
+        state = SessionState()
+        state.aeon_answers["q_1"] = text
+        state.answers.append({"question_id": "q_1", "answer": text})
+        rows.append((token, session_to_row(state)))
+    write_session_rows(rows)
+    rebuilt = MinHashIndex()
+    assert rebuilt.rebuild(chunk_size=1) == 2
+    assert [token for token, _ in rebuilt.similar("y", "q_1")] == ["x"]
+    db = sqlite_db()
+    assert sorted(s.session_token for s in db.query(AnswerSignature)) == ["x", "y"]
+    db.close()
+
+    # Новый процесс загружает сохранённые сигнатуры без пересчёта
+    loaded = MinHashIndex()
+    assert MinHashIndexSaver(loaded).run_once() and len(loaded) == 2 and not loaded._pending
+
+
+def test_loaded_signatures_keep_their_bank(sqlite_db, bank_catalog):
+    english = bank_catalog.bank("en").version
+    first, second = MinHashIndex(bank_catalog), MinHashIndex(bank_catalog)
+    first.ready = second.ready = True
+    first.add("ru-author", "q_1", MODEL_ANSWER)
+    first.add("en-author", "q_1", MODEL_ANSWER, english)
+    first.save()
+    second.add("en-copier", "q_1", MODEL_ANSWER, english)
+    second.save()
+    assert [token for token, _ in second.similar("en-copier", "q_1")] == ["en-author"]
+
+
+def test_only_the_lease_holder_rebuilds(sqlite_db):
+    from app.session_store import write_session_rows
+
+    state = SessionState()
+    state.aeon_answers["q_1"] = MODEL_ANSWER
+    state.answers.append({"question_id": "q_1", "answer": MODEL_ANSWER})
+    write_session_rows([("x", session_to_row(state))])
+
+    # Таблица пуста, ответы есть, а перестраивает другой процесс: этот ждёт и не трогает таблицу
+    leader = JobLease(REBUILD_LEASE)
+    assert leader.acquire()
+    follower = MinHashIndex()
+    saver = MinHashIndexSaver(follower)
+    assert not saver.run_once() and not follower.ready
+
+    assert MinHashIndex().rebuild() == 1
+    leader.release()
+    assert saver.run_once() and follower.ready and len(follower) == 1
+
+
+def test_interrupted_rebuild_leaves_the_table_unchanged(sqlite_db, monkeypatch):
+    import pytest
+    import app.answer_similarity as answer_similarity
+    from app.db_models import AnswerSignature, AnswerSignatureStaging
+    from app.session_store import write_session_rows
+
+    rows = []
+    for token in ("x", "y", "z"):
+        state = SessionState()
+        state.aeon_answers["q_1"] = MODEL_ANSWER
+        state.answers.append({"question_id": "q_1", "answer": MODEL_ANSWER})
+        rows.append((token, session_to_row(state)))
+    write_session_rows(rows)
+    assert MinHashIndex().rebuild() == 3
+
+    def tokens(model):
+        db = sqlite_db()
+        try:
+            return sorted(row.session_token for row in db.query(model))
+        finally:
+            db.close()
+
+    calls = []
+    worker = MinHashIndex()
+    worker.ready = True
+
+    def failing_minhash(text):
+        calls.append(text)
+        if len(calls) == 2:
+            raise RuntimeError("crash")
+        return minhash(text)
+
+    monkeypatch.setattr(answer_similarity, "minhash", failing_minhash)
+    with pytest.raises(RuntimeError):
+        MinHashIndex().rebuild(chunk_size=1)
+    # Другие процессы по-прежнему видят полную таблицу
+    assert tokens(AnswerSignature) == ["x", "y", "z"]
+
+    def saving_minhash(text):
+        # Пока идёт просмотр, другой процесс дописывает свою сигнатуру
+        if not calls:
+            calls.append(text)
+            worker.add("w", "q_1", MODEL_ANSWER)
+            worker.save()
+        return minhash(text)
+
+    calls.clear()
+    monkeypatch.setattr(answer_similarity, "minhash", saving_minhash)
+    assert MinHashIndex().rebuild(chunk_size=1) == 3
+    assert tokens(AnswerSignature) == ["w", "x", "y", "z"] and tokens(AnswerSignatureStaging) == []
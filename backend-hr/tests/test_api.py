@@ -346,7 +346,7 @@ def test_token_expiry_and_reuse():
 
 def test_answer_quality_analysis():
     """Тест анализа качества ответов"""
-    from app.api import analyze_answer_quality
+    from app.answer_quality import analyze_answer_quality
     
     # Тест качественного ответа
     quality_answer = "Это подробный ответ с примерами и конкретными навыками. Например, я использовал Python для разработки веб-приложений. Конкретно, я работал с FastAPI и создавал REST API."
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.session_persistence import WriteBehindQueue
+from app.session_state import SessionState
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker("db", failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure(OSError("connection refused"))
+    assert breaker.allow()
+
+    breaker.record_failure(OSError("connection refused"))
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.guard()
+    stats = breaker.stats()
+    assert stats["opened"] == 1
+    assert stats["rejected"] == 1
+    assert stats["last_error"] == "connection refused"
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker("db", failure_threshold=2)
+    breaker.record_failure(OSError("timeout"))
+    breaker.record_success()
+    breaker.record_failure(OSError("timeout"))
+    assert breaker.closed
+
+
+def test_background_probe_closes_breaker():
+    database_up = []
+
+    def probe():
+        if not database_up:
+            raise OSError("still down")
+
+    breaker = CircuitBreaker("db", probe=probe, failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure(OSError("down"))
+    assert breaker.state == "open"
+    assert wait_until(lambda: breaker.stats()["probes"] >= 2)
+    assert breaker.state == "open"
+
+    database_up.append(True)
+    assert wait_until(lambda: breaker.closed)
+    breaker.stop()
+
+
+def test_write_behind_holds_sessions_while_open():
+    breaker = CircuitBreaker("db", failure_threshold=1, reset_timeout=60)
+    writes = []
+    writer = WriteBehindQueue(writes.extend, max_staleness=60, available=lambda: breaker.closed)
+    breaker.trip(OSError("down"))
+
+    writer.enqueue("tok", {"completed": True})
+    assert writer.flush_token("tok") is False
+    assert writes == [] and writer.stats["failures"] == 0
+
+    breaker._close()
+    assert writer.flush_token("tok") is True
+    assert [token for token, _ in writes] == ["tok"]
+
+
+def test_sql_store_serves_from_memory_when_database_is_down(sqlite_db, monkeypatch):
+    from app import session_store
+    from app.session_store import SqlSessionStore, read_session_row
+
+    store = SqlSessionStore()
+    session_store.db_breaker.trip(OSError("down"))
+    store.save("tok", SessionState(current_question_index=2))
+    assert store.load("tok").current_question_index == 2
+    assert store.stats()["fallback_sessions"] == 1
+
+    session_store.db_breaker._close()
+    assert store.resync() == 1
+    assert read_session_row("tok")["current_question_index"] == 2
+    assert store.stats()["fallback_sessions"] == 0
+
+
+def test_sql_store_stop_leaves_the_final_resync_to_run(sqlite_db, monkeypatch):
+    import asyncio
+    import threading
+    from app import session_store
+    from app.session_store import SqlSessionStore, read_session_row
+
+    store = SqlSessionStore(resync_interval=60)
+    session_store.db_breaker.trip(OSError("down"))
+    store.save("tok", SessionState(current_question_index=3))
+    session_store.db_breaker._close()
+    resynced_on = []
+    resync = store.resync
+    monkeypatch.setattr(store, "resync", lambda: resynced_on.append(threading.current_thread()) or resync())
+
+    async def scenario():
+        task = asyncio.create_task(store.run())
+        await asyncio.sleep(0.01)
+        store.stop()                     # только сигнал: запись — в run(), в отдельном потоке
+        assert not resynced_on
+        await asyncio.wait_for(task, timeout=2)
+
+    asyncio.run(scenario())
+    assert resynced_on and resynced_on[0] is not threading.main_thread()
+    assert read_session_row("tok")["current_question_index"] == 3
+
+
+def test_only_connectivity_errors_count_toward_breaker(monkeypatch):
+    from sqlalchemy import exc as sa_exc
+    from app import session_store
+
+    breaker = CircuitBreaker("db", failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(session_store, "db_breaker", breaker)
+
+    def fail(error):
+        raise error
+
+    integrity = sa_exc.IntegrityError("INSERT", {}, Exception("duplicate key (token, position)"))
+    with pytest.raises(sa_exc.IntegrityError):
+        session_store._guarded(fail, integrity)
+    assert breaker.closed and breaker.consecutive_failures == 0
+
+    with pytest.raises(sa_exc.OperationalError):
+        session_store._guarded(fail, sa_exc.OperationalError("SELECT 1", {}, Exception("connection refused")))
+    assert not breaker.closed
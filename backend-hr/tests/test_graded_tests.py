@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from app.graded_tests import CompiledTest, load_result, save_result
+from app.models import UserAnswer
+
+
+def make_test(questions=200):
+    return CompiledTest({
+        "id": 7, "title": "Большой тест",
+        "questions": [{"id": n, "text": f"Вопрос {n}", "correct_answer_id": n % 4 + 1,
+                       "answers": [{"id": a, "text": str(a)} for a in range(1, 5)]} for n in range(questions)],
+    }, "ru", "test-7.ru@1+abc")
+
+
+def answers(pairs):
+    return [UserAnswer(question_id=q, answer_id=a) for q, a in pairs]
+
+
+def test_grading_uses_answer_key():
+    test = make_test(4)
+    # q0 верно (1), q1 сначала неверно, потом верно (2), q2 неверно, чужой вопрос не считается
+    result = test.grade(answers([(0, 1), (1, 3), (1, 2), (2, 1), (99, 1)]))
+    assert (result.correct, result.total, result.score) == (2, 4, 50)
+    assert result.answers == {0: 1, 1: 2, 2: 1}
+    assert result.details == "2 из 4 правильных ответов"
+    # Кандидату ключ не отдаётся
+    assert "correct_answer_id" not in test.test.questions[0].model_dump()
+
+
+def test_answer_key_must_point_to_an_answer():
+    with pytest.raises(ValueError):
+        CompiledTest({"id": 1, "title": "t", "questions": [
+            {"id": 1, "text": "?", "correct_answer_id": 5, "answers": [{"id": 1, "text": "a"}]}]}, "ru", "v")
+
+
+def test_grading_large_test_is_linear():
+    test = make_test(200)
+    submitted = answers((n, n % 4 + 1) for n in range(200))
+    started = time.perf_counter()
+    for _ in range(200):
+        result = test.grade(submitted)
+    assert result.score == 100
+    assert time.perf_counter() - started < 1.0
+
+
+def test_results_are_persisted_and_read_by_id(sqlite_db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    test = make_test(4)
+    first = save_result(test, test.grade(answers([(0, 1)])))
+    second = save_result(test, test.grade(answers([(0, 1), (1, 2), (2, 3), (3, 4)])))
+    assert second > first
+    assert load_result(second).score == 100 and load_result(first).correct == 1
+    assert load_result(second + 100) is None
+
+    client = TestClient(app)
+    result_id = client.post("/test/1/submit?lang=en", json={"answers": [
+        {"question_id": 1, "answer_id": 1}, {"question_id": 2, "answer_id": 2}]}).json()["result_id"]
+    assert result_id == second + 1
+    assert client.get(f"/result/{result_id}").json() == {"score": 50, "details": "1 из 2 правильных ответов"}
+    assert client.get(f"/result/{result_id + 1}").status_code == 404
+    assert load_result(result_id).language == "en"
@@ -0,0 +1,19 @@
+from app.job_lease import JobLease
+
+
+def test_lease_is_held_by_one_process_until_released(sqlite_db):
+    first, second = JobLease("rebuild"), JobLease("rebuild")
+    assert first.acquire() and first.acquire()  # своя аренда продлевается
+    assert not second.acquire()
+    assert JobLease("other").acquire()
+    second.release()  # чужую аренду не освобождает
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+
+
+def test_expired_lease_is_taken_over(sqlite_db):
+    crashed = JobLease("rebuild", ttl=-1)
+    assert crashed.acquire()
+    assert JobLease("rebuild").acquire()
+    assert not crashed.acquire()
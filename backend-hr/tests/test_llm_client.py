@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+
+from app.llm_client import LLMClient, backoff_delay
+
+
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def make_client(handler, **kwargs) -> LLMClient:
+    kwargs.setdefault("backoff", 0.001)
+    return LLMClient("sk-test", base_url="http://openai.test/v1", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_retries_transient_errors_and_reuses_one_client():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")
+        if len(calls) == 2:
+            return httpx.Response(503)
+        return completion("ok")
+
+    async def scenario():
+        client = make_client(handler, retries=2)
+        first = await client.chat([{"role": "user", "content": "hi"}], max_tokens=10)
+        second = await client.chat([{"role": "user", "content": "again"}], max_tokens=10)
+        await client.aclose()
+        return client, first, second
+
+    client, first, second = asyncio.run(scenario())
+    assert first == second == "ok"
+    assert len(calls) == 4 and client.retried == 2 and client.clients_created == 1
+    assert calls[0].url == "http://openai.test/v1/chat/completions"
+    assert calls[0].headers["authorization"] == "Bearer sk-test"
+    assert json.loads(calls[0].content)["max_tokens"] == 10
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": "bad request"})
+
+    client = make_client(handler, retries=3)
+    assert asyncio.run(client.chat([], max_tokens=10)) is None
+    assert len(calls) == 1 and client.failures == 1
+
+
+def test_backoff_has_full_jitter_and_cap():
+    delays = [backoff_delay(attempt, base=0.5, cap=2.0) for attempt in range(6) for _ in range(50)]
+    assert min(delays) >= 0 and max(delays) <= 2.0
+    assert len(set(delays)) > 1
+
+
+def test_placeholder_key_disables_requests():
+    assert not LLMClient("").enabled and not LLMClient("sk-proj-X1abc").enabled
+    assert asyncio.run(LLMClient("sk-proj-X1abc").chat([], max_tokens=10)) is None
+
+
+def test_aeon_task_goes_through_shared_client(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import api
+    from app.main import app
+    from app.task_cache import TaskCache
+
+    task = {"task": "Спроектируйте сервис", "example": "Пример решения"}
+    monkeypatch.setattr(api, "llm_client", make_client(lambda request: completion(json.dumps(task))))
+    monkeypatch.setattr(api, "task_cache", TaskCache(ttl=0))
+    client = TestClient(app)
+    token = client.post("/session").json()["token"]
+    assert client.post(f"/aeon/task/{token}", json={"position": "Backend"}).json() == task
+    assert api.llm_client.requests == 1
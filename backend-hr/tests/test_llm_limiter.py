@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.llm_client import LLMClient
+from app.llm_limiter import BACKGROUND, INTERACTIVE, LLMLimiter, LLMOverloaded
+
+
+def test_concurrency_cap():
+    limiter = LLMLimiter(concurrency=2, rate=1000, burst=1000)
+    active, peak = [0], [0]
+
+    async def call():
+        async with limiter.slot():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert peak[0] == 2 and limiter.admitted == 10 and limiter.in_flight == 0
+
+
+def test_token_bucket_limits_rate():
+    limiter = LLMLimiter(concurrency=10, rate=50, burst=1)
+
+    async def scenario():
+        started = time.perf_counter()
+        for _ in range(6):
+            async with limiter.slot():
+                pass
+        return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) >= 5 / 50 * 0.9
+
+
+def test_interactive_requests_go_first():
+    limiter = LLMLimiter(concurrency=1, rate=1000, burst=1000)
+    order = []
+
+    async def call(name, priority):
+        async with limiter.slot(priority):
+            order.append(name)
+
+    async def scenario():
+        await limiter.acquire()
+        waiters = [asyncio.create_task(call("background-1", BACKGROUND)),
+                   asyncio.create_task(call("background-2", BACKGROUND))]
+        await asyncio.sleep(0)
+        waiters.append(asyncio.create_task(call("interactive", INTERACTIVE)))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == {"interactive": 1, "background": 2}
+        limiter.release()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "background-1", "background-2"]
+
+
+def test_deadline_fails_fast_or_expires_in_queue():
+    limiter = LLMLimiter(concurrency=1, rate=1000, burst=1000)
+    limiter.latency = 1.0
+
+    async def scenario():
+        await limiter.acquire()
+        started = time.perf_counter()
+        with pytest.raises(LLMOverloaded):
+            await limiter.acquire(deadline=time.monotonic() + 0.5)
+        assert time.perf_counter() - started < 0.05
+        # Оценка занижена: срок истекает уже в очереди, слот не теряется
+        limiter.latency = 0.01
+        with pytest.raises(LLMOverloaded):
+            await limiter.acquire(deadline=time.monotonic() + 0.05)
+        limiter.release()
+        await limiter.acquire(deadline=time.monotonic() + 0.5)
+        limiter.release()
+
+    asyncio.run(scenario())
+    assert limiter.rejected == 1 and limiter.expired == 1 and limiter.in_flight == 0
+
+
+def fake_openai(latency: float, rate_limited: int):
+    """Фейковый OpenAI: задержка ответа и первые rate_limited ответов — 429"""
+    state = {"calls": 0, "concurrent": 0, "peak": 0}
+
+    async def handler(request):
+        state["calls"] += 1
+        call = state["calls"]
+        state["concurrent"] += 1
+        state["peak"] = max(state["peak"], state["concurrent"])
+        try:
+            await asyncio.sleep(latency)
+            if call <= rate_limited:
+                return httpx.Response(429, headers={"retry-after": "0.05"})
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        finally:
+            state["concurrent"] -= 1
+
+    return handler, state
+
+
+def test_client_respects_limiter_and_429_pauses_everyone():
+    handler, state = fake_openai(latency=0.01, rate_limited=2)
+    limiter = LLMLimiter(concurrency=3, rate=1000, burst=1000)
+    client = LLMClient("sk-test", base_url="http://openai.test/v1", transport=httpx.MockTransport(handler),
+                       limiter=limiter, retries=3, backoff=0.001)
+
+    async def scenario():
+        results = await asyncio.gather(*(client.chat([], max_tokens=10) for _ in range(12)))
+        await client.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == ["ok"] * 12
+    assert state["peak"] <= 3 and limiter.rate_limited == 2 and client.retried == 2
+
+
+def test_budget_falls_back_instead_of_waiting():
+    handler, state = fake_openai(latency=0.5, rate_limited=0)
+    limiter = LLMLimiter(concurrency=1, rate=1000, burst=1000)
+    client = LLMClient("sk-test", base_url="http://openai.test/v1", transport=httpx.MockTransport(handler),
+                       limiter=limiter, retries=0)
+
+    async def scenario():
+        background = asyncio.create_task(client.chat([], max_tokens=10, priority=BACKGROUND))
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        # Слот занят фоновым запросом на 0.5 с: интерактивный с бюджетом 0.1 с сразу получает None
+        limiter.latency = 0.5
+        result = await client.chat([], max_tokens=10, budget=0.1)
+        elapsed = time.perf_counter() - started
+        assert await background == "ok"
+        await client.aclose()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(scenario())
+    assert result is None and elapsed < 0.05
+    assert client.overloaded == 1 and state["calls"] == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from app.question_bank import QuestionBank
+
+QUESTIONS = [
+    {"id": "q_1", "text": "О себе", "type": "technical", "keywords": ["Навыки", "опыт"]},
+    {"id": "q_2", "text": "Рабочий день", "type": "soft", "keywords": ["мотивация"]},
+    {"id": "q_3", "text": "Сложная проблема", "type": "technical"},
+]
+
+
+def test_bank_indexes_questions():
+    bank = QuestionBank(QUESTIONS)
+
+    assert len(bank) == 3 and "q_2" in bank and "q_9" not in bank
+    assert bank.get("q_3").text == "Сложная проблема"
+    assert bank.ordinal("q_2") == 1 and bank.ordinal("q_9") is None
+    assert bank.ids_of_type("technical") == {"q_1", "q_3"}
+    assert bank.count_of_type(["q_1", "q_2", "q_3", "ai_q_4_1700000000"], "technical") == 2
+    assert dict(bank.keywords) == {"q_1": ("навыки", "опыт"), "q_2": ("мотивация",), "q_3": ()}
+
+
+def test_bank_questions_behave_like_dicts_and_are_immutable():
+    bank = QuestionBank(QUESTIONS)
+    question = bank[0]
+
+    assert (question["id"], question["type"], question.get("missing", "x")) == ("q_1", "technical", "x")
+    assert [q["id"] for q in bank[1:]] == ["q_2", "q_3"]
+    assert question.analyzer.analyze("У меня есть опыт и навыки работы")["keyword_matches"] == 2
+    assert bank.analyzer("q_1") is question.analyzer and bank.analyzer("q_9") is None
+    with pytest.raises(AttributeError):
+        question.text = "другой текст"
+
+
+def test_duplicate_ids_are_rejected():
+    with pytest.raises(ValueError):
+        QuestionBank(QUESTIONS + [{"id": "q_1", "text": "Дубликат"}])
+
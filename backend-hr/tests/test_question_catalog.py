@@ -0,0 +1,136 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from app.question_catalog import QUESTION_BANK_DIR, QuestionCatalog
+
+
+@pytest.fixture
+def bank_dir(tmp_path):
+    directory = tmp_path / "questions"
+    shutil.copytree(QUESTION_BANK_DIR, directory)
+    return directory
+
+
+def edit(path, change):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    change(data)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # mtime может не измениться за время теста — сдвигаем явно
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_banks_per_language_with_shared_context():
+    catalog = QuestionCatalog().load()
+    ru, en = catalog.bank("ru"), catalog.bank("en")
+    assert len(ru) == len(en) == 10 and ru.ids() == en.ids()
+    assert ru[0].text != en[0].text and ru.version != en.version
+    assert en.context == ru.context and ru.context
+    assert catalog.bank("de") is ru
+    assert catalog.test(1, "en").title == "Programming Test" and catalog.test(2) is None
+    assert catalog.languages() == ["en", "ru"]
+
+
+def test_reload_swaps_banks_and_keeps_pinned_versions(bank_dir, tmp_path):
+    catalog = QuestionCatalog(str(bank_dir), versions_dir=str(tmp_path / "versions")).load()
+    pinned = catalog.bank("ru").version
+    assert not catalog.reload()
+
+    def rename_first(data):
+        data["version"] = 2
+        data["questions"][0]["text"] = "Новый первый вопрос"
+    edit(bank_dir / "general.ru.json", rename_first)
+    assert catalog.reload() and catalog.reloads == 1
+    current = catalog.bank("ru")
+    assert current.version != pinned and current[0].text == "Новый первый вопрос"
+    # Сессия, начатая до перезагрузки, дорабатывает на своей версии
+    assert catalog.pinned(pinned)[0].text != "Новый первый вопрос"
+    # Неизвестная версия (например, после перезапуска) — текущий банк того же языка
+    assert catalog.pinned("general.en@0+deadbeef") is catalog.bank("en")
+
+
+def test_pinned_version_is_read_from_published_versions(bank_dir, tmp_path):
+    versions = str(tmp_path / "versions")
+    worker = QuestionCatalog(str(bank_dir), versions_dir=versions).load()
+    pinned = worker.bank("ru").version
+    edit(bank_dir / "general.ru.json", lambda data: data["questions"][0].update(text="Новый первый вопрос"))
+    assert worker.reload()
+
+    # Другой процесс (или этот же после перезапуска) старую версию не загружал
+    restarted = QuestionCatalog(str(bank_dir), versions_dir=versions).load()
+    assert restarted.bank("ru").version != pinned
+    bank = restarted.pinned(pinned)
+    assert bank.version == pinned and bank[0].text == worker.pinned(pinned)[0].text != "Новый первый вопрос"
+    assert bank.context == worker.pinned(pinned).context and bank.cohort == "general.ru"
+    assert restarted.pinned(pinned) is bank
+    assert restarted.pinned("../general.ru@1+00000000") is restarted.bank("ru")
+
+
+def test_old_versions_are_evicted_and_reloaded_on_demand(bank_dir, tmp_path):
+    catalog = QuestionCatalog(str(bank_dir), versions_dir=str(tmp_path / "versions"), cached_versions=1).load()
+    pinned = [catalog.bank("ru").version]
+    for n in range(3):
+        edit(bank_dir / "general.ru.json", lambda data: data["questions"][0].update(text=f"Вопрос {n}"))
+        assert catalog.reload()
+        pinned.append(catalog.bank("ru").version)
+    # Текущие ru и en плюс одна прежняя версия
+    assert catalog.stats()["loaded_versions"] == 3
+    assert catalog.pinned(pinned[1])[0].text == "Вопрос 0"
+    assert catalog.pinned(pinned[0])[0].text != "Вопрос 0"
+    assert catalog.stats()["loaded_versions"] == 3
+    assert {"q_1", "q_10"} <= catalog.question_ids()
+
+
+def test_borrowed_context_follows_default_bank_without_mutating_pinned(bank_dir, tmp_path):
+    catalog = QuestionCatalog(str(bank_dir), versions_dir=str(tmp_path / "versions")).load()
+    pinned = catalog.bank("en")
+    edit(bank_dir / "general.ru.json", lambda data: data.update(context="Новый контекст"))
+    assert catalog.reload()
+    assert catalog.bank("en").context == "Новый контекст"
+    assert pinned.context != "Новый контекст"
+
+
+def test_broken_file_keeps_current_snapshot(bank_dir, tmp_path):
+    catalog = QuestionCatalog(str(bank_dir), versions_dir=str(tmp_path / "versions")).load()
+    before = catalog.versions()
+    (bank_dir / "general.en.json").write_text("{ broken", encoding="utf-8")
+    assert not catalog.reload()
+    assert catalog.failures == 1 and catalog.versions() == before
+
+
+def test_session_pins_bank_language():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.api import load_session_from_db, question_catalog
+
+    client = TestClient(app)
+    token = client.post("/session", params={"lang": "en"}).json()["token"]
+    question = client.post(f"/aeon/question/{token}", json={}).json()["questions"][0]
+    assert question["text"] == question_catalog.bank("en").get(question["id"]).text
+    assert load_session_from_db(token).bank_version == question_catalog.bank("en").version
+
+
+def test_bank_version_is_stored_with_session(sqlite_db):
+    from app.session_state import SessionState, session_to_row
+    from app.session_store import read_session_row, read_session_summary, write_session_rows
+
+    write_session_rows([("pinned", session_to_row(SessionState(bank_version="general.en@1+abc")))])
+    assert read_session_row("pinned")["bank_version"] == "general.en@1+abc"
+    assert read_session_summary("pinned").bank_version == "general.en@1+abc"
+
+
+def test_selectors_of_old_versions_are_evicted(monkeypatch):
+    from app import api
+    from app.question_bank import QuestionBank
+
+    monkeypatch.setattr(api.question_catalog, "cached_versions", 1)
+    monkeypatch.setattr(api, "_question_selectors", type(api._question_selectors)())
+    current = api.question_catalog.bank()
+    for n in range(5):
+        api.bank_selector(QuestionBank(current, version=f"old@{n}+0"))
+        assert api.bank_selector(current).bank is current
+    assert len(api._question_selectors) <= 1 + len(api.question_catalog.versions())
+    assert current.version in api._question_selectors
@@ -0,0 +1,92 @@
+import time
+
+from app.question_bank import QuestionBank
+from app.question_selector import QuestionSelector, quality_level
+from app.session_state import SessionState, question_codes
+
+QUESTIONS = [
+    {"id": "sel_t1", "type": "technical"}, {"id": "sel_s1", "type": "soft"},
+    {"id": "sel_t2", "type": "technical"}, {"id": "sel_s2", "type": "soft"},
+    {"id": "sel_t3", "type": "technical"}, {"id": "sel_s3", "type": "soft"},
+]
+question_codes.register(q["id"] for q in QUESTIONS)
+SELECTOR = QuestionSelector(QuestionBank(QUESTIONS))
+
+
+def ask(state, score=None):
+    question = SELECTOR.next_question(state)
+    state.asked_questions.add(question.id)
+    state.question_order.append(question.id)
+    if score is not None:
+        state.aeon_answers[question.id] = "ответ"
+        state.set_quality(question.id, {"version": 1, "score": score, "word_count": 1, "sentence_count": 1,
+                                        "keyword_matches": 0, "keyword_ratio": 0, "has_examples": False,
+                                        "has_specifics": False})
+    return question.id
+
+
+def test_strong_technical_answers_get_more_technical_questions():
+    state = SessionState()
+    assert [ask(state, 90), ask(state, 90), ask(state, 90)] == ["sel_t1", "sel_t2", "sel_t3"]
+    # Технические кончились — дальше soft
+    assert ask(state) == "sel_s1"
+
+
+def test_weak_technical_answers_switch_to_soft():
+    state = SessionState()
+    assert ask(state, 20) == "sel_t1"
+    assert ask(state, 90) == "sel_s1"
+    assert ask(state, 60) == "sel_t2"      # сильный soft — проверяем технику
+    assert quality_level(None) == "mid" and quality_level(40) == "low"
+
+
+def test_every_question_is_asked_once():
+    state = SessionState()
+    asked = [ask(state, 60) for _ in QUESTIONS]
+    assert sorted(asked) == sorted(q["id"] for q in QUESTIONS)
+    assert SELECTOR.next_question(state) is None and SELECTOR.remaining(state) == 0
+
+
+def test_questions_follow_bank_order_not_registration_order():
+    # Перезагруженный банк: те же id (уже в реестре) в другом порядке
+    reordered = QuestionSelector(QuestionBank(list(reversed(QUESTIONS))))
+    state = SessionState()
+    asked = []
+    for _ in QUESTIONS:
+        question = reordered.next_question(state)
+        state.asked_questions.add(question.id)
+        state.question_order.append(question.id)
+        asked.append(question.id)
+    assert asked == ["sel_s3", "sel_t3", "sel_s2", "sel_t2", "sel_s1", "sel_t1"]
+    assert reordered.remaining(state) == 0
+
+
+def test_selection_does_not_depend_on_bank_size():
+    questions = [{"id": f"big_{n}", "type": ("technical", "soft")[n % 2]} for n in range(5000)]
+    question_codes.register(q["id"] for q in questions)
+    selector = QuestionSelector(QuestionBank(questions))
+    # Шаг на запрос — по числу заданных вопросов сессии, а не вопросов банка
+    state = SessionState(asked_questions=[f"big_{n}" for n in range(0, 20, 2)] + ["sel_t1"],
+                         question_order=["big_19"])
+    started = time.perf_counter()
+    for _ in range(1000):
+        question = selector.next_question(state)
+    assert question.id == "big_20" and selector.remaining(state) == 4990
+    assert time.perf_counter() - started < 0.5
+
+
+def test_sessions_coded_by_their_bank_table():
+    from app.session_state import register_bank_codes
+
+    old = QuestionBank(QUESTIONS, version="sel@1+0")
+    new = QuestionBank(QUESTIONS[::-1], version="sel@2+0")
+    register_bank_codes(old.version, old.ids())
+    register_bank_codes(new.version, new.ids())
+    selector = QuestionSelector(new)
+    state = SessionState(bank_version=new.version, asked_questions=["sel_s3", "sel_t3"],
+                         question_order=["sel_t3"])
+    assert selector.next_question(state).id == "sel_s2" and selector.remaining(state) == 4
+    # Сессия другой версии банка сопоставляется по id вопросов
+    other = SessionState(bank_version=old.version, asked_questions=["sel_s3", "sel_t3"],
+                         question_order=["sel_t3"])
+    assert selector.asked_mask(other) == selector.asked_mask(state)
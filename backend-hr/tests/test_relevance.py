@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.answer_quality import performance_score, score_answer, session_quality
+from app.question_bank import QuestionBank
+from app.relevance import RelevanceModel, load_relevance_model, load_relevance_models
+from app.session_state import SessionState, question_codes
+
+question_codes.register(["q_1", "q_2"])
+
+REFERENCES = {
+    "q_1": ["Решал сложную проблему с базой данных: проанализировал медленные запросы и добавил индексы.",
+            "Проблема была в очереди задач; я нашёл причину по логам и предложил решение с повторными попытками.",
+            "Сначала анализ проблемы и метрик, затем решение: разбил задачу на части и проверил гипотезы."],
+    "q_2": ["Меня мотивирует рост и результат: когда пользователи довольны продуктом.",
+            "Энергию даёт обучение новому и сильная команда, мотивация — в интересных задачах."],
+}
+RELEVANT = "Была проблема с медленными запросами к базе данных, я проанализировал логи и добавил индексы."
+OFF_TOPIC = "По выходным гуляю с собакой в парке и смотрю кино."
+
+
+@pytest.fixture
+def model(tmp_path):
+    RelevanceModel.build(REFERENCES, documents=[OFF_TOPIC]).save(str(tmp_path / "general.ru"))
+    return load_relevance_model(str(tmp_path / "general.ru"))
+
+
+def test_relevant_answers_score_higher(model):
+    assert isinstance(model.idf, np.memmap)
+    assert model.score("q_1", RELEVANT) > 0.5 > model.score("q_1", OFF_TOPIC)
+    assert model.score("q_1", REFERENCES["q_1"][0]) == 1.0
+    assert model.score("q_ai_1", RELEVANT) is None
+
+
+def test_batch_matches_single_scores(model):
+    question_ids = ["q_1", "q_2", "q_1", "q_ai_1", "q_2", "q_1"]
+    texts = [RELEVANT, RELEVANT, OFF_TOPIC, RELEVANT, REFERENCES["q_2"][1], ""]
+    batch = model.score_batch(question_ids, texts)
+    assert np.isnan(batch[3])
+    for n, (question_id, text) in enumerate(zip(question_ids, texts)):
+        if n != 3:
+            assert round(float(batch[n]), 3) == model.score(question_id, text)
+
+
+def test_relevance_is_blended_into_performance_score(model):
+    bank = QuestionBank([{"id": "q_1", "keywords": ["проблема"]}])
+    state = SessionState()
+    state.aeon_answers["q_1"] = OFF_TOPIC
+    score_answer(state, "q_1", bank, model)
+    without = performance_score(session_quality(state, bank), 10, relevance_weight=0)
+    totals = session_quality(state, bank, model)
+    assert totals.with_relevance == 1 and totals.relevance_sum == state.quality("q_1")["relevance"]
+    assert performance_score(totals, 10, relevance_weight=0.5) < without
+    assert load_relevance_model("no-such-model") is None
+
+
+def test_models_are_loaded_per_bank(tmp_path):
+    RelevanceModel.build(REFERENCES).save(str(tmp_path / "general.ru"))
+    english = {"q_1": ["I found the slow database queries in the logs and added indexes."]}
+    RelevanceModel.build(english, cohort="general.en").save(str(tmp_path / "general.en"))
+    models = load_relevance_models(str(tmp_path))
+    assert sorted(models) == ["general.en", "general.ru"]
+    on_topic = "The database queries were slow, I found them in the logs and added indexes."
+    assert models["general.en"].score("q_1", on_topic) > 0.5 > models["general.ru"].score("q_1", on_topic)
+    assert models["general.ru"].score("q_1", RELEVANT) > 0.5
+    assert load_relevance_models(str(tmp_path / "missing")) == {}
+
+
+def test_rebuild_does_not_touch_files_of_a_loaded_model(tmp_path, model):
+    path = str(tmp_path / "general.ru")
+    before = model.score("q_1", RELEVANT)
+    for _ in range(3):
+        RelevanceModel.build({"q_1": [OFF_TOPIC]}).save(path)
+    # Отображённые файлы живой модели не перезаписаны (иначе — SIGBUS или другие числа)
+    assert model.score("q_1", RELEVANT) == before
+    assert load_relevance_model(path).score("q_1", OFF_TOPIC) == 1.0
+    # Ссылка, текущая и предыдущая версии — и ничего лишнего
+    assert os.path.islink(path)
+    assert sorted(os.listdir(tmp_path))[:2] == sorted(name for name in os.listdir(tmp_path) if name.startswith("."))
+    assert len(os.listdir(tmp_path)) == 3
+    assert list(load_relevance_models(str(tmp_path))) == ["general.ru"]
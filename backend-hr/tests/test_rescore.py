@@ -0,0 +1,82 @@
+from app.answer_quality import SCORER_VERSION, analyze_answer_quality
+from app.db_models import Session, SessionAnswer
+from app.rescore import rescore_answers
+
+from tests.conftest import BANK_KEYWORDS
+
+KEYWORDS = BANK_KEYWORDS["ru"]
+
+
+def add_answers(db, sessions):
+    for n in range(sessions):
+        token = f"tok-{n:03d}"
+        db.add(Session(token=token))
+        db.add(SessionAnswer(session_token=token, position=0, question_id="q_1",
+                             answer=f"Опыт работы в команде номер {n}. Например, релизы."))
+        db.add(SessionAnswer(session_token=token, position=1, question_id="q_2",
+                             answer="Пишу на Python", quality={"score": 1, "version": 0}, scorer_version=0))
+        db.add(SessionAnswer(session_token=token, position=2, question_id="ai_q_3_1700000000",
+                             answer="Ответ на сгенерированный вопрос"))
+    db.commit()
+
+
+def scores(factory):
+    db = factory()
+    try:
+        return {(a.session_token, a.position): a for a in db.query(SessionAnswer)}
+    finally:
+        db.close()
+
+
+def test_rescore_updates_stale_answers_in_chunks(sqlite_db, bank_catalog, tmp_path):
+    db = sqlite_db()
+    add_answers(db, 5)
+    db.close()
+
+    result = rescore_answers(bank_catalog, workers=0, chunk_size=3, checkpoint=str(tmp_path / "cp.json"))
+    assert result["rows_this_run"] == 10 and result["done"]
+
+    rows = scores(sqlite_db)
+    answer = rows[("tok-002", 0)]
+    assert answer.scorer_version == SCORER_VERSION
+    assert answer.quality == dict(analyze_answer_quality(answer.answer, KEYWORDS["q_1"]), version=SCORER_VERSION)
+    assert rows[("tok-002", 2)].scorer_version is None  # вопрос не из банка
+
+
+def test_rescore_resumes_from_checkpoint(sqlite_db, bank_catalog, tmp_path):
+    db = sqlite_db()
+    add_answers(db, 4)
+    db.close()
+    checkpoint = str(tmp_path / "cp.json")
+
+    first = rescore_answers(bank_catalog, workers=0, chunk_size=2, checkpoint=checkpoint, rescore_all=True, max_rows=4)
+    assert first["rows_this_run"] == 4 and first["after"] == ["tok-001", 1]
+
+    second = rescore_answers(bank_catalog, workers=0, chunk_size=2, checkpoint=checkpoint, rescore_all=True)
+    assert second["rows_this_run"] == 4 and second["rows"] == 8
+    assert rescore_answers(bank_catalog, workers=0, checkpoint=checkpoint, rescore_all=True)["rows_this_run"] == 0
+
+
+def test_rescore_with_process_pool(sqlite_db, bank_catalog):
+    db = sqlite_db()
+    add_answers(db, 6)
+    db.close()
+
+    result = rescore_answers(bank_catalog, workers=2, chunk_size=4, checkpoint=None)
+    assert result["rows_this_run"] == 12
+    assert all(a.scorer_version == SCORER_VERSION for a in scores(sqlite_db).values() if a.question_id in KEYWORDS)
+
+
+def test_answers_are_rescored_by_their_session_bank(sqlite_db, bank_catalog):
+    english = bank_catalog.bank("en")
+    answer = "Five years of experience in a team of eight. For example, I ran the releases. Specifically the API."
+    db = sqlite_db()
+    db.add(Session(token="en", bank_version=english.version))
+    db.add(SessionAnswer(session_token="en", position=0, question_id="q_1", answer=answer))
+    db.commit()
+    db.close()
+
+    rescore_answers(bank_catalog, workers=2, checkpoint=None)
+    quality = scores(sqlite_db)[("en", 0)].quality
+    assert quality == dict(analyze_answer_quality(answer, BANK_KEYWORDS["en"]["q_1"], "en"), version=SCORER_VERSION)
+    assert quality["keyword_matches"] == 2 and quality["has_examples"] and quality["has_specifics"]
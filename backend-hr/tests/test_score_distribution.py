@@ -0,0 +1,195 @@
+import pytest
+
+from app.answer_quality import performance_score, score_answer, session_quality
+from app.question_bank import QuestionBank
+from app.session_state import SessionState, question_codes, session_to_row
+from app.job_lease import JobLease
+from app.score_distribution import REBUILD_LEASE, ScoreDistribution, ScoreDistributionSaver, ScoreDistributions
+
+question_codes.register(["q_1", "q_2"])
+
+KEYWORDS = {"q_1": ["опыт", "команда"], "q_2": ["python"]}
+BANK = QuestionBank([{"id": question_id, "keywords": keywords} for question_id, keywords in KEYWORDS.items()])
+TEXTS = {
+    "q_1": "У меня большой опыт. Например, команда из пяти человек. Конкретно отвечал за релизы.",
+    "q_2": "Пишу на Python каждый день, в основном сервисы на FastAPI и немного аналитики.",
+}
+
+
+def test_percentile_counts_ties_as_half():
+    distribution = ScoreDistribution()
+    assert distribution.percentile(50) is None
+    for score in (10, 20, 20, 30, 40):
+        distribution.add(score)
+    assert distribution.percentile(5) == 0.0
+    assert distribution.percentile(20) == 40.0   # 1 ниже + 2 равных пополам
+    assert distribution.percentile(35) == 80.0
+    assert distribution.percentile(100) == 100.0
+    distribution.add(250)  # вне диапазона — в крайнюю корзину
+    assert distribution.counts()[100] == 1
+
+
+def test_workers_merge_their_scores_on_save(sqlite_db):
+    first, second = ScoreDistribution(), ScoreDistribution()
+    first.add(10)
+    first.save()
+    second.add(90)
+    second.add(90)
+    second.save()
+    assert second.total == 3
+
+    first.add(50)
+    first.save()
+    assert first.total == 4
+    assert first.percentile(90) == 75.0
+
+    restored = ScoreDistribution()
+    assert restored.load() and restored.counts() == first.counts()
+    assert not ScoreDistribution(version=restored.version + 1).load()
+
+
+def answered_row(bank, texts, completed=True):
+    state = SessionState(bank_version=bank.version)
+    for question_id, text in texts.items():
+        state.aeon_answers[question_id] = text
+        state.answers.append({"question_id": question_id, "answer": text})
+        score_answer(state, question_id, bank)
+    state.completed = completed
+    return state, session_to_row(state)
+
+
+def scores_of(counts):
+    return sorted(score for score, n in enumerate(counts) for _ in range(n))
+
+
+def test_rebuild_from_completed_sessions(sqlite_db, bank_catalog):
+    from app.session_store import write_session_rows
+
+    bank = bank_catalog.bank("ru")
+    full, full_row = answered_row(bank, TEXTS)
+    partial, partial_row = answered_row(bank, {"q_2": TEXTS["q_2"]})
+    _, unfinished_row = answered_row(bank, TEXTS, completed=False)
+    _, empty_row = answered_row(bank, {})
+    write_session_rows([("a-full", full_row), ("b-partial", partial_row),
+                        ("c-unfinished", unfinished_row), ("d-empty", empty_row)])
+
+    distributions = ScoreDistributions()
+    distributions.add("general.ru", 77)  # до перестроения — не должен попасть в итог дважды
+    distributions.rebuild(bank_catalog, chunk_size=1)
+
+    expected = sorted([performance_score(session_quality(full, bank), len(bank)),
+                       performance_score(session_quality(partial, bank), len(bank)), 0])
+    counts = distributions.get("general.ru").counts()
+    assert distributions.total == 3 and scores_of(counts) == expected
+
+    restored = ScoreDistributions()
+    assert restored.load() and restored.get("general.ru").counts() == counts
+
+
+def test_rebuild_keeps_scores_added_during_the_scan(sqlite_db, bank_catalog, monkeypatch):
+    import app.score_distribution as score_distribution
+    from app.session_store import write_session_rows
+
+    write_session_rows([("tok", answered_row(bank_catalog.bank("ru"), TEXTS)[1])])
+    other = ScoreDistributions()
+    other.add("general.ru", 20)
+    other.save()
+
+    distributions = ScoreDistributions()
+    scan = score_distribution.scan_completed_scores
+
+    def slow_scan(*args):
+        counts = scan(*args)
+        # Пока идёт просмотр: сессия этого процесса завершилась, другой процесс сохранил свой балл
+        distributions.add("general.ru", 60)
+        other.add("general.ru", 80)
+        other.save()
+        return counts
+
+    monkeypatch.setattr(score_distribution, "scan_completed_scores", slow_scan)
+    distributions.rebuild(bank_catalog)
+
+    restored = ScoreDistributions()
+    assert restored.load()
+    stored = scores_of(restored.get("general.ru").counts())
+    assert 60 in stored and 80 in stored and 20 not in stored and len(stored) == 3
+
+
+def test_banks_of_other_languages_are_separate_cohorts(sqlite_db, bank_catalog):
+    from app.session_store import write_session_rows
+
+    russian, english = bank_catalog.bank("ru"), bank_catalog.bank("en")
+    answer = "Five years of experience in a team. For example, I ran the releases. Specifically the API."
+    en_state, en_row = answered_row(english, {"q_1": answer})
+    write_session_rows([("ru", answered_row(russian, TEXTS)[1]), ("en", en_row)])
+
+    distributions = ScoreDistributions()
+    distributions.rebuild(bank_catalog)
+    assert distributions.cohorts() == ["general.en", "general.ru"]
+    assert distributions.get("general.en").total == distributions.get("general.ru").total == 1
+    # Ответ на английском оценён по английскому банку: ключевые слова и маркеры найдены
+    assert scores_of(distributions.get("general.en").counts()) == [
+        performance_score(session_quality(en_state, english), len(english))]
+    assert en_state.quality("q_1")["keyword_matches"] == 2 and en_state.quality("q_1")["has_examples"]
+    assert distributions.percentile("general.de", 50) is None
+
+
+def test_saver_rebuilds_before_first_save(sqlite_db, bank_catalog):
+    from app.session_store import write_session_rows
+
+    write_session_rows([("tok", answered_row(bank_catalog.bank("ru"), TEXTS)[1])])
+    distributions = ScoreDistributions()
+    saver = ScoreDistributionSaver(distributions, bank_catalog)
+    assert saver.run_once() and distributions.ready and distributions.total == 1
+
+    distributions.add("general.ru", 5)
+    distributions.add("general.en", 5)  # новой когорты в базе нет — создаётся при сохранении
+    assert saver.run_once()
+    restored = ScoreDistributions()
+    assert restored.load() and restored.get("general.ru").total == 2 and restored.get("general.en").total == 1
+
+
+def test_only_the_lease_holder_rebuilds(sqlite_db, bank_catalog):
+    from app.session_store import write_session_rows
+
+    write_session_rows([("tok", answered_row(bank_catalog.bank("ru"), TEXTS)[1])])
+    leader = JobLease(REBUILD_LEASE)
+    assert leader.acquire()
+    follower = ScoreDistributions()
+    saver = ScoreDistributionSaver(follower, bank_catalog)
+    follower.add("general.ru", 40)
+    # Перестраивает другой процесс: пока он не сохранил итог, перцентиля нет
+    assert not saver.run_once() and not follower.ready
+    assert follower.percentile("general.ru", 50) is None
+
+    ScoreDistributions().rebuild(bank_catalog)
+    leader.release()
+    assert saver.run_once() and follower.ready and not follower.rebuilt
+    assert follower.get("general.ru").total == 2 and follower.percentile("general.ru", 50) is not None
+
+
+@pytest.fixture
+def api_distribution(monkeypatch):
+    from app import api
+    distributions = ScoreDistributions()
+    distributions.ready = True
+    monkeypatch.setattr(api, "score_distribution", distributions)
+    return distributions.get(api.question_catalog.bank().cohort)
+
+
+def test_result_reports_percentile_after_completion(api_distribution):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    for score in (0, 50, 90):
+        api_distribution.add(score)
+    token = client.post("/session").json()["token"]
+    assert client.get(f"/result/{token}").json()["percentile"] is None
+
+    client.post(f"/session/{token}/complete")
+    client.post(f"/session/{token}/complete")
+    result = client.get(f"/result/{token}").json()
+    assert result["performance_score"] == 0
+    assert api_distribution.total == 4
+    assert result["percentile"] == 25.0
@@ -0,0 +1,80 @@
+from app.session_cache import SessionCache
+from app.api import SessionState
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_state(clock):
+    state = SessionState()
+    state.last_activity = clock.now
+    return state
+
+
+def test_lru_eviction_by_entry_count():
+    clock = FakeClock()
+    cache = SessionCache(max_entries=2, ttl=3600, clock=clock)
+    cache["a"] = make_state(clock)
+    cache["b"] = make_state(clock)
+    cache.get("a")  # "a" становится самым свежим
+    cache["c"] = make_state(clock)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_by_byte_budget():
+    clock = FakeClock()
+    cache = SessionCache(max_entries=100, max_bytes=250, ttl=3600,
+                         sizeof=lambda s: 100, clock=clock)
+    for token in "abc":
+        cache[token] = make_state(clock)
+
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] == 200
+
+
+def test_ttl_expiry_on_read_and_sweep():
+    clock = FakeClock()
+    cache = SessionCache(ttl=60, clock=clock)
+    cache["a"] = make_state(clock)
+    cache["b"] = make_state(clock)
+
+    clock.now += 61
+    assert cache.get("a") is None
+    assert cache.sweep() == 1
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 2
+
+
+def test_hit_miss_counters():
+    clock = FakeClock()
+    cache = SessionCache(clock=clock)
+    cache["a"] = make_state(clock)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_evicted_session_is_reloaded():
+    from app import api
+
+    token = "evicted-token"
+    state = SessionState()
+    api.save_session_to_db(token, state)
+    api.sessions.pop(token)
+
+    reloaded = api.load_session_from_db(token)
+    assert reloaded is not None
+    assert reloaded.created_at == state.created_at
+    api.session_store.delete(token)
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from app.db_models import Session, SessionAnswer, SessionQuestion
+from app.session_expiry import SessionPurgeJob, count_expired_sessions, purge_cutoff, purge_expired_sessions
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def add_session(db, token, idle_hours, completed=False):
+    last_activity = NOW - timedelta(hours=idle_hours)
+    db.add(Session(token=token, completed=completed, created_at=last_activity, last_activity=last_activity))
+    db.add(SessionAnswer(session_token=token, position=0, question_id="q_1", answer="ответ"))
+    db.add(SessionQuestion(session_token=token, position=0, question_id="q_1"))
+
+
+def tokens(factory, model, column):
+    db = factory()
+    try:
+        return sorted(getattr(row, column) for row in db.query(model).all())
+    finally:
+        db.close()
+
+
+def test_purge_deletes_only_expired_unfinished_sessions_in_batches(sqlite_db):
+    db = sqlite_db()
+    for n in range(7):
+        add_session(db, f"stale-{n}", idle_hours=5)
+    add_session(db, "finished", idle_hours=5, completed=True)
+    add_session(db, "active", idle_hours=0.5)
+    db.commit()
+    db.close()
+
+    assert count_expired_sessions(purge_cutoff(7200, NOW)) == 7
+    assert purge_expired_sessions(older_than=7200, batch_size=3, pause=0, now=NOW) == 7
+
+    assert tokens(sqlite_db, Session, "token") == ["active", "finished"]
+    assert tokens(sqlite_db, SessionAnswer, "session_token") == ["active", "finished"]
+    assert tokens(sqlite_db, SessionQuestion, "session_token") == ["active", "finished"]
+
+
+def test_purge_respects_max_batches(sqlite_db):
+    db = sqlite_db()
+    for n in range(5):
+        add_session(db, f"stale-{n}", idle_hours=3)
+    db.commit()
+    db.close()
+
+    assert purge_expired_sessions(older_than=7200, batch_size=2, pause=0, max_batches=2, now=NOW) == 4
+    assert len(tokens(sqlite_db, Session, "token")) == 1
+
+
+def test_purge_job_skips_while_database_unavailable(sqlite_db):
+    db = sqlite_db()
+    add_session(db, "stale", idle_hours=3)
+    db.commit()
+    db.close()
+
+    available = False
+    job = SessionPurgeJob(should_run=lambda: available, older_than=7200, pause=0, now=NOW)
+    assert job.run_once() == 0
+    assert job.stats["runs"] == 0
+
+    available = True
+    assert job.run_once() == 1
+    assert job.stats["purged"] == 1
+
+
+def test_purge_keeps_children_of_session_revived_before_delete(sqlite_db):
+    from sqlalchemy import event, update
+
+    db = sqlite_db()
+    add_session(db, "stale", idle_hours=5)
+    add_session(db, "revived", idle_hours=5)
+    db.commit()
+    db.close()
+
+    def revive_before_first_delete(state):
+        # Пользователь вернулся между SELECT и DELETE чистки
+        if state.is_delete and not revived:
+            revived.append(True)
+            other = sqlite_db()
+            other.execute(update(Session).where(Session.token == "revived").values(last_activity=NOW))
+            other.commit()
+            other.close()
+
+    revived = []
+    event.listen(sqlite_db, "do_orm_execute", revive_before_first_delete)
+    try:
+        assert purge_expired_sessions(older_than=7200, batch_size=10, pause=0, now=NOW) == 1
+    finally:
+        event.remove(sqlite_db, "do_orm_execute", revive_before_first_delete)
+
+    assert tokens(sqlite_db, Session, "token") == ["revived"]
+    assert tokens(sqlite_db, SessionAnswer, "session_token") == ["revived"]
+    assert tokens(sqlite_db, SessionQuestion, "session_token") == ["revived"]
@@ -0,0 +1,96 @@
+from app.session_persistence import WriteBehindQueue
+
+
+class RecordingWriter:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, rows):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.batches.append(list(rows))
+
+
+def test_updates_to_same_token_are_coalesced():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, max_staleness=60)
+
+    for i in range(5):
+        queue.enqueue("t1", {"current_question_index": i})
+    queue.enqueue("t2", {"current_question_index": 0})
+
+    assert len(queue) == 2
+    assert queue.flush() == 2
+    assert len(writer.batches) == 1
+    rows = dict(writer.batches[0])
+    assert rows["t1"]["current_question_index"] == 4
+    assert queue.stats["coalesced"] == 4
+
+
+def test_flush_respects_batch_size():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, max_staleness=60, batch_size=2)
+    for i in range(5):
+        queue.enqueue(f"t{i}", {})
+
+    assert queue.flush() == 5
+    assert [len(b) for b in writer.batches] == [2, 2, 1]
+
+
+def test_flush_token_writes_only_that_session():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, max_staleness=60)
+    queue.enqueue("t1", {"completed": True})
+    queue.enqueue("t2", {"completed": False})
+
+    assert queue.flush_token("t1") is True
+    assert [token for token, _ in writer.batches[0]] == ["t1"]
+    assert queue.pending("t2") is not None
+
+
+def test_failed_flush_keeps_rows_queued():
+    writer = RecordingWriter(fail=True)
+    queue = WriteBehindQueue(writer, max_staleness=60)
+    queue.enqueue("t1", {"current_question_index": 1})
+
+    assert queue.flush() == 0
+    assert queue.pending("t1") == {"current_question_index": 1}
+    assert queue.stats["failures"] == 1
+
+    writer.fail = False
+    assert queue.flush() == 1
+
+
+def test_is_overdue_after_max_staleness():
+    queue = WriteBehindQueue(RecordingWriter(), max_staleness=0)
+    assert queue.is_overdue() is False
+    queue.enqueue("t1", {})
+    assert queue.is_overdue() is True
+
+
+def test_stop_during_async_write_does_not_block_event_loop():
+    import asyncio
+
+    written = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_writer(rows):
+            await release.wait()
+            written.extend(token for token, _ in rows)
+
+        queue = WriteBehindQueue(RecordingWriter(), async_writer=slow_writer, max_staleness=0.05)
+        flusher = asyncio.create_task(queue.run(interval=0.01))
+        queue.enqueue("t1", {})
+        while not queue._flush_lock.locked():
+            await asyncio.sleep(0.005)
+        queue.enqueue("t2", {})
+        queue.stop()                     # флашер посреди записи: stop() не ждёт замок
+        release.set()
+        await asyncio.wait_for(flusher, timeout=2)
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert written == ["t1", "t2"] and len(queue) == 0
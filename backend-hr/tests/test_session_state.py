@@ -0,0 +1,81 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+
+from app.session_state import (
+    SessionState, question_codes, row_from_json, row_to_json, session_from_row, session_to_row,
+)
+
+question_codes.register(["q_1", "q_2", "q_3"])
+
+
+def interview_state():
+    state = SessionState()
+    for question_id in ("q_1", "ai_q_4_1700000000", "q_3"):
+        state.asked_questions.add(question_id)
+        state.question_order.append(question_id)
+        state.current_question_index += 1
+    state.aeon_answers["q_1"] = "Первый ответ"
+    state.answers.append({"question_id": "q_1", "answer": "Первый ответ"})
+    state.aeon_answers["ai_q_4_1700000000"] = "Ответ на вопрос ИИ"
+    state.answers.append({"question_id": "ai_q_4_1700000000", "answer": "Ответ на вопрос ИИ", "lang": "ru"})
+    return state
+
+
+def test_views_behave_like_builtin_containers():
+    state = interview_state()
+    assert state.asked_questions == {"q_1", "ai_q_4_1700000000", "q_3"}
+    assert "q_2" not in state.asked_questions
+    assert len(state.asked_questions) == 3
+    assert state.question_order == ["q_1", "ai_q_4_1700000000", "q_3"]
+    assert state.question_order[-1] == "q_3"
+    assert state.aeon_answers == {"q_1": "Первый ответ", "ai_q_4_1700000000": "Ответ на вопрос ИИ"}
+    assert "q_3" not in state.aeon_answers
+    assert state.answers[1] == {"question_id": "ai_q_4_1700000000", "answer": "Ответ на вопрос ИИ", "lang": "ru"}
+
+    state.aeon_answers["q_1"] = "Исправленный ответ"
+    del state.aeon_answers["ai_q_4_1700000000"]
+    assert dict(state.aeon_answers) == {"q_1": "Исправленный ответ"}
+
+
+def test_question_registered_later_keeps_session_code():
+    state = SessionState()
+    state.asked_questions.add("q_late")
+    question_codes.register(["q_late"])
+    assert "q_late" in state.asked_questions
+    state.question_order.append("q_late")
+    assert list(state.question_order) == ["q_late"]
+
+
+def test_timestamps_are_aware_datetimes():
+    state = SessionState(created_at=datetime(2026, 1, 1, 12, 0))
+    assert state.created_at == datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    state.created_at -= timedelta(hours=2)
+    assert state.created_at.hour == 10
+
+
+def test_roundtrips_through_row_json_and_pickle():
+    state = interview_state()
+    assert session_from_row(session_to_row(state)) == state
+    assert session_from_row(row_from_json(row_to_json(session_to_row(state)))) == state
+    assert pickle.loads(pickle.dumps(state)) == state
+
+
+def test_codes_past_the_short_range():
+    from app.question_bank import QuestionBank
+    from app.session_state import register_bank_codes
+
+    # Реестр за пределами signed short: поздно зарегистрированный вопрос получает код > 32767
+    question_codes.register(f"q_bulk_{n}" for n in range(33000))
+    question_codes.register(["q_after_bulk"])
+    state = SessionState(asked_questions=["q_after_bulk"], question_order=["q_1", "q_after_bulk"])
+    assert state.question_order == ["q_1", "q_after_bulk"] and "q_after_bulk" in state.asked_questions
+
+    # Сессия банка кодирует вопросы порядковыми номерами в банке: маска не зависит от размера реестра
+    bank = QuestionBank([{"id": "q_1", "text": "Первый", "type": "soft"},
+                         {"id": "q_after_bulk", "text": "Второй", "type": "technical"}], version="bulk@1+0")
+    codes = register_bank_codes(bank.version, bank.ids())
+    pinned = SessionState(bank_version=bank.version, asked_questions=["q_after_bulk", "ai_q_1"],
+                          question_order=["q_after_bulk", "ai_q_1"])
+    assert pinned.code_table is codes and pinned.asked_mask.bit_length() <= 4
+    assert pinned.asked_questions == {"q_after_bulk", "ai_q_1"}
+    assert pickle.loads(pickle.dumps(pinned)) == pinned
@@ -0,0 +1,266 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from app.redis_client import RedisClient, RedisError
+from app.session_persistence import WriteBehindQueue
+from app.session_state import SessionState
+from app.session_store import InProcessSessionStore, RedisSessionStore
+
+
+class RespStubHandler(socketserver.StreamRequestHandler):
+    """Небольшая заглушка Redis: GET/SET [EX]/DEL/PING поверх RESP2"""
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        count = int(header[1:])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            if command == b"PING":
+                reply = b"+PONG\r\n"
+            elif command == b"GET":
+                value, expires = data.get(args[1], (None, None))
+                if expires is not None and expires < time.time():
+                    data.pop(args[1], None)
+                    value = None
+                reply = self._bulk(value)
+            elif command == b"SET":
+                expires = None
+                if len(args) == 5 and args[3].upper() == b"EX":
+                    expires = time.time() + int(args[4])
+                data[args[1]] = (args[2], expires)
+                reply = b"+OK\r\n"
+            elif command == b"DEL":
+                reply = b":%d\r\n" % (1 if data.pop(args[1], None) else 0)
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespStubHandler)
+    server.daemon_threads = True
+    server.data = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_redis_store(server, writes):
+    host, port = server.server_address
+    client = RedisClient(f"redis://{host}:{port}/0")
+    writer = WriteBehindQueue(lambda rows: writes.extend(rows), max_staleness=60)
+    return RedisSessionStore(client, ttl=60, writer=writer)
+
+
+def test_redis_client_roundtrip(resp_server):
+    host, port = resp_server.server_address
+    client = RedisClient(f"redis://{host}:{port}/0")
+    assert client.ping() is True
+    assert client.set("k", "значение", ex=10) is True
+    assert client.get("k").decode("utf-8") == "значение"
+    assert client.delete("k") == 1
+    assert client.get("k") is None
+    with pytest.raises(RedisError):
+        client.execute("FLUSHALL")
+
+
+def test_redis_store_is_shared_between_workers(resp_server):
+    writes = []
+    worker_a = make_redis_store(resp_server, writes)
+    worker_b = make_redis_store(resp_server, writes)
+
+    state = SessionState()
+    state.asked_questions.add("q_1")
+    state.question_order.append("q_1")
+    state.aeon_answers["q_1"] = "Ответ кандидата"
+    worker_a.save("tok", state)
+
+    loaded = worker_b.load("tok")
+    assert loaded is not None
+    assert loaded.aeon_answers == {"q_1": "Ответ кандидата"}
+    assert loaded.asked_questions == {"q_1"}
+    assert loaded.created_at == state.created_at
+
+
+def test_redis_store_flushes_completed_session_to_sql(resp_server):
+    writes = []
+    store = make_redis_store(resp_server, writes)
+    state = SessionState(completed=True)
+    store.save("tok", state, flush=True)
+    assert [token for token, _ in writes] == ["tok"]
+
+
+def test_redis_store_delete(resp_server):
+    store = make_redis_store(resp_server, [])
+    store.save("tok", SessionState())
+    store.delete("tok")
+    assert b"hr:session:tok" not in resp_server.data
+
+
+def test_in_process_store_reloads_from_pending_queue():
+    writer = WriteBehindQueue(lambda rows: None, max_staleness=60)
+    store = InProcessSessionStore(writer=writer)
+    state = SessionState(current_question_index=3)
+    store.save("tok", state)
+    store.cache.clear()
+
+    loaded = store.load("tok")
+    assert loaded.current_question_index == 3
+
+
+def test_answers_are_appended_as_rows(sqlite_db):
+    from app.db_models import SessionAnswer, SessionQuestion
+    from app.session_state import session_to_row
+    from app.session_store import read_session_row, write_session_rows
+
+    state = SessionState()
+    write_session_rows([("tok", session_to_row(state))])
+    for i in range(3):
+        question_id = f"q_{i + 1}"
+        state.asked_questions.add(question_id)
+        state.question_order.append(question_id)
+        state.aeon_answers[question_id] = f"Ответ {i}"
+        state.answers.append({"question_id": question_id, "answer": f"Ответ {i}"})
+        write_session_rows([("tok", session_to_row(state))])
+
+    db = sqlite_db()
+    positions = [p for (p,) in db.query(SessionAnswer.position).order_by(SessionAnswer.position)]
+    assert positions == [0, 1, 2]
+    assert db.query(SessionQuestion).count() == 3
+    db.close()
+
+    row = read_session_row("tok")
+    assert row["question_order"] == ["q_1", "q_2", "q_3"]
+    assert row["aeon_answers"] == state.aeon_answers
+    assert row["answers"] == state.answers
+
+
+def test_async_store_roundtrip_matches_sync_path(async_sqlite_db):
+    import asyncio
+    from app.session_store import SqlSessionStore, read_session_row
+
+    store = SqlSessionStore()
+    state = SessionState()
+    state.asked_questions.add("q_1")
+    state.question_order.append("q_1")
+    state.aeon_answers["q_1"] = "Асинхронный ответ"
+    state.answers.append({"question_id": "q_1", "answer": "Асинхронный ответ"})
+
+    async def scenario():
+        await store.asave("tok", state)
+        return await store.aload("tok")
+
+    loaded = asyncio.run(scenario())
+    assert loaded.aeon_answers == {"q_1": "Асинхронный ответ"}
+    assert loaded.question_order == ["q_1"]
+    # Записанное асинхронно читается и синхронным путём
+    assert read_session_row("tok")["answers"] == state.answers
+
+
+def test_in_process_store_async_flush(async_sqlite_db):
+    import asyncio
+    from app.session_store import awrite_session_rows, read_session_row, write_session_rows
+
+    writer = WriteBehindQueue(write_session_rows, max_staleness=60, async_writer=awrite_session_rows)
+    store = InProcessSessionStore(writer=writer)
+    asyncio.run(store.asave("tok", SessionState(completed=True), flush=True))
+
+    assert len(writer) == 0
+    assert read_session_row("tok")["completed"] is True
+
+
+def test_summary_is_one_narrow_select_and_loads_answers_lazily(sqlite_db):
+    from sqlalchemy import event
+    from app import db_models
+    from app.session_state import session_to_row
+    from app.session_store import write_session_rows
+
+    state = SessionState(current_question_index=2)
+    for question_id in ("q_1", "q_2"):
+        state.asked_questions.add(question_id)
+        state.question_order.append(question_id)
+    state.aeon_answers["q_1"] = "Первый"
+    state.answers.append({"question_id": "q_1", "answer": "Первый"})
+    state.aeon_answers["q_1"] = "Исправленный"
+    state.answers.append({"question_id": "q_1", "answer": "Исправленный"})
+    write_session_rows([("tok", session_to_row(state))])
+
+    statements = []
+    event.listen(db_models.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    store = InProcessSessionStore(writer=WriteBehindQueue(lambda rows: None, max_staleness=60))
+
+    summary = store.load_summary("tok")
+    assert len(statements) == 1
+    assert "session_answers.answer " not in statements[0]
+    assert (summary.answered_count, summary.asked_count, summary.current_question_index) == (1, 2, 2)
+    assert summary.created_at == state.created_at
+    assert not summary.loaded and "tok" not in store.cache
+
+    # Тяжёлые поля — полной загрузкой при первом обращении
+    assert summary.aeon_answers == {"q_1": "Исправленный"}
+    assert summary.loaded and "tok" in store.cache
+    assert store.load_summary("missing") is None
+
+
+def test_result_of_completed_session_is_read_from_the_summary(sqlite_db, monkeypatch):
+    from sqlalchemy import event
+    from app import api, db_models
+    from app.score_distribution import ScoreDistributions
+    from app.session_state import session_to_row
+    from app.session_store import write_session_rows
+
+    store = InProcessSessionStore(writer=WriteBehindQueue(lambda rows: None, max_staleness=60))
+    monkeypatch.setattr(api, "session_store", store)
+    monkeypatch.setattr(api, "score_distribution", ScoreDistributions())
+    state = SessionState()
+    text = "У меня пять лет опыта в команде. Например, я вёл релизы сервиса. Конкретно — миграции базы."
+    state.aeon_answers["q_1"] = text
+    state.answers.append({"question_id": "q_1", "answer": text})
+    state.completed = True
+    api.record_completion(state)
+    assert state.final_score > 0
+    write_session_rows([("tok", session_to_row(state))])
+
+    statements = []
+    event.listen(db_models.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    result = api.get_result_by_token("tok")
+    # Один узкий SELECT сводки: ответы для балла не загружаются
+    assert len(statements) == 1 and "session_answers.answer " not in statements[0]
+    assert result["performance_score"] == state.final_score and "tok" not in store.cache
+
+
+def test_summary_prefers_session_in_memory():
+    store = InProcessSessionStore(writer=WriteBehindQueue(lambda rows: None, max_staleness=60))
+    state = SessionState(completed=True)
+    state.aeon_answers["q_1"] = "Ответ"
+    store.save("tok", state)
+
+    summary = store.load_summary("tok")
+    assert summary.loaded and summary.completed and summary.answered_count == 1
+    assert summary.full() is state
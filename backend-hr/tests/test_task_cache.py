@@ -0,0 +1,97 @@
+import asyncio
+
+from app.task_cache import TaskCache, read_cached_task, task_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_generator(calls, result=None, delay=0.01):
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result if result is not None else {"task": f"Задание {len(calls)}", "example": "Пример"}
+    return generate
+
+
+def test_key_normalizes_inputs():
+    key = task_cache_key("Иван  Петров", "Backend", "контекст", "gpt-3.5-turbo")
+    assert key == task_cache_key(" иван петров ", "BACKEND", "контекст", "gpt-3.5-turbo")
+    assert key != task_cache_key("Иван Петров", "Frontend", "контекст", "gpt-3.5-turbo")
+    assert key != task_cache_key("Иван Петров", "Backend", "другой контекст", "gpt-3.5-turbo")
+
+
+def test_concurrent_requests_share_one_upstream_call_and_ttl_expires():
+    calls, clock = [], Clock()
+    cache = TaskCache(ttl=60, persistent=lambda: False, clock=clock)
+    generate = counting_generator(calls)
+
+    async def burst():
+        return await asyncio.gather(*(cache.get_or_generate("k", generate) for _ in range(20)))
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1 and all(r == results[0] for r in results)
+    assert asyncio.run(cache.get_or_generate("k", generate)) == results[0]
+    stats = cache.stats()
+    assert stats["upstream_calls"] == 1 and stats["coalesced"] == 19 and stats["hits"] == 1
+    assert stats["saved_calls"] == 20 and stats["hit_ratio"] == round(20 / 21, 3)
+
+    clock.now = 61
+    asyncio.run(cache.get_or_generate("k", generate))
+    assert len(calls) == 2
+
+
+def test_failures_are_not_cached():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        return None
+
+    cache = TaskCache(ttl=60, persistent=lambda: False)
+    assert asyncio.run(cache.get_or_generate("k", failing)) is None
+    assert asyncio.run(cache.get_or_generate("k", failing)) is None
+    assert len(calls) == 2 and cache.stats()["upstream_failures"] == 2 and len(cache) == 0
+
+
+def test_persistent_tier_survives_restart(sqlite_db):
+    calls = []
+    generate = counting_generator(calls, {"task": "Спроектируйте очередь", "example": "Пример"})
+    first = TaskCache(ttl=60, persistent=lambda: True)
+    assert asyncio.run(first.get_or_generate("k", generate))["task"] == "Спроектируйте очередь"
+    assert read_cached_task("k") == {"task": "Спроектируйте очередь", "example": "Пример"}
+
+    # Новый процесс: память пуста, задание берётся из базы без обращения к ИИ
+    restarted = TaskCache(ttl=60, persistent=lambda: True)
+    assert asyncio.run(restarted.get_or_generate("k", generate))["task"] == "Спроектируйте очередь"
+    assert len(calls) == 1 and restarted.stats()["db_hits"] == 1
+
+
+def test_aeon_task_is_cached_per_position(monkeypatch):
+    import httpx
+    from fastapi.testclient import TestClient
+    from app import api
+    from app.llm_client import LLMClient
+    from app.main import app
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {
+            "content": '{"task": "Задание %d", "example": "Пример"}' % len(requests)}}]})
+
+    monkeypatch.setattr(api, "llm_client", LLMClient("sk-test", base_url="http://openai.test/v1",
+                                                     transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(api, "task_cache", TaskCache(ttl=60, persistent=lambda: False))
+    client = TestClient(app)
+    token = client.post("/session").json()["token"]
+    task = lambda position: client.post(f"/aeon/task/{token}", json={"position": position}).json()["task"]
+    assert task("Backend") == task("  backend ") == "Задание 1"
+    assert task("Frontend") == "Задание 2"
+    assert len(requests) == 2 and api.task_cache.stats()["hits"] == 1